@@ -0,0 +1,133 @@
+﻿# almacen_sqlite.py
+
+import sqlite3
+from amigo import Amigo
+from almacenamiento import Almacen
+from carga_paralela import ErrorLinea
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS criterios (
+	posicion INTEGER PRIMARY KEY,
+	nombre TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS amigos (
+	id INTEGER PRIMARY KEY AUTOINCREMENT,
+	nombre TEXT NOT NULL,
+	genero TEXT NOT NULL,
+	categoria TEXT NOT NULL,
+	total INTEGER NOT NULL,
+	puntuaciones BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS amigos_por_total ON amigos (total DESC, id);
+CREATE INDEX IF NOT EXISTS amigos_por_categoria ON amigos (categoria, total DESC, id);
+CREATE INDEX IF NOT EXISTS amigos_por_genero ON amigos (genero, total DESC, id);
+"""
+
+INSERTAR = "INSERT INTO amigos (id, nombre, genero, categoria, total, puntuaciones) VALUES (?, ?, ?, ?, ?, ?)"
+ACTUALIZAR = "UPDATE amigos SET nombre = ?, genero = ?, categoria = ?, total = ?, puntuaciones = ? WHERE id = ?"
+ELIMINAR = "DELETE FROM amigos WHERE id = ?"
+
+class AlmacenSQLite(Almacen):
+	"""
+	Almacén en una base SQLite. Cada amigo es una fila con id estable (el id de la fila);
+	sus puntuaciones se guardan como un BLOB de un byte por criterio, en el orden de la
+	tabla 'criterios'. Hay índices por total, categoría y género, y cada alta, cambio o
+	baja es una transacción de una sola fila; las transacciones del círculo (aplicar_lote)
+	son una sola transacción de SQLite.
+	"""
+	def __init__(self, nombre_archivo='amigos.db'):
+		self.nombre_archivo = nombre_archivo
+		# El círculo puede abrirse en un hilo (el grupo de GestorCirculos) y usarse después
+		# desde otro (la interfaz); la conexión la usa un solo hilo a la vez.
+		self.conexion = sqlite3.connect(nombre_archivo, check_same_thread=False)
+		self.conexion.executescript(ESQUEMA)
+		self._siguiente_id = None
+
+	def _verificar_criterios(self, criterios):
+		"""Registra los criterios en una base nueva o verifica que coincidan con los guardados."""
+		guardados = [fila[0] for fila in self.conexion.execute("SELECT nombre FROM criterios ORDER BY posicion")]
+		if not guardados:
+			with self.conexion:
+				self.conexion.executemany("INSERT INTO criterios (posicion, nombre) VALUES (?, ?)", enumerate(criterios))
+		elif guardados != list(criterios):
+			raise ValueError("Los criterios de la base de datos no coinciden con los criterios actuales.")
+
+	def cargar(self, tabla, errores):
+		self._verificar_criterios(tabla.criterios)
+		num_preg = len(tabla.criterios)
+		filas = self.conexion.execute("SELECT id, nombre, genero, puntuaciones FROM amigos ORDER BY id").fetchall()
+		validas = [fila for fila in filas if len(fila[3]) == num_preg]
+		for fila in filas:
+			if len(fila[3]) != num_preg:
+				errores.append(ErrorLinea(fila[0], "Cantidad de puntuaciones incorrecta.", fila[1]))
+		# Las puntuaciones de todas las filas se copian a la tabla columna por columna.
+		bloque = b''.join(fila[3] for fila in validas)
+		inicio = len(tabla)
+		for j, columna in enumerate(tabla.columnas):
+			columna.frombytes(bloque[j::num_preg])
+		amigos = []
+		for i, (id_amigo, nombre, genero, _) in enumerate(validas):
+			amigo = Amigo._desde_tabla(nombre, genero, tabla, inicio + i)
+			amigo.id = id_amigo
+			amigos.append(amigo)
+		tabla.duenos.extend(amigos)
+		return amigos
+
+	@staticmethod
+	def _valores(amigo):
+		return (amigo.nombre, amigo.genero, amigo.categoria, amigo.puntuacion_total(),
+				bytes(amigo._tabla.valores(amigo._fila)))
+
+	def guardar(self, amigos):
+		"""Reescribe la tabla de amigos completa en una sola transacción, conservando los ids."""
+		with self.conexion:
+			self.conexion.execute("DELETE FROM amigos")
+			self.conexion.executemany(INSERTAR, ((amigo.id,) + self._valores(amigo) for amigo in amigos))
+
+	def nuevo_id(self):
+		"""Como AUTOINCREMENT, nunca reutiliza un id, aunque su amigo se haya eliminado."""
+		if self._siguiente_id is None:
+			fila = self.conexion.execute(
+				"SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'amigos'), 0),"
+				" COALESCE((SELECT MAX(id) FROM amigos), 0))").fetchone()
+			self._siguiente_id = fila[0] + 1
+		self._siguiente_id += 1
+		return self._siguiente_id - 1
+
+	def agregar(self, amigos, amigo):
+		with self.conexion:
+			self.conexion.execute(INSERTAR, (amigo.id,) + self._valores(amigo))
+
+	def actualizar(self, amigos, amigo):
+		with self.conexion:
+			self.conexion.execute(ACTUALIZAR, self._valores(amigo) + (amigo.id,))
+
+	def eliminar(self, amigos, amigo):
+		with self.conexion:
+			self.conexion.execute(ELIMINAR, (amigo.id,))
+
+	def aplicar_lote(self, amigos, altas, cambios, bajas):
+		with self.conexion:
+			self.conexion.executemany(ELIMINAR, ((amigo.id,) for amigo in bajas))
+			self.conexion.executemany(ACTUALIZAR, (self._valores(amigo) + (amigo.id,) for amigo in cambios))
+			self.conexion.executemany(INSERTAR, ((amigo.id,) + self._valores(amigo) for amigo in altas))
+
+	def consultar(self, genero=None, categoria=None):
+		"""
+		Devuelve los ids de los amigos con el género y la categoría indicados (None = cualquiera),
+		de mayor a menor total; la consulta usa los índices por género o por categoría.
+		"""
+		condiciones = []
+		parametros = []
+		if genero is not None:
+			condiciones.append("genero = ?")
+			parametros.append(genero)
+		if categoria is not None:
+			condiciones.append("categoria = ?")
+			parametros.append(categoria)
+		donde = (" WHERE " + " AND ".join(condiciones)) if condiciones else ""
+		consulta = f"SELECT id FROM amigos{donde} ORDER BY total DESC, id"
+		return [fila[0] for fila in self.conexion.execute(consulta, parametros)]
+
+	def cerrar(self, amigos):
+		self.conexion.close()
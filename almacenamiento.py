@@ -0,0 +1,564 @@
+﻿# almacenamiento.py
+# Capa de almacenamiento del círculo de amistades. CirculoAmistad delega en un Almacen
+# la carga, el guardado completo y la persistencia de cada alta, cambio o baja.
+
+import os
+import threading
+from collections import deque, namedtuple
+from amigo import Amigo
+from carga_paralela import ErrorLinea, cargar_en_paralelo, procesos_utiles
+from diario import Diario
+from escritura_diferida import EscritorDiferido
+from esquema import (Migracion, interpretar_esquema, leer_esquema, lineas_de_amigos, linea_esquema, migrar_archivo,
+					 verificar_sin_esquema)
+from instrumentacion import registrar_escritura, registrar_lectura
+
+# Cambios que otro programa hizo en el almacén (ver Almacen.cambios_externos()): las altas y
+# los cambios son listas de (id, nombre, puntuaciones, género), las bajas una lista de ids, y
+# 'reescribir' indica que el círculo debe volver a guardarse completo.
+CambiosExternos = namedtuple('CambiosExternos', ['altas', 'cambios', 'bajas', 'reescribir'])
+
+class Almacen:
+	"""
+	Interfaz común de los almacenes. Cada almacén asigna a los amigos un 'id' estable
+	y creciente (nuevo_id()), que además desempata el ranking por total.
+	"""
+	def cargar(self, tabla, errores):
+		"""
+		Devuelve la lista de amigos guardados, con su id asignado y sus puntuaciones escritas en 'tabla'.
+		Los errores de cada registro se agregan a la lista 'errores'.
+		"""
+		raise NotImplementedError
+
+	def guardar(self, amigos):
+		"""Guarda el círculo completo; 'amigos' es cualquier iterable de los amigos, en orden."""
+		raise NotImplementedError
+
+	def nuevo_id(self):
+		"""Reserva y devuelve el id del próximo amigo. Un id reservado y no usado no se reutiliza."""
+		raise NotImplementedError
+
+	def agregar(self, amigos, amigo):
+		"""Persiste un amigo nuevo, que ya tiene su id y ya está incluido en 'amigos'."""
+		raise NotImplementedError
+
+	def actualizar(self, amigos, amigo):
+		"""Persiste los cambios del amigo (identificado por su id)."""
+		raise NotImplementedError
+
+	def eliminar(self, amigos, amigo):
+		"""Persiste la baja del amigo (identificado por su id), ya quitado de 'amigos'."""
+		raise NotImplementedError
+
+	def aplicar_lote(self, amigos, altas, cambios, bajas):
+		"""
+		Persiste de una vez el resultado de una transacción del círculo: las altas, los cambios
+		y las bajas (listas de amigos, cada amigo a lo sumo en una de ellas). 'amigos' es el
+		estado final. Por defecto se persiste cada cambio por separado.
+		"""
+		for amigo in bajas:
+			self.eliminar(amigos, amigo)
+		for amigo in cambios:
+			self.actualizar(amigos, amigo)
+		for amigo in altas:
+			self.agregar(amigos, amigo)
+
+	def flush(self):
+		"""Espera a que terminen las escrituras pendientes, si el almacén escribe en segundo plano."""
+		pass
+
+	def cerrar(self, amigos):
+		"""Libera los recursos del almacén; 'amigos' es el estado final del círculo."""
+		pass
+
+	def vigilar(self, amigos):
+		"""
+		Empieza a seguir los cambios que otros programas hagan en el almacén (ver
+		cambios_externos()); 'amigos' es el estado actual del círculo. Por defecto no se siguen.
+		"""
+		pass
+
+	def hay_cambios_externos(self):
+		"""Comprobación rápida, sin leer los datos, de si otro programa modificó el almacén."""
+		return False
+
+	def cambios_externos(self, criterios):
+		"""
+		Devuelve los cambios (CambiosExternos) que otro programa hizo en el almacén desde la
+		última lectura o escritura de esta sesión, o None si no hubo. Las altas ya tienen un
+		id reservado con nuevo_id(). Se puede llamar desde otro hilo que el de los cambios
+		(en la interfaz, el del vigilante), para que la lectura no demore la interfaz.
+		"""
+		return None
+
+	def conciliar_cambios_externos(self, externos):
+		"""
+		Se llama en el hilo de los cambios, antes de aplicar 'externos' (leídos quizá en otro
+		hilo): devuelve lo que todavía corresponde aplicar. Por defecto, todo.
+		"""
+		return externos
+
+
+class AlmacenTexto(Almacen):
+	"""
+	Almacén en un archivo de texto (latin-1) con un amigo por línea, en el formato de Amigo.to_line().
+	La primera línea indica los criterios de las puntuaciones (ver esquema.py); si no coinciden
+	con los del círculo, el archivo se migra al cargarlo o se lanza ValueError.
+	Las líneas que no describen un amigo válido se informan al cargar y se conservan tal cual,
+	al final del archivo, en cada guardado: nunca se pierden por reescribirlo.
+	Con diario=True, cada cambio se anexa a un diario ('<archivo>.diario') en lugar de reescribir
+	el archivo completo; el diario se compacta al cerrar o al alcanzar 'umbral_compactacion' registros.
+	Con procesos > 1, el archivo se analiza por trozos en ese número de procesos, si hay más de
+	un CPU y el archivo es lo bastante grande para que convenga (ver carga_paralela.procesos_utiles()).
+	Con diferido=True, las escrituras (guardados completos y registros del diario) las hace
+	un EscritorDiferido en segundo plano, que junta los cambios seguidos en una sola escritura;
+	flush() espera a que terminen. Las líneas de un guardado completo se arman igual en el hilo
+	que llama (O(N)), así que sin diario cada cambio cuesta eso; con diario solo lo cuesta compactar.
+	"""
+	def __init__(self, nombre_archivo='amigos.txt', diario=False, umbral_compactacion=1000, procesos=None,
+				 diferido=False):
+		self.nombre_archivo = nombre_archivo
+		self.modo_diario = diario
+		self.umbral_compactacion = umbral_compactacion
+		self.procesos = procesos
+		self.diario = Diario(nombre_archivo + '.diario', nombre_archivo)
+		# Criterios del círculo y número de migraciones del archivo, para la línea de esquema.
+		self.criterios = None
+		self.revision = 0
+		self._siguiente_id = 0
+		# Líneas del archivo que no describen un amigo, tal como se leyeron; se vuelven a escribir.
+		self._invalidas = []
+		# Registros anotados en el diario desde el último guardado completo (escritos o pendientes).
+		self._registros = 0
+		# (mtime, tamaño) del archivo de amigos tras la última lectura o escritura de esta sesión.
+		self._firma_archivo = None
+		# Con vigilar(): {id al cargar: [id en el círculo, hash de la línea]} del contenido del
+		# archivo y el diario, en el orden en que lo cargaría otro programa. Sirve para saber qué
+		# líneas cambiaron sin volver a analizar el archivo entero.
+		self._imagen = None
+		# Con vigilar(), cambios_externos() corre en otro hilo. '_candado' hace que cada
+		# escritura del archivo o del diario, junto con su reflejo en la imagen, ocurra entera
+		# antes o después de una comparación. '_candado_ids' protege el próximo id, los ids que
+		# esta sesión guardó desde la última lectura ('_locales') y los que hay que volver a
+		# comparar ('_releer'); nunca se tiene mientras se espera al disco.
+		self._candado = threading.RLock()
+		self._candado_ids = threading.Lock()
+		self._locales = set()
+		self._releer = set()
+		self.escritor = EscritorDiferido(self._escribir_archivo, self._anexar) if diferido else None
+
+	def cargar(self, tabla, errores):
+		"""Carga los amigos desde el archivo, si existe, y aplica los cambios pendientes del diario."""
+		amigos = []
+		criterios = tabla.criterios
+		self.criterios = list(criterios)
+		esquema, inicio = leer_esquema(self.nombre_archivo)
+		if esquema is not None and esquema.criterios != self.criterios:
+			esquema, inicio = self._migrar(esquema, tabla)
+		self.revision = esquema.revision if esquema is not None else 0
+		self._firma_archivo = self._firma()
+		previos = len(errores)
+		if os.path.exists(self.nombre_archivo):
+			registrar_lectura(self.nombre_archivo, os.path.getsize(self.nombre_archivo))
+		if self.procesos and self.procesos > 1 and procesos_utiles(self.nombre_archivo, self.procesos, inicio) > 1:
+			# lineas_de_amigos() lo verifica en el otro caso.
+			if esquema is None:
+				verificar_sin_esquema(self.nombre_archivo, criterios)
+			amigos = cargar_en_paralelo(self.nombre_archivo, tabla, self.procesos, errores, inicio)
+		elif os.path.exists(self.nombre_archivo):
+			for numero, linea in lineas_de_amigos(self.nombre_archivo, criterios):
+				try:
+					amigos.append(Amigo.from_line(linea, criterios, tabla))
+				except ValueError as e:
+					print(f"Error al procesar una línea: {e}")
+					errores.append(ErrorLinea(numero, str(e), linea.rstrip('\r\n')))
+		self._invalidas = [error.contenido for error in errores[previos:] if error.contenido.strip()]
+		# Los amigos del archivo reciben los ids 0, 1, 2...; las altas del diario, los siguientes.
+		for id_amigo, amigo in enumerate(amigos):
+			amigo.id = id_amigo
+		por_id = dict(enumerate(amigos))
+		reproducidos = self.diario.reproducir(por_id, criterios, tabla)
+		if reproducidos:
+			amigos = list(por_id.values())
+		# Ni los ids de los amigos eliminados (en esta u otra sesión) se vuelven a asignar.
+		self._siguiente_id = max(max(por_id, default=-1) + 1, self.diario.id_maximo + 1,
+								 esquema.siguiente if esquema is not None else 0)
+		self._registros = reproducidos
+		if reproducidos and not self.modo_diario:
+			# Quedó un diario de una sesión anterior: se vuelca al archivo de amigos.
+			self.guardar(amigos)
+		if self._imagen is not None:
+			self.vigilar(amigos)
+		return amigos
+
+	def _migrar(self, esquema, tabla):
+		"""
+		El archivo se escribió con otros criterios. Si los del círculo solo los reordenan o
+		agregan criterios nuevos (con puntuación 0), el archivo se migra antes de cargarlo y se
+		devuelve el nuevo (esquema, bytes de su línea). Si el círculo no tiene alguno de los
+		criterios del archivo (porque se renombró o se quitó), ValueError: qué hacer con sus
+		puntuaciones se indica al migrar con cli.py.
+		"""
+		try:
+			migracion = Migracion(esquema.criterios, tabla.criterios)
+		except ValueError as e:
+			raise ValueError(f"Los criterios de '{self.nombre_archivo}' no coinciden con los actuales. {e} "
+							 "Indíquelo con 'python cli.py migrar' (ver --renombrar y --descartar).")
+		print(f"Los criterios cambiaron; se migra '{self.nombre_archivo}'. {' '.join(migracion.describir())}")
+		migrar_archivo(self.nombre_archivo, migracion, tabla.clasificador)
+		return leer_esquema(self.nombre_archivo)
+
+	def guardar(self, amigos):
+		"""
+		Guarda todos los amigos en el archivo (en segundo plano, con diferido=True).
+		Las líneas se arman siempre en el hilo que llama: el escritor diferido recibe texto y
+		nunca lee amigos que la interfaz puede estar modificando o quitando de la tabla.
+		"""
+		self._registros = 0
+		instantanea = self._instantanea(amigos)
+		if self.escritor is not None:
+			self.escritor.programar_guardado(instantanea)
+		else:
+			self._escribir_archivo(instantanea)
+
+	def _instantanea(self, amigos):
+		"""
+		(línea de esquema o None, [(id, línea)], líneas inválidas) con el contenido que tendrá
+		el archivo.
+		"""
+		cabecera = None
+		if self.criterios is not None:
+			cabecera = linea_esquema(self.criterios, self.revision, self._siguiente_id)
+		return cabecera, [(amigo.id, amigo.to_line()) for amigo in amigos], list(self._invalidas)
+
+	def _escribir_archivo(self, instantanea):
+		"""
+		Escribe en el archivo una instantánea armada por _instantanea().
+		Se escribe primero un archivo temporal que luego reemplaza al original, de modo que
+		una interrupción nunca deja el archivo a medio escribir. El diario queda vacío.
+		"""
+		cabecera, lineas, invalidas = instantanea
+		temporal = self.nombre_archivo + '.tmp'
+		with self._candado:
+			with open(temporal, 'w', encoding='latin-1') as archivo:
+				if cabecera is not None:
+					archivo.write(cabecera + '\n')
+				archivo.writelines(linea + '\n' for _, linea in lineas)
+				# Al final, donde no reciben id: al volver a cargar, los amigos conservan los suyos.
+				archivo.writelines(linea + '\n' for linea in invalidas)
+				archivo.flush()
+				os.fsync(archivo.fileno())
+				registrar_escritura(self.nombre_archivo, archivo.tell())
+			os.replace(temporal, self.nombre_archivo)
+			self._firma_archivo = self._firma()
+			self.diario.vaciar(id_amigo for id_amigo, _ in lineas)
+			if self._imagen is not None:
+				self._imagen = {id_amigo: [id_amigo, hash(linea)] for id_amigo, linea in lineas}
+
+	def _anexar(self, registro):
+		self._anexar_varios((registro,))
+
+	def _anexar_varios(self, registros):
+		"""Anexa registros al diario y, si se vigila el almacén, los refleja en la imagen."""
+		with self._candado:
+			self.diario.anexar_varios(registros)
+			if self._imagen is None:
+				return
+			for registro in registros:
+				tipo, _, resto = registro.partition(',')
+				id_texto, _, datos = resto.partition(',')
+				id_amigo = int(id_texto)
+				if tipo == "D":
+					self._imagen.pop(id_amigo, None)
+				elif tipo == "U" and id_amigo in self._imagen:
+					self._imagen[id_amigo][1] = hash(datos)
+				else:
+					self._imagen[id_amigo] = [id_amigo, hash(datos)]
+
+	def _persistir(self, amigos, registros):
+		"""En modo diario anexa los registros; si no, reescribe el archivo."""
+		if not self.modo_diario:
+			self.guardar(amigos)
+			return
+		if self.escritor is not None:
+			for registro in registros:
+				self.escritor.programar_registro(registro)
+		else:
+			self._anexar_varios(registros)
+		self._registros += len(registros)
+		if self._registros >= self.umbral_compactacion:
+			self.guardar(amigos)
+
+	def nuevo_id(self):
+		with self._candado_ids:
+			self._siguiente_id += 1
+			return self._siguiente_id - 1
+
+	def _anotar_locales(self, amigos):
+		"""Si se vigila el almacén, recuerda los ids que guarda esta sesión (ver conciliar_cambios_externos())."""
+		if self._imagen is not None:
+			with self._candado_ids:
+				self._locales.update(amigo.id for amigo in amigos)
+
+	def agregar(self, amigos, amigo):
+		self._persistir(amigos, [Diario.registro_alta(amigo)])
+
+	def actualizar(self, amigos, amigo):
+		self._anotar_locales([amigo])
+		self._persistir(amigos, [Diario.registro_cambio(amigo)])
+
+	def eliminar(self, amigos, amigo):
+		self._anotar_locales([amigo])
+		self._persistir(amigos, [Diario.registro_baja(amigo)])
+
+	def aplicar_lote(self, amigos, altas, cambios, bajas):
+		"""Un solo guardado completo o, en modo diario, una sola escritura con todos los registros."""
+		self._anotar_locales(cambios + bajas)
+		registros = ([Diario.registro_baja(amigo) for amigo in bajas] +
+					 [Diario.registro_cambio(amigo) for amigo in cambios] +
+					 [Diario.registro_alta(amigo) for amigo in altas])
+		if registros:
+			self._persistir(amigos, registros)
+
+	def flush(self):
+		if self.escritor is not None:
+			self.escritor.flush()
+
+	def cerrar(self, amigos):
+		"""Compacta el diario si hay cambios pendientes y espera a que terminen las escrituras."""
+		if self._registros:
+			self.guardar(amigos)
+		if self.escritor is not None:
+			self.escritor.cerrar()
+		self.diario.cerrar()
+
+	def _firma(self):
+		"""(mtime, tamaño) del archivo de amigos, o None si no existe."""
+		try:
+			estado = os.stat(self.nombre_archivo)
+		except OSError:
+			return None
+		return estado.st_mtime_ns, estado.st_size
+
+	def _tamano_diario(self):
+		try:
+			return os.path.getsize(self.diario.nombre_archivo)
+		except OSError:
+			return 0
+
+	def vigilar(self, amigos):
+		"""Guarda la huella de la línea de cada amigo, para comparar con lo que escriban otros programas."""
+		self._imagen = {amigo.id: [amigo.id, hash(amigo.to_line())] for amigo in amigos}
+
+	def hay_cambios_externos(self):
+		"""
+		Compara la fecha y el tamaño del archivo y el tamaño del diario con los que dejó esta
+		sesión. También es True si quedaron amigos por volver a comparar (ver conciliar_cambios_externos()).
+		"""
+		if self._imagen is None:
+			return False
+		return (bool(self._releer) or self._firma() != self._firma_archivo
+				or self._tamano_diario() != self.diario.tamano)
+
+	def cambios_externos(self, criterios):
+		"""
+		Si solo creció el diario (otro programa le anexó registros), se leen los registros
+		nuevos desde el último byte conocido. Si cambió el archivo de amigos (lo editó o
+		reemplazó otro programa, o lo sincronizó un servicio externo), se compara la huella de
+		cada línea con la imagen que tenía esta sesión y solo se analizan las líneas distintas.
+		Mientras tanto, la sesión puede seguir guardando cambios desde su hilo: solo espera si
+		escribe sin diferido, y solo lo que dure la comparación.
+		"""
+		if self._imagen is None:
+			return None
+		# Las escrituras pendientes de esta sesión no deben confundirse con cambios externos.
+		self.flush()
+		with self._candado_ids:
+			self._locales = set()
+			releer, self._releer = self._releer, set()
+		with self._candado:
+			if releer:
+				# Su línea no coincidirá con ninguna: se comparan otra vez con el disco.
+				for entrada in self._imagen.values():
+					if entrada[0] in releer:
+						entrada[1] = None
+			elif not self.hay_cambios_externos():
+				return None
+			tamano_diario = self._tamano_diario()
+			if (not releer and self._firma() == self._firma_archivo
+					and 0 < self.diario.tamano <= tamano_diario):
+				leidos = self.diario.registros_desde(self.diario.tamano)
+				if leidos is not None:
+					return self._aplicar_registros_ajenos(*leidos, criterios)
+			return self._comparar_con_disco(criterios)
+
+	def conciliar_cambios_externos(self, externos):
+		"""
+		Quita de 'externos' los cambios y las bajas de amigos que esta sesión guardó después de
+		empezar a leerlos: lo de esta sesión se escribió después y prevalece, aunque no se sabe
+		qué vio la lectura. Esos amigos se comparan otra vez con el disco en la próxima lectura.
+		"""
+		with self._candado_ids:
+			conflictos = self._locales & ({id_amigo for id_amigo, *_ in externos.cambios} | set(externos.bajas))
+			self._releer |= conflictos
+		if not conflictos:
+			return externos
+		return externos._replace(cambios=[cambio for cambio in externos.cambios if cambio[0] not in conflictos],
+								 bajas=[id_amigo for id_amigo in externos.bajas if id_amigo not in conflictos])
+
+	@staticmethod
+	def _interpretar(linea, criterios):
+		"""(nombre, puntuaciones, género) de una línea, o None si no describe un amigo."""
+		try:
+			nombre, valores, genero, _ = Amigo.parsear_linea(linea, len(criterios))
+			if not all(0 <= valor <= 255 for valor in valores):
+				# Como al cargar (ver TablaPuntuaciones.agregar_fila).
+				raise ValueError("Las puntuaciones deben estar entre 0 y 255.")
+		except ValueError as e:
+			print(f"Error al procesar una línea: {e}")
+			return None
+		return nombre, dict(zip(criterios, valores)), genero
+
+	def _id_para(self, id_disco):
+		"""
+		Id en el círculo para un amigo que otro programa agregó con 'id_disco': el mismo, si
+		esta sesión todavía no lo usó, para que diario y círculo sigan de acuerdo.
+		"""
+		with self._candado_ids:
+			if id_disco >= self._siguiente_id:
+				self._siguiente_id = id_disco + 1
+				return id_disco
+		return self.nuevo_id()
+
+	def _aplicar_registros_ajenos(self, registros, fin, criterios):
+		"""
+		Aplica a la imagen los registros anexados por otro programa y devuelve sus cambios,
+		con los registros de un mismo amigo ya combinados (un alta seguida de su baja se anulan).
+		"""
+		# {id en el círculo: (id, nombre, puntuaciones, género)}
+		altas, cambios = {}, {}
+		bajas = []
+		reescribir = False
+		for tipo, id_disco, datos in registros:
+			entrada = self._imagen.get(id_disco)
+			if tipo == "D":
+				if entrada is not None:
+					del self._imagen[id_disco]
+					if altas.pop(entrada[0], None) is None:
+						cambios.pop(entrada[0], None)
+						bajas.append(entrada[0])
+				continue
+			if tipo not in ("A", "U") or tipo == "U" and entrada is None:
+				print(f"Error al procesar un registro del diario: {tipo},{id_disco}")
+				continue
+			interpretado = self._interpretar(datos, criterios)
+			if interpretado is None:
+				continue
+			if entrada is None:
+				id_amigo = self._id_para(id_disco)
+				reescribir = reescribir or id_amigo != id_disco
+				self._imagen[id_disco] = [id_amigo, hash(datos)]
+				altas[id_amigo] = (id_amigo,) + interpretado
+			else:
+				entrada[1] = hash(datos)
+				id_amigo = entrada[0]
+				(altas if id_amigo in altas else cambios)[id_amigo] = (id_amigo,) + interpretado
+		self.diario.tamano = fin
+		self._registros += len(registros)
+		if not (altas or cambios or bajas):
+			return None
+		return CambiosExternos(list(altas.values()), list(cambios.values()), bajas, reescribir)
+
+	def _comparar_con_disco(self, criterios):
+		"""
+		Compara el contenido actual del archivo y el diario con la imagen. Las líneas iguales
+		(por su hash) conservan su amigo; entre dos líneas iguales consecutivas, las líneas
+		distintas se emparejan en orden como cambios y las que sobran son altas o bajas.
+		"""
+		firma = self._firma()
+		try:
+			with open(self.nombre_archivo, 'rb') as archivo:
+				contenido = archivo.read()
+		except FileNotFoundError:
+			contenido = b''
+		registrar_lectura(self.nombre_archivo, len(contenido))
+		lineas = contenido.decode('latin-1').split('\n')
+		if lineas[-1] == '':
+			lineas.pop()
+		esquema = interpretar_esquema(lineas[0].rstrip('\r')) if lineas else None
+		if esquema is not None:
+			del lineas[0]
+			if esquema.criterios != list(criterios):
+				# Otro programa migró el archivo a otros criterios: no se pueden combinar sus
+				# líneas con las de este círculo.
+				print(f"Otro programa cambió los criterios de '{self.nombre_archivo}'; "
+					  "se verán al volver a abrir el círculo.")
+				self._firma_archivo = firma
+				return None
+		conocidas = {huella for _, huella in self._imagen.values()}
+		interpretadas = {}
+		def valida(linea):
+			if linea not in interpretadas:
+				interpretadas[linea] = self._interpretar(linea, criterios)
+			return interpretadas[linea] is not None
+		# Como al cargar, las líneas que no describen un amigo no reciben id.
+		lineas = [linea.rstrip('\r') for linea in lineas]
+		self._invalidas = [linea for linea in lineas
+						   if linea.strip() and hash(linea) not in conocidas and not valida(linea)]
+		lineas = [linea for linea in lineas if hash(linea) in conocidas or valida(linea)]
+		por_disco, registros, fin = self.diario.imagen(lineas, valida)
+
+		anterior = list(self._imagen.values())
+		nuevas = [(id_disco, linea, hash(linea)) for id_disco, linea in por_disco.items()]
+		# Anclas: líneas que no cambiaron, emparejadas en orden creciente en ambos lados.
+		posiciones = {}
+		for posicion, (_, huella) in enumerate(anterior):
+			posiciones.setdefault(huella, deque()).append(posicion)
+		anclas = []
+		ultima = -1
+		for posicion_nueva, (_, _, huella) in enumerate(nuevas):
+			candidatas = posiciones.get(huella)
+			while candidatas and candidatas[0] <= ultima:
+				candidatas.popleft()
+			if candidatas:
+				ultima = candidatas.popleft()
+				anclas.append((ultima, posicion_nueva))
+		anclas.append((len(anterior), len(nuevas)))
+
+		altas, cambios, bajas = [], [], []
+		imagen = {}
+		reescribir = False
+		previa, previa_nueva = -1, -1
+		for ancla, ancla_nueva in anclas:
+			viejas = range(previa + 1, ancla)
+			for desplazamiento, posicion_nueva in enumerate(range(previa_nueva + 1, ancla_nueva)):
+				id_disco, linea, huella = nuevas[posicion_nueva]
+				datos = interpretadas.get(linea) or self._interpretar(linea, criterios)
+				if desplazamiento < len(viejas):
+					id_amigo = anterior[viejas[desplazamiento]][0]
+					cambios.append((id_amigo,) + datos)
+				else:
+					id_amigo = self._id_para(id_disco)
+					altas.append((id_amigo,) + datos)
+				imagen[id_disco] = [id_amigo, huella]
+				reescribir = reescribir or id_amigo != id_disco
+			bajas.extend(anterior[posicion][0] for posicion in viejas[ancla_nueva - previa_nueva - 1:])
+			if ancla_nueva < len(nuevas):
+				id_disco, _, huella = nuevas[ancla_nueva]
+				id_amigo = anterior[ancla][0]
+				imagen[id_disco] = [id_amigo, huella]
+				reescribir = reescribir or id_amigo != id_disco
+			previa, previa_nueva = ancla, ancla_nueva
+
+		self._imagen = imagen
+		self._firma_archivo = firma
+		self._registros = registros
+		self.diario.adoptar(fin)
+		# Otro programa pudo haber asignado (y eliminado) ids que esta sesión no conoce.
+		with self._candado_ids:
+			if esquema is not None:
+				self._siguiente_id = max(self._siguiente_id, esquema.siguiente)
+			self._siguiente_id = max(self._siguiente_id, self.diario.id_maximo + 1)
+		if not (altas or cambios or bajas or reescribir):
+			return None
+		return CambiosExternos(altas, cambios, bajas, reescribir)
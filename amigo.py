@@ -1,135 +1,207 @@
-﻿# amigo.py
-
-class Amigo:
-	def __init__(self, nombre, puntuaciones=None, genero="M", categoria=None, criterios=None):
-		"""
-		Inicializa un objeto Amigo.
-		
-		:param nombre: Nombre del amigo.
-		:param puntuaciones: Diccionario con puntuaciones; si no se proporciona, se inicializa con 0 para cada pregunta.
-		:param genero: 'M' para Hombre o 'F' para Mujer. Por defecto es 'M'.
-		:param categoria: Categoría del amigo; si no se especifica se asigna "Desconocido".
-		:param criterios: Lista de criterios (criterios) para la evaluación.
-		"""
-		self.nombre = nombre.strip()
-		if criterios is None:
-			# Valor por defecto en caso de no recibir la lista de criterios
-			self.criterios = [
-				"Empatía y Calidez",
-				"Confianza",
-				"Reciprocidad",
-				"Intereses Compartidos",
-				"Disponibilidad y Presencia",
-				"Comunicación Efectiva",
-				"Apoyo en Dificultades",
-				"Resolución de Conflictos",
-				"Diversión y Recreación",
-				"Crecimiento Personal"
-			]
-		else:
-			self.criterios = criterios
-		
-		if puntuaciones is None:
-			self.puntuaciones = { key: 0 for key in self.criterios }
-		else:
-			self.puntuaciones = puntuaciones
-		# Normalizar: si se recibe "H" se trata como "M"
-		gen = genero.upper().strip()
-		if gen == "H":
-			gen = "M"
-		self.genero = gen if gen in ("M", "F") else "M"
-		self.categoria = categoria or "Desconocido"
-		self.clasificar_amigo()
-
-	def actualizar_puntuaciones(self, nuevas_puntuaciones):
-		"""Actualiza las puntuaciones del amigo basándose en un diccionario de nuevas puntuaciones."""
-		for clave, valor in nuevas_puntuaciones.items():
-			if clave in self.puntuaciones and 1 <= valor <= 10:
-				self.puntuaciones[clave] = valor
-		self.clasificar_amigo()
-
-	def clasificar_amigo(self):
-		"""Clasifica al amigo en una categoría basada en la suma total de sus puntuaciones."""
-		puntuacion_total = sum(self.puntuaciones.values())
-		if puntuacion_total > 90:
-			self.categoria = "Súper Amigo"
-		elif puntuacion_total >= 80:
-			self.categoria = "Primario"
-		elif puntuacion_total >= 60:
-			self.categoria = "Secundario"
-		elif puntuacion_total >= 40:
-			self.categoria = "Terciario"
-		elif puntuacion_total >= 20:
-			self.categoria = "Ocasional"
-		else:
-			self.categoria = "Conocido"
-
-	def editar_nombre(self, nuevo_nombre):
-		"""Permite editar el nombre del amigo."""
-		self.nombre = nuevo_nombre.strip()
-
-	def editar_genero(self, nuevo_genero):
-		"""Permite editar el género del amigo.
-		
-		Se espera que nuevo_genero sea 'M' o 'F'. Si se pasa otro valor, se asigna 'M' por defecto.
-		"""
-		nuevo_genero = nuevo_genero.upper().strip()
-		if nuevo_genero not in ("M", "F"):
-			nuevo_genero = "M"
-		self.genero = nuevo_genero
-
-	def __str__(self):
-		detalles = f"Nombre: {self.nombre}\n"
-		detalles += f"Género: {'Hombre' if self.genero == 'M' else 'Mujer'}\n"
-		for pregunta in self.criterios:
-			detalles += f"{pregunta}: {self.puntuaciones.get(pregunta, 0)}\n"
-		detalles += f"Categoría: {self.categoria}\n"
-		return detalles
-
-	def to_line(self):
-		"""
-		Convierte la información del amigo en una línea de texto para el archivo,
-		en el formato: Nombre, score1, score2, ..., score10, Género, Categoría
-		"""
-		punt_str = ",".join(str(self.puntuaciones.get(q, 0)) for q in self.criterios)
-		return f"{self.nombre},{punt_str},{self.genero},{self.categoria}"
-
-	@classmethod
-	def from_line(cls, line, criterios):
-		"""
-		Crea un objeto Amigo a partir de una línea de texto.
-		Se espera que la línea tenga:
-		 - (len(criterios) + 3) campos: [nombre, score1, ..., scoreN, género, categoría]
-		 o  
-		 - (len(criterios) + 2) campos: [nombre, score1, ..., scoreN, género+categoría],
-		   en cuyo caso se toma el primer carácter como género (con "H" convertido a "M")
-		   y el resto como categoría.
-		"""
-		parts = line.strip().split(',')
-		num_preg = len(criterios)
-		if len(parts) == num_preg + 3:
-			nombre = parts[0]
-			scores = list(map(int, parts[1:num_preg+1]))
-			puntuaciones = { criterios[i]: scores[i] for i in range(num_preg) }
-			gen = parts[num_preg+1].upper().strip()
-			if gen == "H":
-				gen = "M"
-			categoria = parts[num_preg+2]
-		elif len(parts) == num_preg + 2:
-			nombre = parts[0]
-			scores = list(map(int, parts[1:num_preg+1]))
-			puntuaciones = { criterios[i]: scores[i] for i in range(num_preg) }
-			campo = parts[num_preg+1].strip()
-			if campo:
-				gen = campo[0].upper()
-				if gen == "H":
-					gen = "M"
-				categoria = campo[1:].strip() if len(campo) > 1 else "Desconocido"
-			else:
-				gen = "M"
-				categoria = "Desconocido"
-		else:
-			raise ValueError("La línea no contiene suficientes datos para un amigo.")
-		amigo = cls(nombre, puntuaciones, gen, categoria, criterios=criterios)
-		amigo.clasificar_amigo()
-		return amigo
+﻿# amigo.py
+
+from instrumentacion import medido
+from tabla_puntuaciones import TablaPuntuaciones, VistaPuntuaciones
+
+# Valor por defecto en caso de no recibir la lista de criterios
+CRITERIOS_POR_DEFECTO = [
+	"Empatía y Calidez",
+	"Confianza",
+	"Reciprocidad",
+	"Intereses Compartidos",
+	"Disponibilidad y Presencia",
+	"Comunicación Efectiva",
+	"Apoyo en Dificultades",
+	"Resolución de Conflictos",
+	"Diversión y Recreación",
+	"Crecimiento Personal"
+]
+
+class Amigo:
+	# Sin __dict__ por instancia: las puntuaciones viven en una TablaPuntuaciones
+	# (normalmente compartida por todo el círculo) y el amigo sólo guarda su fila.
+	# 'id' lo asigna el almacén del círculo; es estable y desempata el ranking por total.
+	# '_total' guarda la suma de las puntuaciones; None indica que hay que recalcularla.
+	__slots__ = ('nombre', 'genero', 'categoria', '_tabla', '_fila', 'id', '_total')
+
+	def __init__(self, nombre, puntuaciones=None, genero="M", categoria=None, criterios=None, tabla=None):
+		"""
+		Inicializa un objeto Amigo.
+		
+		:param nombre: Nombre del amigo.
+		:param puntuaciones: Diccionario con puntuaciones; si no se proporciona, se inicializa con 0 para cada pregunta.
+		:param genero: 'M' para Hombre o 'F' para Mujer. Por defecto es 'M'.
+		:param categoria: Categoría del amigo; si no se especifica se asigna "Desconocido".
+		:param criterios: Lista de criterios (criterios) para la evaluación.
+		:param tabla: TablaPuntuaciones donde guardar las puntuaciones; si no se indica,
+		              el amigo usa una tabla propia con los criterios recibidos.
+		"""
+		self.nombre = nombre.strip()
+		if tabla is None:
+			tabla = TablaPuntuaciones(criterios if criterios is not None else CRITERIOS_POR_DEFECTO)
+		self._tabla = tabla
+		self.id = None
+		self._total = None
+		if puntuaciones is None:
+			valores = [0] * len(tabla.criterios)
+		else:
+			valores = [puntuaciones.get(clave, 0) for clave in tabla.criterios]
+		self._fila = tabla.agregar_fila(valores, self)
+		# Normalizar: si se recibe "H" se trata como "M"
+		# (se asignan las constantes para no guardar una cadena nueva por amigo)
+		gen = genero.upper().strip()
+		self.genero = "F" if gen == "F" else "M"
+		self.categoria = categoria or "Desconocido"
+		self.clasificar_amigo()
+
+	@property
+	def criterios(self):
+		return self._tabla.criterios
+
+	@property
+	def puntuaciones(self):
+		"""Puntuaciones del amigo como una vista {criterio: puntuación} sobre su tabla."""
+		return VistaPuntuaciones(self)
+
+	def _escribir_puntuaciones(self, puntuaciones):
+		"""
+		Sobrescribe las puntuaciones con las de un diccionario (las que falten, 0), sin
+		reclasificar al amigo ni tocar los índices del círculo: lo usan el diario, antes de
+		construirlos, y la recarga de cambios externos, que saca al amigo de ellos y lo vuelve
+		a agregar. ValueError si alguna no está entre 0 y 255.
+		"""
+		self._tabla.escribir(self._fila, [puntuaciones.get(clave, 0) for clave in self._tabla.criterios])
+		self._total = None
+
+	def desvincular(self):
+		"""
+		Saca al amigo de su tabla compartida, copiando sus puntuaciones a una tabla propia.
+		Se usa al eliminarlo de un círculo, para que su fila pueda reutilizarse.
+		"""
+		tabla = self._tabla
+		valores = tabla.valores(self._fila)
+		tabla.quitar_fila(self._fila)
+		self._tabla = TablaPuntuaciones(tabla.criterios, tabla.posiciones, tabla.clasificador)
+		self._fila = self._tabla.agregar_fila(valores, self)
+
+	def actualizar_puntuaciones(self, nuevas_puntuaciones):
+		"""Actualiza las puntuaciones del amigo basándose en un diccionario de nuevas puntuaciones."""
+		tabla = self._tabla
+		for clave, valor in nuevas_puntuaciones.items():
+			if clave in tabla.posiciones and 1 <= valor <= 10:
+				tabla.columnas[tabla.posiciones[clave]][self._fila] = valor
+		self._total = None
+		self.clasificar_amigo()
+
+	def puntuacion_total(self):
+		"""Devuelve la suma de las puntuaciones del amigo; se calcula sólo si cambiaron."""
+		if self._total is None:
+			self._total = self._tabla.total(self._fila)
+		return self._total
+
+	def clasificar_amigo(self):
+		"""
+		Clasifica al amigo en una categoría basada en la suma total de sus puntuaciones, con el
+		clasificador de su tabla (ver categorias.py).
+		"""
+		self.categoria = self._tabla.clasificador.por_total[self.puntuacion_total()]
+
+	def editar_nombre(self, nuevo_nombre):
+		"""Permite editar el nombre del amigo."""
+		self.nombre = nuevo_nombre.strip()
+
+	def editar_genero(self, nuevo_genero):
+		"""Permite editar el género del amigo.
+		
+		Se espera que nuevo_genero sea 'M' o 'F'. Si se pasa otro valor, se asigna 'M' por defecto.
+		"""
+		nuevo_genero = nuevo_genero.upper().strip()
+		self.genero = "F" if nuevo_genero == "F" else "M"
+
+	def __str__(self):
+		detalles = f"Nombre: {self.nombre}\n"
+		detalles += f"Género: {'Hombre' if self.genero == 'M' else 'Mujer'}\n"
+		for pregunta in self.criterios:
+			detalles += f"{pregunta}: {self.puntuaciones.get(pregunta, 0)}\n"
+		detalles += f"Categoría: {self.categoria}\n"
+		return detalles
+
+	@medido
+	def to_line(self):
+		"""
+		Convierte la información del amigo en una línea de texto para el archivo,
+		en el formato: Nombre, score1, score2, ..., scoreN, Género, Categoría
+		"""
+		punt_str = ",".join(map(str, self._tabla.valores(self._fila)))
+		return f"{self.nombre},{punt_str},{self.genero},{self.categoria}"
+
+	@staticmethod
+	def formatear_linea(nombre, puntuaciones, genero, categoria):
+		"""Arma una línea en el mismo formato que to_line(), sin crear el amigo (la usa la migración de esquema)."""
+		return f"{nombre},{','.join(map(str, puntuaciones))},{genero},{categoria}"
+
+	@classmethod
+	def _desde_tabla(cls, nombre, genero, tabla, fila, total=None):
+		"""
+		Crea un amigo cuyas puntuaciones ya están escritas en la fila 'fila' de 'tabla'.
+		Lo usan los cargadores masivos, que llenan la tabla por columnas; el llamador
+		debe registrar al amigo en tabla.duenos.
+		"""
+		amigo = cls.__new__(cls)
+		amigo.nombre = nombre.strip()
+		amigo.genero = "F" if genero == "F" else "M"
+		amigo._tabla = tabla
+		amigo._fila = fila
+		amigo.id = None
+		amigo._total = total
+		amigo.clasificar_amigo()
+		return amigo
+
+	@staticmethod
+	def parsear_linea(line, num_preg):
+		"""
+		Separa una línea del archivo en (nombre, puntuaciones, género, categoría), donde
+		'puntuaciones' es la lista de los num_preg valores en el orden de los criterios.
+		Se espera que la línea tenga:
+		 - (num_preg + 3) campos: [nombre, score1, ..., scoreN, género, categoría]
+		 o  
+		 - (num_preg + 2) campos: [nombre, score1, ..., scoreN, género+categoría],
+		   en cuyo caso se toma el primer carácter como género (con "H" convertido a "M")
+		   y el resto como categoría.
+		"""
+		parts = line.strip().split(',')
+		if len(parts) == num_preg + 3:
+			nombre = parts[0]
+			scores = list(map(int, parts[1:num_preg+1]))
+			gen = parts[num_preg+1].upper().strip()
+			if gen == "H":
+				gen = "M"
+			categoria = parts[num_preg+2]
+		elif len(parts) == num_preg + 2:
+			nombre = parts[0]
+			scores = list(map(int, parts[1:num_preg+1]))
+			campo = parts[num_preg+1].strip()
+			if campo:
+				gen = campo[0].upper()
+				if gen == "H":
+					gen = "M"
+				categoria = campo[1:].strip() if len(campo) > 1 else "Desconocido"
+			else:
+				gen = "M"
+				categoria = "Desconocido"
+		else:
+			raise ValueError("La línea no contiene suficientes datos para un amigo.")
+		return nombre, scores, gen, categoria
+
+	@classmethod
+	@medido
+	def from_line(cls, line, criterios, tabla=None):
+		"""
+		Crea un objeto Amigo a partir de una línea de texto (ver parsear_linea).
+		Si se indica 'tabla', las puntuaciones se guardan en ella.
+		"""
+		nombre, scores, gen, categoria = cls.parsear_linea(line, len(criterios))
+		puntuaciones = dict(zip(criterios, scores))
+		amigo = cls(nombre, puntuaciones, gen, categoria, criterios=criterios, tabla=tabla)
+		amigo.clasificar_amigo()
+		return amigo
@@ -0,0 +1,208 @@
+﻿# analisis.py
+# Estadísticas del círculo calculadas de una vez sobre la tabla de puntuaciones.
+# Con NumPy, cada columna de la tabla se lee con np.frombuffer y los cálculos se hacen por
+# lotes; sin NumPy se usa una versión en Python puro con los mismos resultados.
+
+import sys
+from array import array
+from math import sqrt
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+GENEROS = ("M", "F")
+
+def _percentil_desde_conteos(conteos, cantidad, p):
+	"""
+	Percentil p (0-100) de una muestra de enteros dada por sus conteos (conteos[v] = veces
+	que aparece v), con la misma interpolación lineal que numpy.percentile.
+	"""
+	if cantidad == 0:
+		return float('nan')
+	posicion = p / 100 * (cantidad - 1)
+	inferior = int(posicion)
+	fraccion = posicion - inferior
+	valor_inferior = valor_superior = None
+	acumulado = 0
+	for valor, conteo in enumerate(conteos):
+		acumulado += conteo
+		if valor_inferior is None and acumulado > inferior:
+			valor_inferior = valor
+		if acumulado > inferior + 1 or acumulado == cantidad:
+			valor_superior = valor
+			break
+	if fraccion == 0 or valor_superior is None:
+		return float(valor_inferior)
+	return valor_inferior + (valor_superior - valor_inferior) * fraccion
+
+
+class AnalisisCirculo:
+	"""
+	Estadísticas de un CirculoAmistad sobre su matriz de puntuaciones (N amigos x criterios).
+	Los datos se toman al crear el objeto (debe hacerse fuera de una transacción); para
+	reflejar cambios posteriores, se crea otro.
+	"""
+	def __init__(self, circulo, usar_numpy=True):
+		self.criterios = list(circulo.criterios)
+		tabla = circulo.tabla
+		self.cantidad = len(tabla)
+		# Categorías de mayor a menor; el código de categoría de cada fila es su posición aquí.
+		self.categorias = list(tabla.clasificador.nombres)
+		self.numpy = usar_numpy and np is not None
+		# Un carácter por fila: el género del amigo que la ocupa.
+		generos = ''.join(amigo.genero for amigo in tabla.duenos).encode('ascii')
+		if self.numpy:
+			# Se copia cada columna (un byte por amigo): una vista directa impediría que la tabla
+			# siga creciendo mientras exista el análisis.
+			self.columnas = [np.frombuffer(columna, dtype=np.uint8).copy() if len(columna) else np.zeros(0, np.uint8)
+							 for columna in tabla.columnas]
+			self.totales = np.zeros(self.cantidad, dtype=np.uint16)
+			for columna in self.columnas:
+				self.totales += columna
+			self.codigos_genero = (np.frombuffer(generos, dtype=np.uint8) == ord("F")).astype(np.intp) \
+				if generos else np.zeros(0, np.intp)
+			self.codigos_categoria = tabla.clasificador.codigos()[self.totales].astype(np.intp)
+		else:
+			self.columnas = [array('B', columna) for columna in tabla.columnas]
+			self.totales = [sum(fila) for fila in zip(*self.columnas)] if self.columnas else [0] * self.cantidad
+			self.codigos_genero = [1 if genero == ord("F") else 0 for genero in generos]
+			posiciones = tabla.clasificador.posiciones
+			por_total = tabla.clasificador.por_total
+			self.codigos_categoria = [posiciones[por_total[total]] for total in self.totales]
+
+	def matriz(self):
+		"""Devuelve la matriz N x criterios (con NumPy, un ndarray uint8; sin NumPy, una lista de filas)."""
+		if self.numpy:
+			return np.column_stack(self.columnas) if self.columnas else np.zeros((self.cantidad, 0), np.uint8)
+		return [list(fila) for fila in zip(*self.columnas)]
+
+	def _conteos(self, columna):
+		if self.numpy:
+			return np.bincount(columna, minlength=256).tolist()
+		conteos = [0] * 256
+		for valor in columna:
+			conteos[valor] += 1
+		return conteos
+
+	def medias(self):
+		"""Devuelve {criterio: media}."""
+		if self.cantidad == 0:
+			return {criterio: float('nan') for criterio in self.criterios}
+		if self.numpy:
+			return {criterio: float(columna.mean()) for criterio, columna in zip(self.criterios, self.columnas)}
+		return {criterio: sum(columna) / self.cantidad for criterio, columna in zip(self.criterios, self.columnas)}
+
+	def percentiles(self, ps=(25, 50, 75, 90)):
+		"""
+		Devuelve {criterio: {p: percentil}}. Como las puntuaciones son bytes, se calculan a
+		partir de los conteos de cada valor, sin ordenar la columna.
+		"""
+		resultado = {}
+		for criterio, columna in zip(self.criterios, self.columnas):
+			conteos = self._conteos(columna)
+			resultado[criterio] = {p: _percentil_desde_conteos(conteos, self.cantidad, p) for p in ps}
+		return resultado
+
+	def _desglose(self, codigos, etiquetas):
+		"""Cantidad, media del total y media por criterio de cada grupo (código de fila -> etiqueta)."""
+		grupos = len(etiquetas)
+		if self.numpy:
+			cantidades = np.bincount(codigos, minlength=grupos).tolist()
+			sumas_totales = np.bincount(codigos, weights=self.totales, minlength=grupos).tolist()
+			sumas = [np.bincount(codigos, weights=columna, minlength=grupos).tolist() for columna in self.columnas]
+		else:
+			cantidades = [0] * grupos
+			sumas_totales = [0] * grupos
+			sumas = [[0] * grupos for _ in self.columnas]
+			for codigo, total in zip(codigos, self.totales):
+				cantidades[codigo] += 1
+				sumas_totales[codigo] += total
+			for suma, columna in zip(sumas, self.columnas):
+				for codigo, valor in zip(codigos, columna):
+					suma[codigo] += valor
+		resultado = {}
+		for g, etiqueta in enumerate(etiquetas):
+			n = cantidades[g]
+			resultado[etiqueta] = {
+				'cantidad': n,
+				'media_total': sumas_totales[g] / n if n else float('nan'),
+				'medias': {criterio: suma[g] / n if n else float('nan') for criterio, suma in zip(self.criterios, sumas)},
+			}
+		return resultado
+
+	def por_genero(self):
+		"""Devuelve {'M'|'F': {'cantidad', 'media_total', 'medias': {criterio: media}}}."""
+		return self._desglose(self.codigos_genero, GENEROS)
+
+	def por_categoria(self):
+		"""Como por_genero(), agrupando por categoría (de mayor a menor)."""
+		return self._desglose(self.codigos_categoria, self.categorias)
+
+	def correlaciones(self):
+		"""
+		Devuelve la matriz de correlación de Pearson entre criterios (lista de listas, en el
+		orden de los criterios). Un criterio sin variación da NaN.
+		"""
+		k = len(self.columnas)
+		n = self.cantidad
+		if n == 0:
+			return [[float('nan')] * k for _ in range(k)]
+		if self.numpy:
+			datos = np.vstack(self.columnas).astype(np.float64)
+			medias = datos.mean(axis=1)
+			covarianza = datos @ datos.T / n - np.outer(medias, medias)
+			desvios = np.sqrt(np.clip(np.diag(covarianza), 0, None))
+			with np.errstate(divide='ignore', invalid='ignore'):
+				correlacion = covarianza / np.outer(desvios, desvios)
+			return correlacion.tolist()
+		medias = [sum(columna) / n for columna in self.columnas]
+		covarianza = [[0.0] * k for _ in range(k)]
+		for i in range(k):
+			for j in range(i, k):
+				producto = sum(a * b for a, b in zip(self.columnas[i], self.columnas[j]))
+				covarianza[i][j] = covarianza[j][i] = producto / n - medias[i] * medias[j]
+		desvios = [sqrt(max(covarianza[i][i], 0)) for i in range(k)]
+		return [[covarianza[i][j] / (desvios[i] * desvios[j]) if desvios[i] and desvios[j] else float('nan')
+				 for j in range(k)] for i in range(k)]
+
+	def histograma_totales(self):
+		"""Devuelve una lista con la cantidad de amigos para cada total posible (0 a 10 por criterio)."""
+		largo = 10 * len(self.criterios) + 1
+		if self.numpy:
+			conteos = np.bincount(self.totales, minlength=largo).tolist()
+		else:
+			conteos = [0] * largo
+			for total in self.totales:
+				if total >= len(conteos):
+					conteos.extend([0] * (total + 1 - len(conteos)))
+				conteos[total] += 1
+		return conteos
+
+	def resumen(self):
+		"""Devuelve todas las estadísticas en un diccionario."""
+		return {
+			'cantidad': self.cantidad,
+			'criterios': self.criterios,
+			'medias': self.medias(),
+			'percentiles': self.percentiles(),
+			'por_genero': self.por_genero(),
+			'por_categoria': self.por_categoria(),
+			'correlaciones': self.correlaciones(),
+			'histograma_totales': self.histograma_totales(),
+		}
+
+
+if __name__ == "__main__":
+	# Uso: python analisis.py [amigos.txt]
+	import json
+	import time
+	from amigo import CRITERIOS_POR_DEFECTO
+	from circulo_amistad import CirculoAmistad
+	circulo = CirculoAmistad(sys.argv[1] if len(sys.argv) > 1 else "amigos.txt", CRITERIOS_POR_DEFECTO)
+	inicio = time.perf_counter()
+	resumen = AnalisisCirculo(circulo).resumen()
+	segundos = time.perf_counter() - inicio
+	print(json.dumps(resumen, ensure_ascii=False, indent=1))
+	print(f"{circulo.contar()} amigos analizados en {segundos * 1000:.1f} ms ({'NumPy' if np is not None else 'Python puro'})")
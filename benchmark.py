@@ -0,0 +1,267 @@
+﻿# benchmark.py
+# Mediciones de rendimiento del círculo de amistades sobre archivos sintéticos.
+#
+# Uso:
+#   python benchmark.py                              (1k y 100k amigos; resultados en pantalla)
+#   python benchmark.py --tamanos 1000 100000 1000000 --salida resultados.json
+#   python benchmark.py --base base.json             (compara con una medición guardada)
+#   python benchmark.py --arranque                   (arranque de cli.py frente al de la interfaz)
+# El proceso termina con código 1 si alguna medición empeoró más que la tolerancia.
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from amigo import CRITERIOS_POR_DEFECTO
+from circulo_amistad import CirculoAmistad
+
+NOMBRES = ["Ana", "José", "María", "Pedro", "Lucía", "Andrés", "Sofía", "Martín", "Camila", "Nicolás"]
+APELLIDOS = ["García", "Pérez", "López", "Muñoz", "Rodríguez", "Fernández", "Gómez", "Díaz"]
+
+def generar_archivo(nombre_archivo, cantidad, criterios=CRITERIOS_POR_DEFECTO, semilla=0,
+					proporcion_malformadas=0.001, proporcion_heredadas=0.05):
+	"""
+	Escribe un archivo de amigos sintético y determinista (la misma semilla da el mismo archivo).
+	Además de líneas normales, incluye:
+	 - líneas con el formato heredado de num_preg + 2 campos (género y categoría juntos);
+	 - líneas malformadas (campos de menos, puntuaciones no numéricas y líneas vacías).
+	Devuelve la cantidad de líneas malformadas escritas.
+	"""
+	azar = random.Random(semilla)
+	num_preg = len(criterios)
+	malformadas = 0
+	with open(nombre_archivo, 'w', encoding='latin-1', newline='\n') as archivo:
+		for i in range(cantidad):
+			sorteo = azar.random()
+			if sorteo < proporcion_malformadas:
+				malformadas += 1
+				tipo = i % 3
+				if tipo == 0:
+					archivo.write(f"Incompleto {i},1,2\n")
+				elif tipo == 1:
+					archivo.write(f"Ilegible {i}," + ",".join("x" * num_preg) + ",M,Conocido\n")
+				else:
+					archivo.write("\n")
+				continue
+			nombre = f"{azar.choice(NOMBRES)} {azar.choice(APELLIDOS)} {i}"
+			puntuaciones = ",".join(str(azar.randint(1, 10)) for _ in range(num_preg))
+			genero = "F" if azar.random() < 0.5 else "M"
+			if sorteo < proporcion_malformadas + proporcion_heredadas:
+				archivo.write(f"{nombre},{puntuaciones},{genero}Desconocido\n")
+			else:
+				archivo.write(f"{nombre},{puntuaciones},{genero},Desconocido\n")
+	return malformadas
+
+def _medir(funcion, con_memoria):
+	"""Ejecuta 'funcion' y devuelve (resultado, segundos, pico de memoria en MiB o None)."""
+	if con_memoria:
+		tracemalloc.start()
+	inicio = time.perf_counter()
+	try:
+		resultado = funcion()
+		segundos = time.perf_counter() - inicio
+	finally:
+		pico = None
+		if con_memoria:
+			pico = tracemalloc.get_traced_memory()[1] / 2**20
+			tracemalloc.stop()
+	return resultado, segundos, pico
+
+def _registro(operaciones, segundos, pico):
+	return {
+		'operaciones': operaciones,
+		'segundos': segundos,
+		'por_segundo': operaciones / segundos if segundos > 0 else None,
+		'memoria_pico_mib': pico,
+	}
+
+def medir_tamano(cantidad, directorio, criterios=CRITERIOS_POR_DEFECTO, mutaciones=200, con_memoria=True):
+	"""
+	Mide las operaciones del círculo sobre un archivo sintético de 'cantidad' amigos.
+	La carga y el pico de memoria se miden con tracemalloc en una pasada aparte, para que
+	no altere los tiempos. Las mutaciones se hacen en modo diario, como en la aplicación.
+	Devuelve {operación: {'operaciones', 'segundos', 'por_segundo', 'memoria_pico_mib'}}.
+	"""
+	original = os.path.join(directorio, f"amigos_{cantidad}.txt")
+	if not os.path.exists(original):
+		generar_archivo(original, cantidad, criterios)
+	archivo = os.path.join(directorio, "amigos.txt")
+	shutil.copyfile(original, archivo)
+	resultados = {}
+
+	# Los avisos de las líneas malformadas se descartan para no medir la consola.
+	with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo):
+		circulo, segundos, _ = _medir(lambda: CirculoAmistad(archivo, criterios, diario=True), False)
+		pico = _medir(lambda: CirculoAmistad(archivo, criterios), True)[2] if con_memoria else None
+	resultados['cargar_amigos'] = _registro(cantidad, segundos, pico)
+
+	_, segundos, _ = _medir(circulo.guardar_amigos, False)
+	resultados['guardar_amigos'] = _registro(circulo.contar(), segundos, None)
+
+	_, segundos, pico = _medir(circulo.mostrar_circulo, con_memoria)
+	resultados['mostrar_circulo'] = _registro(circulo.contar(), segundos, pico)
+
+	for filtro, genero, categoria in (("Hombres", "M", None), ("Secundario", None, "Secundario")):
+		_, segundos, _ = _medir(lambda: circulo.filtrar(genero=genero, categoria=categoria), False)
+		resultados[f'filtrar_{filtro.lower()}'] = _registro(circulo.contar(), segundos, None)
+	_, segundos, _ = _medir(lambda: [circulo.contar(f) for f in ("Todos", "Hombres", "Mujeres", "Primario")], False)
+	resultados['contar'] = _registro(4, segundos, None)
+
+	azar = random.Random(1)
+	puntuaciones = [{criterio: azar.randint(1, 10) for criterio in criterios} for _ in range(mutaciones)]
+	ids = [None] * mutaciones
+
+	def agregar():
+		for i in range(mutaciones):
+			ids[i] = circulo.agregar_amigo(f"Nuevo {i}", puntuaciones[i], "F")
+	def reevaluar():
+		for i in range(mutaciones):
+			circulo.reevaluar_amigo(ids[i], puntuaciones[-1 - i])
+	def eliminar():
+		for i in range(mutaciones):
+			circulo.eliminar_amigo(ids[i])
+
+	for nombre, funcion in (("agregar_amigo", agregar), ("reevaluar_amigo", reevaluar), ("eliminar_amigo", eliminar)):
+		_, segundos, _ = _medir(funcion, False)
+		resultados[nombre] = _registro(mutaciones, segundos, None)
+
+	_, segundos, _ = _medir(lambda: circulo.agregar_amigos(("Lote %d" % i, puntuaciones[i]) for i in range(mutaciones)), False)
+	resultados['agregar_amigos'] = _registro(mutaciones, segundos, None)
+	circulo.cerrar()
+	return resultados
+
+def ejecutar(tamanos, directorio=None, mutaciones=200, con_memoria=True):
+	"""Mide todos los tamaños y devuelve el informe completo (un diccionario serializable en JSON)."""
+	temporal = None
+	if directorio is None:
+		directorio = temporal = tempfile.mkdtemp(prefix="benchmark_amistades_")
+	try:
+		informe = {
+			'entorno': {
+				'python': platform.python_version(),
+				'plataforma': platform.platform(),
+				'cpus': os.cpu_count(),
+				'fecha': time.strftime("%Y-%m-%dT%H:%M:%S"),
+			},
+			'resultados': {},
+		}
+		for cantidad in tamanos:
+			print(f"Midiendo {cantidad} amigos...", file=sys.stderr)
+			informe['resultados'][str(cantidad)] = medir_tamano(cantidad, directorio, mutaciones=mutaciones,
+																 con_memoria=con_memoria)
+		return informe
+	finally:
+		if temporal is not None:
+			shutil.rmtree(temporal, ignore_errors=True)
+
+def medir_arranque(repeticiones=5):
+	"""
+	Mide el arranque en frío de cada punto de entrada, en procesos nuevos (el mejor de
+	'repeticiones'): el intérprete solo, la línea de comandos (cli.py, sin amigos que cargar)
+	y los módulos de la interfaz gráfica (importar main.py, que carga wx y los diálogos).
+	Devuelve {punto de entrada: segundos}; None si no se pudo ejecutar (por ejemplo, sin wx).
+	"""
+	directorio = os.path.dirname(os.path.abspath(__file__))
+	temporal = tempfile.mkdtemp(prefix="benchmark_arranque_")
+	comandos = {
+		'python': [sys.executable, "-c", "pass"],
+		'cli': [sys.executable, os.path.join(directorio, "cli.py"), "--archivo", os.path.join(temporal, "amigos.txt"),
+				"--criterios", os.path.join(temporal, "criterios.txt"), "listar"],
+		'gui_importar': [sys.executable, "-c", "import main"],
+	}
+	resultados = {}
+	try:
+		for nombre, comando in comandos.items():
+			mejor = None
+			for _ in range(repeticiones):
+				inicio = time.perf_counter()
+				proceso = subprocess.run(comando, cwd=directorio, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+				segundos = time.perf_counter() - inicio
+				if proceso.returncode != 0:
+					mejor = None
+					break
+				mejor = segundos if mejor is None else min(mejor, segundos)
+			resultados[nombre] = mejor
+	finally:
+		shutil.rmtree(temporal, ignore_errors=True)
+	return resultados
+
+def comparar(informe, base, tolerancia=0.25, minimo=0.001):
+	"""
+	Compara los tiempos de 'informe' con los de 'base' (otro informe).
+	Devuelve la lista de regresiones (tamaño, operación, segundos base, segundos actuales)
+	cuyo tiempo creció más que 'tolerancia' (0.25 = 25 %). Las diferencias menores que
+	'minimo' segundos se consideran ruido.
+	"""
+	regresiones = []
+	for cantidad, operaciones in informe['resultados'].items():
+		for operacion, medicion in operaciones.items():
+			anterior = base.get('resultados', {}).get(cantidad, {}).get(operacion)
+			if (anterior and medicion['segundos'] > anterior['segundos'] * (1 + tolerancia)
+					and medicion['segundos'] - anterior['segundos'] >= minimo):
+				regresiones.append((cantidad, operacion, anterior['segundos'], medicion['segundos']))
+	return regresiones
+
+def imprimir(informe):
+	for cantidad, operaciones in informe['resultados'].items():
+		print(f"\n{cantidad} amigos")
+		for operacion, m in operaciones.items():
+			memoria = f"  pico {m['memoria_pico_mib']:.1f} MiB" if m['memoria_pico_mib'] is not None else ""
+			por_segundo = f"{m['por_segundo']:>14,.0f}/s" if m['por_segundo'] is not None else ""
+			print(f"  {operacion:<20}{m['segundos'] * 1000:>10.1f} ms{por_segundo}{memoria}")
+
+def main(argumentos=None):
+	parser = argparse.ArgumentParser(description="Mediciones de rendimiento del círculo de amistades.")
+	parser.add_argument("--tamanos", type=int, nargs="+", default=[1000, 100000],
+						help="Cantidades de amigos a medir (por ejemplo 1000 100000 1000000).")
+	parser.add_argument("--directorio", help="Directorio donde generar (y reutilizar) los archivos sintéticos.")
+	parser.add_argument("--mutaciones", type=int, default=200, help="Altas, cambios y bajas a medir por tamaño.")
+	parser.add_argument("--sin-memoria", action="store_true", help="No medir el pico de memoria (más rápido).")
+	parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados.")
+	parser.add_argument("--base", help="Archivo JSON con una medición anterior para comparar.")
+	parser.add_argument("--tolerancia", type=float, default=0.25,
+						help="Aumento de tiempo tolerado respecto de la base (0.25 = 25 %%).")
+	parser.add_argument("--arranque", action="store_true",
+						help="Solo mide el arranque de la línea de comandos frente al de la interfaz gráfica.")
+	parser.add_argument("--generar", metavar="ARCHIVO",
+						help="Solo genera un archivo sintético con el primer tamaño y termina.")
+	opciones = parser.parse_args(argumentos)
+
+	if opciones.generar:
+		malformadas = generar_archivo(opciones.generar, opciones.tamanos[0])
+		print(f"{opciones.generar}: {opciones.tamanos[0]} líneas ({malformadas} malformadas)")
+		return 0
+
+	if opciones.arranque:
+		for nombre, segundos in medir_arranque().items():
+			print(f"  {nombre:<14}" + (f"{segundos * 1000:>10.1f} ms" if segundos is not None else "  no disponible"))
+		return 0
+
+	if opciones.directorio:
+		os.makedirs(opciones.directorio, exist_ok=True)
+	informe = ejecutar(opciones.tamanos, opciones.directorio, opciones.mutaciones, not opciones.sin_memoria)
+	imprimir(informe)
+	if opciones.salida:
+		with open(opciones.salida, 'w', encoding='utf-8') as archivo:
+			json.dump(informe, archivo, ensure_ascii=False, indent=1)
+	if opciones.base:
+		with open(opciones.base, 'r', encoding='utf-8') as archivo:
+			regresiones = comparar(informe, json.load(archivo), opciones.tolerancia)
+		for cantidad, operacion, anterior, actual in regresiones:
+			print(f"REGRESIÓN {cantidad} {operacion}: {anterior * 1000:.1f} ms -> {actual * 1000:.1f} ms")
+		if regresiones:
+			return 1
+		print("\nSin regresiones respecto de la base.")
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,157 @@
+﻿# carga_paralela.py
+# Carga de archivos de amigos muy grandes repartiendo el análisis de las líneas
+# entre varios procesos.
+
+import os
+import sys
+import time
+from array import array
+from collections import namedtuple
+from amigo import Amigo
+from tabla_puntuaciones import TablaPuntuaciones
+
+# Error de una línea del archivo: número de línea (desde 1), mensaje y contenido de la línea.
+ErrorLinea = namedtuple('ErrorLinea', ['linea', 'mensaje', 'contenido'])
+
+# Tamaño aproximado de cada trozo; acota la memoria que usa cada proceso.
+TAMANO_TROZO = 8 * 1024 * 1024
+# Tamaño mínimo del archivo para repartirlo entre procesos. Medido con un solo CPU (python
+# carga_paralela.py): analizar cuesta unos 0,19 s por MiB, devolver los resultados al proceso
+# principal unos 0,015 s por MiB y arrancar el grupo de procesos unos 0,06 s. Con dos CPU se
+# ganarían a lo sumo unos 0,08 s por MiB, así que por debajo de unos pocos MiB la carga en
+# un solo proceso es igual o más rápida. Con un solo CPU, varios procesos siempre son más lentos.
+UMBRAL_PARALELO = 4 * 1024 * 1024
+
+def procesos_utiles(nombre_archivo, procesos=None, inicio=0):
+	"""
+	Cantidad de procesos que conviene usar para cargar el archivo a partir del byte 'inicio':
+	'procesos' (por defecto, uno por CPU) sin superar la cantidad de CPU, o 1 si hay un solo
+	CPU o el archivo no llega a UMBRAL_PARALELO.
+	"""
+	cpus = os.cpu_count() or 1
+	procesos = min(procesos or cpus, cpus)
+	if procesos <= 1 or not os.path.exists(nombre_archivo) or os.path.getsize(nombre_archivo) - inicio < UMBRAL_PARALELO:
+		return 1
+	return procesos
+
+def dividir_en_trozos(nombre_archivo, partes, inicio=0):
+	"""
+	Divide el archivo, a partir del byte 'inicio', en 'partes' rangos de bytes [inicio, fin)
+	que terminan en un salto de línea, de modo que ninguna línea quede repartida entre dos trozos.
+	"""
+	tamano = os.path.getsize(nombre_archivo)
+	limites = [inicio]
+	with open(nombre_archivo, 'rb') as archivo:
+		for i in range(1, partes):
+			posicion = max(inicio + (tamano - inicio) * i // partes, limites[-1])
+			archivo.seek(posicion)
+			archivo.readline()
+			posicion = min(archivo.tell(), tamano)
+			if posicion > limites[-1]:
+				limites.append(posicion)
+	limites.append(tamano)
+	return [(inicio, fin) for inicio, fin in zip(limites, limites[1:]) if fin > inicio]
+
+def procesar_trozo(nombre_archivo, inicio, fin, num_preg):
+	"""
+	Analiza las líneas del rango [inicio, fin) del archivo.
+	Devuelve los datos por columnas para que viajen entre procesos de forma compacta:
+	(nombres, géneros, columnas de puntuaciones en bytes, totales en bytes, errores, cantidad de líneas),
+	donde cada error es (línea relativa al trozo desde 0, mensaje, contenido).
+	"""
+	with open(nombre_archivo, 'rb') as archivo:
+		archivo.seek(inicio)
+		datos = archivo.read(fin - inicio)
+	lineas = datos.decode('latin-1').split('\n')
+	if lineas[-1] == '':
+		lineas.pop()
+	nombres = []
+	generos = []
+	columnas = [array('B') for _ in range(num_preg)]
+	totales = array('I')
+	errores = []
+	for numero, linea in enumerate(lineas):
+		try:
+			nombre, scores, genero, _ = Amigo.parsear_linea(linea, num_preg)
+			if not all(0 <= valor <= 255 for valor in scores):
+				raise ValueError("Las puntuaciones deben estar entre 0 y 255.")
+		except ValueError as e:
+			errores.append((numero, str(e), linea.rstrip('\r')))
+			continue
+		for columna, valor in zip(columnas, scores):
+			columna.append(valor)
+		nombres.append(nombre)
+		generos.append("F" if genero == "F" else "M")
+		totales.append(sum(scores))
+	return nombres, ''.join(generos), [columna.tobytes() for columna in columnas], totales.tobytes(), errores, len(lineas)
+
+def cargar_en_paralelo(nombre_archivo, tabla, procesos=None, errores=None, inicio=0, ajustar=True):
+	"""
+	Carga los amigos del archivo analizando trozos en un grupo de 'procesos' procesos
+	(por defecto, uno por CPU) y uniendo los resultados en el orden original. Con ajustar=True,
+	la cantidad se limita con procesos_utiles(): un archivo chico o una máquina con un solo
+	CPU se cargan en este mismo proceso.
+	Las puntuaciones se escriben directamente en las columnas de 'tabla'.
+	Los errores de cada línea se agregan a la lista 'errores' como ErrorLinea, con el número
+	de línea real en el archivo, en lugar de imprimirse. 'inicio' es el byte donde empiezan
+	los amigos (después de la línea de esquema, ver esquema.py), que ocupa la línea 1.
+	Devuelve la lista de amigos.
+	"""
+	amigos = []
+	if not os.path.exists(nombre_archivo):
+		return amigos
+	procesos = procesos_utiles(nombre_archivo, procesos, inicio) if ajustar else procesos or os.cpu_count() or 1
+	num_preg = len(tabla.criterios)
+	partes = max(procesos, os.path.getsize(nombre_archivo) // TAMANO_TROZO + 1)
+	trozos = dividir_en_trozos(nombre_archivo, partes, inicio)
+	argumentos = ([nombre_archivo] * len(trozos), [t[0] for t in trozos], [t[1] for t in trozos], [num_preg] * len(trozos))
+	if procesos > 1 and len(trozos) > 1:
+		# Se importa aquí: cargar multiprocessing demora el arranque y solo hace falta con varios procesos.
+		from concurrent.futures import ProcessPoolExecutor
+		# map() entrega los resultados en el orden de los trozos; se unen a medida que llegan.
+		with ProcessPoolExecutor(max_workers=procesos) as grupo:
+			_unir_resultados(grupo.map(procesar_trozo, *argumentos), tabla, amigos, errores, 2 if inicio else 1)
+	else:
+		_unir_resultados(map(procesar_trozo, *argumentos), tabla, amigos, errores, 2 if inicio else 1)
+	return amigos
+
+def _unir_resultados(resultados, tabla, amigos, errores, primera_linea=1):
+	"""Agrega a la tabla y a la lista de amigos los resultados de cada trozo, en orden."""
+	for nombres, generos, columnas, totales, errores_trozo, cantidad in resultados:
+		fila = len(tabla)
+		for columna, datos in zip(tabla.columnas, columnas):
+			columna.frombytes(datos)
+		sumas = array('I')
+		sumas.frombytes(totales)
+		nuevos = [Amigo._desde_tabla(nombre, genero, tabla, fila + i, sumas[i])
+				  for i, (nombre, genero) in enumerate(zip(nombres, generos))]
+		tabla.duenos.extend(nuevos)
+		amigos.extend(nuevos)
+		if errores is not None:
+			errores.extend(ErrorLinea(primera_linea + numero, mensaje, contenido)
+						   for numero, mensaje, contenido in errores_trozo)
+		primera_linea += cantidad
+
+def medir_aceleracion(nombre_archivo, criterios, procesos=(1, 2, 4, 8)):
+	"""
+	Mide el tiempo de carga del archivo con distinta cantidad de procesos, sin ajustarla
+	con procesos_utiles(), para poder elegir UMBRAL_PARALELO en cada máquina.
+	Devuelve una lista de (procesos, segundos, aceleración respecto de un proceso).
+	"""
+	curva = []
+	for cantidad in procesos:
+		inicio = time.perf_counter()
+		cargar_en_paralelo(nombre_archivo, TablaPuntuaciones(criterios), cantidad, [], ajustar=False)
+		segundos = time.perf_counter() - inicio
+		curva.append((cantidad, segundos, curva[0][1] / segundos if curva else 1.0))
+	return curva
+
+
+if __name__ == "__main__":
+	# Uso: python carga_paralela.py amigos.txt [procesos ...]
+	from amigo import CRITERIOS_POR_DEFECTO
+	archivo = sys.argv[1] if len(sys.argv) > 1 else "amigos.txt"
+	cantidades = [int(n) for n in sys.argv[2:]] or [1, 2, 4, 8]
+	print(f"CPU disponibles: {os.cpu_count()}")
+	for cantidad, segundos, aceleracion in medir_aceleracion(archivo, CRITERIOS_POR_DEFECTO, cantidades):
+		print(f"{cantidad:>3} procesos: {segundos:8.3f} s  (x{aceleracion:.2f})")
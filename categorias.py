@@ -0,0 +1,142 @@
+﻿# categorias.py
+# Categorías de amistad según la puntuación total. Sin dependencias de wx: lo usan tanto
+# main.py como cli.py.
+#
+# Los umbrales se leen de categorias.txt, una categoría por línea, de mayor a menor:
+#   Súper Amigo,91
+# El número es el porcentaje del total máximo (10 puntos por criterio) que hace falta para
+# entrar en la categoría, así que los mismos umbrales sirven para cualquier cantidad de
+# criterios. La última categoría abarca también los totales menores a su umbral.
+
+import os
+from bisect import bisect_right
+from functools import lru_cache
+from math import ceil
+
+# Categorías de mayor a menor, con el porcentaje mínimo del total máximo de cada una
+# (con 10 criterios, el porcentaje coincide con la puntuación total mínima).
+UMBRALES_CATEGORIAS = [
+	("Súper Amigo", 91),
+	("Primario", 80),
+	("Secundario", 60),
+	("Terciario", 40),
+	("Ocasional", 20),
+	("Conocido", 0)
+]
+
+# Puntuación máxima de cada criterio en una evaluación.
+PUNTUACION_MAXIMA = 10
+# Valor más alto que admite una columna de la tabla de puntuaciones (un byte).
+_VALOR_MAXIMO = 255
+
+def _es_latin1(texto):
+	try:
+		texto.encode('latin-1')
+	except UnicodeEncodeError:
+		return False
+	return True
+
+class Clasificador:
+	"""
+	Asigna la categoría que corresponde a una puntuación total con una tabla precalculada:
+	'por_total[total]' es la categoría de cada total posible (de 0 a 255 por criterio), así
+	que clasificar a un amigo es indexar una lista, sin recorrer los umbrales.
+	"""
+	def __init__(self, umbrales=UMBRALES_CATEGORIAS, num_criterios=10):
+		"""
+		:param umbrales: Pares (categoría, porcentaje mínimo del total máximo), de mayor a menor.
+		:param num_criterios: Cantidad de criterios; el total máximo es 10 por criterio.
+		ValueError si no hay categorías, si un nombre se repite o no puede guardarse en el archivo
+		de amigos, o si los porcentajes no bajan estrictamente de una categoría a la siguiente.
+		"""
+		umbrales = [(nombre.strip(), porcentaje) for nombre, porcentaje in umbrales]
+		if not umbrales:
+			raise ValueError("Debe haber al menos una categoría.")
+		self.nombres = [nombre for nombre, _ in umbrales]
+		if any(not nombre or ',' in nombre for nombre in self.nombres) or len(set(self.nombres)) != len(self.nombres):
+			raise ValueError("Los nombres de las categorías deben ser únicos, no vacíos y sin comas.")
+		# La categoría se guarda en el archivo de amigos, que se escribe en latin-1.
+		if not all(nombre.isprintable() and _es_latin1(nombre) for nombre in self.nombres):
+			raise ValueError("Los nombres de las categorías solo pueden tener caracteres latinos.")
+		porcentajes = [porcentaje for _, porcentaje in umbrales]
+		if any(not 0 <= porcentaje <= 100 for porcentaje in porcentajes) or \
+				any(mayor <= menor for mayor, menor in zip(porcentajes, porcentajes[1:])):
+			raise ValueError("Los porcentajes deben estar entre 0 y 100 e ir de mayor a menor.")
+		self.porcentajes = umbrales
+		self.num_criterios = num_criterios
+		self.maximo = PUNTUACION_MAXIMA * num_criterios
+		# Total mínimo de cada categoría; la última empieza en 0.
+		minimos = [ceil(porcentaje * self.maximo / 100) for porcentaje in porcentajes[:-1]] + [0]
+		self.umbrales = list(zip(self.nombres, minimos))
+		self.posiciones = {nombre: posicion for posicion, nombre in enumerate(self.nombres)}
+		ascendentes = minimos[::-1]
+		nombres_ascendentes = self.nombres[::-1]
+		self.por_total = [nombres_ascendentes[bisect_right(ascendentes, total) - 1]
+						  for total in range(_VALOR_MAXIMO * num_criterios + 1)]
+		self._codigos = None
+
+	def categoria(self, total):
+		"""Devuelve la categoría que corresponde a una puntuación total."""
+		return self.por_total[total]
+
+	def rango(self, categoria):
+		"""
+		Devuelve (mínimo, máximo) del total de una categoría (máximo None = sin límite).
+		Una categoría desconocida da un rango vacío.
+		"""
+		maximo = None
+		for nombre, minimo in self.umbrales:
+			if nombre == categoria:
+				return minimo, maximo
+			maximo = minimo - 1
+		return 1, 0
+
+	def codigos(self):
+		"""
+		Tabla NumPy (uint8) con la posición en 'nombres' de la categoría de cada total: con
+		un arreglo de totales, codigos()[totales] clasifica a todos de una vez.
+		NumPy se importa recién aquí, para no demorar el arranque.
+		"""
+		if self._codigos is None:
+			import numpy as np
+			self._codigos = np.array([self.posiciones[nombre] for nombre in self.por_total], dtype=np.uint8)
+		return self._codigos
+
+
+@lru_cache(maxsize=None)
+def clasificador_por_defecto(num_criterios):
+	"""Clasificador con UMBRALES_CATEGORIAS, compartido por todas las tablas con esa cantidad de criterios."""
+	return Clasificador(UMBRALES_CATEGORIAS, num_criterios)
+
+def cargar_categorias(nombre_archivo="categorias.txt"):
+	"""
+	Carga los umbrales de las categorías desde un archivo de texto ("Nombre,porcentaje" por
+	línea, de mayor a menor; las líneas vacías y las que empiezan con '#' se ignoran).
+	Devuelve (umbrales, hubo_problema). Si el archivo no existe, se crea con los umbrales de
+	siempre; si no se puede interpretar, se usan esos mismos umbrales y hubo_problema es
+	True para que quien llama avise al usuario.
+	"""
+	if not os.path.exists(nombre_archivo):
+		try:
+			with open(nombre_archivo, 'w', encoding='utf-8') as f:
+				f.write("# Categoría,porcentaje mínimo del total máximo (de mayor a menor)\n")
+				for nombre, porcentaje in UMBRALES_CATEGORIAS:
+					f.write(f"{nombre},{porcentaje}\n")
+		except OSError as e:
+			print(f"Error al crear el archivo de categorías: {e}")
+		return list(UMBRALES_CATEGORIAS), False
+
+	try:
+		with open(nombre_archivo, 'r', encoding='utf-8') as f:
+			umbrales = []
+			for linea in f:
+				linea = linea.strip()
+				if not linea or linea.startswith('#'):
+					continue
+				nombre, _, porcentaje = linea.rpartition(',')
+				umbrales.append((nombre, float(porcentaje)))
+		# Se valida igual que al clasificar.
+		Clasificador(umbrales)
+	except (OSError, ValueError):
+		return list(UMBRALES_CATEGORIAS), True
+	return umbrales, False
@@ -1,80 +1,588 @@
-﻿# circulo_amistad.py
-
-import os
-from amigo import Amigo
-
-class CirculoAmistad:
-	def __init__(self, nombre_archivo='amigos.txt', criterios=None):
-		self.nombre_archivo = nombre_archivo
-		self.criterios = criterios
-		self.amigos = self.cargar_amigos()
-
-	def cargar_amigos(self):
-		"""Carga los amigos desde un archivo, si existe."""
-		amigos = []
-		if os.path.exists(self.nombre_archivo):
-			with open(self.nombre_archivo, 'r', encoding='latin-1') as archivo:
-				for linea in archivo:
-					try:
-						amigos.append(Amigo.from_line(linea, self.criterios))
-					except ValueError as e:
-						print(f"Error al procesar una línea: {e}")
-		return amigos
-
-	def guardar_amigos(self):
-		"""Guarda todos los amigos en un archivo."""
-		with open(self.nombre_archivo, 'w', encoding='latin-1') as archivo:
-			for amigo in self.amigos:
-				archivo.write(amigo.to_line() + '\n')
-
-	def agregar_amigo(self, nombre, puntuaciones, genero="M"):
-		"""
-		Agrega un nuevo amigo al círculo y lo guarda.
-		Se espera que el diccionario 'puntuaciones' tenga exactamente 10 claves,
-		correspondientes a las criterios de evaluación.
-		"""
-		nuevo_amigo = Amigo(nombre, puntuaciones, genero, criterios=self.criterios)
-		self.amigos.append(nuevo_amigo)
-		self.guardar_amigos()
-
-	def reevaluar_amigo(self, indice, nuevas_puntuaciones, nuevo_nombre=None, nuevo_genero=None):
-		"""
-		Reevaluar un amigo existente basado en nuevas puntuaciones y, opcionalmente, actualizar nombre y género.
-		El parámetro 'indice' es la posición del amigo en la lista.
-		"""
-		try:
-			amigo = self.amigos[indice]
-			amigo.actualizar_puntuaciones(nuevas_puntuaciones)
-			if nuevo_nombre and nuevo_nombre.strip() and nuevo_nombre.strip() != amigo.nombre:
-				amigo.editar_nombre(nuevo_nombre)
-			if nuevo_genero and nuevo_genero in ("M", "F") and nuevo_genero != amigo.genero:
-				amigo.editar_genero(nuevo_genero)
-			self.guardar_amigos()
-			return True
-		except IndexError:
-			return False
-
-	def eliminar_amigo(self, indice):
-		"""
-		Elimina un amigo del círculo basado en su índice en la lista.
-		Se asume que el índice es válido.
-		"""
-		try:
-			del self.amigos[indice]
-			self.guardar_amigos()
-			return True
-		except IndexError:
-			return False
-
-	def listar_amigos(self):
-		"""Devuelve una lista de todos los amigos con sus detalles."""
-		return [str(amigo) for amigo in self.amigos]
-
-	def mostrar_circulo(self):
-		"""Devuelve una lista de amigos ordenados por puntuación total."""
-		amigos_ordenados = sorted(self.amigos, key=lambda a: sum(a.puntuaciones.values()), reverse=True)
-		return [(amigo.nombre,
-				 sum(amigo.puntuaciones.values()),
-				 amigo.categoria,
-				 "Hombre" if amigo.genero == "M" else "Mujer")
-				for amigo in amigos_ordenados]
+﻿# circulo_amistad.py
+
+from collections import Counter, namedtuple
+from contextlib import contextmanager
+from amigo import Amigo, CRITERIOS_POR_DEFECTO
+from almacenamiento import AlmacenTexto
+from categorias import Clasificador, clasificador_por_defecto
+from consulta import Consulta
+from historial import Historial
+from indice_nombres import IndiceNombres
+from indice_totales import IndiceTotales
+from instrumentacion import medido
+from tabla_puntuaciones import TablaPuntuaciones
+from transaccion import Transaccion
+
+# Amigos agregados, modificados y eliminados por otro programa (ver recargar_cambios()).
+CambiosCirculo = namedtuple('CambiosCirculo', ['altas', 'cambios', 'bajas'])
+
+class CirculoAmistad:
+	def __init__(self, nombre_archivo='amigos.txt', criterios=None, diario=False, umbral_compactacion=1000, procesos=None,
+				 almacen=None, diferido=False, vigilar=False, historial=False, umbrales=None):
+		"""
+		:param nombre_archivo: Archivo de texto con un amigo por línea.
+		:param criterios: Lista de criterios de evaluación. Las puntuaciones de todos los amigos
+		                  se guardan en una única TablaPuntuaciones ('self.tabla').
+		:param diario: Si es True, cada cambio se anexa a un diario ('<archivo>.diario') en lugar
+		               de reescribir el archivo completo; el diario se compacta al cerrar o al
+		               alcanzar 'umbral_compactacion' registros.
+		:param procesos: Si es mayor que 1, el archivo se analiza por trozos en ese número de
+		                 procesos (ver carga_paralela.py), siempre que haya más de un CPU y el
+		                 archivo supere carga_paralela.UMBRAL_PARALELO; si no, en este proceso.
+		                 Los errores de cada línea quedan en 'self.errores_carga' en ambos casos.
+		:param almacen: Almacen donde se guardan los amigos (ver almacenamiento.py). Si no se indica,
+		                se usa un AlmacenTexto con los parámetros anteriores.
+		:param diferido: Si es True, el AlmacenTexto escribe en un hilo en segundo plano que junta
+		                 los cambios seguidos en una sola escritura (ver escritura_diferida.py);
+		                 flush() espera a que terminen y cerrar() las completa antes de salir.
+		:param vigilar: Si es True, el almacén recuerda una huella de cada amigo para que
+		                recargar_cambios() incorpore solo lo que otro programa haya cambiado.
+		:param historial: Si es True, las altas, reevaluaciones y bajas se anotan también en un
+		                  historial ('<archivo>.historial', ver historial.py), que se consulta con
+		                  trayectoria(), mayores_caidas() y transiciones(). Con diferido=True,
+		                  también el historial se escribe en segundo plano.
+		:param umbrales: Pares (categoría, porcentaje mínimo del total máximo) con los que se
+		                 clasifica a los amigos (ver categorias.py); None para los de siempre.
+		                 Se cambian con reclasificar().
+		Cada amigo tiene un 'id' estable asignado por el almacén; las operaciones de edición y baja
+		reciben ese id en lugar de una posición en la lista.
+		"""
+		self.nombre_archivo = nombre_archivo
+		self.criterios = criterios if criterios is not None else CRITERIOS_POR_DEFECTO
+		self.clasificador = self._clasificador(umbrales)
+		if almacen is None:
+			almacen = AlmacenTexto(nombre_archivo, diario, umbral_compactacion, procesos, diferido)
+		self.almacen = almacen
+		self.historial = Historial(nombre_archivo + '.historial', self.criterios, diferido) if historial else None
+		self._transaccion = None
+		# Funciones a las que se avisa de los cambios hechos por otros programas.
+		self._oyentes = []
+		# CambiosExternos leídos que esperan a que termine una transacción (ver recargar_cambios()).
+		self._externos = []
+		self.cargar_amigos()
+		if vigilar:
+			self.almacen.vigilar(self.por_id.values())
+
+	@property
+	def amigos(self):
+		"""Lista de los amigos en orden de alta (una copia: modificarla no afecta al círculo)."""
+		return list(self.por_id.values())
+
+	@medido
+	def cargar_amigos(self):
+		"""Carga los amigos desde el almacén y construye los índices del círculo."""
+		self.tabla = TablaPuntuaciones(self.criterios, clasificador=self.clasificador)
+		self.errores_carga = []
+		amigos = self.almacen.cargar(self.tabla, self.errores_carga)
+		self.por_id = {}
+		self.indice = IndiceTotales()
+		self.nombres = IndiceNombres()
+		self.conteo_categorias = Counter()
+		self.conteo_generos = Counter()
+		for amigo in amigos:
+			self.por_id[amigo.id] = amigo
+			self._indexar(amigo)
+		return amigos
+
+	@medido
+	def guardar_amigos(self):
+		"""Guarda todos los amigos en el almacén."""
+		self.almacen.guardar(self.por_id.values())
+
+	def compactar(self):
+		"""Vuelca el estado actual completo al almacén (en el almacén de texto, vacía el diario)."""
+		self.guardar_amigos()
+
+	@medido
+	def flush(self):
+		"""Espera a que el almacén y el historial terminen de escribir los cambios pendientes."""
+		self.almacen.flush()
+		if self.historial is not None:
+			self._escribir_historial(self.historial.flush)
+
+	@medido
+	def cerrar(self):
+		"""
+		Debe llamarse al salir: compacta el diario si hay cambios pendientes, espera a que
+		terminen las escrituras en segundo plano y libera el almacén.
+		"""
+		self.almacen.cerrar(self.por_id.values())
+		if self.historial is not None:
+			self._escribir_historial(self.historial.cerrar)
+
+	def _clasificador(self, umbrales):
+		if umbrales is None:
+			return clasificador_por_defecto(len(self.criterios))
+		return Clasificador(umbrales, len(self.criterios))
+
+	@medido
+	def reclasificar(self, umbrales=None, usar_numpy=True):
+		"""
+		Cambia los umbrales de las categorías (None: los de siempre) y vuelve a clasificar a todo
+		el círculo en una sola pasada, sin llamar a clasificar_amigo() por cada amigo: solo se
+		escribe la categoría de los amigos cuyo total cae en otra categoría con los nuevos
+		umbrales. Con NumPy, los totales se calculan por columnas y se clasifican todos juntos
+		con la tabla del clasificador; sin NumPy, se clasifica una vez cada cubeta del índice
+		por totales. Si algún amigo cambió de categoría, se guarda el círculo.
+		Devuelve la cantidad de amigos que cambiaron de categoría.
+		"""
+		if self._transaccion is not None:
+			raise ValueError("No se puede reclasificar el círculo durante una transacción.")
+		anterior = self.clasificador
+		nuevo = self._clasificador(umbrales)
+		self.clasificador = self.tabla.clasificador = nuevo
+		# Totales que pasan a otra categoría (los clasificadores tienen la misma cantidad de criterios).
+		cambia = [antes != despues for antes, despues in zip(anterior.por_total, nuevo.por_total)]
+		try:
+			import numpy as np
+		except ImportError:
+			np = None
+		if usar_numpy and np is not None and len(self.tabla):
+			cambiados = self._reclasificar_numpy(np, nuevo, cambia)
+		else:
+			cambiados = 0
+			self.conteo_categorias = Counter()
+			for total, amigos in self.indice.cubetas():
+				categoria = nuevo.por_total[total]
+				self.conteo_categorias[categoria] += len(amigos)
+				if cambia[total]:
+					for amigo in amigos:
+						amigo.categoria = categoria
+					cambiados += len(amigos)
+		if cambiados:
+			self.guardar_amigos()
+		return cambiados
+
+	def _reclasificar_numpy(self, np, clasificador, cambia):
+		tabla = self.tabla
+		totales = np.zeros(len(tabla), dtype=np.intp)
+		for columna in tabla.columnas:
+			# Vista sin copia de la columna; se descarta enseguida para que la tabla pueda crecer.
+			totales += np.frombuffer(columna, dtype=np.uint8)
+		codigos = clasificador.codigos()[totales]
+		filas = np.flatnonzero(np.array(cambia)[totales])
+		nombres = clasificador.nombres
+		duenos = tabla.duenos
+		for fila, codigo in zip(filas.tolist(), codigos[filas].tolist()):
+			duenos[fila].categoria = nombres[codigo]
+		self.conteo_categorias = Counter(dict(zip(nombres, np.bincount(codigos, minlength=len(nombres)).tolist())))
+		return len(filas)
+
+	def _indexar(self, amigo):
+		"""
+		Registra al amigo en el índice de nombres, el ranking y los contadores.
+		'por_id' se mantiene aparte para conservar el orden de alta al editar un amigo.
+		"""
+		self.indice.agregar(amigo)
+		self.nombres.agregar(amigo)
+		self.conteo_categorias[amigo.categoria] += 1
+		self.conteo_generos[amigo.genero] += 1
+
+	def _desindexar(self, amigo):
+		"""Quita al amigo de los índices; debe llamarse antes de modificarlo."""
+		self.indice.quitar(amigo)
+		self.nombres.quitar(amigo)
+		self.conteo_categorias[amigo.categoria] -= 1
+		self.conteo_generos[amigo.genero] -= 1
+
+	@medido
+	def agregar_amigo(self, nombre, puntuaciones, genero="M"):
+		"""
+		Agrega un nuevo amigo al círculo y lo guarda.
+		Se espera que el diccionario 'puntuaciones' tenga una clave por criterio,
+		correspondientes a las criterios de evaluación.
+		Devuelve el id asignado al nuevo amigo.
+		"""
+		nuevo_amigo = Amigo(nombre, puntuaciones, genero, criterios=self.criterios, tabla=self.tabla)
+		nuevo_amigo.id = self.almacen.nuevo_id()
+		self.por_id[nuevo_amigo.id] = nuevo_amigo
+		self._indexar(nuevo_amigo)
+		if self._transaccion is not None:
+			self._transaccion.anotar_alta(nuevo_amigo)
+		else:
+			self.almacen.agregar(self.por_id.values(), nuevo_amigo)
+			self._anotar_historial(altas=[(nuevo_amigo.id, self.tabla.valores(nuevo_amigo._fila))])
+		return nuevo_amigo.id
+
+	def obtener(self, id_amigo):
+		"""Devuelve el amigo con ese id, o None si no existe."""
+		return self.por_id.get(id_amigo)
+
+	@medido
+	def reevaluar_amigo(self, id_amigo, nuevas_puntuaciones, nuevo_nombre=None, nuevo_genero=None):
+		"""
+		Reevaluar un amigo existente basado en nuevas puntuaciones y, opcionalmente, actualizar nombre y género.
+		El parámetro 'id_amigo' es el id del amigo. Devuelve False si no existe.
+		"""
+		amigo = self.por_id.get(id_amigo)
+		if amigo is None:
+			return False
+		anteriores = amigo._tabla.valores(amigo._fila)
+		if self._transaccion is not None:
+			self._transaccion.anotar_cambio(amigo, (amigo.nombre, amigo.genero, anteriores))
+		self._desindexar(amigo)
+		amigo.actualizar_puntuaciones(nuevas_puntuaciones)
+		if nuevo_nombre and nuevo_nombre.strip() and nuevo_nombre.strip() != amigo.nombre:
+			amigo.editar_nombre(nuevo_nombre)
+		if nuevo_genero and nuevo_genero in ("M", "F") and nuevo_genero != amigo.genero:
+			amigo.editar_genero(nuevo_genero)
+		self._indexar(amigo)
+		if self._transaccion is None:
+			self.almacen.actualizar(self.por_id.values(), amigo)
+			self._anotar_historial(cambios=[(amigo.id, anteriores, amigo._tabla.valores(amigo._fila))])
+		return True
+
+	@medido
+	def eliminar_amigo(self, id_amigo):
+		"""
+		Elimina del círculo al amigo con ese id. Devuelve False si no existe.
+		"""
+		amigo = self.por_id.get(id_amigo)
+		if amigo is None:
+			return False
+		del self.por_id[id_amigo]
+		self._desindexar(amigo)
+		if self._transaccion is not None:
+			# Se desvincula al confirmar, para poder restaurarlo si la transacción se deshace.
+			self._transaccion.anotar_baja(amigo)
+			return True
+		amigo.desvincular()
+		self.almacen.eliminar(self.por_id.values(), amigo)
+		self._anotar_historial(bajas=[id_amigo])
+		return True
+
+	def _anotar_historial(self, altas=(), cambios=(), bajas=()):
+		"""
+		Anota en el historial (si el círculo lo lleva) cambios ya guardados en el almacén.
+		Si el historial no se puede escribir, se avisa pero el cambio se mantiene.
+		"""
+		if self.historial is not None:
+			self._escribir_historial(self.historial.anotar, altas, cambios, bajas)
+
+	def _escribir_historial(self, funcion, *argumentos):
+		"""Llama a una función del historial que escribe; si falla, se avisa y el círculo sigue igual."""
+		try:
+			funcion(*argumentos)
+		except (OSError, ValueError) as e:
+			print(f"Error al guardar el historial de reevaluaciones: {e}")
+
+	def _validar_puntuaciones(self, puntuaciones, minimo):
+		"""Verifica que las puntuaciones sean enteros entre 'minimo' y 10 de criterios conocidos."""
+		for clave, valor in puntuaciones.items():
+			if clave not in self.tabla.posiciones:
+				raise ValueError(f"Criterio desconocido: {clave!r}.")
+			if not isinstance(valor, int) or not minimo <= valor <= 10:
+				raise ValueError(f"La puntuación de '{clave}' debe ser un entero entre {minimo} y 10.")
+
+	@medido
+	def agregar_amigos(self, nuevos):
+		"""
+		Agrega varios amigos en una sola transacción; 'nuevos' es un iterable de tuplas
+		(nombre, puntuaciones) o (nombre, puntuaciones, genero). Se valida todo antes de
+		agregar el primero y se guarda una sola vez. Devuelve la lista de ids asignados.
+		"""
+		nuevos = [tuple(datos) for datos in nuevos]
+		for datos in nuevos:
+			if not 2 <= len(datos) <= 3 or not datos[0].strip():
+				raise ValueError(f"Datos de amigo inválidos: {datos!r}.")
+			self._validar_puntuaciones(datos[1], 0)
+		with self.transaccion():
+			return [self.agregar_amigo(*datos) for datos in nuevos]
+
+	@medido
+	def reevaluar_amigos(self, reevaluaciones):
+		"""
+		Reevalúa varios amigos en una sola transacción; 'reevaluaciones' es un diccionario
+		{id: nuevas puntuaciones}. Si algún id no existe o alguna puntuación no está entre
+		1 y 10, no se cambia nada y se lanza ValueError. Se guarda una sola vez.
+		"""
+		for id_amigo, puntuaciones in reevaluaciones.items():
+			if id_amigo not in self.por_id:
+				raise ValueError(f"No existe un amigo con id {id_amigo}.")
+			self._validar_puntuaciones(puntuaciones, 1)
+		with self.transaccion():
+			for id_amigo, puntuaciones in reevaluaciones.items():
+				self.reevaluar_amigo(id_amigo, puntuaciones)
+
+	@contextmanager
+	def transaccion(self):
+		"""
+		Agrupa varias altas, cambios y bajas:
+
+			with circulo.transaccion():
+				circulo.agregar_amigo(...)
+				circulo.eliminar_amigo(...)
+
+		Dentro del bloque los cambios se ven en el círculo, pero no se guardan; al salir se
+		persisten todos juntos con Almacen.aplicar_lote() (un solo guardado). Si el bloque
+		lanza una excepción, o falla el guardado, se deshacen todos y se propaga la excepción.
+		Una transacción dentro de otra forma parte de la exterior.
+		"""
+		if self._transaccion is not None:
+			yield self._transaccion
+			return
+		transaccion = self._transaccion = Transaccion()
+		try:
+			yield transaccion
+		except BaseException:
+			self._transaccion = None
+			self._deshacer(transaccion)
+			raise
+		self._transaccion = None
+		try:
+			if len(transaccion):
+				self.almacen.aplicar_lote(self.por_id.values(), list(transaccion.altas.values()),
+										  list(transaccion.cambios.values()), list(transaccion.bajas.values()))
+		except BaseException:
+			self._deshacer(transaccion)
+			raise
+		for amigo in transaccion.eliminados:
+			amigo.desvincular()
+		if len(transaccion):
+			self._anotar_historial(
+				altas=[(amigo.id, amigo._tabla.valores(amigo._fila)) for amigo in transaccion.altas.values()],
+				cambios=[(amigo.id, transaccion.previos[amigo.id][2], amigo._tabla.valores(amigo._fila))
+						 for amigo in transaccion.cambios.values()],
+				bajas=list(transaccion.bajas))
+
+	def _deshacer(self, transaccion):
+		"""Revierte en memoria los cambios de una transacción, del último al primero."""
+		restaurados = False
+		for tipo, amigo, previo in reversed(transaccion.deshacer):
+			if tipo == "A":
+				del self.por_id[amigo.id]
+				self._desindexar(amigo)
+				amigo.desvincular()
+			elif tipo == "U":
+				self._desindexar(amigo)
+				amigo.nombre, amigo.genero, valores = previo
+				amigo._tabla.escribir(amigo._fila, valores)
+				amigo._total = None
+				amigo.clasificar_amigo()
+				self._indexar(amigo)
+			else:
+				self.por_id[amigo.id] = amigo
+				self._indexar(amigo)
+				restaurados = True
+		if restaurados:
+			# Los amigos restaurados vuelven a su lugar en el orden de alta.
+			ordenados = sorted(self.por_id.items())
+			self.por_id.clear()
+			self.por_id.update(ordenados)
+
+	@medido
+	def buscar_por_nombre(self, nombre):
+		"""
+		Devuelve los amigos con ese nombre, sin distinguir mayúsculas, tildes ni espacios sobrantes.
+		La búsqueda usa el índice de nombres (O(1)); puede haber varios amigos con el mismo nombre.
+		"""
+		return self.nombres.buscar(nombre)
+
+	@medido
+	def buscar_por_prefijo(self, prefijo, limite=None):
+		"""Devuelve los amigos cuyo nombre empieza con 'prefijo', ordenados por nombre (hasta 'limite')."""
+		return self.nombres.buscar_prefijo(prefijo, self.por_id, limite)
+
+	@medido
+	def listar_amigos(self):
+		"""Devuelve una lista de todos los amigos con sus detalles."""
+		return [str(amigo) for amigo in self.amigos]
+
+	@medido
+	def ranking(self, inicio=0, fin=None):
+		"""
+		Devuelve los amigos ordenados de mayor a menor puntuación total (la porción [inicio:fin]).
+		Se sirve del índice por totales, sin volver a ordenar el círculo.
+		"""
+		return self.indice.rango(inicio, fin)
+
+	@medido
+	def top(self, k):
+		"""Devuelve los k amigos con mayor puntuación total."""
+		return self.indice.top(k)
+
+	@medido
+	def contar(self, filtro="Todos"):
+		"""
+		Devuelve en O(1) cuántos amigos cumplen un filtro: "Todos", "Hombres", "Mujeres"
+		o el nombre de una categoría.
+		"""
+		if filtro == "Todos":
+			return len(self.por_id)
+		if filtro == "Hombres":
+			return self.conteo_generos["M"]
+		if filtro == "Mujeres":
+			return self.conteo_generos["F"]
+		return self.conteo_categorias[filtro]
+
+	def suscribir(self, oyente):
+		"""
+		Registra 'oyente(cambios)', al que recargar_cambios() avisa con un CambiosCirculo
+		cuando incorpora cambios hechos por otro programa.
+		"""
+		self._oyentes.append(oyente)
+
+	def desuscribir(self, oyente):
+		if oyente in self._oyentes:
+			self._oyentes.remove(oyente)
+
+	def hay_cambios_externos(self):
+		"""
+		Comprobación rápida (la fecha y el tamaño de los archivos) de si otro programa modificó
+		el almacén. Se puede llamar desde cualquier hilo (ver vigilancia.py).
+		"""
+		return self.almacen.hay_cambios_externos()
+
+	@medido
+	def leer_cambios_externos(self):
+		"""
+		Lee los cambios que otro programa hizo en el almacén (requiere vigilar=True) sin tocar
+		el círculo: solo se analizan las líneas nuevas o distintas. Se puede llamar desde
+		cualquier hilo; la interfaz lo hace en el del vigilante, para no esperar al disco, y
+		pasa el resultado (un CambiosExternos, o None si no hubo cambios) a recargar_cambios().
+		"""
+		return self.almacen.cambios_externos(self.criterios)
+
+	@medido
+	def recargar_cambios(self, externos=None):
+		"""
+		Incorpora al círculo los cambios que otro programa hizo en el almacén: 'externos' es
+		lo que devolvió leer_cambios_externos() (si no se indica, se lee en este hilo). Solo
+		se actualizan en los índices los amigos agregados, modificados o eliminados; los que
+		este círculo modificó después de la lectura conservan su versión. Los cambios no se
+		vuelven a guardar, salvo que el almacén lo pida para mantener los ids de acuerdo, ni se
+		anotan en el historial: lo hace el otro programa, si lo lleva (como cli.py).
+		Avisa a los oyentes y devuelve un CambiosCirculo, o None si no hubo cambios o hay
+		una transacción en curso (se incorporarán en la próxima llamada).
+		"""
+		if externos is not None:
+			self._externos.append(externos)
+		elif self._transaccion is None:
+			externos = self.leer_cambios_externos()
+			if externos is not None:
+				self._externos.append(externos)
+		if self._transaccion is not None or not self._externos:
+			return None
+		pendientes, self._externos = self._externos, []
+		altas, cambios, bajas = [], [], []
+		for externos in pendientes:
+			self._aplicar_externos(self.almacen.conciliar_cambios_externos(externos), altas, cambios, bajas)
+		if not (altas or cambios or bajas):
+			return None
+		resultado = CambiosCirculo(altas, cambios, bajas)
+		for oyente in list(self._oyentes):
+			oyente(resultado)
+		return resultado
+
+	def _aplicar_externos(self, externos, altas, cambios, bajas):
+		"""Aplica al círculo unos CambiosExternos y agrega a las listas los amigos afectados."""
+		for id_amigo in externos.bajas:
+			amigo = self.por_id.pop(id_amigo, None)
+			if amigo is not None:
+				self._desindexar(amigo)
+				amigo.desvincular()
+				bajas.append(amigo)
+		for id_amigo, nombre, puntuaciones, genero in externos.cambios:
+			amigo = self.por_id.get(id_amigo)
+			genero = "F" if genero == "F" else "M"
+			if amigo is None or (amigo.nombre == nombre.strip() and amigo.genero == genero and
+								 amigo.puntuaciones == puntuaciones):
+				continue
+			self._desindexar(amigo)
+			amigo.nombre = nombre.strip()
+			amigo.genero = genero
+			amigo._escribir_puntuaciones(puntuaciones)
+			amigo.clasificar_amigo()
+			self._indexar(amigo)
+			cambios.append(amigo)
+		for id_amigo, nombre, puntuaciones, genero in externos.altas:
+			amigo = Amigo(nombre, puntuaciones, genero, tabla=self.tabla)
+			amigo.id = id_amigo
+			self.por_id[id_amigo] = amigo
+			self._indexar(amigo)
+			altas.append(amigo)
+		if externos.reescribir:
+			self.guardar_amigos()
+
+	def consulta(self):
+		"""
+		Devuelve una Consulta sobre todos los amigos, para combinar condiciones, orden y
+		límite (ver consulta.py); por ejemplo circulo.consulta().genero("F").limite(10).ejecutar().
+		"""
+		return Consulta(self)
+
+	@medido
+	def similares(self, id_amigo, k=10, metrica="euclidea"):
+		"""
+		Devuelve los k amigos más parecidos al amigo con ese id, como lista de (amigo, valor),
+		según la distancia "euclidea" o la similitud del "coseno" entre sus puntuaciones
+		(ver similitud.py). Devuelve None si el id no existe.
+		"""
+		# Se importa al usarlo: similitud.py carga NumPy, que demora el arranque.
+		from similitud import similares
+		amigo = self.por_id.get(id_amigo)
+		if amigo is None:
+			return None
+		return similares(self, amigo, k, metrica)
+
+	@medido
+	def agrupar(self, grupos=5, semilla=0):
+		"""
+		Divide el círculo en 'grupos' grupos de amigos con puntuaciones parecidas (k-medias).
+		Devuelve una lista de {'centroide': {criterio: valor medio}, 'amigos': [amigos]}.
+		"""
+		from similitud import agrupar
+		return agrupar(self, grupos, semilla=semilla)
+
+	def _historial(self):
+		if self.historial is None:
+			raise ValueError("El círculo no lleva historial de reevaluaciones (historial=True).")
+		return self.historial
+
+	@medido
+	def trayectoria(self, id_amigo):
+		"""
+		Devuelve las evaluaciones sucesivas del amigo según el historial, de la más antigua a
+		la más reciente (ver Historial.trayectoria). Incluye a los amigos ya eliminados.
+		"""
+		return self._historial().trayectoria(id_amigo)
+
+	@medido
+	def mayores_caidas(self, k=10, desde=None, hasta=None):
+		"""
+		Devuelve los k amigos del círculo cuyo total más bajó entre 'desde' y 'hasta' (segundos
+		desde 1970; None: sin límite), como tuplas (amigo, total inicial, total final).
+		"""
+		caidas = self._historial().mayores_caidas(desde, hasta, k, ids=self.por_id)
+		return [(self.por_id[id_amigo], inicial, final) for id_amigo, inicial, final in caidas]
+
+	@medido
+	def transiciones(self, desde=None, hasta=None):
+		"""
+		Devuelve los cambios de categoría entre 'desde' y 'hasta' como tuplas (fecha, id,
+		categoría anterior, categoría nueva); el id puede ser de un amigo ya eliminado.
+		"""
+		return self._historial().transiciones(desde, hasta, self.clasificador)
+
+	@medido
+	def filtrar(self, genero=None, categoria=None):
+		"""
+		Devuelve los amigos con el género ('M' o 'F') y la categoría indicados (None = cualquiera),
+		de mayor a menor puntuación total. Es un atajo de consulta(): la categoría se resuelve
+		con el índice por totales y el género, con las consultas del almacén si las admite.
+		"""
+		consulta = self.consulta()
+		if genero is not None:
+			consulta = consulta.genero(genero)
+		if categoria is not None:
+			consulta = consulta.categoria(categoria)
+		return consulta.ejecutar()
+
+	@medido
+	def mostrar_circulo(self):
+		"""Devuelve una lista de amigos ordenados por puntuación total."""
+		return [(amigo.nombre,
+				 amigo.puntuacion_total(),
+				 amigo.categoria,
+				 "Hombre" if amigo.genero == "M" else "Mujer")
+				for amigo in self.indice]
@@ -0,0 +1,418 @@
+﻿# cli.py
+# Línea de comandos del círculo de amistades. No importa wx ni los diálogos: arranca en
+# pocas decenas de milisegundos y funciona en equipos sin pantalla.
+#
+# Uso:
+#   python cli.py agregar "Ana Pérez" 8 7 9 6 8 7 9 8 7 6 --genero F
+#   python cli.py reevaluar 12 9 9 9 9 9 9 9 9 9 9 [--nombre "Ana P."] [--genero F]
+#   python cli.py eliminar 12
+#   python cli.py listar [--limite 20] [--todos]
+#   python cli.py filtrar [--genero F] [--categoria Primario]
+#   python cli.py estadisticas [--completo]
+#   python cli.py importar otros_amigos.txt       (con extensión .bin, formato binario)
+#   python cli.py exportar copia.txt              (con extensión .bin, formato binario)
+#   python cli.py exportar informe.html [--genero F] [--categoria Primario] [--orden nombre] [--invertido] [--limite 100]
+#                                                 (también .csv y .jsonl, ver exportacion.py)
+#   python cli.py circulos [--buscar "Ana Pérez" | --repetidos]
+#   python cli.py historial 12                    (evaluaciones sucesivas del amigo 12)
+#   python cli.py historial --caidas [--dias 30] [--limite 10]
+#   python cli.py historial --transiciones [--dias 30]
+#   python cli.py migrar [--renombrar VIEJO=NUEVO] [--descartar CRITERIO] [--defecto N | --defecto CRITERIO=N]
+#                        [--desde criterios_anteriores.txt]   (ver esquema.py)
+# Opciones comunes: --archivo (amigos.txt), --criterios (criterios.txt), --categorias
+# (categorias.txt, ver categorias.py) y --circulo, para trabajar con otro círculo de la
+# carpeta "circulos" (agregar e importar lo crean si no existe; ver gestor_circulos.py).
+# Códigos de salida: 0 correcto, 1 amigo inexistente, 2 datos inválidos (también si el archivo
+# del círculo tiene líneas que no describen un amigo: se conservan, pero hay que corregirlas).
+
+import argparse
+import contextlib
+import os
+import sys
+import time
+from amigo import CRITERIOS_POR_DEFECTO, Amigo
+from categorias import Clasificador, cargar_categorias
+from consulta import ORDENES
+from criterios import cargar_criterios
+from esquema import Migracion, corresponde_sin_esquema, leer_esquema, lineas_de_amigos, linea_esquema, migrar_archivo
+from gestor_circulos import GestorCirculos, PRINCIPAL, descubrir_circulos
+
+# Comandos que crean el círculo de --circulo si todavía no existe; los demás fallan.
+COMANDOS_QUE_CREAN = ("agregar", "importar")
+
+def _puntuaciones(valores, criterios, minimo):
+	"""Convierte la lista de puntuaciones (en el orden de los criterios) en un diccionario."""
+	if len(valores) != len(criterios):
+		raise ValueError(f"Se esperaban {len(criterios)} puntuaciones y se recibieron {len(valores)}.")
+	for valor in valores:
+		if not minimo <= valor <= 10:
+			raise ValueError(f"Las puntuaciones deben estar entre {minimo} y 10.")
+	return dict(zip(criterios, valores))
+
+def _fila(amigo):
+	return f"{amigo.id}\t{amigo.puntuacion_total()}\t{amigo.categoria}\t{amigo.genero}\t{amigo.nombre}\n"
+
+def _escribir_filas(amigos):
+	"""Escribe un amigo por línea: id, total, categoría, género y nombre, separados por tabulaciones."""
+	sys.stdout.writelines(_fila(amigo) for amigo in amigos)
+
+def comando_agregar(circulo, opciones):
+	puntuaciones = _puntuaciones(opciones.puntuaciones, circulo.criterios, 0)
+	print(circulo.agregar_amigo(opciones.nombre, puntuaciones, opciones.genero))
+	return 0
+
+def comando_reevaluar(circulo, opciones):
+	puntuaciones = _puntuaciones(opciones.puntuaciones, circulo.criterios, 1)
+	if not circulo.reevaluar_amigo(opciones.id, puntuaciones, opciones.nombre, opciones.genero):
+		print(f"No existe un amigo con id {opciones.id}.", file=sys.stderr)
+		return 1
+	return 0
+
+def comando_eliminar(circulo, opciones):
+	if not circulo.eliminar_amigo(opciones.id):
+		print(f"No existe un amigo con id {opciones.id}.", file=sys.stderr)
+		return 1
+	return 0
+
+def _cargar_todos(gestor):
+	"""Carga todos los círculos a la vez, con los avisos de la carga en stderr."""
+	with contextlib.redirect_stdout(sys.stderr):
+		return gestor.cargar()
+
+def comando_listar(circulo, opciones):
+	if opciones.todos:
+		_cargar_todos(opciones.gestor)
+		# Ranking conjunto de todos los círculos, con el nombre del círculo al principio de cada línea.
+		sys.stdout.writelines(f"{nombre}\t{_fila(amigo)}" for nombre, amigo in opciones.gestor.ranking(0, opciones.limite))
+		return 0
+	_escribir_filas(circulo.ranking(0, opciones.limite))
+	return 0
+
+def comando_filtrar(circulo, opciones):
+	amigos = circulo.filtrar(genero=opciones.genero, categoria=opciones.categoria)
+	_escribir_filas(amigos[:opciones.limite])
+	return 0
+
+def comando_estadisticas(circulo, opciones):
+	if opciones.completo:
+		# NumPy (si está instalado) solo se importa para el análisis completo.
+		import json
+		from analisis import AnalisisCirculo
+		print(json.dumps(AnalisisCirculo(circulo).resumen(), ensure_ascii=False, indent=1))
+		return 0
+	total = circulo.contar()
+	print(f"Amigos: {total}")
+	for filtro in ["Hombres", "Mujeres"] + circulo.clasificador.nombres:
+		cantidad = circulo.contar(filtro)
+		porcentaje = cantidad / total * 100 if total else 0
+		print(f"  {filtro:<12}{cantidad:>10}  {porcentaje:5.1f}%")
+	return 0
+
+def comando_circulos(circulo, opciones):
+	"""Lista los círculos con su cantidad de amigos, o en qué círculos aparece un amigo."""
+	gestor = opciones.gestor
+	circulos = _cargar_todos(gestor)
+	if opciones.buscar:
+		for nombre, amigos in gestor.buscar_por_nombre(opciones.buscar).items():
+			for amigo in amigos:
+				sys.stdout.write(f"{nombre}\t{_fila(amigo)}")
+		return 0
+	if opciones.repetidos:
+		for amigo, circulos in sorted(gestor.en_varios_circulos().items()):
+			print(f"{amigo}\t{', '.join(circulos)}")
+		return 0
+	for nombre, otro in circulos.items():
+		print(f"{nombre}\t{otro.contar()}\t{otro.nombre_archivo}")
+	return 0
+
+def _fecha(segundos):
+	return time.strftime("%Y-%m-%d %H:%M", time.localtime(segundos))
+
+def comando_historial(circulo, opciones):
+	"""Trayectoria de un amigo, mayores caídas del total o cambios de categoría, según el historial."""
+	desde = time.time() - opciones.dias * 86400 if opciones.dias is not None else None
+	if opciones.caidas:
+		for amigo, inicial, final in circulo.mayores_caidas(opciones.limite or 10, desde):
+			print(f"{amigo.id}\t{inicial}\t{final}\t{final - inicial}\t{amigo.nombre}")
+		return 0
+	if opciones.transiciones:
+		transiciones = circulo.transiciones(desde)
+		if opciones.limite:
+			# Las más recientes.
+			transiciones = transiciones[-opciones.limite:]
+		for fecha, id_amigo, anterior, nueva in transiciones:
+			print(f"{_fecha(fecha)}\t{id_amigo}\t{anterior}\t{nueva}")
+		return 0
+	if opciones.id is None:
+		raise ValueError("Indique el id de un amigo, --caidas o --transiciones.")
+	evaluaciones = circulo.trayectoria(opciones.id)
+	if not evaluaciones:
+		print(f"No hay historial del amigo con id {opciones.id}.", file=sys.stderr)
+		return 1
+	for evaluacion in evaluaciones:
+		if evaluacion.puntuaciones is None:
+			print(f"{_fecha(evaluacion.fecha)}\teliminado")
+		else:
+			puntuaciones = " ".join(map(str, evaluacion.puntuaciones.values()))
+			print(f"{_fecha(evaluacion.fecha)}\t{evaluacion.total}\t{circulo.clasificador.categoria(evaluacion.total)}\t{puntuaciones}")
+	return 0
+
+def _leer_origen(ruta, criterios, errores):
+	"""
+	Genera (nombre, puntuaciones, género) de cada amigo válido de un archivo de texto o binario.
+	Si el archivo tiene los mismos criterios en otro orden, o le faltan criterios del círculo
+	(que quedan en 0), las puntuaciones se acomodan por nombre de criterio, como al migrar.
+	"""
+	if ruta.lower().endswith('.bin'):
+		from formato_binario import ArchivoBinario
+		with ArchivoBinario(ruta) as binario:
+			migracion = Migracion(binario.criterios, criterios)
+			for numero, (nombre, puntuaciones, genero, _) in enumerate(binario, 1):
+				yield numero, nombre, migracion.aplicar(puntuaciones), genero
+		return
+	esquema, _ = leer_esquema(ruta)
+	anteriores = esquema.criterios if esquema is not None else criterios
+	migracion = Migracion(anteriores, criterios)
+	for numero, linea in lineas_de_amigos(ruta, anteriores):
+		try:
+			nombre, puntuaciones, genero, _ = Amigo.parsear_linea(linea, len(anteriores))
+		except ValueError as e:
+			errores.append((numero, str(e)))
+			continue
+		yield numero, nombre, migracion.aplicar(puntuaciones), genero
+
+def comando_importar(circulo, opciones):
+	"""Agrega al círculo los amigos de otro archivo, en una sola transacción."""
+	errores = []
+	nuevos = []
+	for numero, nombre, puntuaciones, genero in _leer_origen(opciones.origen, circulo.criterios, errores):
+		if not nombre.strip() or not all(0 <= valor <= 10 for valor in puntuaciones):
+			errores.append((numero, "Nombre vacío o puntuaciones fuera de rango."))
+			continue
+		nuevos.append((nombre, dict(zip(circulo.criterios, puntuaciones)), "F" if genero == "F" else "M"))
+	for numero, mensaje in errores:
+		print(f"{opciones.origen}:{numero}: {mensaje}", file=sys.stderr)
+	circulo.agregar_amigos(nuevos)
+	print(f"{len(nuevos)} amigos importados ({len(errores)} líneas omitidas).")
+	return 0
+
+def comando_exportar(circulo, opciones):
+	"""
+	Escribe el círculo en otro archivo: en formato de texto o binario (.bin), para volver a
+	cargarlo, o en CSV, JSON Lines o HTML (ver exportacion.py), con filtros y orden opcionales.
+	"""
+	destino = opciones.destino
+	from exportacion import FORMATOS, exportar
+	if os.path.splitext(destino)[1].lower() in FORMATOS:
+		consulta = circulo.consulta().ordenar(opciones.orden, opciones.invertido).limite(opciones.limite)
+		if opciones.genero:
+			consulta = consulta.genero(opciones.genero)
+		if opciones.categoria:
+			consulta = consulta.categoria(opciones.categoria)
+		titulo = "Círculo de Amistades" if opciones.circulo == PRINCIPAL else f"Círculo {opciones.circulo}"
+		cantidad = exportar(consulta, circulo.criterios, destino, titulo=titulo)
+	elif opciones.genero or opciones.categoria or opciones.limite is not None or opciones.orden != "total" or opciones.invertido:
+		raise ValueError("Los filtros y el orden solo se aplican al exportar a .csv, .jsonl o .html.")
+	elif destino.lower().endswith('.bin'):
+		from formato_binario import escribir_binario
+		registros = ((amigo.nombre, list(amigo.puntuaciones.values()), amigo.genero, amigo.categoria)
+					 for amigo in circulo.amigos)
+		cantidad = escribir_binario(destino, circulo.criterios, registros, capacidad=circulo.contar())
+	else:
+		temporal = destino + '.tmp'
+		with open(temporal, 'w', encoding='latin-1') as archivo:
+			archivo.write(linea_esquema(circulo.criterios) + '\n')
+			archivo.writelines(amigo.to_line() + '\n' for amigo in circulo.amigos)
+		os.replace(temporal, destino)
+		cantidad = circulo.contar()
+	print(f"{cantidad} amigos exportados a {destino}.")
+	return 0
+
+def _circulo_inexistente(opciones):
+	"""Error para un --circulo que no existe, con la lista de los círculos que hay."""
+	conocidos = ", ".join(repr(nombre) for nombre in opciones.gestor.archivos)
+	return ValueError(f"no existe el círculo {opciones.circulo!r}. Círculos: {conocidos}.")
+
+def _pares(textos, opcion):
+	"""Convierte los textos "A=B" de una opción repetible en una lista de pares (A, B)."""
+	pares = []
+	for texto in textos:
+		izquierda, igual, derecha = texto.rpartition('=')
+		if not igual or not izquierda.strip() or not derecha.strip():
+			raise ValueError(f"{opcion} espera VALOR=VALOR y se recibió {texto!r}.")
+		pares.append((izquierda.strip(), derecha.strip()))
+	return pares
+
+def comando_migrar(opciones, criterios, umbrales):
+	"""
+	Reescribe el archivo del círculo con los criterios actuales (los de --criterios), sin
+	cargarlo. Los reordenamientos y los criterios agregados se migran solos al abrir el
+	círculo; este comando hace falta cuando un criterio se renombró o se quitó.
+	"""
+	nombre_archivo = opciones.gestor.archivos.get(opciones.circulo)
+	if nombre_archivo is None:
+		raise _circulo_inexistente(opciones)
+	esquema, _ = leer_esquema(nombre_archivo)
+	if esquema is not None:
+		anteriores = esquema.criterios
+	elif opciones.desde:
+		# Un archivo anterior al esquema no dice con qué criterios se escribió.
+		if not os.path.exists(opciones.desde):
+			raise ValueError(f"No existe el archivo de criterios '{opciones.desde}'.")
+		anteriores, hubo_problema = cargar_criterios(opciones.desde)
+		if hubo_problema:
+			raise ValueError(f"'{opciones.desde}' está vacío o repite un criterio.")
+	else:
+		anteriores = criterios
+		if not corresponde_sin_esquema(nombre_archivo, criterios) and corresponde_sin_esquema(nombre_archivo, CRITERIOS_POR_DEFECTO):
+			# Un archivo anterior al esquema cuyas líneas no corresponden a los criterios actuales
+			# pero sí a los de ejemplo se escribió con estos.
+			anteriores = CRITERIOS_POR_DEFECTO
+			print(f"'{nombre_archivo}' no tiene línea de esquema; se interpreta con los criterios de ejemplo.")
+	defectos = [texto for texto in opciones.defecto if '=' not in texto]
+	if defectos and len(opciones.defecto) > 1:
+		raise ValueError("Use --defecto N para todos los criterios agregados o --defecto CRITERIO=N para cada uno.")
+	try:
+		if defectos:
+			por_defecto = int(defectos[0])
+		else:
+			por_defecto = {criterio: int(valor) for criterio, valor in _pares(opciones.defecto, "--defecto")}
+	except ValueError:
+		raise ValueError("La puntuación por defecto debe ser un entero entre 0 y 10.")
+	migracion = Migracion(anteriores, criterios, dict(_pares(opciones.renombrar, "--renombrar")),
+						  por_defecto, opciones.descartar)
+	if migracion.sin_cambios and esquema is not None:
+		print(f"'{nombre_archivo}' ya tiene los criterios de '{opciones.criterios}'.")
+		return 0
+	for frase in migracion.describir():
+		print(frase)
+	errores = []
+	cantidad = migrar_archivo(nombre_archivo, migracion, Clasificador(umbrales, len(criterios)), errores)
+	for error in errores:
+		print(f"{nombre_archivo}:{error.linea}: {error.mensaje}", file=sys.stderr)
+	print(f"{cantidad} amigos migrados en {nombre_archivo}.")
+	return 2 if errores else 0
+
+def crear_parser():
+	parser = argparse.ArgumentParser(description="Gestión del círculo de amistades desde la línea de comandos.")
+	parser.add_argument("--archivo", default="amigos.txt", help="Archivo de amigos (por defecto amigos.txt).")
+	parser.add_argument("--criterios", default="criterios.txt", help="Archivo de criterios (por defecto criterios.txt).")
+	parser.add_argument("--categorias", default="categorias.txt",
+						help="Archivo con los umbrales de las categorías (por defecto categorias.txt).")
+	parser.add_argument("--circulo", default=PRINCIPAL,
+						help="Círculo con el que trabajar (por defecto, el principal: el de --archivo).")
+	comandos = parser.add_subparsers(dest="comando", required=True)
+
+	agregar = comandos.add_parser("agregar", help="Agrega un amigo y muestra su id.")
+	agregar.add_argument("nombre")
+	agregar.add_argument("puntuaciones", type=int, nargs="+", help="Una puntuación (0 a 10) por criterio, en orden.")
+	agregar.add_argument("--genero", choices=("M", "F"), default="M")
+	agregar.set_defaults(funcion=comando_agregar)
+
+	reevaluar = comandos.add_parser("reevaluar", help="Cambia las puntuaciones (y opcionalmente nombre y género) de un amigo.")
+	reevaluar.add_argument("id", type=int)
+	reevaluar.add_argument("puntuaciones", type=int, nargs="+", help="Una puntuación (1 a 10) por criterio, en orden.")
+	reevaluar.add_argument("--nombre")
+	reevaluar.add_argument("--genero", choices=("M", "F"))
+	reevaluar.set_defaults(funcion=comando_reevaluar)
+
+	eliminar = comandos.add_parser("eliminar", help="Elimina un amigo.")
+	eliminar.add_argument("id", type=int)
+	eliminar.set_defaults(funcion=comando_eliminar)
+
+	listar = comandos.add_parser("listar", help="Lista los amigos de mayor a menor puntuación total.")
+	listar.add_argument("--limite", type=int, help="Cantidad máxima de amigos a listar.")
+	listar.add_argument("--todos", action="store_true", help="Ranking conjunto de todos los círculos.")
+	listar.set_defaults(funcion=comando_listar)
+
+	filtrar = comandos.add_parser("filtrar", help="Lista los amigos de un género o una categoría.")
+	filtrar.add_argument("--genero", choices=("M", "F"))
+	filtrar.add_argument("--categoria")
+	filtrar.add_argument("--limite", type=int, help="Cantidad máxima de amigos a listar.")
+	filtrar.set_defaults(funcion=comando_filtrar)
+
+	estadisticas = comandos.add_parser("estadisticas", help="Muestra cuántos amigos hay por género y categoría.")
+	estadisticas.add_argument("--completo", action="store_true",
+							  help="Muestra el análisis completo en JSON (ver analisis.py).")
+	estadisticas.set_defaults(funcion=comando_estadisticas)
+
+	importar = comandos.add_parser("importar", help="Agrega los amigos de otro archivo (texto o .bin).")
+	importar.add_argument("origen")
+	importar.set_defaults(funcion=comando_importar)
+
+	exportar = comandos.add_parser("exportar", help="Escribe el círculo en otro archivo (texto, .bin, .csv, .jsonl o .html).")
+	exportar.add_argument("destino")
+	exportar.add_argument("--genero", choices=("M", "F"), help="Solo amigos de ese género (.csv, .jsonl y .html).")
+	exportar.add_argument("--categoria", help="Solo amigos de esa categoría (.csv, .jsonl y .html).")
+	exportar.add_argument("--orden", choices=ORDENES, default="total", help="Orden de los amigos (por defecto, total).")
+	exportar.add_argument("--invertido", action="store_true", help="Invierte el orden.")
+	exportar.add_argument("--limite", type=int, help="Cantidad máxima de amigos a exportar.")
+	exportar.set_defaults(funcion=comando_exportar)
+
+	circulos = comandos.add_parser("circulos", help="Lista los círculos o busca amigos en todos ellos.")
+	busqueda = circulos.add_mutually_exclusive_group()
+	busqueda.add_argument("--buscar", metavar="NOMBRE", help="Muestra en qué círculos hay un amigo con ese nombre.")
+	busqueda.add_argument("--repetidos", action="store_true", help="Lista los amigos que están en más de un círculo.")
+	circulos.set_defaults(funcion=comando_circulos)
+
+	historial = comandos.add_parser("historial", help="Muestra la trayectoria de un amigo, las mayores caídas o los cambios de categoría.")
+	historial.add_argument("id", type=int, nargs="?")
+	consulta = historial.add_mutually_exclusive_group()
+	consulta.add_argument("--caidas", action="store_true", help="Lista los amigos cuyo total más bajó.")
+	consulta.add_argument("--transiciones", action="store_true", help="Lista los cambios de categoría, en orden.")
+	historial.add_argument("--dias", type=int, help="Considera solo los últimos N días.")
+	historial.add_argument("--limite", type=int, help="Cantidad máxima de líneas.")
+	historial.set_defaults(funcion=comando_historial)
+
+	migrar = comandos.add_parser("migrar", help="Migra el archivo del círculo a los criterios actuales (ver esquema.py).")
+	migrar.add_argument("--renombrar", action="append", default=[], metavar="VIEJO=NUEVO",
+						help="Las puntuaciones del criterio VIEJO pasan al criterio NUEVO.")
+	migrar.add_argument("--descartar", action="append", default=[], metavar="CRITERIO",
+						help="Permite perder las puntuaciones de un criterio quitado.")
+	migrar.add_argument("--defecto", action="append", default=[], metavar="N|CRITERIO=N",
+						help="Puntuación de los criterios agregados (por defecto 0).")
+	migrar.add_argument("--desde", metavar="CRITERIOS_ANTERIORES",
+						help="Criterios con los que se escribió un archivo sin línea de esquema.")
+	return parser
+
+def main(argumentos=None):
+	opciones = crear_parser().parse_args(argumentos)
+	criterios, hubo_problema = cargar_criterios(opciones.criterios)
+	if hubo_problema:
+		print(f"Aviso: se usan criterios de ejemplo porque '{opciones.criterios}' no existía "
+			  "o estaba vacío o repetía un criterio.", file=sys.stderr)
+	umbrales, hubo_problema = cargar_categorias(opciones.categorias)
+	if hubo_problema:
+		print(f"Aviso: se usan las categorías de siempre porque '{opciones.categorias}' no se pudo interpretar.",
+			  file=sys.stderr)
+	# Solo se carga el círculo elegido; los demás, si el comando los necesita.
+	opciones.gestor = GestorCirculos(descubrir_circulos(principal=opciones.archivo), criterios, diario=True, historial=True,
+									 umbrales=umbrales)
+	try:
+		if opciones.comando == "migrar":
+			# Se migra sin cargar el círculo: con los criterios cambiados, la carga fallaría.
+			return comando_migrar(opciones, criterios, umbrales)
+		# Los avisos de líneas inválidas al cargar van a stderr, para no mezclarse con los listados.
+		with contextlib.redirect_stdout(sys.stderr):
+			if opciones.circulo in opciones.gestor.archivos:
+				circulo = opciones.gestor.circulo(opciones.circulo)
+			elif opciones.comando in COMANDOS_QUE_CREAN:
+				circulo = opciones.gestor.crear(opciones.circulo)
+			else:
+				# Un nombre mal escrito no debe dejar un círculo vacío nuevo.
+				raise _circulo_inexistente(opciones)
+		resultado = opciones.funcion(circulo, opciones)
+		if circulo.errores_carga:
+			print(f"Aviso: {len(circulo.errores_carga)} líneas de '{circulo.nombre_archivo}' no describen un amigo "
+				  "válido; se conservan sin cambios al final del archivo.", file=sys.stderr)
+			return max(resultado, 2)
+		return resultado
+	except ValueError as e:
+		print(f"Error: {e}", file=sys.stderr)
+		return 2
+	finally:
+		opciones.gestor.cerrar()
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,302 @@
+﻿# consulta.py
+
+import sys
+from itertools import islice
+from math import log2
+from indice_nombres import normalizar_nombre
+
+# Órdenes posibles. El total va de mayor a menor; los demás, en orden ascendente.
+# En todos, los empates se resuelven por puntuación total y luego por orden de alta.
+ORDENES = ("total", "nombre", "categoria", "genero", "id")
+
+def _intersecar(rango, minimo, maximo):
+	"""Intersección de dos rangos [mínimo, máximo]; None en un extremo significa sin límite."""
+	anterior_minimo, anterior_maximo = rango
+	if minimo is None or anterior_minimo is not None and anterior_minimo > minimo:
+		minimo = anterior_minimo
+	if maximo is None or anterior_maximo is not None and anterior_maximo < maximo:
+		maximo = anterior_maximo
+	return minimo, maximo
+
+def _vacio(rango):
+	return rango[0] is not None and rango[1] is not None and rango[0] > rango[1]
+
+
+class Consulta:
+	"""
+	Consulta sobre los amigos de un CirculoAmistad, armada con condiciones que se combinan
+	(todas deben cumplirse):
+
+		circulo.consulta().genero("F").total(60).puntuacion("Confianza", 8).ordenar("nombre").limite(20)
+
+	Cada método devuelve una consulta nueva, de modo que una consulta base puede reutilizarse.
+	El resultado se obtiene con ejecutar() (o recorriéndola) y la cantidad con contar().
+
+	Al ejecutarla, el planificador elige de dónde sacar los candidatos:
+	 - el índice por totales, si hay un rango de total (una categoría también es un rango de
+	   total, ver Clasificador.rango());
+	 - el índice de nombres, si hay un prefijo o se ordena por nombre;
+	 - las consultas del almacén (por ejemplo, los índices de SQLite), si filtra por género;
+	 - si no, el ranking completo (o el orden de alta, si se ordena por id).
+	Estima cuántos candidatos da cada opción (los índices lo saben sin recorrerlos), suma
+	el costo de ordenar si la opción no entrega el orden pedido, y usa la más barata; las
+	condiciones que esa fuente no resuelve se verifican en una sola pasada. explicar()
+	describe el plan elegido.
+	"""
+	def __init__(self, circulo):
+		self.circulo = circulo
+		self._genero = None
+		self._categoria = None
+		self._total = (None, None)
+		self._puntuaciones = {}
+		self._prefijo = None
+		self._predicados = ()
+		self._orden = "total"
+		self._invertido = False
+		self._desde = 0
+		self._limite = None
+		self._vacia = False
+
+	def _copiar(self):
+		copia = Consulta.__new__(Consulta)
+		copia.__dict__.update(self.__dict__)
+		copia._puntuaciones = dict(self._puntuaciones)
+		return copia
+
+	def genero(self, genero):
+		"""Solo amigos de ese género ('M' o 'F')."""
+		copia = self._copiar()
+		if copia._genero is not None and copia._genero != genero:
+			copia._vacia = True
+		copia._genero = genero
+		return copia
+
+	def categoria(self, categoria):
+		"""Solo amigos de esa categoría."""
+		copia = self._copiar()
+		if copia._categoria is not None and copia._categoria != categoria:
+			copia._vacia = True
+		copia._categoria = categoria
+		return copia
+
+	def total(self, minimo=None, maximo=None):
+		"""Solo amigos con puntuación total entre 'minimo' y 'maximo' (inclusive; None = sin límite)."""
+		copia = self._copiar()
+		copia._total = _intersecar(copia._total, minimo, maximo)
+		return copia
+
+	def puntuacion(self, criterio, minimo=None, maximo=None):
+		"""Solo amigos con la puntuación de 'criterio' entre 'minimo' y 'maximo' (inclusive)."""
+		if criterio not in self.circulo.tabla.posiciones:
+			raise ValueError(f"Criterio desconocido: {criterio!r}.")
+		copia = self._copiar()
+		copia._puntuaciones[criterio] = _intersecar(copia._puntuaciones.get(criterio, (None, None)), minimo, maximo)
+		return copia
+
+	def prefijo(self, prefijo):
+		"""
+		Solo amigos cuyo nombre empieza con 'prefijo' (sin distinguir mayúsculas ni tildes,
+		ver normalizar_nombre()). Un segundo prefijo reemplaza al anterior.
+		"""
+		copia = self._copiar()
+		copia._prefijo = prefijo
+		return copia
+
+	def donde(self, predicado):
+		"""Solo amigos para los que predicado(amigo) es verdadero (se verifica en la pasada final)."""
+		copia = self._copiar()
+		copia._predicados = copia._predicados + (predicado,)
+		return copia
+
+	def ordenar(self, por="total", invertido=False):
+		"""Ordena por una de ORDENES; 'invertido' da vuelta el orden natural de esa columna."""
+		if por not in ORDENES:
+			raise ValueError(f"Orden desconocido: {por!r}.")
+		copia = self._copiar()
+		copia._orden = por
+		copia._invertido = invertido
+		return copia
+
+	def desde(self, cantidad):
+		"""Omite los primeros 'cantidad' resultados."""
+		copia = self._copiar()
+		copia._desde = cantidad
+		return copia
+
+	def limite(self, cantidad):
+		"""Devuelve como máximo 'cantidad' resultados (None = todos)."""
+		copia = self._copiar()
+		copia._limite = cantidad
+		return copia
+
+	# --- Planificación ---
+
+	def _rango_total(self):
+		"""Rango de total que deben cumplir los amigos: el pedido, intersecado con el de la categoría."""
+		rango = self._total
+		if self._categoria is not None:
+			rango = _intersecar(rango, *self.circulo.clasificador.rango(self._categoria))
+		return rango
+
+	def _usar_almacen(self):
+		"""Las consultas del almacén solo sirven fuera de una transacción (dentro, no reflejan los cambios)."""
+		return (self._genero is not None and self.circulo._transaccion is None
+				and getattr(self.circulo.almacen, 'consultar', None) is not None)
+
+	def _planes(self):
+		"""
+		Devuelve las fuentes de candidatos posibles como (costo, nombre, orden que entregan,
+		cantidad estimada). El costo es la cantidad de candidatos, más una estimación del
+		costo de ordenarlos si la fuente no entrega el orden pedido.
+		"""
+		circulo = self.circulo
+		total = len(circulo.por_id)
+		rango = self._rango_total()
+		planes = []
+		if self._prefijo is not None or self._orden == "nombre":
+			planes.append(("nombres", "nombre", circulo.nombres.contar_prefijo(self._prefijo or "")))
+		if rango != (None, None):
+			planes.append(("totales", "total", circulo.indice.contar_entre(*rango)))
+		if self._usar_almacen():
+			planes.append(("almacen", "total", circulo.conteo_generos[self._genero]))
+		planes.append(("ranking", "total", total))
+		if self._orden == "id":
+			planes.append(("alta", "id", total))
+		resultado = []
+		for nombre, orden, cantidad in planes:
+			costo = cantidad
+			if orden != self._orden:
+				costo += cantidad * log2(cantidad + 1) / 4
+			resultado.append((costo, nombre, orden, cantidad))
+		return resultado
+
+	def _plan(self):
+		return min(self._planes())
+
+	def explicar(self):
+		"""Describe el plan elegido, por ejemplo "totales (~1200 candidatos) + filtro + orden por nombre"."""
+		if self._vacia or _vacio(self._rango_total()):
+			return "vacía"
+		_, fuente, orden, cantidad = self._plan()
+		partes = [f"{fuente} (~{cantidad} candidatos)"]
+		filtros = self._filtros(fuente)
+		if self._porcion_directa(fuente, orden, filtros):
+			partes.append("porción directa del índice")
+		if filtros:
+			partes.append("filtro")
+		if orden != self._orden:
+			partes.append(f"orden por {self._orden}")
+		return " + ".join(partes)
+
+	def _filtros(self, fuente):
+		"""
+		Condiciones que la fuente elegida no resuelve por sí sola, como funciones que reciben
+		un iterable de amigos y devuelven los que las cumplen. Se arman con expresiones
+		generadoras en lugar de un predicado por amigo, que costaría una llamada más por amigo.
+		"""
+		filtros = []
+		minimo, maximo = self._rango_total()
+		if fuente != "totales" and (minimo, maximo) != (None, None):
+			minimo = -1 if minimo is None else minimo
+			maximo = sys.maxsize if maximo is None else maximo
+			filtros.append(lambda amigos: (a for a in amigos if minimo <= a.puntuacion_total() <= maximo))
+		if self._genero is not None and fuente != "almacen":
+			genero = self._genero
+			filtros.append(lambda amigos: (a for a in amigos if a.genero == genero))
+		if self._prefijo and fuente != "nombres":
+			prefijo = normalizar_nombre(self._prefijo)
+			filtros.append(lambda amigos: (a for a in amigos if normalizar_nombre(a.nombre).startswith(prefijo)))
+		tabla = self.circulo.tabla
+		for criterio, (desde, hasta) in self._puntuaciones.items():
+			# Se lee directamente la columna del criterio en la tabla de puntuaciones.
+			columna = tabla.columnas[tabla.posiciones[criterio]]
+			desde = 0 if desde is None else desde
+			hasta = 255 if hasta is None else hasta
+			filtros.append(lambda amigos, columna=columna, desde=desde, hasta=hasta:
+						   (a for a in amigos if desde <= columna[a._fila] <= hasta))
+		for predicado in self._predicados:
+			filtros.append(lambda amigos, predicado=predicado: filter(predicado, amigos))
+		return filtros
+
+	def _porcion_directa(self, fuente, orden, filtros):
+		"""
+		True si el índice por totales puede entregar directamente la porción pedida: la fuente
+		es el índice (con o sin rango de total), no quedan filtros y el orden es el suyo.
+		"""
+		return fuente in ("totales", "ranking") and not filtros and orden == self._orden and not self._invertido
+
+	def _candidatos(self, fuente):
+		circulo = self.circulo
+		if fuente == "nombres":
+			return circulo.nombres.recorrer_prefijo(self._prefijo or "", circulo.por_id)
+		if fuente == "totales":
+			return circulo.indice.entre(*self._rango_total())
+		if fuente == "almacen":
+			return (circulo.por_id[id_amigo] for id_amigo in circulo.almacen.consultar(self._genero, None))
+		if fuente == "ranking":
+			return iter(circulo.indice)
+		return iter(list(circulo.por_id.values()))
+
+	def _clave(self):
+		"""Clave de ordenamiento de self._orden (en su sentido natural)."""
+		orden = self._orden
+		if orden == "total":
+			return lambda amigo: (-amigo.puntuacion_total(), amigo.id)
+		if orden == "nombre":
+			return lambda amigo: (normalizar_nombre(amigo.nombre), amigo.id)
+		if orden == "categoria":
+			posiciones = self.circulo.clasificador.posiciones
+			return lambda amigo: (posiciones.get(amigo.categoria, len(posiciones)), -amigo.puntuacion_total(), amigo.id)
+		if orden == "genero":
+			return lambda amigo: (amigo.genero, -amigo.puntuacion_total(), amigo.id)
+		return lambda amigo: amigo.id
+
+	# --- Ejecución ---
+
+	def ejecutar(self):
+		"""Devuelve la lista de amigos que cumplen la consulta, en el orden pedido."""
+		if self._vacia or _vacio(self._rango_total()):
+			return []
+		_, fuente, orden, _ = self._plan()
+		fin = None if self._limite is None else self._desde + self._limite
+		filtros = self._filtros(fuente)
+		if self._porcion_directa(fuente, orden, filtros):
+			# El índice por totales entrega directamente la porción pedida, sin recorrer las
+			# anteriores: desde(299000) no cuesta 299000 pasos de un islice.
+			return self.circulo.indice.rango(self._desde, fin, *self._rango_total())
+		candidatos = self._candidatos(fuente)
+		for filtro in filtros:
+			candidatos = filtro(candidatos)
+		if orden == self._orden and not self._invertido:
+			# La fuente ya entrega el orden pedido: se corta al llegar al límite.
+			if self._desde == 0 and fin is None:
+				return list(candidatos)
+			return list(islice(candidatos, self._desde, fin))
+		if orden == self._orden:
+			resultado = list(candidatos)
+			resultado.reverse()
+		else:
+			resultado = sorted(candidatos, key=self._clave(), reverse=self._invertido)
+		return resultado[self._desde:fin]
+
+	def __iter__(self):
+		return iter(self.ejecutar())
+
+	def contar(self):
+		"""
+		Cantidad de amigos que cumplen la consulta (sin tener en cuenta desde() ni limite()).
+		Con solo un género, una categoría o un rango de total se responde con los contadores
+		o el índice por totales, sin recorrer amigos.
+		"""
+		if self._vacia or _vacio(self._rango_total()):
+			return 0
+		circulo = self.circulo
+		rango = self._rango_total()
+		sin_otras = not self._puntuaciones and not self._prefijo and not self._predicados
+		if sin_otras and self._genero is None:
+			return circulo.indice.contar_entre(*rango)
+		if sin_otras and rango == (None, None):
+			return circulo.conteo_generos[self._genero]
+		if not self._puntuaciones and not self._predicados and self._genero is None and rango == (None, None):
+			return circulo.nombres.contar_prefijo(self._prefijo)
+		return len(self.desde(0).limite(None).ejecutar())
@@ -0,0 +1,46 @@
+﻿# criterios.py
+# Sin dependencias de wx: lo usan tanto main.py como cli.py.
+
+import os
+
+def cargar_criterios(nombre_archivo="criterios.txt"):
+	"""
+	Carga los criterios desde un archivo de texto.
+	Si el archivo no existe, se crea uno con ejemplos y quien llama avisa al usuario
+	(un mensaje en la GUI o en la consola) para que lo edite con sus propios criterios.
+	Se espera un criterio por línea, al menos uno y sin repetir; puede haber cualquier
+	cantidad (el archivo de amigos indica con cuáles se escribió, ver esquema.py).
+	Si está vacío o repite un criterio, se muestra un mensaje y se utilizan criterios de ejemplo.
+	"""
+	criterios_de_ejemplo = [
+		"Empatía y Calidez",
+		"Confianza",
+		"Reciprocidad",
+		"Intereses Compartidos",
+		"Disponibilidad y Presencia",
+		"Comunicación Efectiva",
+		"Apoyo en Dificultades",
+		"Resolución de Conflictos",
+		"Diversión y Recreación",
+		"Crecimiento Personal"
+	]
+
+	# Si el archivo no existe, crearlo con criterios de ejemplo.
+	if not os.path.exists(nombre_archivo):
+		with open(nombre_archivo, 'w', encoding='utf-8') as f:
+			for linea in criterios_de_ejemplo:
+				f.write(linea + "\n")
+		# Se retorna la lista de ejemplo; el aviso lo muestra quien llama
+		# (main.py, una vez que la app wx está disponible, o cli.py).
+		return criterios_de_ejemplo, True
+
+	# Si el archivo existe, leerlo.
+	with open(nombre_archivo, 'r', encoding='utf-8') as f:
+		criterios = [linea.strip() for linea in f if linea.strip()]
+
+	# Si no hay criterios o alguno se repite, usar los criterios de ejemplo.
+	if not criterios or len(set(criterios)) != len(criterios):
+		return criterios_de_ejemplo, True
+
+	# Caso en que todo está correcto.
+	return criterios, False
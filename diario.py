@@ -0,0 +1,348 @@
+﻿# diario.py
+
+import os
+from amigo import Amigo
+from instrumentacion import registrar_escritura, registrar_lectura
+
+def _comprimir_rangos(ids):
+	"""
+	Resume una lista creciente de ids como rangos "0-499,501-999".
+	Devuelve None si los ids son exactamente 0, 1, 2...
+	"""
+	rangos = []
+	for id_amigo in ids:
+		if rangos and rangos[-1][1] == id_amigo - 1:
+			rangos[-1][1] = id_amigo
+		else:
+			rangos.append([id_amigo, id_amigo])
+	if not rangos or len(rangos) == 1 and rangos[0][0] == 0:
+		return None
+	return ",".join(f"{inicio}-{fin}" for inicio, fin in rangos)
+
+def recorrer_rangos(texto):
+	"""Genera los ids de un texto de rangos "0-499,501-999" sin armar la lista completa."""
+	for rango in texto.split(","):
+		inicio, _, fin = rango.partition("-")
+		yield from range(int(inicio), int(fin) + 1)
+
+def _expandir_rangos(texto):
+	return list(recorrer_rangos(texto))
+
+
+class Diario:
+	"""
+	Registro de solo anexado con las mutaciones del círculo de amistades.
+	Cada línea del archivo es un registro:
+	 - "S,tamaño,mtime": marca del archivo de amigos sobre el que se anotaron los cambios.
+	 - "I,rangos": ids de los amigos del archivo, si no son 0, 1, 2... (ver vaciar()).
+	 - "A,id,línea": alta de un amigo con ese id.
+	 - "U,id,línea": nuevos datos del amigo con ese id.
+	 - "D,id": baja del amigo con ese id.
+	Los amigos del archivo reciben los ids 0, 1, 2... en orden (o los del registro "I"), de
+	modo que los registros se refieren a los mismos amigos que en la sesión que los anotó.
+	La marca inicial permite reconocer un diario que no corresponde al archivo de amigos
+	actual (por ejemplo, si la aplicación se cerró durante una compactación, o si el archivo
+	se copió, restauró o sincronizó): ese diario no se aplica, pero tampoco se borra, sino
+	que se guarda aparte (ver apartar()).
+	"""
+	def __init__(self, nombre_archivo, archivo_amigos):
+		self.nombre_archivo = nombre_archivo
+		self.archivo_amigos = archivo_amigos
+		self.registros = 0
+		# Bytes del diario que esta sesión ya conoce (leídos o escritos); si el archivo crece
+		# más allá, otro programa le anexó registros (ver registros_desde()).
+		self.tamano = 0
+		self._archivo = None
+		self._ids_archivo = None
+		# Mayor id que aparece en los registros leídos (aunque su amigo se haya dado de baja),
+		# para que no se vuelva a asignar (ver AlmacenTexto.cargar()).
+		self.id_maximo = -1
+
+	def _marca_actual(self):
+		"""Devuelve la marca (tamaño, mtime) del archivo de amigos actual."""
+		try:
+			estado = os.stat(self.archivo_amigos)
+			return f"S,{estado.st_size},{estado.st_mtime_ns}"
+		except OSError:
+			return "S,0,0"
+
+	def anexar(self, registro):
+		"""Anexa un registro al diario y lo vuelca al disco."""
+		self.anexar_varios((registro,))
+
+	def anexar_varios(self, registros):
+		"""Anexa varios registros al diario con una sola escritura."""
+		cabecera = []
+		if self._archivo is None:
+			nuevo = not os.path.exists(self.nombre_archivo) or os.path.getsize(self.nombre_archivo) == 0
+			self._archivo = open(self.nombre_archivo, 'ab')
+			if nuevo:
+				cabecera.append(self._marca_actual())
+				if self._ids_archivo:
+					cabecera.append("I," + self._ids_archivo)
+		datos = ''.join(registro + '\n' for registro in cabecera + list(registros)).encode('latin-1')
+		self._archivo.write(datos)
+		registrar_escritura(self.nombre_archivo, len(datos))
+		self._archivo.flush()
+		self.tamano = self._archivo.tell()
+		self.registros += len(registros)
+
+	@staticmethod
+	def registro_alta(amigo):
+		return f"A,{amigo.id}," + amigo.to_line()
+
+	@staticmethod
+	def registro_cambio(amigo):
+		return f"U,{amigo.id}," + amigo.to_line()
+
+	@staticmethod
+	def registro_baja(amigo):
+		return f"D,{amigo.id}"
+
+	def anotar_alta(self, amigo):
+		self.anexar(self.registro_alta(amigo))
+
+	def anotar_cambio(self, amigo):
+		self.anexar(self.registro_cambio(amigo))
+
+	def anotar_baja(self, amigo):
+		self.anexar(self.registro_baja(amigo))
+
+	def reproducir(self, por_id, criterios, tabla=None):
+		"""
+		Aplica sobre el diccionario 'por_id' ({id: amigo}, en orden) los registros del diario.
+		Las puntuaciones de los amigos creados se guardan en 'tabla', si se indica.
+		Un último registro incompleto (escritura interrumpida) se descarta y se recorta del archivo.
+		Devuelve la cantidad de registros aplicados.
+		"""
+		self.cerrar()
+		self.registros = 0
+		self.tamano = 0
+		self.id_maximo = -1
+		if not os.path.exists(self.nombre_archivo):
+			return 0
+		with open(self.nombre_archivo, 'rb') as archivo:
+			contenido = archivo.read()
+		registrar_lectura(self.nombre_archivo, len(contenido))
+		completo = contenido.rfind(b'\n') + 1
+		if completo < len(contenido):
+			with open(self.nombre_archivo, 'r+b') as archivo:
+				archivo.truncate(completo)
+		self.tamano = completo
+		lineas = contenido[:completo].decode('latin-1').splitlines()
+		if not lineas:
+			return 0
+		if lineas[0].strip() != self._marca_actual():
+			# El diario pertenece a otra versión del archivo de amigos.
+			self.apartar()
+			return 0
+		registros = lineas[1:]
+		if registros and registros[0].startswith("I,"):
+			# Los amigos del archivo tenían otros ids en la sesión que anotó el diario.
+			try:
+				ids = _expandir_rangos(registros.pop(0)[2:])
+			except ValueError:
+				ids = None
+			amigos = list(por_id.values())
+			if ids is not None and len(ids) == len(amigos):
+				por_id.clear()
+				for id_amigo, amigo in zip(ids, amigos):
+					amigo.id = id_amigo
+					por_id[id_amigo] = amigo
+			else:
+				print("Error al procesar un registro del diario: la lista de ids no coincide con el archivo.")
+		for linea in registros:
+			tipo, _, resto = linea.partition(',')
+			try:
+				if tipo == "A":
+					id_amigo, _, datos = resto.partition(',')
+					self.id_maximo = max(self.id_maximo, int(id_amigo))
+					amigo = Amigo.from_line(datos, criterios, tabla)
+					amigo.id = int(id_amigo)
+					por_id[amigo.id] = amigo
+				elif tipo == "U":
+					id_amigo, _, datos = resto.partition(',')
+					# Se actualiza el amigo existente para conservar su posición y su tabla.
+					amigo = por_id[int(id_amigo)]
+					nuevo = Amigo.from_line(datos, criterios)
+					amigo.nombre = nuevo.nombre
+					amigo.genero = nuevo.genero
+					amigo._escribir_puntuaciones(nuevo.puntuaciones)
+					amigo.clasificar_amigo()
+				elif tipo == "D":
+					por_id.pop(int(resto)).desvincular()
+				else:
+					raise ValueError(f"Tipo de registro desconocido: {tipo!r}")
+			except (ValueError, KeyError) as e:
+				print(f"Error al procesar un registro del diario: {e}")
+			self.registros += 1
+		return self.registros
+
+	def _leer_desde(self, posicion):
+		"""Devuelve (líneas completas del diario desde el byte 'posicion', byte siguiente a la última)."""
+		try:
+			with open(self.nombre_archivo, 'rb') as archivo:
+				archivo.seek(posicion)
+				contenido = archivo.read()
+		except FileNotFoundError:
+			return [], posicion
+		registrar_lectura(self.nombre_archivo, len(contenido))
+		completo = contenido.rfind(b'\n') + 1
+		return contenido[:completo].decode('latin-1').splitlines(), posicion + completo
+
+	def registros_desde(self, posicion):
+		"""
+		Lee los registros que otro programa anexó desde el byte 'posicion' (una línea
+		completa), sin volver a leer el resto. Devuelve (registros, byte siguiente), donde cada
+		registro es (tipo, id, datos); datos es la línea del amigo, o None en una baja.
+		Devuelve None si aparece una marca o una lista de ids: el diario se reemplazó.
+		"""
+		lineas, fin = self._leer_desde(posicion)
+		registros = []
+		for linea in lineas:
+			tipo, _, resto = linea.partition(',')
+			if tipo in ("S", "I"):
+				return None
+			id_texto, _, datos = resto.partition(',')
+			try:
+				registros.append((tipo, int(id_texto), datos if tipo != "D" else None))
+			except ValueError:
+				print(f"Error al procesar un registro del diario: {linea!r}")
+		return registros, fin
+
+	def imagen(self, lineas_archivo, valida):
+		"""
+		Aplica el diario, como texto y sin crear amigos, sobre las líneas (válidas) del archivo
+		de amigos: devuelve ({id: línea del amigo}, en el orden en que los cargaría un programa
+		nuevo, cantidad de registros del diario, bytes leídos). 'valida(línea)' indica si una
+		línea de un alta o un cambio describe un amigo. Un diario de otra versión del archivo
+		se guarda aparte sin aplicarlo, igual que al reproducirlo.
+		"""
+		lineas, fin = self._leer_desde(0)
+		por_id = dict(enumerate(lineas_archivo))
+		if not lineas:
+			return por_id, 0, fin
+		if lineas[0].strip() != self._marca_actual():
+			self.apartar()
+			return por_id, 0, 0
+		registros = lineas[1:]
+		if registros and registros[0].startswith("I,"):
+			try:
+				ids = _expandir_rangos(registros.pop(0)[2:])
+			except ValueError:
+				ids = None
+			if ids is not None and len(ids) == len(por_id):
+				por_id = dict(zip(ids, lineas_archivo))
+		for linea in registros:
+			tipo, _, resto = linea.partition(',')
+			id_texto, _, datos = resto.partition(',')
+			try:
+				id_amigo = int(id_texto)
+				self.id_maximo = max(self.id_maximo, id_amigo)
+				if tipo == "D":
+					del por_id[id_amigo]
+				elif tipo == "U" and id_amigo not in por_id:
+					raise KeyError(id_amigo)
+				elif tipo in ("A", "U") and valida(datos):
+					por_id[id_amigo] = datos
+			except (ValueError, KeyError) as e:
+				print(f"Error al procesar un registro del diario: {e}")
+		return por_id, len(registros), fin
+
+	def pendientes(self, valida):
+		"""
+		Lee el diario como texto, sin crear amigos, para aplicarlo mientras se recorre el
+		archivo de amigos línea por línea (ver esquema.migrar_archivo). Devuelve (rangos de ids
+		del registro "I" o None, {id de un amigo del archivo: su nueva línea, o None si se dio
+		de baja}, {id: línea} de las altas en el orden en que quedan al final del círculo).
+		'valida(línea)' indica si la línea de un alta o un cambio describe un amigo. Un diario
+		de otra versión del archivo se guarda aparte sin aplicarlo, igual que al reproducirlo.
+		La memoria usada depende del tamaño del diario, no del archivo de amigos.
+		"""
+		lineas, _ = self._leer_desde(0)
+		rangos, reemplazos, altas = None, {}, {}
+		self.id_maximo = -1
+		if not lineas:
+			return rangos, reemplazos, altas
+		if lineas[0].strip() != self._marca_actual():
+			self.apartar()
+			return rangos, reemplazos, altas
+		registros = lineas[1:]
+		if registros and registros[0].startswith("I,"):
+			rangos = registros.pop(0)[2:]
+		for linea in registros:
+			tipo, _, resto = linea.partition(',')
+			id_texto, _, datos = resto.partition(',')
+			try:
+				id_amigo = int(id_texto)
+			except ValueError:
+				print(f"Error al procesar un registro del diario: {linea!r}")
+				continue
+			self.id_maximo = max(self.id_maximo, id_amigo)
+			if tipo == "D":
+				if altas.pop(id_amigo, None) is None:
+					reemplazos[id_amigo] = None
+			elif tipo == "A" or tipo == "U" and id_amigo in altas:
+				if valida(datos):
+					altas[id_amigo] = datos
+			elif tipo == "U":
+				# Un cambio de un amigo ya dado de baja no lo revive, igual que al reproducirlo.
+				if valida(datos) and not (id_amigo in reemplazos and reemplazos[id_amigo] is None):
+					reemplazos[id_amigo] = datos
+			else:
+				print(f"Error al procesar un registro del diario: tipo desconocido {tipo!r}")
+		return rangos, reemplazos, altas
+
+	def adoptar(self, tamano):
+		"""
+		Se usa cuando otro programa reemplazó el archivo de amigos o el diario y esta sesión ya
+		incorporó su contenido con los mismos ids que asignaría una carga: 'tamano' son los
+		bytes leídos del diario actual, y un diario nuevo ya no necesita el registro "I".
+		"""
+		self.cerrar()
+		self.tamano = tamano
+		self._ids_archivo = None
+
+	def apartar(self):
+		"""
+		Guarda el diario como '<diario>.bak' (o '.bak1', '.bak2'... si ya existe) en lugar de
+		borrarlo, y avisa. Se usa cuando su marca no coincide con el archivo de amigos: puede
+		ser un diario ya volcado, pero también cambios que nunca se compactaron en un archivo
+		que luego se copió o restauró, y esos no deben perderse sin que el usuario lo sepa.
+		Devuelve la ruta del diario apartado.
+		"""
+		self.cerrar()
+		destino = self.nombre_archivo + '.bak'
+		numero = 1
+		while os.path.exists(destino):
+			destino = f"{self.nombre_archivo}.bak{numero}"
+			numero += 1
+		os.replace(self.nombre_archivo, destino)
+		self.registros = 0
+		self.tamano = 0
+		self._ids_archivo = None
+		print(f"Aviso: el diario '{self.nombre_archivo}' no corresponde a la versión actual de "
+			  f"'{self.archivo_amigos}'; se guardó sin aplicar en '{destino}'.")
+		return destino
+
+	def vaciar(self, ids=None):
+		"""
+		Elimina el diario; se usa cuando su contenido ya está en el archivo de amigos.
+		'ids' son los ids de los amigos recién guardados, en el orden del archivo. Si no son
+		0, 1, 2... (porque hubo bajas en la sesión), se escribe enseguida un diario nuevo con
+		el registro "I": así la próxima carga les devuelve los mismos ids, aunque no se anote
+		ningún otro cambio (el historial de reevaluaciones se refiere a los amigos por su id).
+		"""
+		self.cerrar()
+		if os.path.exists(self.nombre_archivo):
+			os.remove(self.nombre_archivo)
+		self.registros = 0
+		self.tamano = 0
+		self._ids_archivo = _comprimir_rangos(ids) if ids is not None else None
+		if self._ids_archivo:
+			self.anexar_varios(())
+
+	def cerrar(self):
+		if self._archivo is not None:
+			self._archivo.close()
+			self._archivo = None
@@ -1,46 +1,68 @@
-﻿# eliminar_amigo_dialog.py
-
-import wx
-
-class EliminarAmigoDialog(wx.Dialog):
-	def __init__(self, parent, circulo, title="Eliminar Amigo"):
-		super(EliminarAmigoDialog, self).__init__(parent, title=title, size=(300, 200))
-		
-		self.circulo = circulo
-		self.panel = wx.Panel(self)
-		self.main_sizer = wx.BoxSizer(wx.VERTICAL)
-
-		wx.StaticText(self.panel, label="Seleccione un Amigo para eliminar:")
-		self.amigo_choice = wx.Choice(self.panel, choices=[amigo.nombre for amigo in self.circulo.amigos])
-		self.main_sizer.Add(self.amigo_choice, 0, wx.EXPAND | wx.ALL, 5)
-
-		delete_button = wx.Button(self.panel, label="&Eliminar Amigo")
-		delete_button.Bind(wx.EVT_BUTTON, self.on_confirm)
-		self.main_sizer.Add(delete_button, 0, wx.EXPAND | wx.ALL, 5)
-		
-		self.panel.SetSizer(self.main_sizer)
-
-		# Permitir cerrar el diálogo con Escape
-		self.Bind(wx.EVT_CHAR_HOOK, self.on_key)
-
-	def on_key(self, event):
-		if event.GetKeyCode() == wx.WXK_ESCAPE:
-			self.EndModal(wx.ID_CANCEL)
-		else:
-			event.Skip()
-
-	def on_confirm(self, event):
-		indice = self.amigo_choice.GetSelection()
-		if indice == wx.NOT_FOUND:
-			wx.MessageBox("No se ha seleccionado ningún amigo.", "Error", wx.OK | wx.ICON_ERROR)
-			return
-		amigo_nombre = self.circulo.amigos[indice].nombre
-		mensaje = f"Está seguro de que desea eliminar a {amigo_nombre}?"
-		if wx.MessageBox(mensaje, "Confirmar Eliminación", wx.YES_NO | wx.ICON_QUESTION) == wx.YES:
-			self.resultado = indice
-			self.EndModal(wx.ID_OK)
-		else:
-			wx.MessageBox("Operación cancelada.", "Información", wx.OK | wx.ICON_INFORMATION)
-
-	def obtener_indice_seleccionado(self):
-		return self.resultado
+﻿# eliminar_amigo_dialog.py
+
+import wx
+
+class EliminarAmigoDialog(wx.Dialog):
+	def __init__(self, parent, circulo, title="Eliminar Amigo"):
+		super(EliminarAmigoDialog, self).__init__(parent, title=title, size=(300, 200))
+		
+		self.circulo = circulo
+		self.amigos = circulo.amigos
+		self.panel = wx.Panel(self)
+		self.main_sizer = wx.BoxSizer(wx.VERTICAL)
+
+		wx.StaticText(self.panel, label="Seleccione un Amigo para eliminar:")
+		self.amigo_choice = wx.Choice(self.panel, choices=[amigo.nombre for amigo in self.amigos])
+		self.main_sizer.Add(self.amigo_choice, 0, wx.EXPAND | wx.ALL, 5)
+
+		delete_button = wx.Button(self.panel, label="&Eliminar Amigo")
+		delete_button.Bind(wx.EVT_BUTTON, self.on_confirm)
+		self.main_sizer.Add(delete_button, 0, wx.EXPAND | wx.ALL, 5)
+		
+		self.panel.SetSizer(self.main_sizer)
+
+		# Permitir cerrar el diálogo con Escape
+		self.Bind(wx.EVT_CHAR_HOOK, self.on_key)
+
+		# Los cambios que otro programa haga en el archivo se reflejan sin cerrar el diálogo.
+		self.circulo.suscribir(self.on_cambios_externos)
+		self.Bind(wx.EVT_WINDOW_DESTROY, self.on_destroy)
+
+	def on_destroy(self, event):
+		if event.GetEventObject() is self:
+			self.circulo.desuscribir(self.on_cambios_externos)
+		event.Skip()
+
+	def on_cambios_externos(self, cambios):
+		"""Actualiza la lista de amigos conservando el elegido, si todavía existe."""
+		indice = self.amigo_choice.GetSelection()
+		elegido = self.amigos[indice].id if indice != wx.NOT_FOUND else None
+		self.amigos = self.circulo.amigos
+		self.amigo_choice.Set([amigo.nombre for amigo in self.amigos])
+		for posicion, amigo in enumerate(self.amigos):
+			if amigo.id == elegido:
+				self.amigo_choice.SetSelection(posicion)
+				break
+
+	def on_key(self, event):
+		if event.GetKeyCode() == wx.WXK_ESCAPE:
+			self.EndModal(wx.ID_CANCEL)
+		else:
+			event.Skip()
+
+	def on_confirm(self, event):
+		indice = self.amigo_choice.GetSelection()
+		if indice == wx.NOT_FOUND:
+			wx.MessageBox("No se ha seleccionado ningún amigo.", "Error", wx.OK | wx.ICON_ERROR)
+			return
+		amigo_nombre = self.amigos[indice].nombre
+		mensaje = f"Está seguro de que desea eliminar a {amigo_nombre}?"
+		if wx.MessageBox(mensaje, "Confirmar Eliminación", wx.YES_NO | wx.ICON_QUESTION) == wx.YES:
+			self.resultado = self.amigos[indice].id
+			self.EndModal(wx.ID_OK)
+		else:
+			wx.MessageBox("Operación cancelada.", "Información", wx.OK | wx.ICON_INFORMATION)
+
+	def obtener_id_seleccionado(self):
+		"""Devuelve el id del amigo elegido para eliminar."""
+		return self.resultado
@@ -0,0 +1,121 @@
+﻿# escritura_diferida.py
+
+import threading
+
+class EscritorDiferido:
+	"""
+	Hilo que escribe en segundo plano los cambios del almacén de texto (o las anotaciones del
+	historial, ver historial.py), para que el hilo de la interfaz nunca espere al disco.
+	 - programar_guardado(instantanea): pide un guardado completo. La instantánea ya trae el
+	   texto a escribir, armado en el hilo que llama, así que este hilo nunca lee amigos que
+	   se estén modificando. Si ya había un guardado pendiente, se reemplaza: varios cambios
+	   seguidos cuestan una sola escritura.
+	 - programar_registro(registro): pide anexar un registro al diario. Un guardado completo
+	   posterior descarta los registros anteriores aún no escritos, que ya incluye.
+	"""
+	def __init__(self, guardar, anexar, demora=0.2):
+		"""
+		:param guardar: Función que escribe el archivo completo a partir de una instantánea
+		                (None si solo se anexan registros).
+		:param anexar: Función que anexa un registro (texto) al diario.
+		:param demora: Segundos que se esperan antes de escribir, para juntar los cambios seguidos.
+		"""
+		self.guardar = guardar
+		self.anexar = anexar
+		self.demora = demora
+		self._condicion = threading.Condition()
+		self._instantanea = None
+		self._registros = []
+		self._fallido = None
+		self._escribiendo = False
+		self._urgente = False
+		self._cerrado = False
+		self._hilo = threading.Thread(target=self._trabajar, name="EscritorDiferido", daemon=True)
+		self._hilo.start()
+
+	def programar_guardado(self, instantanea):
+		with self._condicion:
+			self._instantanea = instantanea
+			self._registros = []
+			self._condicion.notify_all()
+
+	def programar_registro(self, registro):
+		with self._condicion:
+			self._registros.append(registro)
+			self._condicion.notify_all()
+
+	def _hay_pendientes(self):
+		return self._instantanea is not None or bool(self._registros)
+
+	def _tomar_pendientes(self):
+		"""
+		Devuelve (instantánea, registros) a escribir y vacía la cola. Lo que quedó de una
+		escritura fallida va primero, salvo que un guardado completo nuevo ya lo incluya.
+		"""
+		instantanea, registros = self._instantanea, self._registros
+		self._instantanea, self._registros = None, []
+		if self._fallido is not None:
+			if instantanea is None:
+				instantanea, previos = self._fallido
+				registros = previos + registros
+			self._fallido = None
+		return instantanea, registros
+
+	def _trabajar(self):
+		while True:
+			with self._condicion:
+				self._condicion.wait_for(lambda: self._hay_pendientes() or self._cerrado)
+				if not self._hay_pendientes():
+					return
+				# Se espera un poco para juntar en una sola escritura los cambios que sigan llegando.
+				self._condicion.wait_for(lambda: self._urgente or self._cerrado, timeout=self.demora)
+				instantanea, registros = self._tomar_pendientes()
+				self._escribiendo = True
+			try:
+				self._escribir(instantanea, registros)
+			except Exception as e:
+				print(f"Error al guardar en segundo plano: {e}")
+			finally:
+				with self._condicion:
+					self._escribiendo = False
+					self._condicion.notify_all()
+
+	def _escribir(self, instantanea, registros):
+		"""Escribe un trabajo; si falla, guarda en '_fallido' la parte no escrita y propaga el error."""
+		escritos = 0
+		try:
+			if instantanea is not None:
+				self.guardar(instantanea)
+				instantanea = None
+			for registro in registros:
+				self.anexar(registro)
+				escritos += 1
+		except Exception:
+			with self._condicion:
+				self._fallido = (instantanea, registros[escritos:])
+			raise
+
+	def flush(self):
+		"""
+		Espera a que se escriba todo lo pendiente. Si la última escritura falló, se reintenta
+		en este hilo y, si vuelve a fallar, se propaga el error.
+		"""
+		with self._condicion:
+			self._urgente = True
+			self._condicion.notify_all()
+			self._condicion.wait_for(lambda: not self._hay_pendientes() and not self._escribiendo)
+			self._urgente = False
+			if self._fallido is None:
+				return
+			instantanea, registros = self._tomar_pendientes()
+		self._escribir(instantanea, registros)
+
+	def cerrar(self):
+		"""Escribe lo pendiente y termina el hilo."""
+		try:
+			self.flush()
+		finally:
+			with self._condicion:
+				self._cerrado = True
+				self._condicion.notify_all()
+			self._hilo.join()
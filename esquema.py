@@ -0,0 +1,346 @@
+﻿# esquema.py
+# Esquema del archivo de amigos: la primera línea indica con qué criterios, y en qué orden,
+# se escribieron las puntuaciones, para que editar criterios.txt no cambie en silencio el
+# significado de cada columna. Cuando los criterios cambian, una migración reescribe el
+# archivo línea por línea, con memoria constante: renombra, reordena, agrega (con una
+# puntuación por defecto) o descarta criterios.
+#
+# La línea de esquema es "#esquema " seguido de un objeto JSON (solo caracteres ASCII):
+#   #esquema {"formato": 1, "revision": 2, "siguiente": 57, "criterios": ["Empatía y Calidez", ...]}
+# 'revision' aumenta con cada migración. 'siguiente' es el menor id que todavía no se usó:
+# así los ids de los amigos eliminados no se vuelven a asignar en otra sesión. Un archivo sin
+# esa línea (anterior a este formato) se interpreta con los criterios actuales, como siempre,
+# y la recibe al guardarse; pero si la cantidad de campos de sus líneas no corresponde a esos
+# criterios, no se carga: hay que indicar con cuáles se escribió (cli.py migrar --desde).
+
+import os
+from collections import namedtuple
+from itertools import count
+from amigo import CRITERIOS_POR_DEFECTO, Amigo
+from carga_paralela import ErrorLinea
+from categorias import clasificador_por_defecto
+from diario import Diario, recorrer_rangos
+from instrumentacion import registrar_escritura, registrar_lectura
+
+PREFIJO = "#esquema "
+FORMATO = 1
+
+# Criterios de un archivo de amigos, en el orden de sus columnas, número de migraciones y
+# menor id sin usar.
+Esquema = namedtuple('Esquema', ['criterios', 'revision', 'siguiente'], defaults=(0,))
+
+def linea_esquema(criterios, revision=0, siguiente=0):
+	"""Línea de esquema (sin el salto de línea) para un archivo con esos criterios."""
+	# json se importa aquí, como en instrumentacion.py, para no demorar el arranque de cli.py.
+	import json
+	return PREFIJO + json.dumps({'formato': FORMATO, 'revision': revision, 'siguiente': siguiente,
+								 'criterios': list(criterios)})
+
+def interpretar_esquema(linea):
+	"""
+	Devuelve el Esquema de una línea de esquema, o None si la línea no lo es (la primera línea
+	de un archivo sin esquema es un amigo). ValueError si la línea está dañada o es de un
+	formato posterior.
+	"""
+	if not linea.startswith(PREFIJO):
+		return None
+	import json
+	try:
+		datos = json.loads(linea[len(PREFIJO):])
+		formato, criterios = datos['formato'], datos['criterios']
+		revision, siguiente = datos.get('revision', 0), datos.get('siguiente', 0)
+	except (ValueError, KeyError, TypeError):
+		raise ValueError("La línea de esquema del archivo de amigos no es válida.")
+	if formato != FORMATO:
+		raise ValueError(f"Formato de archivo de amigos no soportado: {formato}.")
+	if not isinstance(criterios, list) or not all(isinstance(criterio, str) for criterio in criterios) \
+			or not isinstance(revision, int) or not isinstance(siguiente, int) or siguiente < 0:
+		raise ValueError("La línea de esquema del archivo de amigos no es válida.")
+	return Esquema(criterios, revision, siguiente)
+
+def leer_esquema(nombre_archivo):
+	"""
+	Devuelve (esquema, bytes que ocupa su línea) leyendo solo la primera línea del archivo;
+	(None, 0) si el archivo no existe o no tiene línea de esquema.
+	"""
+	try:
+		with open(nombre_archivo, 'rb') as archivo:
+			primera = archivo.readline()
+	except FileNotFoundError:
+		return None, 0
+	esquema = interpretar_esquema(primera.decode('latin-1').rstrip('\r\n'))
+	return esquema, len(primera) if esquema is not None else 0
+
+def verificar_esquema(esquema, criterios, nombre_archivo):
+	"""ValueError si el archivo tiene esquema y sus criterios no son 'criterios' (en ese orden)."""
+	if esquema is not None and esquema.criterios != list(criterios):
+		raise ValueError(f"Los criterios de '{nombre_archivo}' no coinciden con los actuales: "
+						 "hay que migrar el archivo (python cli.py migrar).")
+
+# Líneas de un archivo sin esquema que se examinan para saber si corresponden a los criterios.
+LINEAS_MUESTRA = 20
+
+def _muestra_sin_esquema(nombre_archivo):
+	"""
+	Primeras LINEAS_MUESTRA líneas no vacías de un archivo sin línea de esquema; lista vacía
+	si el archivo no existe, está vacío o tiene esquema.
+	"""
+	muestra = []
+	try:
+		with open(nombre_archivo, 'r', encoding='latin-1') as archivo:
+			for numero, linea in enumerate(archivo, 1):
+				if numero == 1 and interpretar_esquema(linea.rstrip('\r\n')) is not None:
+					return []
+				if linea.strip():
+					muestra.append(linea)
+					if len(muestra) == LINEAS_MUESTRA:
+						break
+	except FileNotFoundError:
+		pass
+	return muestra
+
+def corresponde_sin_esquema(nombre_archivo, criterios):
+	"""
+	Un archivo sin línea de esquema no dice con qué criterios se escribió: indica si alguna de
+	sus primeras líneas describe un amigo con 'criterios' (una línea dañada no alcanza para
+	rechazar el archivo). No basta con contar campos: con un criterio más, una línea
+	"nombre,p1..pN,M,Categoría" tiene los campos de "nombre,p1..pN+1,MCategoría". True también
+	si el archivo tiene esquema, no existe o está vacío.
+	"""
+	muestra = _muestra_sin_esquema(nombre_archivo)
+	return not muestra or any(_interpretar(linea, len(criterios)) is not None for linea in muestra)
+
+def verificar_sin_esquema(nombre_archivo, criterios):
+	"""
+	ValueError si el archivo no tiene esquema y sus líneas no corresponden a 'criterios' (ver
+	corresponde_sin_esquema): interpretarlas con ellos las daría a todas por inválidas.
+	"""
+	if corresponde_sin_esquema(nombre_archivo, criterios):
+		return
+	mensaje = (f"'{nombre_archivo}' no indica con qué criterios se escribió, y sus líneas no corresponden "
+			   f"a los {len(criterios)} criterios actuales. Indique los criterios con que se escribió con "
+			   "'python cli.py migrar --desde criterios_anteriores.txt'")
+	if corresponde_sin_esquema(nombre_archivo, CRITERIOS_POR_DEFECTO):
+		mensaje += " (si son los criterios de ejemplo, basta con 'python cli.py migrar')"
+	raise ValueError(mensaje + ".")
+
+def lineas_de_amigos(nombre_archivo, criterios):
+	"""
+	Genera (número de línea, línea) de cada amigo de un archivo de texto, sin la línea de
+	esquema. ValueError, antes de la primera línea, si el archivo tiene otros criterios o, sin
+	esquema, si sus líneas no corresponden a 'criterios' (ver verificar_sin_esquema).
+	"""
+	with open(nombre_archivo, 'r', encoding='latin-1') as archivo:
+		for numero, linea in enumerate(archivo, 1):
+			if numero == 1:
+				esquema = interpretar_esquema(linea.rstrip('\r\n'))
+				if esquema is not None:
+					verificar_esquema(esquema, criterios, nombre_archivo)
+					continue
+				verificar_sin_esquema(nombre_archivo, criterios)
+			yield numero, linea
+
+
+class Migracion:
+	"""
+	Cómo pasar las puntuaciones de unos criterios ('anteriores') a otros ('nuevos'). Cada
+	criterio nuevo toma la puntuación del anterior con el mismo nombre o del que se renombra
+	a él; si no hay ninguno, es un criterio agregado y recibe una puntuación por defecto. Los
+	criterios anteriores que no pasan a ninguno nuevo se descartan, pero solo si se indican
+	en 'descartar': así ninguna puntuación se pierde por un error al editar criterios.txt.
+	"""
+	def __init__(self, anteriores, nuevos, renombrar=None, por_defecto=0, descartar=()):
+		"""
+		:param renombrar: Diccionario {criterio anterior: criterio nuevo}.
+		:param por_defecto: Puntuación de los criterios agregados: un número para todos o un
+		                    diccionario {criterio agregado: puntuación} (los que falten, 0).
+		:param descartar: Criterios anteriores cuyas puntuaciones pueden perderse.
+		ValueError si la migración no es coherente o perdería puntuaciones sin indicarlo.
+		"""
+		self.anteriores = list(anteriores)
+		self.nuevos = list(nuevos)
+		renombrar = dict(renombrar or {})
+		descartar = set(descartar)
+		if len(set(self.anteriores)) != len(self.anteriores) or len(set(self.nuevos)) != len(self.nuevos):
+			raise ValueError("Hay criterios repetidos.")
+		for criterio in list(renombrar) + list(descartar):
+			if criterio not in self.anteriores:
+				raise ValueError(f"El archivo no tiene el criterio {criterio!r}.")
+		for criterio in renombrar.values():
+			if criterio not in self.nuevos:
+				raise ValueError(f"{criterio!r} no está entre los criterios nuevos.")
+		origen = {nuevo: anterior for anterior, nuevo in renombrar.items()}
+		if len(origen) != len(renombrar):
+			raise ValueError("Hay dos criterios renombrados con el mismo nombre nuevo.")
+		posiciones = {criterio: i for i, criterio in enumerate(self.anteriores)}
+		# Posición en los criterios anteriores de la que sale cada criterio nuevo (None: agregado).
+		self.origenes = []
+		for criterio in self.nuevos:
+			if criterio in origen:
+				self.origenes.append(posiciones[origen[criterio]])
+			elif criterio in posiciones and criterio not in renombrar:
+				self.origenes.append(posiciones[criterio])
+			else:
+				self.origenes.append(None)
+		usados = set(self.origenes)
+		self.descartados = [criterio for i, criterio in enumerate(self.anteriores) if i not in usados]
+		perdidos = [criterio for criterio in self.descartados if criterio not in descartar]
+		if perdidos:
+			raise ValueError(f"Se perderían las puntuaciones de {', '.join(map(repr, perdidos))}: "
+							 "renómbrelos a un criterio nuevo o indique que se descartan.")
+		self.renombrados = list(renombrar.items())
+		self.agregados = [criterio for criterio, i in zip(self.nuevos, self.origenes) if i is None]
+		if isinstance(por_defecto, dict):
+			for criterio in por_defecto:
+				if criterio not in self.agregados:
+					raise ValueError(f"{criterio!r} no es un criterio agregado.")
+			self.por_defecto = [por_defecto.get(criterio, 0) for criterio in self.nuevos]
+		else:
+			self.por_defecto = [por_defecto] * len(self.nuevos)
+		if not all(isinstance(valor, int) and 0 <= valor <= 10 for valor in self.por_defecto):
+			raise ValueError("La puntuación por defecto debe ser un entero entre 0 y 10.")
+
+	@property
+	def sin_cambios(self):
+		"""True si los criterios nuevos son los anteriores, en el mismo orden."""
+		return self.nuevos == self.anteriores
+
+	def aplicar(self, puntuaciones):
+		"""Puntuaciones en el orden de los criterios nuevos, a partir de las de los anteriores."""
+		return [puntuaciones[i] if i is not None else valor for i, valor in zip(self.origenes, self.por_defecto)]
+
+	def describir(self):
+		"""Lista de frases que resumen la migración, para mostrarlas antes de aplicarla."""
+		frases = [f"Se renombra {anterior!r} a {nuevo!r}." for anterior, nuevo in self.renombrados]
+		frases += [f"Se agrega {criterio!r} con puntuación {valor}."
+				   for criterio, i, valor in zip(self.nuevos, self.origenes, self.por_defecto) if i is None]
+		frases += [f"Se descarta {criterio!r}." for criterio in self.descartados]
+		conservados = [i for i in self.origenes if i is not None]
+		if conservados != sorted(conservados):
+			frases.append("Cambia el orden de los criterios.")
+		return frases
+
+
+def _interpretar(linea, num_preg):
+	"""(nombre, puntuaciones, género) de una línea, o None si no describe un amigo válido."""
+	try:
+		nombre, puntuaciones, genero, _ = Amigo.parsear_linea(linea, num_preg)
+	except ValueError:
+		return None
+	if not all(0 <= valor <= 255 for valor in puntuaciones):
+		return None
+	return nombre.strip(), puntuaciones, "F" if genero == "F" else "M"
+
+def _contar_lineas(nombre_archivo):
+	cantidad = 0
+	if os.path.exists(nombre_archivo):
+		with open(nombre_archivo, 'rb') as archivo:
+			for bloque in iter(lambda: archivo.read(1024 * 1024), b''):
+				cantidad += bloque.count(b'\n')
+	return cantidad + 1
+
+def migrar_archivo(nombre_archivo, migracion, clasificador=None, errores=None):
+	"""
+	Reescribe el archivo de amigos con los criterios nuevos de 'migracion', línea por línea y
+	con memoria constante (sin cargar el círculo). Los cambios pendientes del diario se
+	incorporan al archivo, así que los ids de los amigos no cambian. La categoría de cada
+	amigo se recalcula con 'clasificador' (por defecto, el de los umbrales de siempre).
+	Las líneas que no describen un amigo se anotan como ErrorLinea en 'errores', si se pasa, y
+	se conservan tal cual al final del archivo, como al guardar. Las que con los criterios
+	nuevos sí describirían un amigo (con puntuaciones que no son suyas) se apartan, también
+	tal cual, en '<archivo>.rechazadas'. Nunca se pierde una línea; se informa cuántas quedaron
+	en cada lugar. Un archivo sin esquema se interpreta con los criterios anteriores
+	(ValueError si sus líneas no corresponden a ellos).
+	Se escribe un archivo temporal que luego reemplaza al original, como al guardar.
+	Devuelve la cantidad de amigos escritos.
+	"""
+	esquema, _ = leer_esquema(nombre_archivo)
+	if esquema is not None and esquema.criterios != migracion.anteriores:
+		raise ValueError(f"'{nombre_archivo}' no tiene los criterios de los que parte la migración.")
+	if esquema is None:
+		verificar_sin_esquema(nombre_archivo, migracion.anteriores)
+	if clasificador is None:
+		clasificador = clasificador_por_defecto(len(migracion.nuevos))
+	num_preg = len(migracion.anteriores)
+	diario = Diario(nombre_archivo + '.diario', nombre_archivo)
+	rangos, reemplazos, altas = diario.pendientes(lambda linea: _interpretar(linea, num_preg) is not None)
+	ids = recorrer_rangos(rangos) if rangos else count()
+	# Los ids se asignan mientras se escribe, después de la línea de esquema: se guarda una
+	# cota del siguiente id que no lo subestima (sin registro "I", cada línea recibe a lo sumo
+	# un id nuevo, así que la cantidad de líneas alcanza).
+	siguiente = max(esquema.siguiente if esquema is not None else 0, diario.id_maximo + 1,
+					int(rangos.rpartition('-')[2]) + 1 if rangos else _contar_lineas(nombre_archivo))
+	# Ids escritos, como rangos [inicio, fin]: ocupan según la cantidad de huecos, no de amigos.
+	escritos = []
+	invalidas = []
+	apartadas = []
+
+	def escribir(archivo, id_amigo, datos):
+		nombre, puntuaciones, genero = datos
+		puntuaciones = migracion.aplicar(puntuaciones)
+		categoria = clasificador.por_total[sum(puntuaciones)]
+		archivo.write(Amigo.formatear_linea(nombre, puntuaciones, genero, categoria) + '\n')
+		if escritos and escritos[-1][1] == id_amigo - 1:
+			escritos[-1][1] = id_amigo
+		else:
+			escritos.append([id_amigo, id_amigo])
+
+	temporal = nombre_archivo + '.tmp'
+	try:
+		with open(temporal, 'w', encoding='latin-1') as salida:
+			salida.write(linea_esquema(migracion.nuevos, esquema.revision + 1 if esquema is not None else 1, siguiente) + '\n')
+			if os.path.exists(nombre_archivo):
+				registrar_lectura(nombre_archivo, os.path.getsize(nombre_archivo))
+				with open(nombre_archivo, 'r', encoding='latin-1') as entrada:
+					for numero, linea in enumerate(entrada, 1):
+						if numero == 1 and esquema is not None:
+							continue
+						datos = _interpretar(linea, num_preg)
+						if datos is None:
+							if errores is not None:
+								errores.append(ErrorLinea(numero, "La línea no describe un amigo válido.", linea.rstrip('\r\n')))
+							if _interpretar(linea, len(migracion.nuevos)) is not None:
+								# Al final del archivo migrado se leería como un amigo.
+								apartadas.append(linea.rstrip('\r\n'))
+							elif linea.strip():
+								invalidas.append(linea.rstrip('\r\n'))
+							continue
+						# Como al cargar, solo las líneas válidas reciben id.
+						id_amigo = next(ids, None)
+						if id_amigo is None:
+							raise ValueError("La lista de ids del diario no coincide con el archivo de amigos.")
+						if id_amigo in reemplazos:
+							linea = reemplazos[id_amigo]
+							if linea is None:
+								continue
+							datos = _interpretar(linea, num_preg)
+						escribir(salida, id_amigo, datos)
+			if rangos and next(ids, None) is not None:
+				raise ValueError("La lista de ids del diario no coincide con el archivo de amigos.")
+			for id_amigo, linea in altas.items():
+				escribir(salida, id_amigo, _interpretar(linea, num_preg))
+			salida.writelines(linea + '\n' for linea in invalidas)
+			salida.flush()
+			os.fsync(salida.fileno())
+			registrar_escritura(nombre_archivo, salida.tell())
+		if apartadas:
+			# Antes de reemplazar el archivo: si algo falla, a lo sumo quedan en los dos.
+			with open(nombre_archivo + '.rechazadas', 'a', encoding='latin-1') as rechazadas:
+				rechazadas.writelines(linea + '\n' for linea in apartadas)
+				rechazadas.flush()
+				os.fsync(rechazadas.fileno())
+	except BaseException:
+		# Una migración interrumpida deja el archivo original intacto.
+		if os.path.exists(temporal):
+			os.remove(temporal)
+		raise
+	os.replace(temporal, nombre_archivo)
+	if invalidas:
+		print(f"{len(invalidas)} líneas de '{nombre_archivo}' no describen un amigo válido; "
+			  "se conservan sin cambios al final del archivo.")
+	if apartadas:
+		print(f"{len(apartadas)} líneas de '{nombre_archivo}' no describían un amigo válido y con los criterios "
+			  f"nuevos parecerían uno; se apartaron en '{nombre_archivo}.rechazadas'.")
+	# El diario ya está en el archivo; si los ids no son 0, 1, 2..., el diario nuevo los conserva.
+	diario.vaciar(id_amigo for inicio, fin in escritos for id_amigo in range(inicio, fin + 1))
+	return sum(fin - inicio + 1 for inicio, fin in escritos)
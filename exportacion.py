@@ -0,0 +1,242 @@
+﻿# exportacion.py
+# Exportación del círculo, o del resultado de una consulta, a CSV, JSON Lines o un informe
+# HTML con el estilo de ayuda.html. Sin dependencias de wx: la usan tanto main.py como cli.py.
+#
+# Los amigos se escriben por lotes: cada lote se arma como texto y se escribe de una vez en
+# un archivo con búfer, así que la memoria usada depende del tamaño del lote y no del
+# círculo. Entre lotes se informa el progreso y se puede cancelar.
+#
+# Para exportar en otro hilo mientras el círculo puede cambiar (la interfaz), se toma antes,
+# en el hilo del círculo, una copia de los datos con filas(): el hilo de exportación solo
+# lee esas filas y nunca los amigos ni la tabla de puntuaciones.
+
+import csv
+import os
+import time
+from collections import namedtuple
+from html import escape
+from instrumentacion import registrar_escritura
+
+# Formato de cada extensión de archivo.
+FORMATOS = {'.csv': 'csv', '.jsonl': 'jsonl', '.html': 'html', '.htm': 'html'}
+# Amigos por lote: entre lotes se llama a progreso() y se consulta cancelar().
+TAMANO_LOTE = 5000
+# Búfer del archivo de salida.
+TAMANO_BUFER = 1024 * 1024
+
+# Estilo de ayuda.html, más el de la tabla del informe.
+_ESTILO = """        body {
+            font-family: Arial, sans-serif;
+            line-height: 1.6;
+            margin: 20px;
+            padding: 20px;
+            background-color: #f4f4f4;
+        }
+        h1, h2 {
+            color: #333;
+        }
+        .container {
+            max-width: 1100px;
+            margin: auto;
+            background: white;
+            padding: 20px;
+            border-radius: 8px;
+            box-shadow: 0 0 10px rgba(0, 0, 0, 0.1);
+        }
+        .tabla {
+            overflow-x: auto;
+        }
+        table {
+            border-collapse: collapse;
+            width: 100%;
+        }
+        th, td {
+            padding: 4px 8px;
+            border-bottom: 1px solid #ddd;
+            text-align: left;
+        }
+        th {
+            background: #0070ba;
+            color: white;
+        }
+        td.numero {
+            text-align: right;
+        }"""
+
+def formato_de(destino):
+	"""Devuelve el formato ('csv', 'jsonl' o 'html') según la extensión de 'destino'; ValueError si no es ninguno."""
+	formato = FORMATOS.get(os.path.splitext(destino)[1].lower())
+	if formato is None:
+		raise ValueError(f"No se puede exportar a '{destino}': use la extensión .csv, .jsonl o .html.")
+	return formato
+
+# Datos de un amigo que se exportan, copiados del círculo.
+Fila = namedtuple('Fila', ['id', 'nombre', 'genero', 'categoria', 'total', 'puntuaciones'])
+
+def _fila(amigo):
+	return Fila(amigo.id, amigo.nombre, amigo.genero, amigo.categoria, amigo.puntuacion_total(),
+				amigo._tabla.valores(amigo._fila))
+
+def filas(amigos):
+	"""
+	Copia los datos de los amigos, en el mismo orden, para exportarlos desde otro hilo sin
+	leer el círculo mientras cambia. Debe llamarse en el hilo que modifica el círculo.
+	"""
+	return [_fila(amigo) for amigo in amigos]
+
+def _lotes(amigos, tamano):
+	"""
+	Agrupa los amigos, como Fila, en listas de hasta 'tamano' (solo se conserva un lote a la
+	vez). Los que ya son Fila se usan tal cual.
+	"""
+	lote = []
+	for amigo in amigos:
+		lote.append(amigo if isinstance(amigo, Fila) else _fila(amigo))
+		if len(lote) == tamano:
+			yield lote
+			lote = []
+	if lote:
+		yield lote
+
+class _EscritorCsv:
+	"""Una fila por amigo, con una columna por criterio. Lleva BOM para que las hojas de
+	cálculo reconozcan UTF-8."""
+	codificacion = 'utf-8-sig'
+
+	def __init__(self, archivo, criterios, titulo):
+		self.escritor = csv.writer(archivo)
+		self.escritor.writerow(["id", "nombre", "genero", "categoria", "total"] + list(criterios))
+
+	def lote(self, filas):
+		self.escritor.writerows([fila.id, fila.nombre, fila.genero, fila.categoria, fila.total]
+								+ list(fila.puntuaciones) for fila in filas)
+
+	def fin(self, cantidad):
+		pass
+
+
+class _EscritorJsonl:
+	"""Un objeto JSON por línea y por amigo, con sus puntuaciones por criterio."""
+	codificacion = 'utf-8'
+
+	def __init__(self, archivo, criterios, titulo):
+		# json se importa aquí, como en instrumentacion.py, para no demorar el arranque.
+		import json
+		self.archivo = archivo
+		self.codificar = json.JSONEncoder(ensure_ascii=False).encode
+		# Las claves de las puntuaciones son siempre las mismas: se codifican una sola vez y
+		# cada línea se arma con texto, sin crear un diccionario por amigo.
+		self.claves = [self.codificar(criterio) + ": " for criterio in criterios]
+
+	def lote(self, filas):
+		codificar = self.codificar
+		claves = self.claves
+		self.archivo.write(''.join(
+			f'{{"id": {"null" if fila.id is None else fila.id}, "nombre": {codificar(fila.nombre)}, '
+			f'"genero": {codificar(fila.genero)}, "categoria": {codificar(fila.categoria)}, '
+			f'"total": {fila.total}, "puntuaciones": {{'
+			+ ", ".join([clave + str(valor) for clave, valor in zip(claves, fila.puntuaciones)])
+			+ "}}\n" for fila in filas))
+
+	def fin(self, cantidad):
+		pass
+
+
+class _EscritorHtml:
+	"""Página independiente con el estilo de ayuda.html y una tabla con una fila por amigo."""
+	codificacion = 'utf-8'
+
+	def __init__(self, archivo, criterios, titulo):
+		self.archivo = archivo
+		columnas = ''.join(f"<th>{escape(criterio)}</th>" for criterio in criterios)
+		archivo.write(f"""<!DOCTYPE html>
+<html lang="es">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{escape(titulo)} - Gestión de Amistades</title>
+    <style>
+{_ESTILO}
+    </style>
+</head>
+<body>
+
+    <div class="container">
+        <h1>{escape(titulo)}</h1>
+        <h2>Gestión de Amistades</h2>
+        <p>Exportado el {time.strftime("%d/%m/%Y a las %H:%M")}.</p>
+        <div class="tabla">
+        <table>
+            <tr><th>Id</th><th>Nombre</th><th>Género</th><th>Categoría</th><th>Total</th>{columnas}</tr>
+""")
+
+	def lote(self, filas):
+		self.archivo.write(''.join(
+			f"            <tr><td class=\"numero\">{'' if fila.id is None else fila.id}</td>"
+			f"<td>{escape(fila.nombre)}</td><td>{'Mujer' if fila.genero == 'F' else 'Hombre'}</td>"
+			f"<td>{escape(fila.categoria)}</td><td class=\"numero\">{fila.total}</td>"
+			+ ''.join(f"<td class=\"numero\">{valor}</td>" for valor in fila.puntuaciones)
+			+ "</tr>\n" for fila in filas))
+
+	def fin(self, cantidad):
+		self.archivo.write(f"""        </table>
+        </div>
+        <p>{cantidad} amigos.</p>
+    </div>
+
+</body>
+</html>
+""")
+
+
+_ESCRITORES = {'csv': _EscritorCsv, 'jsonl': _EscritorJsonl, 'html': _EscritorHtml}
+
+def exportar(amigos, criterios, destino, formato=None, titulo="Círculo de Amistades", total=None,
+			 progreso=None, cancelar=None, tamano_lote=TAMANO_LOTE):
+	"""
+	Escribe los amigos en 'destino', en el orden en que se reciben.
+	:param amigos: Cualquier iterable de amigos: CirculoAmistad.ranking(), una Consulta ya
+	               filtrada y ordenada, o flujo_amigos.iter_amigos() para exportar un archivo
+	               sin cargar el círculo. Desde otro hilo, las filas() copiadas antes.
+	:param criterios: Criterios del círculo, en el orden de las puntuaciones.
+	:param formato: 'csv', 'jsonl' o 'html'; por defecto, según la extensión de 'destino'.
+	:param titulo: Título del informe HTML.
+	:param total: Cantidad de amigos esperada, solo para informar el progreso (None si se desconoce).
+	:param progreso: Función progreso(escritos, total) que se llama después de cada lote.
+	:param cancelar: Función sin argumentos que se consulta antes de cada lote; si devuelve
+	                 True, se descarta lo escrito y se devuelve None.
+	Se escribe un archivo temporal que reemplaza a 'destino' al terminar, así que una
+	exportación interrumpida o cancelada no deja un archivo a medias.
+	Devuelve la cantidad de amigos exportados.
+	"""
+	if formato is None:
+		formato = formato_de(destino)
+	if formato not in _ESCRITORES:
+		raise ValueError(f"Formato de exportación desconocido: {formato!r}.")
+	clase = _ESCRITORES[formato]
+	temporal = destino + '.tmp'
+	cantidad = 0
+	cancelada = False
+	try:
+		with open(temporal, 'w', encoding=clase.codificacion, newline='', buffering=TAMANO_BUFER) as archivo:
+			escritor = clase(archivo, criterios, titulo)
+			for lote in _lotes(amigos, tamano_lote):
+				if cancelar is not None and cancelar():
+					cancelada = True
+					break
+				escritor.lote(lote)
+				cantidad += len(lote)
+				if progreso is not None:
+					progreso(cantidad, total)
+			if not cancelada:
+				escritor.fin(cantidad)
+				registrar_escritura(destino, archivo.tell())
+		if cancelada:
+			os.remove(temporal)
+			return None
+	except BaseException:
+		if os.path.exists(temporal):
+			os.remove(temporal)
+		raise
+	os.replace(temporal, destino)
+	return cantidad
@@ -0,0 +1,55 @@
+﻿# flujo_amigos.py
+# Lectura en flujo del archivo de amigos, para reportes y tareas por lotes que no
+# necesitan cargar el círculo completo en memoria.
+
+import heapq
+import os
+from collections import Counter
+from amigo import Amigo
+from esquema import lineas_de_amigos
+from tabla_puntuaciones import TablaPuntuaciones
+
+def iter_amigos(nombre_archivo, criterios, errores=None):
+	"""
+	Genera los amigos del archivo uno a uno, usando Amigo.from_line.
+	Cada amigo tiene su propia tabla de puntuaciones, así que la memoria usada no depende
+	del tamaño del archivo sino de cuántos amigos conserve quien consume el generador.
+	Las líneas con errores se omiten: si se pasa una lista 'errores', se anota en ella
+	(número de línea, mensaje); si no, se informa por pantalla como en cargar_amigos().
+	No incluye los cambios pendientes en el diario; para eso, cerrar antes el círculo.
+	ValueError si el archivo se escribió con otros criterios (ver esquema.py).
+	"""
+	if not os.path.exists(nombre_archivo):
+		return
+	posiciones = TablaPuntuaciones(criterios).posiciones
+	for numero, linea in lineas_de_amigos(nombre_archivo, criterios):
+		try:
+			yield Amigo.from_line(linea, criterios, TablaPuntuaciones(criterios, posiciones))
+		except ValueError as e:
+			if errores is None:
+				print(f"Error al procesar una línea: {e}")
+			else:
+				errores.append((numero, str(e)))
+
+def filtrar_genero(amigos, genero):
+	"""Genera sólo los amigos del género indicado ('M' o 'F')."""
+	return (amigo for amigo in amigos if amigo.genero == genero)
+
+def filtrar_categoria(amigos, categoria):
+	"""Genera sólo los amigos de la categoría indicada."""
+	return (amigo for amigo in amigos if amigo.categoria == categoria)
+
+def contar_por_categoria(amigos):
+	"""Devuelve un Counter {categoría: cantidad} recorriendo los amigos una sola vez."""
+	return Counter(amigo.categoria for amigo in amigos)
+
+def contar_por_genero(amigos):
+	"""Devuelve un Counter {género: cantidad} recorriendo los amigos una sola vez."""
+	return Counter(amigo.genero for amigo in amigos)
+
+def top_k(amigos, k):
+	"""
+	Devuelve los k amigos con mayor puntuación total, conservando en memoria sólo k a la vez.
+	Los empates se resuelven por orden de aparición, igual que el ranking del círculo.
+	"""
+	return heapq.nlargest(k, amigos, key=Amigo.puntuacion_total)
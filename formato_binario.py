@@ -0,0 +1,307 @@
+﻿# formato_binario.py
+# Formato binario de registros de ancho fijo para el círculo de amistades, leído con mmap.
+#
+# Estructura del archivo (little-endian):
+#  - Encabezado: firma b'AMGB', versión, cantidad de criterios, cantidad de registros,
+#    capacidad de registros, inicio de los registros, inicio y tamaño del área de nombres.
+#  - Esquema: los criterios (en orden) y la tabla de categorías, como cadenas UTF-8
+#    precedidas por su longitud.
+#  - Registros: 'capacidad' registros de ancho fijo. Cada uno tiene el desplazamiento y la
+#    longitud de su nombre en el área de nombres, un byte por puntuación, el código de
+#    género (0 = 'M', 1 = 'F') y el código de categoría (posición en la tabla de categorías).
+#  - Área de nombres: nombres en UTF-8. Al escribir el archivo, los nombres repetidos se
+#    guardan una sola vez; los renombres y altas posteriores se agregan al final.
+
+import mmap
+import os
+import struct
+from amigo import Amigo
+from esquema import leer_esquema, lineas_de_amigos, linea_esquema, verificar_esquema
+
+FIRMA = b'AMGB'
+VERSION = 1
+ENCABEZADO = struct.Struct('<4sHHIIIII')
+GENEROS = ("M", "F")
+CATEGORIAS = ["Súper Amigo", "Primario", "Secundario", "Terciario", "Ocasional", "Conocido", "Desconocido"]
+# Bytes reservados tras el esquema para la tabla de categorías, que puede crecer al convertir.
+RESERVA_CATEGORIAS = 4096
+
+def _formato_registro(num_criterios):
+	return struct.Struct(f'<IH{num_criterios}sBB')
+
+def cadenas_a_bytes(cadenas, formato_longitud):
+	"""
+	Codifica cadenas en UTF-8, cada una precedida por su longitud en bytes empaquetada con
+	'formato_longitud' (un formato de struct, como '<H'). Las usan este formato y el historial.
+	"""
+	datos = bytearray()
+	for cadena in cadenas:
+		codificada = cadena.encode('utf-8')
+		datos += struct.pack(formato_longitud, len(codificada)) + codificada
+	return bytes(datos)
+
+def leer_cadenas(datos, posicion, cantidad, formato_longitud):
+	"""
+	Lee 'cantidad' cadenas escritas por cadenas_a_bytes() a partir de 'posicion' y devuelve
+	(cadenas, posición siguiente). struct.error o UnicodeDecodeError si los datos no alcanzan
+	o no son UTF-8.
+	"""
+	tamano = struct.calcsize(formato_longitud)
+	cadenas = []
+	for _ in range(cantidad):
+		(longitud,) = struct.unpack_from(formato_longitud, datos, posicion)
+		posicion += tamano
+		cadenas.append(bytes(datos[posicion:posicion + longitud]).decode('utf-8'))
+		posicion += longitud
+	return cadenas, posicion
+
+
+class ArchivoBinario:
+	"""
+	Acceso a un archivo en formato binario mediante mmap: abrirlo no requiere leerlo completo,
+	y cada registro se puede leer o modificar en su lugar.
+	"""
+	def __init__(self, nombre_archivo, escritura=False):
+		self.nombre_archivo = nombre_archivo
+		self.escritura = escritura
+		self._archivo = open(nombre_archivo, 'r+b' if escritura else 'rb')
+		self._abrir_mapa()
+
+	def _abrir_mapa(self):
+		acceso = mmap.ACCESS_WRITE if self.escritura else mmap.ACCESS_READ
+		self._mapa = mmap.mmap(self._archivo.fileno(), 0, access=acceso)
+		(firma, version, num_criterios, self.cantidad, self.capacidad, self.inicio_registros,
+		 self.inicio_nombres, self.tamano_nombres) = ENCABEZADO.unpack_from(self._mapa, 0)
+		if firma != FIRMA:
+			raise ValueError("El archivo no está en formato binario de amigos.")
+		if version != VERSION:
+			raise ValueError(f"Versión de formato binario no soportada: {version}")
+		self.criterios, posicion = leer_cadenas(self._mapa, ENCABEZADO.size, num_criterios, '<H')
+		(num_categorias,) = struct.unpack_from('<B', self._mapa, posicion)
+		self.categorias, _ = leer_cadenas(self._mapa, posicion + 1, num_categorias, '<B')
+		self.registro = _formato_registro(num_criterios)
+
+	def __len__(self):
+		return self.cantidad
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *_):
+		self.cerrar()
+
+	def _posicion(self, indice):
+		if not 0 <= indice < self.cantidad:
+			raise IndexError(indice)
+		return self.inicio_registros + indice * self.registro.size
+
+	def _nombre(self, desplazamiento, longitud):
+		inicio = self.inicio_nombres + desplazamiento
+		return self._mapa[inicio:inicio + longitud].decode('utf-8')
+
+	def leer(self, indice):
+		"""Devuelve (nombre, puntuaciones, género, categoría) del registro indicado."""
+		desplazamiento, longitud, puntuaciones, genero, categoria = self.registro.unpack_from(self._mapa, self._posicion(indice))
+		return self._nombre(desplazamiento, longitud), list(puntuaciones), GENEROS[genero], self.categorias[categoria]
+
+	def leer_amigo(self, indice, tabla=None):
+		"""Crea un Amigo con los datos del registro indicado."""
+		nombre, puntuaciones, genero, categoria = self.leer(indice)
+		return Amigo(nombre, dict(zip(self.criterios, puntuaciones)), genero, categoria,
+					 criterios=self.criterios, tabla=tabla)
+
+	def __iter__(self):
+		for indice in range(self.cantidad):
+			yield self.leer(indice)
+
+	def cargar_en_tabla(self, tabla):
+		"""
+		Carga todos los registros en una TablaPuntuaciones con los mismos criterios.
+		Cada columna de puntuaciones se copia de una vez desde el mapa; sólo los nombres
+		se decodifican registro por registro. Devuelve la lista de amigos.
+		"""
+		ancho = self.registro.size
+		inicio = self.inicio_registros
+		fin = inicio + self.cantidad * ancho
+		fila = len(tabla)
+		for j, columna in enumerate(tabla.columnas):
+			columna.frombytes(self._mapa[inicio + 6 + j:fin:ancho])
+		amigos = [Amigo._desde_tabla(self._nombre(desplazamiento, longitud), GENEROS[genero], tabla, fila + i)
+				  for i, (desplazamiento, longitud, _, genero, _) in enumerate(self.registro.iter_unpack(self._mapa[inicio:fin]))]
+		tabla.duenos.extend(amigos)
+		return amigos
+
+	def _codigo_categoria(self, categoria):
+		if categoria not in self.categorias:
+			raise ValueError(f"Categoría desconocida para este archivo: {categoria}")
+		return self.categorias.index(categoria)
+
+	def actualizar(self, indice, puntuaciones=None, genero=None, categoria=None, nombre=None):
+		"""
+		Modifica un registro en su lugar. Un nombre nuevo se agrega al final del área de nombres.
+		Requiere haber abierto el archivo con escritura=True.
+		"""
+		posicion = self._posicion(indice)
+		desplazamiento, longitud, actuales, cod_genero, cod_categoria = self.registro.unpack_from(self._mapa, posicion)
+		if puntuaciones is not None:
+			actuales = bytes(puntuaciones)
+		if genero is not None:
+			cod_genero = 1 if genero == "F" else 0
+		if categoria is not None:
+			cod_categoria = self._codigo_categoria(categoria)
+		if nombre is not None:
+			desplazamiento, longitud = self._agregar_nombre(nombre)
+		self.registro.pack_into(self._mapa, posicion, desplazamiento, longitud, actuales, cod_genero, cod_categoria)
+
+	def agregar(self, nombre, puntuaciones, genero, categoria):
+		"""
+		Agrega un registro al final. Si no queda capacidad, el archivo se reescribe con
+		el doble de capacidad. Devuelve el índice del nuevo registro.
+		"""
+		codigo_categoria = self._codigo_categoria(categoria)
+		if self.cantidad == self.capacidad:
+			self._ampliar(max(self.capacidad * 2, 16))
+		desplazamiento, longitud = self._agregar_nombre(nombre)
+		posicion = self.inicio_registros + self.cantidad * self.registro.size
+		self.registro.pack_into(self._mapa, posicion, desplazamiento, longitud, bytes(puntuaciones),
+								1 if genero == "F" else 0, codigo_categoria)
+		self.cantidad += 1
+		self._guardar_encabezado()
+		return self.cantidad - 1
+
+	def _agregar_nombre(self, nombre):
+		codificado = nombre.encode('utf-8')
+		desplazamiento = self.tamano_nombres
+		self._redimensionar(self.inicio_nombres + desplazamiento + len(codificado))
+		inicio = self.inicio_nombres + desplazamiento
+		self._mapa[inicio:inicio + len(codificado)] = codificado
+		self.tamano_nombres += len(codificado)
+		self._guardar_encabezado()
+		return desplazamiento, len(codificado)
+
+	def _redimensionar(self, tamano):
+		if tamano > len(self._mapa):
+			self._mapa.close()
+			self._archivo.truncate(tamano)
+			self._abrir_mapa()
+
+	def _guardar_encabezado(self):
+		ENCABEZADO.pack_into(self._mapa, 0, FIRMA, VERSION, len(self.criterios), self.cantidad, self.capacidad,
+							 self.inicio_registros, self.inicio_nombres, self.tamano_nombres)
+
+	def _ampliar(self, capacidad):
+		"""Reescribe el archivo con más capacidad de registros."""
+		registros = list(self)
+		self.cerrar()
+		escribir_binario(self.nombre_archivo, self.criterios, registros, capacidad=capacidad)
+		self._archivo = open(self.nombre_archivo, 'r+b')
+		self._abrir_mapa()
+
+	def cerrar(self):
+		if self._mapa is not None:
+			if self.escritura:
+				self._mapa.flush()
+			self._mapa.close()
+			self._mapa = None
+		self._archivo.close()
+
+
+def escribir_binario(nombre_archivo, criterios, registros, capacidad=None):
+	"""
+	Escribe un archivo binario a partir de un iterable de (nombre, puntuaciones, género, categoría).
+	Los registros se escriben a medida que llegan; sólo los nombres distintos se conservan
+	en memoria para no repetirlos. 'capacidad' debe ser al menos la cantidad de registros;
+	si no se indica, el iterable se materializa para contarlo.
+	Devuelve la cantidad de registros escritos.
+	"""
+	if capacidad is None:
+		registros = list(registros)
+		capacidad = len(registros)
+	formato = _formato_registro(len(criterios))
+	esquema = cadenas_a_bytes(criterios, '<H')
+	categorias = list(CATEGORIAS)
+	inicio_registros = ENCABEZADO.size + len(esquema) + RESERVA_CATEGORIAS
+	inicio_nombres = inicio_registros + capacidad * formato.size
+	nombres = {}
+	area_nombres = bytearray()
+	escritos = 0
+	temporal = nombre_archivo + '.tmp'
+	with open(temporal, 'wb') as archivo:
+		archivo.seek(inicio_registros)
+		for nombre, puntuaciones, genero, categoria in registros:
+			if escritos == capacidad:
+				raise ValueError("Hay más registros que la capacidad indicada.")
+			if nombre not in nombres:
+				codificado = nombre.encode('utf-8')
+				nombres[nombre] = (len(area_nombres), len(codificado))
+				area_nombres += codificado
+			if categoria not in categorias:
+				categorias.append(categoria)
+				if len(categorias) > 255 or 1 + len(cadenas_a_bytes(categorias, '<B')) > RESERVA_CATEGORIAS:
+					raise ValueError("Demasiadas categorías distintas para el formato binario.")
+			desplazamiento, longitud = nombres[nombre]
+			archivo.write(formato.pack(desplazamiento, longitud, bytes(puntuaciones),
+									   1 if genero == "F" else 0, categorias.index(categoria)))
+			escritos += 1
+		archivo.seek(inicio_nombres)
+		archivo.write(area_nombres)
+		# Asegura que el archivo cubra toda la capacidad aunque queden registros libres.
+		archivo.truncate(inicio_nombres + len(area_nombres))
+		archivo.seek(0)
+		archivo.write(ENCABEZADO.pack(FIRMA, VERSION, len(criterios), escritos, capacidad,
+									  inicio_registros, inicio_nombres, len(area_nombres)))
+		archivo.write(esquema)
+		archivo.write(struct.pack('<B', len(categorias)) + cadenas_a_bytes(categorias, '<B'))
+	os.replace(temporal, nombre_archivo)
+	return escritos
+
+
+def _contar_lineas(nombre_archivo):
+	cantidad = 0
+	with open(nombre_archivo, 'rb') as archivo:
+		for bloque in iter(lambda: archivo.read(1024 * 1024), b''):
+			cantidad += bloque.count(b'\n')
+	return cantidad
+
+
+def texto_a_binario(ruta_texto, ruta_binario, criterios, errores=None):
+	"""
+	Convierte un archivo de amigos en texto al formato binario, leyéndolo línea por línea.
+	Se conservan tal cual el nombre, las puntuaciones y la categoría escrita en el archivo,
+	de modo que binario_a_texto() reproduce las líneas en el formato de Amigo.to_line().
+	Las líneas inválidas se omiten y, si se pasa la lista 'errores', se anotan como (línea, mensaje).
+	ValueError si el archivo de texto se escribió con otros criterios (ver esquema.py).
+	Devuelve la cantidad de amigos convertidos.
+	"""
+	num_preg = len(criterios)
+	# Se verifica antes de crear el archivo binario.
+	verificar_esquema(leer_esquema(ruta_texto)[0], criterios, ruta_texto)
+
+	def registros():
+		for numero, linea in lineas_de_amigos(ruta_texto, criterios):
+			try:
+				nombre, puntuaciones, genero, categoria = Amigo.parsear_linea(linea, num_preg)
+				if not all(0 <= valor <= 255 for valor in puntuaciones):
+					raise ValueError("Las puntuaciones deben estar entre 0 y 255.")
+			except ValueError as e:
+				if errores is not None:
+					errores.append((numero, str(e)))
+				continue
+			yield nombre.strip(), puntuaciones, "F" if genero == "F" else "M", categoria
+
+	# Se cuentan las líneas para reservar la capacidad sin materializar el archivo
+	# (una más por si la última línea no termina en salto de línea).
+	capacidad = _contar_lineas(ruta_texto) + 1
+	return escribir_binario(ruta_binario, criterios, registros(), capacidad=capacidad)
+
+
+def binario_a_texto(ruta_binario, ruta_texto):
+	"""Escribe en formato de texto (Amigo.to_line), con su línea de esquema, todos los registros de un archivo binario."""
+	with ArchivoBinario(ruta_binario) as binario:
+		temporal = ruta_texto + '.tmp'
+		with open(temporal, 'w', encoding='latin-1') as archivo:
+			archivo.write(linea_esquema(binario.criterios) + '\n')
+			for nombre, puntuaciones, genero, categoria in binario:
+				archivo.write(f"{nombre},{','.join(map(str, puntuaciones))},{genero},{categoria}\n")
+		os.replace(temporal, ruta_texto)
+		return len(binario)
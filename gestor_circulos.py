@@ -0,0 +1,254 @@
+﻿# gestor_circulos.py
+# Varios círculos de amistades con nombre (familia, trabajo, internet...), cada uno en su
+# propio archivo. Cada círculo se carga recién cuando se usa, o de a varios a la vez en un
+# grupo de hilos. Las consultas entre círculos (ranking conjunto, búsqueda por nombre,
+# amigos que aparecen en más de un círculo) cargan los círculos que se les indican en
+# 'nombres', o todos si no se indica ninguno: la respuesta depende de cada uno.
+#
+# El círculo "principal" es el archivo de siempre (amigos.txt); los demás son los archivos
+# .txt de la carpeta "circulos", y el nombre de cada círculo es el de su archivo.
+
+import heapq
+import os
+import threading
+from itertools import islice
+from amigo import CRITERIOS_POR_DEFECTO
+from circulo_amistad import CirculoAmistad
+from instrumentacion import medido
+
+PRINCIPAL = "principal"
+CARPETA_CIRCULOS = "circulos"
+
+def descubrir_circulos(carpeta=CARPETA_CIRCULOS, principal='amigos.txt'):
+	"""
+	Devuelve {nombre del círculo: archivo}: el círculo principal y uno por cada archivo .txt
+	de 'carpeta' (si existe), en orden alfabético. No lee ningún archivo.
+	"""
+	archivos = {PRINCIPAL: principal}
+	if os.path.isdir(carpeta):
+		for entrada in sorted(os.listdir(carpeta)):
+			nombre, extension = os.path.splitext(entrada)
+			if extension.lower() == '.txt' and nombre not in archivos:
+				archivos[nombre] = os.path.join(carpeta, entrada)
+	return archivos
+
+def _total_descendente(par):
+	return -par[1].puntuacion_total()
+
+def _etiquetar(nombre, amigos):
+	for amigo in amigos:
+		yield nombre, amigo
+
+
+class _Carga:
+	"""
+	Carga de un círculo en el hilo que lo pidió. Ofrece lo que el gestor usa de
+	concurrent.futures.Future, que solo se importa para cargar en segundo plano: importa
+	logging, que demora el arranque de cli.py.
+	"""
+	def __init__(self):
+		self._terminada = threading.Event()
+		self._circulo = None
+		self._error = None
+
+	def terminar(self, circulo=None, error=None):
+		self._circulo = circulo
+		self._error = error
+		self._terminada.set()
+
+	def done(self):
+		return self._terminada.is_set()
+
+	def exception(self):
+		self._terminada.wait()
+		return self._error
+
+	def result(self):
+		if self.exception() is not None:
+			raise self._error
+		return self._circulo
+
+
+class GestorCirculos:
+	def __init__(self, archivos=None, criterios=None, carpeta=CARPETA_CIRCULOS, hilos=4, **opciones):
+		"""
+		:param archivos: {nombre del círculo: archivo}. Si no se indica, se buscan en 'carpeta'
+		                 (ver descubrir_circulos).
+		:param criterios: Criterios de evaluación, comunes a todos los círculos.
+		:param carpeta: Carpeta donde crear() guarda los círculos nuevos.
+		:param hilos: Cantidad máxima de círculos que se cargan a la vez.
+		:param opciones: Se pasan a cada CirculoAmistad (diario, diferido, procesos...).
+		Ningún círculo se carga al crear el gestor.
+		"""
+		self.carpeta = carpeta
+		self.archivos = dict(archivos) if archivos is not None else descubrir_circulos(carpeta)
+		self.criterios = criterios if criterios is not None else CRITERIOS_POR_DEFECTO
+		self.hilos = hilos
+		self.opciones = opciones
+		# {nombre: Future (o _Carga) con el CirculoAmistad}; un círculo se carga una sola vez
+		# aunque lo pidan varios hilos.
+		self._futuros = {}
+		self._candado = threading.Lock()
+		self._ejecutor = None
+
+	@property
+	def nombres(self):
+		"""Nombres de los círculos, cargados o no."""
+		return list(self.archivos)
+
+	def cargado(self, nombre):
+		"""Indica si el círculo ya terminó de cargarse."""
+		futuro = self._futuros.get(nombre)
+		return futuro is not None and futuro.done() and futuro.exception() is None
+
+	def cargados(self):
+		"""Devuelve {nombre: círculo} de los círculos ya cargados, sin cargar ninguno."""
+		return {nombre: self._futuros[nombre].result() for nombre in self.archivos if self.cargado(nombre)}
+
+	def _abrir(self, nombre):
+		return CirculoAmistad(self.archivos[nombre], self.criterios, **self.opciones)
+
+	def _olvidar_si_fallo(self, nombre, futuro):
+		# Si la carga falló, se descarta para poder reintentarla más adelante.
+		if futuro.exception() is not None:
+			with self._candado:
+				if self._futuros.get(nombre) is futuro:
+					del self._futuros[nombre]
+
+	def _futuro(self, nombre, en_segundo_plano):
+		"""
+		Devuelve (Future del círculo, si el llamador debe cargarlo). Si el círculo no se pidió
+		antes, se encarga al grupo de hilos (en_segundo_plano=True) o al hilo que llama.
+		"""
+		with self._candado:
+			if nombre not in self.archivos:
+				raise KeyError(nombre)
+			futuro = self._futuros.get(nombre)
+			if futuro is not None:
+				return futuro, False
+			if not en_segundo_plano:
+				futuro = self._futuros[nombre] = _Carga()
+				return futuro, True
+			if self._ejecutor is None:
+				from concurrent.futures import ThreadPoolExecutor
+				self._ejecutor = ThreadPoolExecutor(self.hilos, thread_name_prefix="CargaCirculo")
+			futuro = self._futuros[nombre] = self._ejecutor.submit(self._abrir, nombre)
+		futuro.add_done_callback(lambda futuro: self._olvidar_si_fallo(nombre, futuro))
+		return futuro, False
+
+	def circulo(self, nombre=PRINCIPAL):
+		"""
+		Devuelve el círculo con ese nombre. Si todavía no se cargó, se carga en este hilo;
+		si se está cargando en segundo plano, espera a que termine. KeyError si no existe.
+		"""
+		futuro, cargar = self._futuro(nombre, False)
+		if cargar:
+			try:
+				futuro.terminar(self._abrir(nombre))
+			except BaseException as e:
+				futuro.terminar(error=e)
+				self._olvidar_si_fallo(nombre, futuro)
+				raise
+		return futuro.result()
+
+	def cargar_en_segundo_plano(self, nombres=None):
+		"""
+		Empieza a cargar esos círculos (todos si es None) en el grupo de hilos y devuelve
+		{nombre: Future}, sin esperar. Los ya cargados o en curso no se vuelven a cargar.
+		"""
+		nombres = self.nombres if nombres is None else nombres
+		return {nombre: self._futuro(nombre, True)[0] for nombre in nombres}
+
+	@medido
+	def cargar(self, nombres=None):
+		"""
+		Carga esos círculos (todos si es None) a la vez y devuelve {nombre: círculo}.
+		La lectura de los archivos se superpone; el análisis de las líneas sigue compartiendo
+		el intérprete, así que para archivos muy grandes conviene además 'procesos' (ver
+		carga_paralela.py). Si alguna carga falla, se propaga su excepción.
+		"""
+		futuros = self.cargar_en_segundo_plano(nombres)
+		return {nombre: futuro.result() for nombre, futuro in futuros.items()}
+
+	def crear(self, nombre):
+		"""
+		Agrega un círculo vacío llamado 'nombre' en la carpeta de círculos y lo devuelve.
+		El archivo se escribe con el primer cambio. ValueError si el nombre no es válido o ya existe.
+		"""
+		nombre = nombre.strip()
+		if not nombre or nombre in (os.curdir, os.pardir) or any(separador in nombre for separador in '/\\'):
+			raise ValueError(f"Nombre de círculo no válido: {nombre!r}.")
+		with self._candado:
+			if nombre in self.archivos:
+				raise ValueError(f"Ya existe un círculo llamado {nombre!r}.")
+			os.makedirs(self.carpeta, exist_ok=True)
+			self.archivos[nombre] = os.path.join(self.carpeta, nombre + '.txt')
+		return self.circulo(nombre)
+
+	@medido
+	def ranking(self, inicio=0, fin=None, nombres=None):
+		"""
+		Devuelve la porción [inicio:fin] del ranking conjunto de esos círculos (todos si es None),
+		como pares (nombre del círculo, amigo) de mayor a menor total. Se mezclan los índices por
+		totales de cada círculo, sin ordenar todos los amigos juntos; en los empates, primero los
+		del círculo anterior.
+		"""
+		circulos = self.cargar(nombres)
+		recorridos = [_etiquetar(nombre, circulo.indice) for nombre, circulo in circulos.items()]
+		return list(islice(heapq.merge(*recorridos, key=_total_descendente), inicio, fin))
+
+	@medido
+	def buscar_por_nombre(self, nombre, nombres=None):
+		"""
+		Devuelve {nombre del círculo: [amigos]} con los círculos donde hay un amigo con ese
+		nombre (sin distinguir mayúsculas, tildes ni espacios sobrantes).
+		"""
+		encontrados = {}
+		for circulo_nombre, circulo in self.cargar(nombres).items():
+			amigos = circulo.buscar_por_nombre(nombre)
+			if amigos:
+				encontrados[circulo_nombre] = amigos
+		return encontrados
+
+	@medido
+	def en_varios_circulos(self, minimo=2, nombres=None):
+		"""
+		Devuelve {nombre normalizado: [nombres de los círculos]} de los amigos que aparecen en
+		al menos 'minimo' círculos. Compara los índices de nombres de cada círculo, sin recorrer
+		a los amigos.
+		"""
+		circulos_por_nombre = {}
+		for circulo_nombre, circulo in self.cargar(nombres).items():
+			for clave in circulo.nombres.claves():
+				circulos_por_nombre.setdefault(clave, []).append(circulo_nombre)
+		return {clave: circulos for clave, circulos in circulos_por_nombre.items() if len(circulos) >= minimo}
+
+	@medido
+	def reclasificar(self, umbrales=None):
+		"""
+		Cambia los umbrales de las categorías (None: los de siempre) de todos los círculos: los
+		que se carguen después los usan desde el principio, y los ya cargados o en curso se
+		reclasifican (ver CirculoAmistad.reclasificar). Devuelve {nombre: amigos que cambiaron
+		de categoría} de los círculos reclasificados.
+		"""
+		with self._candado:
+			self.opciones['umbrales'] = umbrales
+			nombres = list(self._futuros)
+		return {nombre: circulo.reclasificar(umbrales) for nombre, circulo in self.cargar(nombres).items()}
+
+	def flush(self):
+		"""Espera a que terminen las escrituras pendientes de los círculos cargados."""
+		for circulo in self.cargados().values():
+			circulo.flush()
+
+	def cerrar(self):
+		"""
+		Debe llamarse al salir: espera las cargas en curso y cierra todos los círculos cargados
+		(ver CirculoAmistad.cerrar).
+		"""
+		with self._candado:
+			ejecutor, self._ejecutor = self._ejecutor, None
+		if ejecutor is not None:
+			ejecutor.shutdown(wait=True)
+		for circulo in self.cargados().values():
+			circulo.cerrar()
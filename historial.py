@@ -0,0 +1,613 @@
+﻿# historial.py
+# Historial de las evaluaciones de cada amigo, en un archivo binario aparte al que solo se
+# agregan registros ('<archivo de amigos>.historial'). Cada reevaluación guarda solo los
+# criterios que cambiaron y su diferencia, de modo que años de reevaluaciones de un círculo
+# grande ocupan pocos megabytes.
+#
+# Estructura del archivo:
+#  - Encabezado: firma b'AMGH', versión, un número al azar que identifica al archivo y los
+#    criterios (en orden), como cadenas UTF-8 precedidas por su longitud.
+#  - Registros, uno tras otro. Los enteros tienen longitud variable (7 bits por byte: hasta
+#    127 ocupan un byte). Cada registro empieza con (dato << 2) | tipo:
+#     - MARCA: 'dato' es la fecha en segundos desde 1970. La fecha de los registros que la
+#       siguen se guarda como segundos desde la marca. Se escribe una marca al empezar cada
+#       sesión, cada REGISTROS_POR_MARCA registros y cuando pasaron más de
+#       SEGUNDOS_POR_MARCA desde la anterior.
+#     - ALTA: 'dato' es el id del amigo; siguen la fecha y un byte por puntuación.
+#     - CAMBIO: id y fecha; la distancia en bytes hasta el registro anterior del mismo
+#       amigo; una máscara de bits con los criterios que cambiaron; la diferencia de cada uno
+#       (un byte con signo) y el total resultante, para que las consultas por período no
+#       tengan que reconstruir las puntuaciones.
+#     - BAJA: id, fecha y distancia hasta el registro anterior del amigo.
+#    La distancia encadena los registros de cada amigo hacia atrás, hasta su alta: la
+#    trayectoria de un amigo se lee sin recorrer el resto del archivo. Una reevaluación
+#    típica ocupa entre 8 y 15 bytes.
+#
+# El índice ('<historial>.idx') guarda la posición del último registro de cada amigo y la
+# posición y la fecha de cada marca; se escribe al cerrar. Al abrir el historial solo se
+# recorren los registros posteriores al índice (los anotados por otro programa, como
+# cli.py, o antes de un cierre inesperado). Las fechas nunca retroceden: si el reloj del
+# equipo atrasa, se usa la última fecha anotada.
+#
+# Para anotar, cada programa toma un bloqueo exclusivo ('<historial>.bloqueo') mientras
+# incorpora los registros ajenos y escribe los suyos. Así nadie escribe a la vez, y un
+# registro incompleto al final del archivo solo puede ser de una escritura que se
+# interrumpió: se recorta sin riesgo de borrar lo que otro programa está escribiendo.
+# Con diferido=True (la interfaz gráfica), el bloqueo y la escritura los hace un hilo aparte
+# (ver escritura_diferida.py): anotar() solo encola, y nunca espera a otro programa.
+
+import heapq
+import os
+import struct
+import time
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
+from random import getrandbits
+from categorias import clasificador_por_defecto
+from escritura_diferida import EscritorDiferido
+from formato_binario import cadenas_a_bytes, leer_cadenas
+from instrumentacion import medido, registrar_escritura, registrar_lectura
+
+try:
+	import fcntl
+except ImportError:
+	# Windows
+	fcntl = None
+	import msvcrt
+
+FIRMA = b'AMGH'
+FIRMA_INDICE = b'AMGI'
+VERSION = 1
+# Firma, versión, identificador del archivo y cantidad de criterios.
+ENCABEZADO = struct.Struct('<4sHQH')
+# Firma, versión, identificador del historial, bytes cubiertos, registros, última fecha,
+# cantidad de amigos y cantidad de marcas. Siguen cuatro arreglos de enteros de 8 bytes:
+# ids, posición del último registro de cada uno, posición y fecha de cada marca.
+ENCABEZADO_INDICE = struct.Struct('<4sHQQQqII')
+
+ALTA, CAMBIO, BAJA, MARCA = range(4)
+REGISTROS_POR_MARCA = 1024
+SEGUNDOS_POR_MARCA = 1 << 14
+
+# Estado de un amigo en un momento de su historial; tras una baja, 'puntuaciones' y 'total' son None.
+Evaluacion = namedtuple('Evaluacion', ['fecha', 'puntuaciones', 'total'])
+
+def _anexar_entero(salida, valor):
+	"""Agrega a 'salida' (un bytearray) un entero no negativo de longitud variable."""
+	while valor > 0x7F:
+		salida.append(valor & 0x7F | 0x80)
+		valor >>= 7
+	salida.append(valor)
+
+def _leer_entero(datos, posicion):
+	"""Devuelve (entero, posición siguiente). IndexError si el entero está incompleto."""
+	byte = datos[posicion]
+	posicion += 1
+	if byte < 0x80:
+		return byte, posicion
+	valor = byte & 0x7F
+	desplazamiento = 7
+	while True:
+		byte = datos[posicion]
+		posicion += 1
+		valor |= (byte & 0x7F) << desplazamiento
+		if byte < 0x80:
+			return valor, posicion
+		desplazamiento += 7
+
+# Para cada byte, 1 si representa un número negativo (ver _suma).
+_NEGATIVOS = bytes(byte >> 7 for byte in range(256))
+
+def _suma(diferencias):
+	"""Suma las diferencias de un cambio, guardadas como bytes con signo."""
+	return sum(diferencias) - 256 * diferencias.translate(_NEGATIVOS).count(1)
+
+def _aplicar(valores, mascara, diferencias):
+	"""Suma a 'valores' las diferencias de un cambio, en los criterios marcados en la máscara."""
+	criterio = 0
+	for diferencia in diferencias:
+		while not mascara & 1:
+			mascara >>= 1
+			criterio += 1
+		valores[criterio] += diferencia - 256 if diferencia > 127 else diferencia
+		mascara >>= 1
+		criterio += 1
+
+def _bloquear(archivo):
+	"""Toma el bloqueo exclusivo del archivo abierto 'archivo' (espera a que lo suelte otro programa)."""
+	if fcntl is not None:
+		fcntl.flock(archivo.fileno(), fcntl.LOCK_EX)
+		return
+	archivo.seek(0)
+	while True:
+		try:
+			# LK_LOCK reintenta durante unos 10 segundos antes de fallar.
+			msvcrt.locking(archivo.fileno(), msvcrt.LK_LOCK, 1)
+			return
+		except OSError:
+			pass
+
+def _desbloquear(archivo):
+	if fcntl is not None:
+		fcntl.flock(archivo.fileno(), fcntl.LOCK_UN)
+	else:
+		archivo.seek(0)
+		msvcrt.locking(archivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _decodificar(datos, posicion, num_criterios):
+	"""
+	Decodifica el registro que empieza en 'posicion' y devuelve (tipo, dato, segundos desde
+	la marca, distancia al registro anterior del amigo, carga, posición siguiente). La carga
+	es el bytes con las puntuaciones de un alta, (máscara, diferencias, total) de un cambio,
+	o None. IndexError si el registro está incompleto.
+	"""
+	cabecera, posicion = _leer_entero(datos, posicion)
+	tipo = cabecera & 3
+	if tipo == MARCA:
+		return tipo, cabecera >> 2, 0, 0, None, posicion
+	segundos, posicion = _leer_entero(datos, posicion)
+	if tipo == ALTA:
+		fin = posicion + num_criterios
+		if fin > len(datos):
+			raise IndexError(fin)
+		return tipo, cabecera >> 2, segundos, 0, datos[posicion:fin], fin
+	atras, posicion = _leer_entero(datos, posicion)
+	if tipo == BAJA:
+		return tipo, cabecera >> 2, segundos, atras, None, posicion
+	mascara, posicion = _leer_entero(datos, posicion)
+	fin = posicion + bin(mascara).count("1")
+	total, siguiente = _leer_entero(datos, fin)
+	return tipo, cabecera >> 2, segundos, atras, (mascara, datos[posicion:fin], total), siguiente
+
+
+class Historial:
+	"""
+	Historial de las altas, reevaluaciones y bajas de un círculo (ver el comienzo del módulo).
+	El archivo se abre recién al anotar o consultar, para no demorar la carga del círculo.
+	Lo usa un solo hilo (y, con diferido=True, su hilo de escritura); otro programa puede
+	anotar en el mismo archivo, y sus registros se incorporan antes de cada anotación o consulta.
+	"""
+	def __init__(self, nombre_archivo, criterios, diferido=False):
+		"""
+		:param diferido: Si es True, las anotaciones las escribe un hilo aparte, que junta las
+		                 que llegan seguidas; las consultas, flush() y cerrar() esperan a que
+		                 termine.
+		"""
+		self.nombre_archivo = nombre_archivo
+		self.nombre_indice = nombre_archivo + '.idx'
+		self.nombre_bloqueo = nombre_archivo + '.bloqueo'
+		self.criterios = list(criterios)
+		self._lectura = None
+		self._escritura = None
+		self._bloqueo = None
+		self.escritor = EscritorDiferido(None, self._anotar_lote) if diferido else None
+
+	def _reiniciar_estado(self, inicio):
+		self._inicio = inicio
+		self._fin = inicio
+		self._registros = 0
+		self._ultima_fecha = 0
+		# {id: posición del último registro del amigo}
+		self._ultimos = {}
+		self._marcas_posicion = array('q')
+		self._marcas_fecha = array('q')
+		# Registros desde la última marca; None obliga a escribir una marca (nueva sesión).
+		self._desde_marca = None
+		self._indice_al_dia = False
+
+	def _crear(self):
+		encabezado = ENCABEZADO.pack(FIRMA, VERSION, getrandbits(64), len(self.criterios))
+		with open(self.nombre_archivo, 'wb') as archivo:
+			archivo.write(encabezado + cadenas_a_bytes(self.criterios, '<H'))
+
+	def _abrir(self):
+		"""Abre el historial la primera vez que se usa y, si ya estaba abierto, incorpora los registros ajenos."""
+		if self._lectura is not None:
+			self._ponerse_al_dia()
+			return
+		if not os.path.exists(self.nombre_archivo) or os.path.getsize(self.nombre_archivo) == 0:
+			self._crear()
+		lectura = open(self.nombre_archivo, 'rb')
+		try:
+			datos = lectura.read(1 << 16)
+			try:
+				firma, version, identificador, num_criterios = ENCABEZADO.unpack_from(datos)
+				criterios, inicio = leer_cadenas(datos, ENCABEZADO.size, num_criterios, '<H')
+			except (struct.error, UnicodeDecodeError):
+				firma = None
+			if firma != FIRMA:
+				raise ValueError(f"'{self.nombre_archivo}' no es un historial de reevaluaciones.")
+			if version != VERSION:
+				raise ValueError(f"Versión de historial no soportada: {version}")
+		except BaseException:
+			lectura.close()
+			raise
+		if criterios != self.criterios:
+			# Las diferencias se refieren a los criterios por posición: con otros criterios se
+			# empieza un historial nuevo y el anterior se conserva aparte.
+			lectura.close()
+			os.replace(self.nombre_archivo, self.nombre_archivo + '.anterior')
+			print(f"El historial tenía otros criterios; se guardó como '{self.nombre_archivo}.anterior'.")
+			return self._abrir()
+		self._lectura = lectura
+		self._identificador = identificador
+		self._reiniciar_estado(inicio)
+		self._leer_indice()
+		self._ponerse_al_dia()
+
+	def _leer_indice(self):
+		try:
+			with open(self.nombre_indice, 'rb') as archivo:
+				datos = archivo.read()
+			(firma, version, identificador, fin, registros, ultima_fecha,
+			 cantidad_amigos, cantidad_marcas) = ENCABEZADO_INDICE.unpack_from(datos)
+		except (OSError, struct.error):
+			return
+		tamano = os.fstat(self._lectura.fileno()).st_size
+		if firma != FIRMA_INDICE or version != VERSION or identificador != self._identificador or fin > tamano:
+			# Es el índice de otro historial: se reconstruye recorriendo el archivo.
+			return
+		arreglos = []
+		posicion = ENCABEZADO_INDICE.size
+		for cantidad in (cantidad_amigos, cantidad_amigos, cantidad_marcas, cantidad_marcas):
+			arreglo = array('q')
+			siguiente = posicion + cantidad * arreglo.itemsize
+			if siguiente > len(datos):
+				return
+			arreglo.frombytes(datos[posicion:siguiente])
+			arreglos.append(arreglo)
+			posicion = siguiente
+		registrar_lectura(self.nombre_indice, len(datos))
+		ids, posiciones, self._marcas_posicion, self._marcas_fecha = arreglos
+		self._ultimos = dict(zip(ids, posiciones))
+		self._fin = fin
+		self._registros = registros
+		self._ultima_fecha = ultima_fecha
+		self._indice_al_dia = True
+
+	def _ponerse_al_dia(self):
+		"""Incorpora al estado los registros que se agregaron al archivo después de los conocidos."""
+		tamano = os.fstat(self._lectura.fileno()).st_size
+		if tamano <= self._fin:
+			return
+		self._lectura.seek(self._fin)
+		datos = self._lectura.read(tamano - self._fin)
+		registrar_lectura(self.nombre_archivo, len(datos))
+		num_criterios = len(self.criterios)
+		posicion = 0
+		while posicion < len(datos):
+			try:
+				tipo, dato, segundos, _, _, siguiente = _decodificar(datos, posicion, num_criterios)
+			except IndexError:
+				# Registro incompleto (escritura interrumpida): se recorta antes de anotar.
+				break
+			absoluta = self._fin + posicion
+			if tipo == MARCA:
+				self._marcas_posicion.append(absoluta)
+				self._marcas_fecha.append(dato)
+				self._ultima_fecha = max(self._ultima_fecha, dato)
+				if self._desde_marca is not None:
+					self._desde_marca = 0
+			else:
+				self._ultimos[dato] = absoluta
+				self._ultima_fecha = max(self._ultima_fecha, self._marcas_fecha[-1] + segundos)
+				self._registros += 1
+				if self._desde_marca is not None:
+					self._desde_marca += 1
+			posicion = siguiente
+		self._fin += posicion
+		self._indice_al_dia = False
+
+	def _consultar(self):
+		"""Prepara una consulta: espera las anotaciones encoladas e incorpora las ajenas."""
+		self.flush()
+		self._abrir()
+
+	def __len__(self):
+		"""Cantidad de registros (altas, cambios y bajas) del historial."""
+		self._consultar()
+		return self._registros
+
+	# --- Anotación ---
+
+	def _empezar(self, salida, tipo, id_amigo, fecha):
+		"""Agrega a 'salida' el comienzo de un registro (precedido por una marca si hace falta)."""
+		if (self._desde_marca is None or self._desde_marca >= REGISTROS_POR_MARCA
+				or fecha - self._marcas_fecha[-1] >= SEGUNDOS_POR_MARCA):
+			self._marcas_posicion.append(self._fin + len(salida))
+			self._marcas_fecha.append(fecha)
+			_anexar_entero(salida, fecha << 2 | MARCA)
+			self._desde_marca = 0
+		posicion = self._fin + len(salida)
+		_anexar_entero(salida, id_amigo << 2 | tipo)
+		_anexar_entero(salida, fecha - self._marcas_fecha[-1])
+		if tipo != ALTA:
+			_anexar_entero(salida, posicion - self._ultimos[id_amigo])
+		self._ultimos[id_amigo] = posicion
+		self._desde_marca += 1
+		self._registros += 1
+
+	def _alta(self, salida, id_amigo, valores, fecha):
+		self._empezar(salida, ALTA, id_amigo, fecha)
+		salida += bytes(valores)
+
+	def _cambio(self, salida, id_amigo, anteriores, valores, fecha):
+		mascara = 0
+		diferencias = bytearray()
+		for criterio, (anterior, valor) in enumerate(zip(anteriores, valores)):
+			if valor != anterior:
+				mascara |= 1 << criterio
+				diferencias.append((valor - anterior) & 0xFF)
+		if not mascara:
+			return
+		if id_amigo not in self._ultimos:
+			# Primera reevaluación de un amigo anterior al historial: se anota de dónde partía.
+			self._alta(salida, id_amigo, anteriores, fecha)
+		self._empezar(salida, CAMBIO, id_amigo, fecha)
+		_anexar_entero(salida, mascara)
+		salida += diferencias
+		_anexar_entero(salida, sum(valores))
+
+	@medido
+	def anotar(self, altas=(), cambios=(), bajas=(), fecha=None):
+		"""
+		Agrega al historial, con una sola escritura:
+		 - altas: pares (id, puntuaciones);
+		 - cambios: tuplas (id, puntuaciones anteriores, puntuaciones nuevas); los que no
+		   cambian ninguna puntuación se omiten;
+		 - bajas: ids de amigos eliminados.
+		Las puntuaciones son listas en el orden de los criterios. 'fecha' (segundos desde
+		1970) es por defecto la actual. Con diferido=True solo se encola, con la fecha de la
+		llamada; un error de escritura se informa en flush() o cerrar().
+		"""
+		lote = (list(altas), list(cambios), list(bajas), int(time.time()) if fecha is None else fecha)
+		if self.escritor is not None:
+			self.escritor.programar_registro(lote)
+		else:
+			self._anotar_lote(lote)
+
+	def _anotar_lote(self, lote):
+		"""Anota un lote (altas, cambios, bajas, fecha) con el bloqueo del historial tomado."""
+		if self._bloqueo is None:
+			self._bloqueo = open(self.nombre_bloqueo, 'a+b')
+		_bloquear(self._bloqueo)
+		try:
+			self._anotar(*lote)
+		finally:
+			if self._bloqueo is not None:
+				_desbloquear(self._bloqueo)
+
+	def _anotar(self, altas, cambios, bajas, fecha):
+		# Con el bloqueo tomado se incorporan los registros ajenos: lo que quede después de
+		# self._fin es un registro incompleto de una escritura interrumpida.
+		self._abrir()
+		fecha = max(int(fecha), self._ultima_fecha)
+		salida = bytearray()
+		try:
+			for id_amigo, valores in altas:
+				self._alta(salida, id_amigo, valores, fecha)
+			for id_amigo, anteriores, valores in cambios:
+				self._cambio(salida, id_amigo, anteriores, valores, fecha)
+			for id_amigo in bajas:
+				if id_amigo in self._ultimos:
+					self._empezar(salida, BAJA, id_amigo, fecha)
+			if not salida:
+				return
+			if self._escritura is None:
+				self._escritura = open(self.nombre_archivo, 'ab')
+			if os.fstat(self._escritura.fileno()).st_size > self._fin:
+				# Nadie más escribe mientras se tiene el bloqueo.
+				self._escritura.truncate(self._fin)
+			self._escritura.write(salida)
+			self._escritura.flush()
+		except BaseException:
+			# El estado en memoria ya incluye el lote: se vuelve a leer del disco en el próximo uso.
+			self._cerrar_archivos(guardar_indice=False)
+			raise
+		registrar_escritura(self.nombre_archivo, len(salida))
+		self._fin += len(salida)
+		self._ultima_fecha = fecha
+		self._indice_al_dia = False
+
+	# --- Consultas ---
+
+	def _fecha_en(self, posicion):
+		"""Fecha de la marca que precede al registro en 'posicion'."""
+		return self._marcas_fecha[bisect_right(self._marcas_posicion, posicion) - 1]
+
+	@medido
+	def trayectoria(self, id_amigo):
+		"""
+		Devuelve las evaluaciones del amigo, de la más antigua a la más reciente, como lista de
+		Evaluacion: su alta (o el estado previo a su primera reevaluación anotada), cada
+		reevaluación y, si se eliminó, su baja. Solo se leen los registros de ese amigo.
+		"""
+		self._consultar()
+		num_criterios = len(self.criterios)
+		ancho = 32 + 2 * num_criterios
+		cadena = []
+		posicion = self._ultimos.get(id_amigo)
+		while posicion is not None:
+			self._lectura.seek(posicion)
+			datos = self._lectura.read(ancho)
+			tipo, _, segundos, atras, carga, _ = _decodificar(datos, 0, num_criterios)
+			cadena.append((tipo, self._fecha_en(posicion) + segundos, carga))
+			posicion = posicion - atras if tipo != ALTA else None
+		evaluaciones = []
+		valores = None
+		for tipo, fecha, carga in reversed(cadena):
+			if tipo == BAJA:
+				evaluaciones.append(Evaluacion(fecha, None, None))
+				continue
+			if tipo == ALTA:
+				valores = list(carga)
+			else:
+				_aplicar(valores, carga[0], carga[1])
+			evaluaciones.append(Evaluacion(fecha, dict(zip(self.criterios, valores)), sum(valores)))
+		return evaluaciones
+
+	def _recorrer(self, desde, hasta):
+		"""
+		Genera (tipo, id, fecha, total, diferencias) de los registros con fecha entre 'desde' y
+		'hasta' (segundos desde 1970; None: sin límite); en las altas 'diferencias' es None y en
+		las bajas, también el total. Con las marcas, solo se lee esa parte del archivo.
+		"""
+		self._consultar()
+		if not self._marcas_posicion:
+			return
+		primera = 0 if desde is None else max(bisect_right(self._marcas_fecha, desde) - 1, 0)
+		ultima = len(self._marcas_fecha) if hasta is None else bisect_right(self._marcas_fecha, hasta)
+		inicio = self._marcas_posicion[primera]
+		fin = self._marcas_posicion[ultima] if ultima < len(self._marcas_posicion) else self._fin
+		self._lectura.seek(inicio)
+		datos = self._lectura.read(fin - inicio)
+		registrar_lectura(self.nombre_archivo, len(datos))
+		num_criterios = len(self.criterios)
+		posicion = 0
+		base = 0
+		# Es _decodificar en línea, sin armar la carga ni llamar a _leer_entero, ya que estas
+		# consultas recorren cientos de miles de registros.
+		while posicion < len(datos):
+			cabecera = datos[posicion]
+			posicion += 1
+			if cabecera > 0x7F:
+				cabecera &= 0x7F
+				desplazamiento = 7
+				while True:
+					byte = datos[posicion]
+					posicion += 1
+					cabecera |= (byte & 0x7F) << desplazamiento
+					if byte < 0x80:
+						break
+					desplazamiento += 7
+			tipo = cabecera & 3
+			if tipo == MARCA:
+				base = cabecera >> 2
+				continue
+			segundos = datos[posicion]
+			if segundos < 0x80:
+				posicion += 1
+			else:
+				segundos, posicion = _leer_entero(datos, posicion)
+			total = diferencias = None
+			if tipo == ALTA:
+				total = sum(datos[posicion:posicion + num_criterios])
+				posicion += num_criterios
+			else:
+				# La distancia al registro anterior del amigo no hace falta.
+				while datos[posicion] > 0x7F:
+					posicion += 1
+				posicion += 1
+				if tipo == CAMBIO:
+					mascara = datos[posicion]
+					if mascara < 0x80:
+						posicion += 1
+					elif datos[posicion + 1] < 0x80:
+						mascara = mascara & 0x7F | datos[posicion + 1] << 7
+						posicion += 2
+					else:
+						mascara, posicion = _leer_entero(datos, posicion)
+					fin = posicion + bin(mascara).count("1")
+					diferencias = datos[posicion:fin]
+					total = datos[fin]
+					if total < 0x80:
+						posicion = fin + 1
+					else:
+						total, posicion = _leer_entero(datos, fin)
+			fecha = base + segundos
+			if hasta is not None and fecha > hasta:
+				return
+			if desde is None or fecha >= desde:
+				yield tipo, cabecera >> 2, fecha, total, diferencias
+
+	@medido
+	def mayores_caidas(self, desde=None, hasta=None, k=10, ids=None):
+		"""
+		Devuelve los k amigos cuyo total más bajó entre 'desde' y 'hasta', como tuplas (id,
+		total al empezar el período, total al terminarlo), de la mayor a la menor caída. Se
+		comparan el total antes de la primera reevaluación del período y después de la última;
+		los amigos eliminados en el período no se cuentan. Con 'ids', solo esos amigos.
+		"""
+		totales = {}
+		for tipo, id_amigo, _, total, diferencias in self._recorrer(desde, hasta):
+			if tipo == CAMBIO:
+				par = totales.get(id_amigo)
+				if par is None:
+					totales[id_amigo] = [total - _suma(diferencias), total]
+				else:
+					par[1] = total
+			elif tipo == ALTA:
+				totales[id_amigo] = [total, total]
+			else:
+				totales.pop(id_amigo, None)
+		caidas = ((final - inicial, id_amigo, inicial, final) for id_amigo, (inicial, final) in totales.items()
+				  if final < inicial and (ids is None or id_amigo in ids))
+		return [(id_amigo, inicial, final) for _, id_amigo, inicial, final in heapq.nsmallest(k, caidas)]
+
+	@medido
+	def transiciones(self, desde=None, hasta=None, clasificador=None):
+		"""
+		Devuelve los cambios de categoría entre 'desde' y 'hasta', en orden, como tuplas (fecha,
+		id, categoría anterior, categoría nueva). Las categorías se calculan a partir de los
+		totales anotados, con 'clasificador' (por defecto, el de los umbrales de siempre).
+		"""
+		if clasificador is None:
+			clasificador = clasificador_por_defecto(len(self.criterios))
+		# Categoría de cada total posible, para no recorrer los umbrales en cada registro.
+		categorias = clasificador.por_total
+		resultado = []
+		for tipo, id_amigo, fecha, total, diferencias in self._recorrer(desde, hasta):
+			if tipo == CAMBIO:
+				anterior = categorias[total - _suma(diferencias)]
+				nueva = categorias[total]
+				if anterior != nueva:
+					resultado.append((fecha, id_amigo, anterior, nueva))
+		return resultado
+
+	# --- Cierre ---
+
+	def guardar_indice(self):
+		"""Escribe el índice, para que la próxima apertura no tenga que recorrer el archivo."""
+		if self._lectura is None or self._indice_al_dia:
+			return
+		ids = array('q', self._ultimos.keys())
+		posiciones = array('q', self._ultimos.values())
+		temporal = self.nombre_indice + '.tmp'
+		with open(temporal, 'wb') as archivo:
+			archivo.write(ENCABEZADO_INDICE.pack(FIRMA_INDICE, VERSION, self._identificador, self._fin, self._registros,
+												 self._ultima_fecha, len(ids), len(self._marcas_posicion)))
+			for arreglo in (ids, posiciones, self._marcas_posicion, self._marcas_fecha):
+				arreglo.tofile(archivo)
+			registrar_escritura(self.nombre_indice, archivo.tell())
+		os.replace(temporal, self.nombre_indice)
+		self._indice_al_dia = True
+
+	def flush(self):
+		"""Con diferido=True, espera a que se escriban las anotaciones encoladas."""
+		if self.escritor is not None:
+			self.escritor.flush()
+
+	def cerrar(self):
+		"""
+		Escribe las anotaciones encoladas, guarda el índice (si cambió) y cierra el archivo; se
+		vuelve a abrir si se sigue usando (entonces, sin hilo de escritura).
+		"""
+		escritor, self.escritor = self.escritor, None
+		try:
+			if escritor is not None:
+				escritor.cerrar()
+		finally:
+			self._cerrar_archivos()
+
+	def _cerrar_archivos(self, guardar_indice=True):
+		try:
+			if guardar_indice:
+				self.guardar_indice()
+		finally:
+			for archivo in (self._escritura, self._lectura, self._bloqueo):
+				if archivo is not None:
+					archivo.close()
+			self._escritura = None
+			self._lectura = None
+			self._bloqueo = None
@@ -0,0 +1,140 @@
+﻿# indice_nombres.py
+
+import unicodedata
+from bisect import bisect_left, insort
+from itertools import islice
+
+# Mayor que cualquier carácter de un nombre: (prefijo + _ULTIMO_CARACTER,) acota los nombres con ese prefijo.
+_ULTIMO_CARACTER = chr(0x10FFFF)
+# Pares por bloque de la lista ordenada al construirla; un bloque se parte al superar el doble.
+_TAMANO_BLOQUE = 1000
+
+def _id(amigo):
+	return amigo.id
+
+def normalizar_nombre(nombre):
+	"""
+	Normaliza un nombre para buscarlo: sin espacios sobrantes, en minúsculas y sin tildes
+	("  José  Pérez" y "jose perez" se consideran el mismo nombre).
+	"""
+	descompuesto = unicodedata.normalize('NFKD', nombre.casefold())
+	sin_tildes = ''.join(c for c in descompuesto if not unicodedata.combining(c))
+	return ' '.join(sin_tildes.split())
+
+
+class IndiceNombres:
+	"""
+	Índices de amigos por nombre normalizado:
+	 - un diccionario {nombre normalizado: [amigos]} para buscar por nombre exacto en O(1);
+	 - una lista ordenada de (nombre normalizado, id) para buscar por prefijo con búsqueda binaria.
+	La lista ordenada se guarda partida en bloques de hasta 2 * _TAMANO_BLOQUE pares, junto con
+	el último par de cada bloque: agregar o quitar un amigo es una búsqueda binaria entre esos
+	máximos y un insort o del dentro de un bloque, en vez de desplazar toda la lista (O(N)).
+	Se construye recién en la primera búsqueda por prefijo y desde entonces se mantiene con
+	cada cambio.
+	"""
+	def __init__(self):
+		self._por_nombre = {}
+		# Bloques ordenados de (nombre normalizado, id) y el último par de cada uno; None hasta la
+		# primera búsqueda por prefijo.
+		self._bloques = None
+		self._maximos = None
+
+	def agregar(self, amigo):
+		clave = normalizar_nombre(amigo.nombre)
+		insort(self._por_nombre.setdefault(clave, []), amigo, key=_id)
+		if self._bloques is not None:
+			self._insertar((clave, amigo.id))
+
+	def quitar(self, amigo):
+		"""Quita al amigo del índice; debe llamarse antes de cambiarle el nombre."""
+		clave = normalizar_nombre(amigo.nombre)
+		homonimos = self._por_nombre[clave]
+		homonimos.remove(amigo)
+		if not homonimos:
+			del self._por_nombre[clave]
+		if self._bloques is not None:
+			self._eliminar((clave, amigo.id))
+
+	def buscar(self, nombre):
+		"""Devuelve la lista de amigos con ese nombre (normalizado), en orden de alta."""
+		return list(self._por_nombre.get(normalizar_nombre(nombre), ()))
+
+	def claves(self):
+		"""Recorre los nombres normalizados distintos que hay en el índice."""
+		return iter(self._por_nombre)
+
+	def _ordenar(self):
+		if self._bloques is None:
+			ordenados = sorted((clave, amigo.id) for clave, homonimos in self._por_nombre.items()
+							   for amigo in homonimos)
+			self._bloques = [ordenados[inicio:inicio + _TAMANO_BLOQUE]
+							 for inicio in range(0, len(ordenados), _TAMANO_BLOQUE)]
+			self._maximos = [bloque[-1] for bloque in self._bloques]
+
+	def _insertar(self, par):
+		bloques, maximos = self._bloques, self._maximos
+		if not bloques:
+			bloques.append([par])
+			maximos.append(par)
+			return
+		# Primer bloque cuyo máximo no es menor que 'par'; si no hay, el último.
+		numero = min(bisect_left(maximos, par), len(bloques) - 1)
+		bloque = bloques[numero]
+		insort(bloque, par)
+		maximos[numero] = bloque[-1]
+		if len(bloque) > 2 * _TAMANO_BLOQUE:
+			bloques[numero:numero + 1] = [bloque[:_TAMANO_BLOQUE], bloque[_TAMANO_BLOQUE:]]
+			maximos[numero:numero + 1] = [bloque[_TAMANO_BLOQUE - 1], bloque[-1]]
+
+	def _eliminar(self, par):
+		numero = bisect_left(self._maximos, par)
+		bloque = self._bloques[numero]
+		del bloque[bisect_left(bloque, par)]
+		if bloque:
+			self._maximos[numero] = bloque[-1]
+		else:
+			del self._bloques[numero]
+			del self._maximos[numero]
+
+	def _ubicar(self, par):
+		"""Posición (bloque, posición en el bloque) del primer par que no es menor que 'par'."""
+		numero = bisect_left(self._maximos, par)
+		if numero == len(self._bloques):
+			return numero, 0
+		return numero, bisect_left(self._bloques[numero], par)
+
+	def _limites_prefijo(self, prefijo):
+		"""Posiciones [inicio, fin) de la lista ordenada con los nombres que empiezan con 'prefijo'."""
+		self._ordenar()
+		prefijo = normalizar_nombre(prefijo)
+		return self._ubicar((prefijo,)), self._ubicar((prefijo + _ULTIMO_CARACTER,))
+
+	def contar_prefijo(self, prefijo):
+		"""
+		Cantidad de amigos cuyo nombre normalizado empieza con 'prefijo': dos búsquedas binarias
+		y la suma de los tamaños de los bloques intermedios.
+		"""
+		(bloque_inicio, inicio), (bloque_fin, fin) = self._limites_prefijo(prefijo)
+		if bloque_inicio == bloque_fin:
+			return fin - inicio
+		return (len(self._bloques[bloque_inicio]) - inicio + fin
+				+ sum(len(bloque) for bloque in self._bloques[bloque_inicio + 1:bloque_fin]))
+
+	def _recorrer(self, prefijo):
+		(bloque_inicio, inicio), (bloque_fin, fin) = self._limites_prefijo(prefijo)
+		for numero in range(bloque_inicio, min(bloque_fin + 1, len(self._bloques))):
+			bloque = self._bloques[numero]
+			yield from bloque[inicio if numero == bloque_inicio else 0:fin if numero == bloque_fin else len(bloque)]
+
+	def recorrer_prefijo(self, prefijo, por_id):
+		"""Recorre, ordenados por nombre, los amigos cuyo nombre empieza con 'prefijo'."""
+		for _, id_amigo in self._recorrer(prefijo):
+			yield por_id[id_amigo]
+
+	def buscar_prefijo(self, prefijo, por_id, limite=None):
+		"""
+		Devuelve los amigos cuyo nombre normalizado empieza con 'prefijo', ordenados por nombre.
+		'por_id' es el diccionario {id: amigo} del círculo.
+		"""
+		return [por_id[id_amigo] for _, id_amigo in islice(self._recorrer(prefijo), limite)]
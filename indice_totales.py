@@ -0,0 +1,125 @@
+﻿# indice_totales.py
+
+from bisect import bisect_left, bisect_right, insort
+
+def _id(amigo):
+	return amigo.id
+
+class IndiceTotales:
+	"""
+	Mantiene a los amigos ordenados por puntuación total, de mayor a menor.
+	Los totales posibles son pocos (entre 0 y 10 por criterio), así que se guarda una
+	cubeta por total; dentro de cada cubeta los amigos se ordenan por id, que respeta
+	el orden en que fueron agregados al círculo (igual que un sorted() estable).
+	Agregar o quitar un amigo cuesta una búsqueda binaria dentro de su cubeta.
+	"""
+	def __init__(self, amigos=()):
+		self._cubetas = {}
+		# Totales con al menos un amigo, en orden ascendente.
+		self._totales = []
+		self._cantidad = 0
+		for amigo in amigos:
+			self.agregar(amigo)
+
+	def __len__(self):
+		return self._cantidad
+
+	def agregar(self, amigo):
+		total = amigo.puntuacion_total()
+		cubeta = self._cubetas.get(total)
+		if cubeta is None:
+			cubeta = self._cubetas[total] = []
+			insort(self._totales, total)
+		if not cubeta or cubeta[-1].id < amigo.id:
+			cubeta.append(amigo)
+		else:
+			insort(cubeta, amigo, key=_id)
+		self._cantidad += 1
+
+	def quitar(self, amigo):
+		"""
+		Quita al amigo del índice. Debe llamarse antes de modificar sus puntuaciones,
+		ya que la cubeta se localiza con su total actual.
+		"""
+		total = amigo.puntuacion_total()
+		cubeta = self._cubetas[total]
+		posicion = bisect_left(cubeta, amigo.id, key=_id)
+		if posicion == len(cubeta) or cubeta[posicion] is not amigo:
+			raise KeyError(amigo.nombre)
+		del cubeta[posicion]
+		if not cubeta:
+			del self._cubetas[total]
+			del self._totales[bisect_left(self._totales, total)]
+		self._cantidad -= 1
+
+	def __iter__(self):
+		"""Recorre los amigos de mayor a menor puntuación total."""
+		for total in reversed(self._totales):
+			yield from self._cubetas[total]
+
+	def _totales_entre(self, minimo=None, maximo=None):
+		"""Totales con amigos entre 'minimo' y 'maximo' (inclusive; None = sin límite), de mayor a menor."""
+		desde = 0 if minimo is None else bisect_left(self._totales, minimo)
+		hasta = len(self._totales) if maximo is None else bisect_right(self._totales, maximo)
+		return self._totales[desde:hasta][::-1]
+
+	def contar_entre(self, minimo=None, maximo=None):
+		"""Cantidad de amigos con total entre 'minimo' y 'maximo', sumando el tamaño de las cubetas."""
+		if minimo is None and maximo is None:
+			return self._cantidad
+		return sum(len(self._cubetas[total]) for total in self._totales_entre(minimo, maximo))
+
+	def entre(self, minimo=None, maximo=None):
+		"""Recorre, de mayor a menor total, los amigos con total entre 'minimo' y 'maximo'."""
+		for total in self._totales_entre(minimo, maximo):
+			yield from self._cubetas[total]
+
+	def rango(self, inicio=0, fin=None, minimo=None, maximo=None):
+		"""
+		Devuelve la porción [inicio:fin] del ranking sin recorrer las cubetas anteriores
+		a 'inicio' amigo por amigo. Con 'minimo' o 'maximo', la porción es del ranking
+		de los amigos con total en ese rango.
+		"""
+		cantidad = self.contar_entre(minimo, maximo)
+		if fin is None or fin > cantidad:
+			fin = cantidad
+		resultado = []
+		if inicio >= fin:
+			return resultado
+		visto = 0
+		for total in self._totales_entre(minimo, maximo):
+			cubeta = self._cubetas[total]
+			if visto + len(cubeta) > inicio:
+				resultado.extend(cubeta[max(inicio - visto, 0):fin - visto])
+				if visto + len(cubeta) >= fin:
+					break
+			visto += len(cubeta)
+		return resultado
+
+	def cubetas(self):
+		"""
+		Recorre las cubetas de mayor a menor total, como pares (total, lista de amigos).
+		No se deben modificar las listas.
+		"""
+		for total in reversed(self._totales):
+			yield total, self._cubetas[total]
+
+	def cubetas_cercanas(self, total):
+		"""
+		Recorre las cubetas de la más cercana a la más lejana a 'total', como pares
+		(diferencia de total, lista de amigos). No se deben modificar las listas.
+		"""
+		derecha = bisect_left(self._totales, total)
+		izquierda = derecha - 1
+		while izquierda >= 0 or derecha < len(self._totales):
+			if derecha >= len(self._totales) or (izquierda >= 0 and total - self._totales[izquierda] <= self._totales[derecha] - total):
+				actual = self._totales[izquierda]
+				izquierda -= 1
+			else:
+				actual = self._totales[derecha]
+				derecha += 1
+			yield abs(actual - total), self._cubetas[actual]
+
+	def top(self, k):
+		"""Devuelve los k amigos con mayor puntuación total."""
+		return self.rango(0, k)
@@ -0,0 +1,232 @@
+﻿# instrumentacion.py
+# Mediciones opcionales de las operaciones más usadas (llamadas, latencia y bytes de E/S).
+#
+# Se activan con variables de entorno, antes de iniciar la aplicación:
+#   AMISTADES_INSTRUMENTACION=1               activa las mediciones; al salir se guardan en
+#                                             instrumentacion.json (o en la ruta indicada en
+#                                             lugar de "1").
+#   AMISTADES_PERFILAR=Clase.metodo,...       además, perfila esas operaciones con cProfile.
+#   AMISTADES_TRACEMALLOC=1                   además, mide la memoria de las operaciones perfiladas.
+# También se pueden activar desde el código con activar(), antes de importar los módulos
+# instrumentados: sin activar, el decorador @medido devuelve la función original y no
+# agrega ningún costo.
+
+import atexit
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+ARCHIVO_POR_DEFECTO = "instrumentacion.json"
+
+ACTIVA = False
+_archivo_salida = None
+_perfilar = set()
+_memoria = False
+
+_candado = threading.Lock()
+# {operación: [llamadas, segundos acumulados, segundos máximo]}
+_operaciones = {}
+# {origen: [bytes leídos, bytes escritos]}
+_bytes = {}
+# {operación: cProfile.Profile}; los perfiles de varias llamadas se acumulan.
+_perfiles = {}
+# {operación: {'pico_mib': máximo, 'asignaciones': las líneas que más memoria reservaron}}
+_memorias = {}
+# Fases del arranque de la interfaz gráfica (ver main.TiemposArranque).
+_arranque = {}
+# Tomado mientras un bloque se perfila (en cualquier hilo): cProfile admite un solo perfil
+# activo. Se toma sin esperar; quien no lo consigue se ejecuta sin perfilar.
+_perfilando = threading.Lock()
+
+def activar(archivo=ARCHIVO_POR_DEFECTO, perfilar=(), memoria=False):
+	"""
+	Activa las mediciones. Solo se instrumentan las funciones decoradas después de llamarla.
+	:param archivo: Ruta del JSON que se escribe al salir (None para no escribirlo).
+	:param perfilar: Nombres de operaciones ("CirculoAmistad.cargar_amigos") a perfilar con cProfile.
+	:param memoria: Si es True, las operaciones perfiladas también miden memoria con tracemalloc.
+	"""
+	global ACTIVA, _archivo_salida, _memoria
+	if archivo and _archivo_salida is None:
+		atexit.register(lambda: volcar())
+	ACTIVA = True
+	_archivo_salida = archivo or None
+	_perfilar.update(perfilar)
+	_memoria = memoria
+
+def _activar_desde_entorno():
+	valor = os.environ.get("AMISTADES_INSTRUMENTACION", "").strip()
+	if not valor or valor == "0":
+		return
+	perfilar = [nombre.strip() for nombre in os.environ.get("AMISTADES_PERFILAR", "").split(",") if nombre.strip()]
+	activar(ARCHIVO_POR_DEFECTO if valor == "1" else valor, perfilar,
+			os.environ.get("AMISTADES_TRACEMALLOC", "") not in ("", "0"))
+
+def medido(funcion):
+	"""
+	Decorador: cuenta las llamadas a 'funcion' y su latencia acumulada y máxima, bajo el
+	nombre Clase.metodo. Si la operación está en la lista a perfilar, cada llamada se
+	ejecuta además bajo cProfile (y tracemalloc). Sin instrumentación activa, no envuelve nada.
+	"""
+	if not ACTIVA:
+		return funcion
+	nombre = funcion.__qualname__
+
+	@wraps(funcion)
+	def envoltura(*args, **kwargs):
+		if nombre in _perfilar:
+			with perfilar(nombre, _memoria):
+				return _medir(nombre, funcion, args, kwargs)
+		return _medir(nombre, funcion, args, kwargs)
+	return envoltura
+
+def _medir(nombre, funcion, args, kwargs):
+	inicio = time.perf_counter()
+	try:
+		return funcion(*args, **kwargs)
+	finally:
+		segundos = time.perf_counter() - inicio
+		with _candado:
+			medicion = _operaciones.get(nombre)
+			if medicion is None:
+				medicion = _operaciones[nombre] = [0, 0.0, 0.0]
+			medicion[0] += 1
+			medicion[1] += segundos
+			if segundos > medicion[2]:
+				medicion[2] = segundos
+
+def registrar_lectura(origen, cantidad):
+	"""Suma 'cantidad' bytes leídos de 'origen' (por ejemplo "amigos.txt")."""
+	if ACTIVA:
+		with _candado:
+			_bytes.setdefault(origen, [0, 0])[0] += cantidad
+
+def registrar_escritura(origen, cantidad):
+	"""Suma 'cantidad' bytes escritos en 'origen'."""
+	if ACTIVA:
+		with _candado:
+			_bytes.setdefault(origen, [0, 0])[1] += cantidad
+
+def registrar_arranque(informe):
+	"""Guarda las fases del arranque de la aplicación para incluirlas en el informe."""
+	if ACTIVA:
+		with _candado:
+			_arranque.clear()
+			_arranque.update(informe)
+
+@contextmanager
+def perfilar(nombre, memoria=False):
+	"""
+	Perfila el bloque con cProfile y acumula el resultado bajo 'nombre':
+
+		with instrumentacion.perfilar("carga", memoria=True):
+			circulo.cargar_amigos()
+
+	Con memoria=True también registra el pico de memoria del bloque y las líneas que más
+	memoria reservaron (tracemalloc). Mientras haya un bloque perfilándose, los demás
+	(anidados o de otros hilos) se ejecutan sin perfilar.
+	"""
+	# Los módulos de perfilado se importan recién al usarlos, para no demorar el arranque.
+	import cProfile
+	import tracemalloc
+	if not _perfilando.acquire(blocking=False):
+		yield
+		return
+	try:
+		with _candado:
+			perfil = _perfiles.get(nombre)
+			if perfil is None:
+				perfil = _perfiles[nombre] = cProfile.Profile()
+		iniciado = False
+		if memoria:
+			iniciado = not tracemalloc.is_tracing()
+			if iniciado:
+				tracemalloc.start()
+			tracemalloc.reset_peak()
+		perfil.enable()
+		try:
+			yield
+		finally:
+			perfil.disable()
+			if memoria:
+				pico = tracemalloc.get_traced_memory()[1] / 2**20
+				asignaciones = [str(estadistica) for estadistica in
+								tracemalloc.take_snapshot().statistics('lineno')[:10]]
+				if iniciado:
+					tracemalloc.stop()
+				with _candado:
+					anterior = _memorias.get(nombre)
+					if anterior is None or pico >= anterior['pico_mib']:
+						_memorias[nombre] = {'pico_mib': pico, 'asignaciones': asignaciones}
+	finally:
+		# Solo lo suelta quien lo tomó, después de terminar con cProfile y tracemalloc.
+		_perfilando.release()
+
+def _resumir_perfil(perfil, limite=30):
+	"""Las 'limite' funciones con más tiempo acumulado de un perfil, como lista de diccionarios."""
+	import pstats
+	try:
+		estadisticas = pstats.Stats(perfil).stats
+	except TypeError:
+		# El perfil no registró ninguna llamada.
+		return []
+	filas = sorted(estadisticas.items(), key=lambda item: item[1][3], reverse=True)[:limite]
+	return [{
+		'funcion': f"{archivo}:{linea}({funcion})",
+		'llamadas': llamadas,
+		'segundos_propios': propios,
+		'segundos_acumulados': acumulados,
+	} for (archivo, linea, funcion), (_, llamadas, propios, acumulados, _) in filas]
+
+def informe():
+	"""Devuelve todas las mediciones en un diccionario serializable en JSON."""
+	import platform
+	with _candado:
+		operaciones = {nombre: {
+			'llamadas': llamadas,
+			'segundos': total,
+			'segundos_max': maximo,
+			'segundos_media': total / llamadas if llamadas else 0.0,
+		} for nombre, (llamadas, total, maximo) in sorted(_operaciones.items())}
+		bytes_es = {origen: {'leidos': leidos, 'escritos': escritos}
+					for origen, (leidos, escritos) in sorted(_bytes.items())}
+		perfiles = dict(_perfiles)
+		memorias = dict(_memorias)
+		arranque = dict(_arranque)
+	return {
+		'entorno': {
+			'python': platform.python_version(),
+			'plataforma': platform.platform(),
+			'fecha': time.strftime("%Y-%m-%dT%H:%M:%S"),
+		},
+		'arranque': arranque,
+		'operaciones': operaciones,
+		'bytes': bytes_es,
+		'perfiles': {nombre: _resumir_perfil(perfil) for nombre, perfil in perfiles.items()},
+		'memoria': memorias,
+	}
+
+def volcar(archivo=None):
+	"""Escribe el informe en 'archivo' (por defecto, el indicado al activar)."""
+	import json
+	archivo = archivo or _archivo_salida
+	if not archivo:
+		return
+	try:
+		with open(archivo, 'w', encoding='utf-8') as salida:
+			json.dump(informe(), salida, ensure_ascii=False, indent=1)
+	except OSError as e:
+		print(f"Error al guardar la instrumentación: {e}")
+
+def reiniciar():
+	"""Descarta las mediciones acumuladas."""
+	with _candado:
+		_operaciones.clear()
+		_bytes.clear()
+		_perfiles.clear()
+		_memorias.clear()
+		_arranque.clear()
+
+
+_activar_desde_entorno()
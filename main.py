@@ -1,250 +1,383 @@
-﻿# main.py
-# encoding: utf-8
-import wx
-import os
-from circulo_amistad import CirculoAmistad
-from amigo_dialog import AmigoDialog
-from reevaluar_amigo_dialog import ReevaluarAmigoDialog
-from eliminar_amigo_dialog import EliminarAmigoDialog
-
-def cargar_criterios(nombre_archivo="criterios.txt"):
-	"""
-	Carga los criterios desde un archivo de texto.
-	Si el archivo no existe, se crea uno con ejemplos y se muestra un mensaje en la GUI
-	para que el usuario lo edite con sus propios criterios.
-	Se espera que el archivo contenga exactamente 10 criterios, uno por línea.
-	Si no tiene 10, se muestra un mensaje y se utilizan criterios de ejemplo por defecto.
-	"""
-	criterios_de_ejemplo = [
-		"Empatía y Calidez",
-		"Confianza",
-		"Reciprocidad",
-		"Intereses Compartidos",
-		"Disponibilidad y Presencia",
-		"Comunicación Efectiva",
-		"Apoyo en Dificultades",
-		"Resolución de Conflictos",
-		"Diversión y Recreación",
-		"Crecimiento Personal"
-	]
-
-	# Si el archivo no existe, crearlo con criterios de ejemplo.
-	if not os.path.exists(nombre_archivo):
-		with open(nombre_archivo, 'w', encoding='utf-8') as f:
-			for linea in criterios_de_ejemplo:
-				f.write(linea + "\n")
-		# Se retorna la lista de ejemplo y se mostrará un mensaje más adelante, 
-		# una vez que la app wx esté disponible.
-		return criterios_de_ejemplo, True
-
-	# Si el archivo existe, leerlo.
-	with open(nombre_archivo, 'r', encoding='utf-8') as f:
-		criterios = [linea.strip() for linea in f if linea.strip()]
-
-	# Si la cantidad de criterios no es 10, usar los criterios de ejemplo.
-	if len(criterios) != 10:
-		return criterios_de_ejemplo, True
-
-	# Caso en que todo está correcto.
-	return criterios, False
-
-
-class AmigosApp(wx.Frame):
-	"""
-	Clase principal de la aplicación de gestión de amistades.
-	Permite agregar, reevaluar/editar, eliminar y mostrar amigos del círculo de amistades.
-	"""
-	def __init__(self, parent, title="Gestión de Amistades", criterios=None):
-		super(AmigosApp, self).__init__(parent, title=title, size=(500, 400))
-		self.criterios = criterios
-		self.circulo = CirculoAmistad(criterios=self.criterios)
-		self.InitUI()
-
-	def InitUI(self):
-		# Se crea el panel principal y se organiza con un sizer vertical.
-		panel = wx.Panel(self)
-		sizer = wx.BoxSizer(wx.VERTICAL)
-
-		# Botón para agregar un nuevo amigo.
-		add_btn = wx.Button(panel, label="&Agregar Amigo")
-		add_btn.Bind(wx.EVT_BUTTON, self.on_add_amigo)
-		sizer.Add(add_btn, 0, wx.ALL | wx.EXPAND, 5)
-
-		# Botón para reevaluar/editar un amigo.
-		eval_btn = wx.Button(panel, label="&Reevaluar/Editar Amigo")
-		eval_btn.Bind(wx.EVT_BUTTON, self.on_reevaluar_amigo)
-		sizer.Add(eval_btn, 0, wx.ALL | wx.EXPAND, 5)
-
-		# Botón para eliminar un amigo.
-		del_btn = wx.Button(panel, label="&Eliminar Amigo")
-		del_btn.Bind(wx.EVT_BUTTON, self.on_eliminar_amigo)
-		sizer.Add(del_btn, 0, wx.ALL | wx.EXPAND, 5)
-
-		# Botón para mostrar la lista de amigos.
-		show_btn = wx.Button(panel, label="&Mostrar Amigos")
-		show_btn.Bind(wx.EVT_BUTTON, self.on_mostrar_amigos)
-		sizer.Add(show_btn, 0, wx.ALL | wx.EXPAND, 5)
-
-		# Botón para salir de la aplicación.
-		exit_btn = wx.Button(panel, label="&Salir")
-		exit_btn.Bind(wx.EVT_BUTTON, self.on_exit)
-		sizer.Add(exit_btn, 0, wx.ALL | wx.EXPAND, 5)
-
-		panel.SetSizer(sizer)
-		self.Centre()
-
-	def on_add_amigo(self, event):
-		dialog = AmigoDialog(self, title="Agregar Amigo", criterios=self.criterios)
-		if dialog.ShowModal() == wx.ID_OK:
-			nombre, puntuaciones, genero = dialog.obtener_datos()
-			self.circulo.agregar_amigo(nombre, puntuaciones, genero)
-			wx.MessageBox("Amigo añadido correctamente.", "Información", wx.OK | wx.ICON_INFORMATION)
-		dialog.Destroy()
-
-	def on_reevaluar_amigo(self, event):
-		dialog = ReevaluarAmigoDialog(self, circulo=self.circulo, title="Reevaluar/Editar Amigo", criterios=self.criterios)
-		dialog.ShowModal()
-		dialog.Destroy()
-
-	def on_eliminar_amigo(self, event):
-		dialog = EliminarAmigoDialog(self, circulo=self.circulo, title="Eliminar Amigo")
-		if dialog.ShowModal() == wx.ID_OK:
-			indice = dialog.obtener_indice_seleccionado()
-			if self.circulo.eliminar_amigo(indice):
-				wx.MessageBox("Amigo eliminado correctamente.", "Información", wx.OK | wx.ICON_INFORMATION)
-			else:
-				wx.MessageBox("Error al eliminar el amigo.", "Error", wx.OK | wx.ICON_ERROR)
-		dialog.Destroy()
-
-	def on_mostrar_amigos(self, event):
-		"""
-		Muestra la lista de amigos en un diálogo con opción de filtrado.
-		Se han realizado las siguientes modificaciones:
-		  - Se ha eliminado el filtro de 'Puntuación ≥ 80'.
-		  - Se muestra, en el encabezado, el porcentaje de amigos filtrados respecto al total.
-		"""
-		# Opciones de filtro disponibles (se elimina la opción de 'Puntuación ≥ 80')
-		filtro_options = [
-			"Todos", "Hombres", "Mujeres",
-			"Súper Amigo", "Primario", "Secundario", "Terciario", "Ocasional", "Conocido"
-		]
-
-		# Crear el diálogo para mostrar la lista de amigos.
-		dialog = wx.Dialog(self, title="Lista de Amigos", size=(400, 450),
-						   style=wx.DEFAULT_DIALOG_STYLE | wx.TAB_TRAVERSAL)
-		panel = wx.Panel(dialog, style=wx.TAB_TRAVERSAL)
-		sizer = wx.BoxSizer(wx.VERTICAL)
-
-		# Sección del filtro: etiqueta y combo box.
-		filter_sizer = wx.BoxSizer(wx.HORIZONTAL)
-		filter_label = wx.StaticText(panel, label="Filtrar:")
-		filter_sizer.Add(filter_label, 0, wx.ALIGN_CENTER_VERTICAL | wx.ALL, 5)
-		filtro_choice = wx.Choice(panel, choices=filtro_options)
-		filtro_choice.SetSelection(0)  # Selección por defecto: "Todos"
-		filter_sizer.Add(filtro_choice, 0, wx.ALL, 5)
-		sizer.Add(filter_sizer, 0, wx.EXPAND | wx.ALL, 5)
-
-		# Área de texto para mostrar la información de los amigos.
-		text_ctrl = wx.TextCtrl(panel, style=wx.TE_MULTILINE | wx.TE_READONLY)
-		sizer.Add(text_ctrl, 1, wx.EXPAND | wx.ALL, 5)
-
-		# Botón para cerrar el diálogo.
-		close_btn = wx.Button(panel, label="&Cerrar")
-		sizer.Add(close_btn, 0, wx.ALL | wx.CENTER, 5)
-
-		panel.SetSizer(sizer)
-
-		def update_list(event=None):
-			"""
-			Actualiza la lista de amigos según el filtro seleccionado.
-			Se ordenan los amigos de mayor a menor por la suma de sus puntuaciones.
-			Se aplica el filtro elegido y se calcula el porcentaje de amigos filtrados
-			respecto al total, mostrando dicha información en el encabezado.
-			"""
-			# Obtener la opción de filtro seleccionada.
-			filtro = filtro_choice.GetStringSelection()
-
-			# Ordenar los amigos de mayor a menor según la suma de sus puntuaciones.
-			amigos_ordenados = sorted(
-				self.circulo.amigos,
-				key=lambda a: sum(a.puntuaciones.values()),
-				reverse=True
-			)
-			amigos_info = []  # Lista para almacenar la información de cada amigo.
-			count = 0		 # Contador de amigos que cumplen con el filtro.
-
-			# Recorrer cada amigo en la lista ordenada.
-			for amigo in amigos_ordenados:
-				# Convertir el valor del género a un texto legible.
-				genero_text = "Hombre" if amigo.genero == "M" else "Mujer"
-
-				# Filtrar por género.
-				if filtro == "Hombres" and genero_text != "Hombre":
-					continue
-				if filtro == "Mujeres" and genero_text != "Mujer":
-					continue
-
-				# Filtrar por categoría de amistad.
-				if filtro in ["Súper Amigo", "Primario", "Secundario", "Terciario", "Ocasional", "Conocido"]:
-					if amigo.categoria != filtro:
-						continue
-
-				# Si pasa los filtros, se incrementa el contador y se guarda la información.
-				count += 1
-				amigos_info.append(
-					f"{amigo.nombre}, Puntuación Total: {sum(amigo.puntuaciones.values())}, "
-					f"Categoría: {amigo.categoria}, {genero_text}"
-				)
-
-			# Calcular el porcentaje de amigos filtrados respecto al total del círculo.
-			total_amigos = len(self.circulo.amigos)
-			porcentaje = (count / total_amigos * 100) if total_amigos > 0 else 0
-
-			# Encabezado que muestra la cantidad de amigos filtrados y el porcentaje calculado.
-			encabezado = f"Mostrando lista de {count} amigos (Filtro: {filtro}) - {porcentaje:.1f}% del total"
-			info_str = encabezado + "\n" + "\n".join(amigos_info)
-			text_ctrl.SetValue(info_str)
-
-		# Vincular el evento de cambio en el filtro a la función de actualización.
-		filtro_choice.Bind(wx.EVT_CHOICE, update_list)
-		update_list()  # Inicializar la lista con el filtro por defecto.
-
-		# Vincular el botón de cierre para terminar el diálogo.
-		close_btn.Bind(wx.EVT_BUTTON, lambda event: dialog.EndModal(wx.ID_OK))
-
-		dialog.ShowModal()
-		dialog.Destroy()
-
-	def on_exit(self, event):
-		self.Close(True)
-
-
-def main():
-	# Se inicializa la aplicación de wxPython primero para poder mostrar mensajes con wx.MessageBox.
-	app = wx.App()
-	# Verificar si ya hay una instancia ejecutándose
-	name = "manage-friends-Instance"  # Identificador para la aplicación
-	instance = wx.SingleInstanceChecker(name)
-	if instance.IsAnotherRunning():
-		wx.MessageBox("el gestor de amistades ya está en ejecución.", "Aviso", wx.ICON_INFORMATION)
-		return False
-
-
-	criterios, hubo_problema = cargar_criterios()
-
-	# Si hubo_problema es True, se muestra un mensaje en la GUI indicando la acción tomada.
-	if hubo_problema:
-		wx.MessageBox(
-			"Se han creado o ajustado criterios de ejemplo porque el archivo no existía "
-			"o no contenía exactamente 10 líneas. Por favor, revise el archivo 'criterios.txt'.",
-			"Información",
-			wx.OK | wx.ICON_INFORMATION
-		)
-
-	frame = AmigosApp(None, title="Gestión de Amistades", criterios=criterios)
-	frame.Show()
-	app.MainLoop()
-
-
-if __name__ == '__main__':
-	main()
+﻿# main.py
+# encoding: utf-8
+import time
+_INICIO = time.perf_counter()
+import threading
+import wx
+import instrumentacion
+from categorias import cargar_categorias
+from criterios import cargar_criterios
+from gestor_circulos import GestorCirculos, PRINCIPAL
+from vigilancia import Vigilante
+# Los diálogos se importan la primera vez que se abren (ver on_add_amigo y siguientes),
+# para que no demoren la aparición de la ventana principal.
+
+# Tiempo máximo deseado, en segundos, desde el inicio del proceso hasta que la ventana
+# principal está en pantalla. Si se supera, se avisa en la consola.
+OBJETIVO_PRIMERA_VENTANA = 0.5
+
+# Formatos del diálogo "Exportar Amigos", en el orden de su lista de tipos (ver exportacion.py).
+FORMATOS_EXPORTACION = [("CSV", ".csv"), ("JSON Lines", ".jsonl"), ("Informe HTML", ".html")]
+
+class TiemposArranque:
+	"""
+	Fases del arranque, medidas desde el inicio del proceso: importación de módulos,
+	carga de criterios, primera pintura de la ventana y carga del círculo. Con la
+	instrumentación activa (ver instrumentacion.py) se incluyen en su informe.
+	"""
+	def __init__(self, inicio=_INICIO):
+		self.inicio = inicio
+		self.fases = {}
+
+	def marcar(self, fase):
+		self.fases[fase] = time.perf_counter() - self.inicio
+
+	def informe(self):
+		primera_ventana = self.fases.get("primera_ventana")
+		return {
+			'fases': dict(self.fases),
+			'objetivo_primera_ventana': OBJETIVO_PRIMERA_VENTANA,
+			'objetivo_cumplido': primera_ventana is not None and primera_ventana <= OBJETIVO_PRIMERA_VENTANA,
+		}
+
+	def __str__(self):
+		return ", ".join(f"{fase} {segundos * 1000:.0f} ms" for fase, segundos in self.fases.items())
+
+
+class AmigosApp(wx.Frame):
+	"""
+	Clase principal de la aplicación de gestión de amistades.
+	Permite agregar, reevaluar/editar, eliminar y mostrar amigos del círculo de amistades.
+	"""
+	def __init__(self, parent, title="Gestión de Amistades", criterios=None, tiempos=None, umbrales=None):
+		super(AmigosApp, self).__init__(parent, title=title, size=(500, 400))
+		self.criterios = criterios
+		self.tiempos = tiempos if tiempos is not None else TiemposArranque()
+		# Los círculos (ver gestor_circulos.py) se cargan en segundo plano recién cuando se eligen:
+		# el principal, una vez que la ventana está en pantalla (ver cargar_circulo). Mientras
+		# el círculo elegido se carga, los botones que lo usan están deshabilitados. Los cambios
+		# se anotan en el diario desde un hilo de escritura, sin bloquear la interfaz.
+		# Un vigilante (ver vigilancia.py) incorpora los cambios que otros programas hagan en el
+		# archivo del círculo elegido, como la línea de comandos o un editor de texto. Las
+		# reevaluaciones quedan en el historial de cada círculo (ver historial.py). Las categorías
+		# se asignan con los umbrales de categorias.txt (ver categorias.py).
+		self.gestor = GestorCirculos(criterios=criterios, diario=True, diferido=True, vigilar=True, historial=True,
+									 umbrales=umbrales)
+		self.nombre_circulo = PRINCIPAL
+		self.circulo = None
+		self.vigilante = None
+		self.InitUI()
+		self.Bind(wx.EVT_CLOSE, self.on_close)
+
+	def cargar_circulo(self):
+		"""Se llama cuando la ventana ya se pintó: carga el círculo principal en segundo plano."""
+		self.tiempos.marcar("primera_ventana")
+		self.seleccionar_circulo(PRINCIPAL)
+
+	def seleccionar_circulo(self, nombre):
+		"""Pasa a trabajar con el círculo 'nombre', cargándolo en segundo plano si hace falta."""
+		self.nombre_circulo = nombre
+		self.circulo = None
+		self.detener_vigilante()
+		for boton in self.botones_circulo:
+			boton.Disable()
+		self.SetStatusText(f"Cargando el círculo {nombre}...")
+		futuro = self.gestor.cargar_en_segundo_plano([nombre])[nombre]
+		# El aviso llega desde el hilo de carga: CallAfter lo pasa al hilo de la interfaz.
+		futuro.add_done_callback(lambda futuro: wx.CallAfter(self._carga_terminada, nombre, futuro))
+
+	def _carga_terminada(self, nombre, futuro):
+		if not self or nombre != self.nombre_circulo:
+			# La ventana se cerró (y el gestor cerró los círculos) o ya se eligió otro círculo.
+			return
+		if futuro.exception() is not None:
+			self.on_error_carga(futuro.exception())
+		else:
+			self.on_circulo_cargado(futuro.result())
+
+	def on_circulo_cargado(self, circulo):
+		self.circulo = circulo
+		for boton in self.botones_circulo:
+			boton.Enable()
+		self.SetStatusText(f"{self.nombre_circulo}: {circulo.contar()} amigos")
+		# El vigilante lee los cambios en su hilo; CallAfter pasa el resultado al de la interfaz.
+		self.vigilante = Vigilante(circulo.hay_cambios_externos, lambda: self.leer_cambios_en_disco(circulo))
+		if "circulo" in self.tiempos.fases:
+			return
+		self.tiempos.marcar("circulo")
+		informe = self.tiempos.informe()
+		if not informe['objetivo_cumplido']:
+			print(f"Arranque más lento que el objetivo de {OBJETIVO_PRIMERA_VENTANA * 1000:.0f} ms: {self.tiempos}")
+		if instrumentacion.ACTIVA:
+			instrumentacion.registrar_arranque(informe)
+
+	def detener_vigilante(self):
+		if self.vigilante is not None:
+			self.vigilante.detener()
+			self.vigilante = None
+
+	def leer_cambios_en_disco(self, circulo):
+		"""
+		Se llama en el hilo del vigilante: ahí se espera a las escrituras pendientes y se lee
+		y compara el archivo, de modo que la interfaz solo recibe el resultado.
+		"""
+		try:
+			externos = circulo.leer_cambios_externos()
+		except (OSError, ValueError) as e:
+			wx.CallAfter(self.on_error_cambios_en_disco, circulo, e)
+			return
+		if externos is not None:
+			wx.CallAfter(self.on_cambios_en_disco, circulo, externos)
+
+	def on_error_cambios_en_disco(self, circulo, error):
+		if self and circulo is self.circulo:
+			self.SetStatusText(f"Error al releer el archivo de amigos: {error}")
+
+	def on_cambios_en_disco(self, circulo, externos):
+		"""
+		Incorpora los cambios que otro programa hizo en el archivo del círculo, ya leídos en el
+		hilo del vigilante. Solo se actualizan los amigos modificados; los diálogos abiertos se
+		enteran por CirculoAmistad.suscribir y se refrescan solos.
+		"""
+		if not self:
+			# La ventana se cerró y el gestor cerró los círculos.
+			return
+		# Aunque ya se haya elegido otro círculo, los cambios leídos se incorporan al suyo.
+		cambios = circulo.recargar_cambios(externos)
+		if circulo is not self.circulo:
+			return
+		if cambios is not None:
+			self.SetStatusText(f"{self.nombre_circulo}: {circulo.contar()} amigos "
+							   f"({len(cambios.altas)} nuevos, {len(cambios.cambios)} modificados "
+							   f"y {len(cambios.bajas)} eliminados por otro programa)")
+
+	def on_error_carga(self, error):
+		self.SetStatusText("Error al cargar los amigos")
+		wx.MessageBox(f"No se pudo cargar el archivo de amigos:\n{error}", "Error", wx.OK | wx.ICON_ERROR)
+
+	def on_cambiar_circulo(self, event):
+		nombre = self.selector_circulo.GetStringSelection()
+		if nombre and nombre != self.nombre_circulo:
+			self.seleccionar_circulo(nombre)
+
+	def on_nuevo_circulo(self, event):
+		nombre = wx.GetTextFromUser("Nombre del nuevo círculo:", "Nuevo Círculo", parent=self).strip()
+		if not nombre:
+			return
+		try:
+			self.gestor.crear(nombre)
+		except ValueError as e:
+			wx.MessageBox(str(e), "Error", wx.OK | wx.ICON_ERROR)
+			return
+		self.selector_circulo.Append(nombre)
+		self.selector_circulo.SetStringSelection(nombre)
+		self.seleccionar_circulo(nombre)
+
+	def InitUI(self):
+		# Se crea el panel principal y se organiza con un sizer vertical.
+		panel = wx.Panel(self)
+		sizer = wx.BoxSizer(wx.VERTICAL)
+
+		# Selector del círculo con el que se trabaja y botón para crear uno nuevo.
+		circulo_sizer = wx.BoxSizer(wx.HORIZONTAL)
+		circulo_sizer.Add(wx.StaticText(panel, label="&Círculo:"), 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
+		self.selector_circulo = wx.Choice(panel, choices=self.gestor.nombres)
+		self.selector_circulo.SetStringSelection(self.nombre_circulo)
+		self.selector_circulo.Bind(wx.EVT_CHOICE, self.on_cambiar_circulo)
+		circulo_sizer.Add(self.selector_circulo, 1, wx.ALL | wx.EXPAND, 5)
+		nuevo_btn = wx.Button(panel, label="&Nuevo Círculo")
+		nuevo_btn.Bind(wx.EVT_BUTTON, self.on_nuevo_circulo)
+		circulo_sizer.Add(nuevo_btn, 0, wx.ALL, 5)
+		sizer.Add(circulo_sizer, 0, wx.EXPAND)
+
+		# Botón para agregar un nuevo amigo.
+		add_btn = wx.Button(panel, label="&Agregar Amigo")
+		add_btn.Bind(wx.EVT_BUTTON, self.on_add_amigo)
+		sizer.Add(add_btn, 0, wx.ALL | wx.EXPAND, 5)
+
+		# Botón para reevaluar/editar un amigo.
+		eval_btn = wx.Button(panel, label="&Reevaluar/Editar Amigo")
+		eval_btn.Bind(wx.EVT_BUTTON, self.on_reevaluar_amigo)
+		sizer.Add(eval_btn, 0, wx.ALL | wx.EXPAND, 5)
+
+		# Botón para eliminar un amigo.
+		del_btn = wx.Button(panel, label="&Eliminar Amigo")
+		del_btn.Bind(wx.EVT_BUTTON, self.on_eliminar_amigo)
+		sizer.Add(del_btn, 0, wx.ALL | wx.EXPAND, 5)
+
+		# Botón para mostrar la lista de amigos.
+		show_btn = wx.Button(panel, label="&Mostrar Amigos")
+		show_btn.Bind(wx.EVT_BUTTON, self.on_mostrar_amigos)
+		sizer.Add(show_btn, 0, wx.ALL | wx.EXPAND, 5)
+
+		# Botón para exportar el círculo a CSV, JSON Lines o HTML.
+		export_btn = wx.Button(panel, label="E&xportar Amigos")
+		export_btn.Bind(wx.EVT_BUTTON, self.on_exportar)
+		sizer.Add(export_btn, 0, wx.ALL | wx.EXPAND, 5)
+
+		# Botón para salir de la aplicación.
+		exit_btn = wx.Button(panel, label="&Salir")
+		exit_btn.Bind(wx.EVT_BUTTON, self.on_exit)
+		sizer.Add(exit_btn, 0, wx.ALL | wx.EXPAND, 5)
+
+		# Hasta que termine la carga del círculo solo se puede salir o elegir otro círculo.
+		self.botones_circulo = [add_btn, eval_btn, del_btn, show_btn, export_btn]
+		for boton in self.botones_circulo:
+			boton.Disable()
+		self.CreateStatusBar()
+
+		panel.SetSizer(sizer)
+		self.Centre()
+
+	def on_add_amigo(self, event):
+		from amigo_dialog import AmigoDialog
+		dialog = AmigoDialog(self, title="Agregar Amigo", criterios=self.criterios)
+		if dialog.ShowModal() == wx.ID_OK:
+			nombre, puntuaciones, genero = dialog.obtener_datos()
+			self.circulo.agregar_amigo(nombre, puntuaciones, genero)
+			wx.MessageBox("Amigo añadido correctamente.", "Información", wx.OK | wx.ICON_INFORMATION)
+		dialog.Destroy()
+
+	def on_reevaluar_amigo(self, event):
+		from reevaluar_amigo_dialog import ReevaluarAmigoDialog
+		dialog = ReevaluarAmigoDialog(self, circulo=self.circulo, title="Reevaluar/Editar Amigo", criterios=self.criterios)
+		dialog.ShowModal()
+		dialog.Destroy()
+
+	def on_eliminar_amigo(self, event):
+		from eliminar_amigo_dialog import EliminarAmigoDialog
+		dialog = EliminarAmigoDialog(self, circulo=self.circulo, title="Eliminar Amigo")
+		if dialog.ShowModal() == wx.ID_OK:
+			id_amigo = dialog.obtener_id_seleccionado()
+			if self.circulo.eliminar_amigo(id_amigo):
+				wx.MessageBox("Amigo eliminado correctamente.", "Información", wx.OK | wx.ICON_INFORMATION)
+			else:
+				wx.MessageBox("Error al eliminar el amigo.", "Error", wx.OK | wx.ICON_ERROR)
+		dialog.Destroy()
+
+	def on_mostrar_amigos(self, event):
+		"""
+		Muestra la lista de amigos en un diálogo con opción de filtrado.
+		La lista es virtual (ver mostrar_amigos_dialog.py): solo se dibujan las filas visibles,
+		y sus columnas se pueden ordenar por nombre, total, categoría o género.
+		"""
+		from mostrar_amigos_dialog import MostrarAmigosDialog
+		dialog = MostrarAmigosDialog(self, circulo=self.circulo, title="Lista de Amigos")
+		dialog.ShowModal()
+		dialog.Destroy()
+
+	def on_exportar(self, event):
+		"""
+		Exporta el círculo, de mayor a menor total, a CSV, JSON Lines o un informe HTML
+		(ver exportacion.py). La escritura se hace en un hilo aparte, con una barra de progreso
+		que permite cancelarla. La barra no impide que el vigilante incorpore cambios externos
+		al círculo, así que el hilo exporta una copia de los datos tomada antes de empezar.
+		"""
+		dialog = wx.FileDialog(self, "Exportar Amigos",
+							   wildcard="|".join(f"{nombre} (*{extension})|*{extension}"
+												 for nombre, extension in FORMATOS_EXPORTACION),
+							   style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT)
+		if dialog.ShowModal() != wx.ID_OK:
+			dialog.Destroy()
+			return
+		destino = dialog.GetPath()
+		extension = FORMATOS_EXPORTACION[dialog.GetFilterIndex()][1]
+		dialog.Destroy()
+		if not destino.lower().endswith(extension):
+			destino += extension
+		from exportacion import exportar, filas
+		circulo = self.circulo
+		# La copia se toma ahora, en el hilo de la interfaz, que es el único que modifica el círculo.
+		amigos = filas(circulo.ranking())
+		criterios = list(circulo.criterios)
+		titulo = "Círculo de Amistades" if self.nombre_circulo == PRINCIPAL else f"Círculo {self.nombre_circulo}"
+		progreso = wx.ProgressDialog("Exportar Amigos", f"Exportando {len(amigos)} amigos...",
+									 maximum=max(len(amigos), 1), parent=self,
+									 style=wx.PD_APP_MODAL | wx.PD_CAN_ABORT | wx.PD_ELAPSED_TIME | wx.PD_REMAINING_TIME)
+		cancelada = threading.Event()
+
+		def exportar_en_segundo_plano():
+			try:
+				cantidad = exportar(amigos, criterios, destino, titulo=titulo, total=len(amigos),
+									progreso=lambda escritos, total: wx.CallAfter(self._progreso_exportacion, progreso, escritos, cancelada),
+									cancelar=cancelada.is_set)
+			except (OSError, ValueError) as e:
+				wx.CallAfter(self._exportacion_terminada, progreso, destino, None, e)
+			else:
+				wx.CallAfter(self._exportacion_terminada, progreso, destino, cantidad, None)
+		threading.Thread(target=exportar_en_segundo_plano, name="Exportacion", daemon=True).start()
+
+	def _progreso_exportacion(self, progreso, escritos, cancelada):
+		if cancelada.is_set():
+			return
+		continuar, _ = progreso.Update(min(escritos, progreso.GetRange()), f"Exportados {escritos} amigos...")
+		if not continuar:
+			cancelada.set()
+
+	def _exportacion_terminada(self, progreso, destino, cantidad, error):
+		progreso.Destroy()
+		if error is not None:
+			wx.MessageBox(f"No se pudo exportar:\n{error}", "Error", wx.OK | wx.ICON_ERROR)
+		elif cantidad is None:
+			self.SetStatusText("Exportación cancelada")
+		else:
+			self.SetStatusText(f"{cantidad} amigos exportados a {destino}")
+
+	def on_exit(self, event):
+		# Terminar las escrituras pendientes antes de cerrar la ventana.
+		self.gestor.flush()
+		self.Close(True)
+
+	def on_close(self, event):
+		# Volcar el diario de cambios de cada círculo cargado a su archivo (y esperar a los hilos
+		# de escritura) antes de cerrar. Si un círculo todavía se está cargando, se espera a que
+		# termine; no tiene cambios que guardar.
+		self.detener_vigilante()
+		self.gestor.cerrar()
+		event.Skip()
+
+
+def main():
+	tiempos = TiemposArranque()
+	tiempos.marcar("importacion")
+	# Se inicializa la aplicación de wxPython primero para poder mostrar mensajes con wx.MessageBox.
+	app = wx.App()
+	# Verificar si ya hay una instancia ejecutándose
+	name = "manage-friends-Instance"  # Identificador para la aplicación
+	instance = wx.SingleInstanceChecker(name)
+	if instance.IsAnotherRunning():
+		wx.MessageBox("el gestor de amistades ya está en ejecución.", "Aviso", wx.ICON_INFORMATION)
+		return False
+
+
+	criterios, hubo_problema = cargar_criterios()
+	umbrales, problema_categorias = cargar_categorias()
+	tiempos.marcar("criterios")
+
+	frame = AmigosApp(None, title="Gestión de Amistades", criterios=criterios, tiempos=tiempos, umbrales=umbrales)
+	frame.Show()
+	# CallAfter se ejecuta cuando el bucle de eventos ya procesó la primera pintura de la ventana.
+	wx.CallAfter(frame.cargar_circulo)
+
+	# Si hubo_problema es True, se muestra un mensaje en la GUI indicando la acción tomada
+	# (con la ventana ya visible y el círculo cargándose).
+	if hubo_problema:
+		wx.CallAfter(
+			wx.MessageBox,
+			"Se han creado o ajustado criterios de ejemplo porque el archivo no existía "
+			"o estaba vacío o repetía un criterio. Por favor, revise el archivo 'criterios.txt'.",
+			"Información",
+			wx.OK | wx.ICON_INFORMATION
+		)
+	if problema_categorias:
+		wx.CallAfter(
+			wx.MessageBox,
+			"No se pudo interpretar el archivo 'categorias.txt'; se usan las categorías de siempre. "
+			"Cada línea debe tener un nombre y un porcentaje del total máximo, de mayor a menor.",
+			"Información",
+			wx.OK | wx.ICON_INFORMATION
+		)
+	app.MainLoop()
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,179 @@
+﻿# mostrar_amigos_dialog.py
+
+import wx
+from instrumentacion import medido
+
+# Columnas de la lista: (título, ancho, orden de la Consulta).
+COLUMNAS = [("Nombre", 160, "nombre"), ("Total", 60, "total"), ("Categoría", 100, "categoria"), ("Género", 70, "genero")]
+COLUMNA_NOMBRE, COLUMNA_TOTAL, COLUMNA_CATEGORIA, COLUMNA_GENERO = range(len(COLUMNAS))
+
+class PaginasConsulta:
+	"""
+	Secuencia de solo lectura con el resultado de una Consulta que el índice por totales
+	resuelve por posición (ordenada por total, sin más filtros que una categoría).
+	Los amigos se piden de a una página, a medida que la lista los muestra, en lugar de
+	copiar el resultado entero.
+	"""
+	def __init__(self, consulta, tamano_pagina=256):
+		self.consulta = consulta
+		self.tamano_pagina = tamano_pagina
+		self._cantidad = consulta.contar()
+		self._inicio = None
+		self._pagina = []
+
+	def __len__(self):
+		return self._cantidad
+
+	def __getitem__(self, posicion):
+		if self._inicio is None or not self._inicio <= posicion < self._inicio + len(self._pagina):
+			self._inicio = posicion - posicion % self.tamano_pagina
+			self._pagina = self.consulta.desde(self._inicio).limite(self.tamano_pagina).ejecutar()
+		return self._pagina[posicion - self._inicio]
+
+
+class ListaAmigos(wx.ListCtrl):
+	"""
+	Lista virtual de amigos: el control solo pide el texto de las filas visibles,
+	de modo que el costo de mostrarla no depende del tamaño del círculo.
+	'filas' es cualquier secuencia de amigos; con 'invertida' se recorre de atrás hacia adelante.
+	"""
+	def __init__(self, parent):
+		super(ListaAmigos, self).__init__(parent, style=wx.LC_REPORT | wx.LC_VIRTUAL | wx.LC_SINGLE_SEL)
+		for columna, (titulo, ancho, _) in enumerate(COLUMNAS):
+			self.InsertColumn(columna, titulo, width=ancho)
+		self.filas = []
+		self.invertida = False
+
+	def mostrar(self, filas, invertida=False):
+		self.filas = filas
+		self.invertida = invertida
+		self.SetItemCount(len(filas))
+		self.Refresh()
+
+	def amigo_en(self, fila):
+		if self.invertida:
+			fila = len(self.filas) - 1 - fila
+		return self.filas[fila]
+
+	def OnGetItemText(self, fila, columna):
+		amigo = self.amigo_en(fila)
+		if columna == COLUMNA_NOMBRE:
+			return amigo.nombre
+		if columna == COLUMNA_TOTAL:
+			return str(amigo.puntuacion_total())
+		if columna == COLUMNA_CATEGORIA:
+			return amigo.categoria
+		return "Hombre" if amigo.genero == "M" else "Mujer"
+
+
+class MostrarAmigosDialog(wx.Dialog):
+	"""
+	Diálogo "Lista de Amigos": una lista virtual con filtro por género o categoría y
+	columnas ordenables (nombre, total, categoría y género). Al hacer clic en una columna
+	se ordena por ella; un segundo clic invierte el orden.
+	"""
+	def __init__(self, parent, circulo, title="Lista de Amigos"):
+		super(MostrarAmigosDialog, self).__init__(parent, title=title, size=(450, 450),
+												  style=wx.DEFAULT_DIALOG_STYLE | wx.RESIZE_BORDER | wx.TAB_TRAVERSAL)
+		self.circulo = circulo
+		self.columna_orden = COLUMNA_TOTAL
+		self.invertida = False
+		self.panel = wx.Panel(self, style=wx.TAB_TRAVERSAL)
+		self.main_sizer = wx.BoxSizer(wx.VERTICAL)
+
+		# Sección del filtro: etiqueta y combo box.
+		filtro_sizer = wx.BoxSizer(wx.HORIZONTAL)
+		filtro_label = wx.StaticText(self.panel, label="Filtrar:")
+		filtro_sizer.Add(filtro_label, 0, wx.ALIGN_CENTER_VERTICAL | wx.ALL, 5)
+		# Las categorías son las del círculo (configurables en categorias.txt).
+		self.filtro_choice = wx.Choice(self.panel, choices=["Todos", "Hombres", "Mujeres"] + self.circulo.clasificador.nombres)
+		self.filtro_choice.SetSelection(0)  # Selección por defecto: "Todos"
+		self.filtro_choice.Bind(wx.EVT_CHOICE, self.on_filter_changed)
+		filtro_sizer.Add(self.filtro_choice, 0, wx.ALL, 5)
+		self.main_sizer.Add(filtro_sizer, 0, wx.EXPAND | wx.ALL, 5)
+
+		# Encabezado con la cantidad de amigos filtrados y su porcentaje.
+		self.encabezado = wx.StaticText(self.panel, label="")
+		self.main_sizer.Add(self.encabezado, 0, wx.EXPAND | wx.ALL, 5)
+
+		# Lista virtual de amigos.
+		self.lista = ListaAmigos(self.panel)
+		self.lista.Bind(wx.EVT_LIST_COL_CLICK, self.on_col_click)
+		self.main_sizer.Add(self.lista, 1, wx.EXPAND | wx.ALL, 5)
+
+		# Botón para cerrar el diálogo.
+		close_btn = wx.Button(self.panel, label="&Cerrar")
+		close_btn.Bind(wx.EVT_BUTTON, lambda event: self.EndModal(wx.ID_OK))
+		self.main_sizer.Add(close_btn, 0, wx.ALL | wx.CENTER, 5)
+
+		self.panel.SetSizer(self.main_sizer)
+		self.update_list()
+
+		# Los cambios que otro programa haga en el archivo se muestran sin cerrar el diálogo.
+		self.circulo.suscribir(self.on_cambios_externos)
+		self.Bind(wx.EVT_WINDOW_DESTROY, self.on_destroy)
+
+	def on_cambios_externos(self, cambios):
+		self.update_list(conservar_seleccion=True)
+
+	def on_destroy(self, event):
+		if event.GetEventObject() is self:
+			self.circulo.desuscribir(self.on_cambios_externos)
+		event.Skip()
+
+	def consulta_actual(self):
+		"""Traduce el filtro elegido a una Consulta del círculo (ver consulta.py)."""
+		filtro = self.filtro_choice.GetStringSelection()
+		consulta = self.circulo.consulta()
+		if filtro in ("Hombres", "Mujeres"):
+			consulta = consulta.genero("M" if filtro == "Hombres" else "F")
+		elif filtro in self.circulo.clasificador.posiciones:
+			consulta = consulta.categoria(filtro)
+		return filtro, consulta
+
+	def on_filter_changed(self, event):
+		self.update_list()
+
+	def on_col_click(self, event):
+		columna = event.GetColumn()
+		if columna == self.columna_orden:
+			self.invertida = not self.invertida
+		else:
+			self.columna_orden = columna
+			self.invertida = False
+		self.update_list()
+
+	def filas_ordenadas(self, filtro, consulta):
+		"""
+		Devuelve los amigos de la consulta en el orden de la columna elegida (sin invertir;
+		la lista se recorre al revés). El planificador de la consulta usa el índice por
+		totales o el de nombres según el filtro y el orden. Por total, sin filtro o con una
+		categoría, ni siquiera se copia el resultado (ver PaginasConsulta).
+		"""
+		if self.columna_orden == COLUMNA_TOTAL and filtro not in ("Hombres", "Mujeres"):
+			return PaginasConsulta(consulta)
+		return consulta.ordenar(COLUMNAS[self.columna_orden][2]).ejecutar()
+
+	@medido
+	def update_list(self, conservar_seleccion=False):
+		"""
+		Actualiza la lista según el filtro y la columna de orden elegidos.
+		La cantidad de amigos filtrados y su porcentaje respecto al total se obtienen
+		con Consulta.contar() (de los contadores del círculo) y se muestran en el encabezado.
+		Con conservar_seleccion, la fila seleccionada sigue siendo la misma (si todavía existe)
+		en lugar de volver a la primera.
+		"""
+		seleccionada = self.lista.GetFirstSelected() if conservar_seleccion else -1
+		filtro, consulta = self.consulta_actual()
+		count = consulta.contar()
+		total_amigos = self.circulo.contar()
+		porcentaje = (count / total_amigos * 100) if total_amigos > 0 else 0
+		self.encabezado.SetLabel(f"Mostrando lista de {count} amigos (Filtro: {filtro}) - {porcentaje:.1f}% del total")
+		self.lista.mostrar(self.filas_ordenadas(filtro, consulta), self.invertida)
+		# El total se muestra de mayor a menor; las demás columnas, en orden ascendente.
+		ascendente = (self.columna_orden != COLUMNA_TOTAL) != self.invertida
+		self.lista.ShowSortIndicator(self.columna_orden, ascendente)
+		if self.lista.GetItemCount() > 0:
+			fila = min(max(seleccionada, 0), self.lista.GetItemCount() - 1)
+			self.lista.Focus(fila)
+			self.lista.Select(fila)
@@ -0,0 +1,233 @@
+﻿# similitud.py
+# Búsqueda de amigos parecidos y agrupamiento del círculo según sus puntuaciones.
+# Cada amigo es un vector con una puntuación por criterio. Con NumPy, las columnas de la
+# tabla de puntuaciones se leen sin copiarlas (np.frombuffer) y la búsqueda recorre todo el
+# círculo por lotes; sin NumPy, la distancia euclídea se poda con el índice por totales.
+# Ninguna de las dos necesita un índice propio: leen la tabla y el índice por totales del
+# círculo, que ya se actualizan con cada alta, cambio o baja.
+
+import heapq
+import random
+from math import sqrt
+
+try:
+	import numpy as np
+except ImportError:
+	np = None
+
+METRICAS = ("euclidea", "coseno")
+
+def _vistas(tabla):
+	"""Vistas NumPy (sin copia) de las columnas de la tabla; no deben conservarse, ya que
+	impiden que la tabla crezca mientras existan."""
+	return [np.frombuffer(columna, dtype=np.uint8) for columna in tabla.columnas]
+
+def _excluidos(circulo, amigo):
+	"""
+	Filas de la tabla que no deben aparecer en los resultados: la del propio amigo y las de
+	los amigos eliminados en una transacción en curso (siguen en la tabla hasta confirmarla).
+	"""
+	excluidos = {amigo._fila} if amigo is not None else set()
+	if circulo._transaccion is not None:
+		excluidos.update(eliminado._fila for eliminado in circulo._transaccion.eliminados)
+	return excluidos
+
+def similares(circulo, amigo, k=10, metrica="euclidea", usar_numpy=True):
+	"""
+	Devuelve los k amigos del círculo más parecidos a 'amigo', como lista de (amigo, valor)
+	del más al menos parecido. Con metrica="euclidea", 'valor' es la distancia euclídea
+	entre los vectores de puntuaciones; con "coseno", la similitud del coseno (1 = misma
+	proporción entre criterios, aunque los totales difieran).
+	"""
+	if metrica not in METRICAS:
+		raise ValueError(f"Métrica desconocida: {metrica!r}.")
+	if k <= 0:
+		return []
+	consulta = amigo._tabla.valores(amigo._fila)
+	excluidos = _excluidos(circulo, amigo)
+	if usar_numpy and np is not None and len(circulo.tabla):
+		return _similares_numpy(circulo.tabla, consulta, k, metrica, excluidos)
+	if metrica == "euclidea":
+		return _euclidea_podada(circulo, consulta, k, excluidos)
+	return _coseno_python(circulo.tabla, consulta, k, excluidos)
+
+def _similares_numpy(tabla, consulta, k, metrica, excluidos):
+	columnas = _vistas(tabla)
+	if metrica == "euclidea":
+		puntaje = np.zeros(len(tabla), dtype=np.int32)
+		for columna, valor in zip(columnas, consulta):
+			diferencia = columna.astype(np.int32) - valor
+			puntaje += diferencia * diferencia
+	else:
+		producto = np.zeros(len(tabla), dtype=np.float64)
+		normas = np.zeros(len(tabla), dtype=np.float64)
+		for columna, valor in zip(columnas, consulta):
+			producto += columna * float(valor)
+			normas += np.square(columna, dtype=np.float64)
+		norma_consulta = sqrt(sum(valor * valor for valor in consulta))
+		with np.errstate(divide='ignore', invalid='ignore'):
+			similitud = producto / (np.sqrt(normas) * norma_consulta)
+		# Un vector nulo no tiene dirección: se considera sin similitud.
+		similitud[~np.isfinite(similitud)] = 0.0
+		puntaje = -similitud
+	del columnas
+	# Se eligen los k mejores sin ordenar todo el círculo, con margen para las filas excluidas.
+	# Entre empates con el último elegido se prefieren las primeras filas, como sin NumPy.
+	cantidad = min(k + len(excluidos), len(puntaje))
+	limite = np.partition(puntaje, cantidad - 1)[cantidad - 1]
+	menores = np.flatnonzero(puntaje < limite)
+	iguales = np.flatnonzero(puntaje == limite)[:cantidad - len(menores)]
+	candidatos = np.concatenate((menores, iguales))
+	candidatos = candidatos[np.lexsort((candidatos, puntaje[candidatos]))]
+	resultado = []
+	for fila in candidatos.tolist():
+		if fila in excluidos:
+			continue
+		valor = float(puntaje[fila])
+		resultado.append((tabla.duenos[fila], sqrt(valor) if metrica == "euclidea" else -valor))
+		if len(resultado) == k:
+			break
+	return resultado
+
+def _euclidea_podada(circulo, consulta, k, excluidos):
+	"""
+	Búsqueda exacta sin NumPy: se recorren las cubetas del índice por totales de la más
+	cercana a la más lejana al total del amigo. Como |Δtotal| <= sqrt(criterios) * distancia,
+	al llegar a una cubeta con Δtotal² / criterios mayor que la k-ésima mejor distancia² ya
+	no puede haber amigos más cercanos y la búsqueda termina.
+	"""
+	columnas = circulo.tabla.columnas
+	dimension = len(columnas)
+	total = sum(consulta)
+	# Montículo de (-distancia², -fila): el peor de los k mejores queda arriba.
+	mejores = []
+	for diferencia, cubeta in circulo.indice.cubetas_cercanas(total):
+		if len(mejores) == k and diferencia * diferencia > -mejores[0][0] * dimension:
+			break
+		for otro in cubeta:
+			fila = otro._fila
+			if fila in excluidos:
+				continue
+			distancia = 0
+			for columna, valor in zip(columnas, consulta):
+				d = columna[fila] - valor
+				distancia += d * d
+			elemento = (-distancia, -fila)
+			if len(mejores) < k:
+				heapq.heappush(mejores, elemento)
+			elif elemento > mejores[0]:
+				heapq.heapreplace(mejores, elemento)
+	tabla = circulo.tabla
+	return [(tabla.duenos[-fila], sqrt(-distancia)) for distancia, fila in sorted(mejores, reverse=True)]
+
+def _coseno_python(tabla, consulta, k, excluidos):
+	norma_consulta = sqrt(sum(valor * valor for valor in consulta))
+	def similitudes():
+		for fila, valores in enumerate(zip(*tabla.columnas)):
+			if fila in excluidos:
+				continue
+			norma = sqrt(sum(valor * valor for valor in valores))
+			producto = sum(a * b for a, b in zip(valores, consulta))
+			yield (producto / (norma * norma_consulta) if norma and norma_consulta else 0.0), -fila
+	return [(tabla.duenos[-fila], similitud) for similitud, fila in heapq.nlargest(k, similitudes())]
+
+def agrupar(circulo, grupos=5, iteraciones=20, semilla=0, usar_numpy=True, muestra=5000):
+	"""
+	Divide el círculo en 'grupos' grupos de amigos con puntuaciones parecidas (k-medias con
+	distancia euclídea, iniciado con k-medias++ y 'semilla' fija, de modo que el resultado
+	se repite). Devuelve una lista de diccionarios {'centroide': {criterio: valor medio},
+	'amigos': [amigos]}, del centroide de mayor al de menor total.
+	Sin NumPy, los centroides se calculan sobre una muestra de hasta 'muestra' amigos y
+	luego se asigna cada amigo al más cercano.
+	"""
+	tabla = circulo.tabla
+	excluidos = _excluidos(circulo, None)
+	filas = [fila for fila in range(len(tabla)) if fila not in excluidos]
+	if not filas or grupos <= 0:
+		return []
+	grupos = min(grupos, len(filas))
+	azar = random.Random(semilla)
+	if usar_numpy and np is not None:
+		columnas = _vistas(tabla)
+		datos = np.column_stack(columnas)[filas].astype(np.float64)
+		del columnas
+		centroides = _kmedias_numpy(datos, grupos, iteraciones, azar)
+		asignacion = _asignar_numpy(datos, centroides)
+		centroides = centroides.tolist()
+		asignacion = asignacion.tolist()
+	else:
+		vectores = [tabla.valores(fila) for fila in filas]
+		base = vectores if len(vectores) <= muestra else azar.sample(vectores, muestra)
+		centroides = _kmedias_python(base, grupos, iteraciones, azar)
+		asignacion = [_mas_cercano(vector, centroides) for vector in vectores]
+	miembros = [[] for _ in centroides]
+	for fila, grupo in zip(filas, asignacion):
+		miembros[grupo].append(tabla.duenos[fila])
+	resultado = [{'centroide': dict(zip(tabla.criterios, centroide)), 'amigos': amigos}
+				 for centroide, amigos in zip(centroides, miembros)]
+	resultado.sort(key=lambda grupo: -sum(grupo['centroide'].values()))
+	return resultado
+
+def _iniciales(vectores, grupos, azar, distancia):
+	"""Elige los centroides iniciales con k-medias++: cada uno, con probabilidad proporcional
+	a la distancia² al centroide más cercano ya elegido."""
+	centroides = [list(vectores[azar.randrange(len(vectores))])]
+	cercanias = [distancia(vector, centroides[0]) for vector in vectores]
+	while len(centroides) < grupos:
+		suma = sum(cercanias)
+		if suma == 0:
+			elegido = azar.randrange(len(vectores))
+		else:
+			objetivo = azar.random() * suma
+			acumulado = 0
+			for elegido, cercania in enumerate(cercanias):
+				acumulado += cercania
+				if acumulado >= objetivo:
+					break
+		centroides.append(list(vectores[elegido]))
+		cercanias = [min(c, distancia(vector, centroides[-1])) for c, vector in zip(cercanias, vectores)]
+	return centroides
+
+def _distancia2(a, b):
+	return sum((x - y) * (x - y) for x, y in zip(a, b))
+
+def _mas_cercano(vector, centroides):
+	return min(range(len(centroides)), key=lambda g: _distancia2(vector, centroides[g]))
+
+def _kmedias_python(vectores, grupos, iteraciones, azar):
+	centroides = _iniciales(vectores, grupos, azar, _distancia2)
+	for _ in range(iteraciones):
+		sumas = [[0.0] * len(vectores[0]) for _ in centroides]
+		cantidades = [0] * len(centroides)
+		for vector in vectores:
+			grupo = _mas_cercano(vector, centroides)
+			cantidades[grupo] += 1
+			suma = sumas[grupo]
+			for i, valor in enumerate(vector):
+				suma[i] += valor
+		nuevos = [[valor / cantidad for valor in suma] if cantidad else centroide
+				  for suma, cantidad, centroide in zip(sumas, cantidades, centroides)]
+		if nuevos == centroides:
+			break
+		centroides = nuevos
+	return centroides
+
+def _asignar_numpy(datos, centroides):
+	# ||x - c||² = ||x||² - 2 x·c + ||c||²; ||x||² no cambia el centroide más cercano.
+	distancias = (centroides * centroides).sum(axis=1) - 2 * datos @ centroides.T
+	return distancias.argmin(axis=1)
+
+def _kmedias_numpy(datos, grupos, iteraciones, azar):
+	# k-medias++ sobre una muestra, para no calcular N distancias por cada centroide inicial.
+	indices = list(range(len(datos))) if len(datos) <= 5000 else azar.sample(range(len(datos)), 5000)
+	muestra = datos[indices]
+	centroides = np.array(_iniciales(muestra.tolist(), grupos, azar, _distancia2))
+	for _ in range(iteraciones):
+		asignacion = _asignar_numpy(datos, centroides)
+		cantidades = np.bincount(asignacion, minlength=grupos)
+		sumas = np.column_stack([np.bincount(asignacion, weights=columna, minlength=grupos) for columna in datos.T])
+		nuevos = np.where(cantidades[:, None] > 0, sumas / np.maximum(cantidades, 1)[:, None], centroides)
+		if np.allclose(nuevos, centroides):
+			break
+		centroides = nuevos
+	return centroides
@@ -0,0 +1,111 @@
+﻿# tabla_puntuaciones.py
+
+from array import array
+from collections.abc import Mapping
+from categorias import clasificador_por_defecto
+
+class TablaPuntuaciones:
+	"""
+	Almacena las puntuaciones de muchos amigos de forma compacta.
+	Hay una columna por criterio (un byte por puntuación) y una fila por amigo;
+	la lista de criterios se guarda una sola vez para todo el círculo.
+	"""
+	def __init__(self, criterios, posiciones=None, clasificador=None):
+		"""
+		:param criterios: Lista de criterios, en el orden de las columnas.
+		:param posiciones: Diccionario {criterio: columna} de otra tabla con los mismos
+		                   criterios; permite crear tablas pequeñas sin reconstruirlo.
+		:param clasificador: Clasificador (ver categorias.py) con el que se asigna la categoría
+		                     de los amigos de la tabla; por defecto, el de los umbrales de siempre.
+		"""
+		self.criterios = criterios
+		if posiciones is None:
+			posiciones = {criterio: i for i, criterio in enumerate(criterios)}
+		self.posiciones = posiciones
+		if clasificador is None:
+			clasificador = clasificador_por_defecto(len(criterios))
+		self.clasificador = clasificador
+		self.columnas = [array('B') for _ in criterios]
+		# Amigo que ocupa cada fila; permite reubicar filas al eliminar.
+		self.duenos = []
+
+	def __len__(self):
+		return len(self.duenos)
+
+	def agregar_fila(self, valores, dueno):
+		"""Agrega una fila con los valores dados (uno por criterio) y devuelve su número."""
+		try:
+			for columna, valor in zip(self.columnas, valores):
+				columna.append(valor)
+		except OverflowError:
+			# Deshacer las columnas ya escritas para no dejar la tabla desalineada.
+			fila = len(self.duenos)
+			for columna in self.columnas:
+				del columna[fila:]
+			raise ValueError("Las puntuaciones deben estar entre 0 y 255.")
+		self.duenos.append(dueno)
+		return len(self.duenos) - 1
+
+	def quitar_fila(self, fila):
+		"""
+		Elimina una fila en O(1): la última fila pasa a ocupar su lugar
+		y se actualiza el número de fila de su dueño.
+		"""
+		ultima = len(self.duenos) - 1
+		if fila != ultima:
+			for columna in self.columnas:
+				columna[fila] = columna[ultima]
+			movido = self.duenos[ultima]
+			self.duenos[fila] = movido
+			movido._fila = fila
+		for columna in self.columnas:
+			columna.pop()
+		self.duenos.pop()
+
+	def valores(self, fila):
+		"""Devuelve la lista de puntuaciones de una fila, en el orden de los criterios."""
+		return [columna[fila] for columna in self.columnas]
+
+	def escribir(self, fila, valores):
+		"""Sobrescribe todas las puntuaciones de una fila."""
+		if not all(0 <= valor <= 255 for valor in valores):
+			raise ValueError("Las puntuaciones deben estar entre 0 y 255.")
+		for columna, valor in zip(self.columnas, valores):
+			columna[fila] = valor
+
+	def total(self, fila):
+		return sum(columna[fila] for columna in self.columnas)
+
+
+class VistaPuntuaciones(Mapping):
+	"""
+	Vista liviana sobre las puntuaciones de un amigo guardadas en su tabla, con la misma
+	interfaz de lectura que un diccionario {criterio: puntuación}. Es de solo lectura: las
+	puntuaciones de un amigo de un círculo se cambian con CirculoAmistad.reevaluar_amigo(),
+	que además mantiene su categoría, el ranking y los contadores.
+	"""
+	__slots__ = ('_amigo',)
+
+	def __init__(self, amigo):
+		self._amigo = amigo
+
+	def __getitem__(self, criterio):
+		amigo = self._amigo
+		tabla = amigo._tabla
+		return tabla.columnas[tabla.posiciones[criterio]][amigo._fila]
+
+	def __contains__(self, criterio):
+		return criterio in self._amigo._tabla.posiciones
+
+	def __iter__(self):
+		return iter(self._amigo._tabla.criterios)
+
+	def __len__(self):
+		return len(self._amigo._tabla.criterios)
+
+	def values(self):
+		amigo = self._amigo
+		return amigo._tabla.valores(amigo._fila)
+
+	def __repr__(self):
+		return repr(dict(self.items()))
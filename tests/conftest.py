@@ -0,0 +1,48 @@
+﻿# conftest.py
+# Utilidades comunes de las pruebas. Los módulos del proyecto están en la carpeta de arriba.
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from amigo import CRITERIOS_POR_DEFECTO
+
+NOMBRES = ["Ana", "Ángel", "Bruno", "Camila", "José", "Jose Luis", "Lucía", "Martín", "Ñandú", "Zoe"]
+
+def puntuaciones_al_azar(azar, criterios=CRITERIOS_POR_DEFECTO):
+	return {criterio: azar.randint(0, 10) for criterio in criterios}
+
+def estado(circulo):
+	"""{id: (nombre, género, puntuaciones)} de cada amigo del círculo."""
+	return {amigo.id: (amigo.nombre, amigo.genero, tuple(amigo.puntuaciones.values())) for amigo in circulo.amigos}
+
+def contenido(circulo):
+	"""Los amigos sin sus ids, ordenados: sirve para comparar círculos que asignaron otros ids."""
+	return sorted(estado(circulo).values())
+
+def mutar(circulo, azar, cantidad):
+	"""Aplica 'cantidad' altas, reevaluaciones y bajas al azar."""
+	for _ in range(cantidad):
+		ids = list(circulo.por_id)
+		sorteo = azar.random()
+		if sorteo < 0.4 or not ids:
+			circulo.agregar_amigo(f"{azar.choice(NOMBRES)} {azar.randint(0, 999)}", puntuaciones_al_azar(azar),
+								  azar.choice("MF"))
+		elif sorteo < 0.75:
+			circulo.reevaluar_amigo(azar.choice(ids), puntuaciones_al_azar(azar),
+									azar.choice([None, f"{azar.choice(NOMBRES)} R"]), azar.choice("MF"))
+		else:
+			circulo.eliminar_amigo(azar.choice(ids))
+
+@pytest.fixture
+def azar():
+	return random.Random(20240607)
+
+@pytest.fixture
+def carpeta(tmp_path, monkeypatch):
+	"""Carpeta temporal como directorio de trabajo (cli.py busca ahí la carpeta de círculos)."""
+	monkeypatch.chdir(tmp_path)
+	return tmp_path
@@ -0,0 +1,85 @@
+﻿# test_almacen_sqlite.py
+# AlmacenSQLite (almacen_sqlite.py) frente al almacén de texto con los mismos cambios.
+
+import sqlite3
+import pytest
+from almacen_sqlite import AlmacenSQLite
+from amigo import CRITERIOS_POR_DEFECTO
+from circulo_amistad import CirculoAmistad
+from conftest import estado, mutar
+
+def _par(carpeta):
+	texto = CirculoAmistad(str(carpeta / "amigos.txt"), diario=True)
+	base = CirculoAmistad(str(carpeta / "amigos.txt"), almacen=AlmacenSQLite(str(carpeta / "amigos.db")))
+	return texto, base
+
+def _traducir(circulo, otro):
+	"""
+	estado(circulo) con los ids de 'otro': cada almacén numera a su manera, pero los dos
+	asignan ids crecientes, así que el n-ésimo id de uno corresponde al n-ésimo del otro.
+	"""
+	ids = dict(zip(sorted(circulo.por_id), sorted(otro.por_id)))
+	return {ids[id_amigo]: amigo for id_amigo, amigo in estado(circulo).items()}
+
+def _base(carpeta):
+	return CirculoAmistad(str(carpeta / "amigos.txt"), almacen=AlmacenSQLite(str(carpeta / "amigos.db")))
+
+def test_la_base_guarda_lo_mismo_que_el_archivo_de_texto(carpeta, azar):
+	texto, base = _par(carpeta)
+	for ronda in range(15):
+		# Los dos círculos reciben la misma secuencia de cambios.
+		semilla = azar.random()
+		for circulo in (texto, base):
+			azar.seed(semilla)
+			if ronda % 3 == 2:
+				with circulo.transaccion():
+					mutar(circulo, azar, 20)
+			else:
+				mutar(circulo, azar, 20)
+		assert _traducir(base, texto) == estado(texto), ronda
+		texto.flush()
+		if azar.random() < 0.3:
+			anterior = estado(base)
+			base.cerrar()
+			base = _base(carpeta)
+			assert estado(base) == anterior, ronda
+		assert _traducir(base, texto) == estado(CirculoAmistad(str(carpeta / "amigos.txt"), diario=True)), ronda
+	ids = dict(zip(sorted(base.por_id), sorted(texto.por_id)))
+	for genero in (None, "M", "F"):
+		for categoria in (None, "Conocido", "Primario"):
+			esperados = [a.id for a in texto.filtrar(genero, categoria)]
+			assert [ids[a.id] for a in base.filtrar(genero, categoria)] == esperados
+			assert [ids[id_amigo] for id_amigo in base.almacen.consultar(genero, categoria)] == esperados
+	texto.cerrar()
+	base.cerrar()
+
+def test_los_ids_de_los_eliminados_no_se_reutilizan(carpeta, azar):
+	base = _base(carpeta)
+	mutar(base, azar, 30)
+	ultimo = max(base.por_id)
+	base.eliminar_amigo(ultimo)
+	base.cerrar()
+	base = _base(carpeta)
+	assert base.agregar_amigo("Nuevo", dict.fromkeys(CRITERIOS_POR_DEFECTO, 1)) > ultimo
+	base.cerrar()
+
+def test_una_base_con_otros_criterios_no_se_abre(carpeta, azar):
+	base = _base(carpeta)
+	mutar(base, azar, 5)
+	base.cerrar()
+	with pytest.raises(ValueError):
+		CirculoAmistad(str(carpeta / "amigos.txt"), CRITERIOS_POR_DEFECTO[:-1],
+					   almacen=AlmacenSQLite(str(carpeta / "amigos.db")))
+
+def test_las_filas_con_otra_cantidad_de_puntuaciones_se_informan(carpeta, azar):
+	base = _base(carpeta)
+	mutar(base, azar, 10)
+	antes = estado(base)
+	base.cerrar()
+	with sqlite3.connect(str(carpeta / "amigos.db")) as conexion:
+		conexion.execute("INSERT INTO amigos (nombre, genero, categoria, total, puntuaciones) VALUES ('Corto', 'M', 'Conocido', 3, ?)",
+						 (bytes([1, 2]),))
+	base = _base(carpeta)
+	assert estado(base) == antes
+	assert [error.contenido for error in base.errores_carga] == ["Corto"]
+	base.cerrar()
@@ -0,0 +1,102 @@
+﻿# test_carga_paralela.py
+# Carga en varios procesos (carga_paralela.py): cuándo se usa, y que carga lo mismo que la secuencial.
+
+import concurrent.futures
+from concurrent.futures import ProcessPoolExecutor
+import os
+import pytest
+import benchmark
+import carga_paralela
+from amigo import CRITERIOS_POR_DEFECTO
+from carga_paralela import procesos_utiles
+from circulo_amistad import CirculoAmistad
+from esquema import leer_esquema
+from tabla_puntuaciones import TablaPuntuaciones
+from conftest import estado, mutar
+
+def _sin_grupo(*argumentos, **opciones):
+	raise AssertionError("no debería crearse un grupo de procesos")
+
+@pytest.mark.parametrize("cpus, procesos, umbral, esperados", [
+	(1, 4, 0, 1),
+	(None, 4, 0, 1),
+	(8, 4, 10 ** 9, 1),
+	(8, 4, 0, 4),
+	(8, None, 0, 8),
+	(8, 16, 0, 8),
+	(8, 1, 0, 1),
+])
+def test_procesos_utiles(carpeta, monkeypatch, cpus, procesos, umbral, esperados):
+	archivo = str(carpeta / "amigos.txt")
+	benchmark.generar_archivo(archivo, 200, CRITERIOS_POR_DEFECTO)
+	monkeypatch.setattr(os, "cpu_count", lambda: cpus)
+	monkeypatch.setattr(carga_paralela, "UMBRAL_PARALELO", umbral)
+	assert procesos_utiles(archivo, procesos) == esperados
+	# El umbral se mide desde 'inicio' (después de la línea de esquema).
+	monkeypatch.setattr(carga_paralela, "UMBRAL_PARALELO", os.path.getsize(archivo))
+	assert procesos_utiles(archivo, procesos, inicio=1) == 1
+	assert procesos_utiles(str(carpeta / "no_existe.txt"), procesos) == 1
+
+@pytest.mark.parametrize("cpus, umbral", [(1, 0), (8, 10 ** 9)])
+def test_sin_varios_cpu_o_con_un_archivo_chico_no_se_crean_procesos(carpeta, monkeypatch, cpus, umbral):
+	archivo = str(carpeta / "amigos.txt")
+	benchmark.generar_archivo(archivo, 500, CRITERIOS_POR_DEFECTO)
+	esperado = estado(CirculoAmistad(archivo))
+	monkeypatch.setattr(os, "cpu_count", lambda: cpus)
+	monkeypatch.setattr(carga_paralela, "UMBRAL_PARALELO", umbral)
+	monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor", _sin_grupo)
+	assert estado(CirculoAmistad(archivo, procesos=4)) == esperado
+	_, inicio = leer_esquema(archivo)
+	amigos = carga_paralela.cargar_en_paralelo(archivo, TablaPuntuaciones(CRITERIOS_POR_DEFECTO), 4, [], inicio)
+	assert [amigo.nombre for amigo in amigos] == [nombre for nombre, _, _ in esperado.values()]
+
+def _con_trozos_chicos(monkeypatch, tamano):
+	"""Muchos trozos chicos, para que las líneas caigan en los bordes de los trozos."""
+	monkeypatch.setattr(carga_paralela, "TAMANO_TROZO", tamano)
+
+@pytest.mark.parametrize("final", ["\n", ""])
+def test_los_trozos_cubren_el_archivo_y_terminan_en_una_linea(carpeta, azar, final):
+	archivo = carpeta / "amigos.txt"
+	lineas = [f"Amigo {i}," + ",".join(["1"] * azar.randint(0, 12)) for i in range(azar.randint(1, 80))]
+	archivo.write_bytes(("\n".join(lineas) + final).encode("latin-1"))
+	datos = archivo.read_bytes()
+	for partes in (1, 2, 3, 7, 50, 500):
+		inicio = azar.choice([0, len(lineas[0]) + 1])
+		trozos = carga_paralela.dividir_en_trozos(str(archivo), partes, inicio)
+		assert trozos[0][0] == inicio and trozos[-1][1] == len(datos)
+		assert all(fin == siguiente for (_, fin), (siguiente, _) in zip(trozos, trozos[1:]))
+		assert all(datos[fin - 1:fin] == b"\n" for _, fin in trozos[:-1])
+		assert len(trozos) <= partes
+
+def test_la_carga_en_procesos_coincide_con_la_secuencial(carpeta, azar, monkeypatch):
+	grupos = []
+	for ronda in range(4):
+		archivo = str(carpeta / f"amigos{ronda}.txt")
+		# Incluye líneas mal formadas y con el formato heredado (ver benchmark.generar_archivo).
+		benchmark.generar_archivo(archivo, azar.randint(0, 400), CRITERIOS_POR_DEFECTO, semilla=ronda,
+								  proporcion_malformadas=0.05)
+		if ronda % 2:
+			# Con diario: los cambios pendientes se aplican igual sobre lo cargado en procesos.
+			circulo = CirculoAmistad(archivo, diario=True)
+			mutar(circulo, azar, 30)
+			circulo.almacen.diario.cerrar()
+		secuencial = CirculoAmistad(archivo, diario=True)
+		_con_trozos_chicos(monkeypatch, azar.choice([64, 1000, 10 ** 6]))
+		monkeypatch.setattr(carga_paralela, "UMBRAL_PARALELO", 0)
+		monkeypatch.setattr(os, "cpu_count", lambda: 2)
+		monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor",
+							lambda *argumentos, **opciones: grupos.append(1) or ProcessPoolExecutor(*argumentos, **opciones))
+		paralelo = CirculoAmistad(archivo, diario=True, procesos=2)
+		monkeypatch.undo()
+		assert estado(paralelo) == estado(secuencial), ronda
+		assert [amigo.categoria for amigo in paralelo.amigos] == [amigo.categoria for amigo in secuencial.amigos]
+		assert paralelo.errores_carga == secuencial.errores_carga, ronda
+	assert grupos
+
+def test_medir_aceleracion_usa_los_procesos_pedidos(carpeta, monkeypatch):
+	archivo = str(carpeta / "amigos.txt")
+	benchmark.generar_archivo(archivo, 300, CRITERIOS_POR_DEFECTO)
+	_con_trozos_chicos(monkeypatch, 1024)
+	curva = carga_paralela.medir_aceleracion(archivo, CRITERIOS_POR_DEFECTO, (1, 2))
+	assert [procesos for procesos, _, _ in curva] == [1, 2]
+	assert curva[0][2] == 1.0 and all(segundos > 0 for _, segundos, _ in curva)
@@ -0,0 +1,90 @@
+﻿# test_categorias.py
+# Categorías (categorias.py) y reclasificar(): frente a recorrer los umbrales total por total.
+
+from collections import Counter
+from importlib.util import find_spec
+import pytest
+from categorias import UMBRALES_CATEGORIAS, Clasificador, cargar_categorias
+from circulo_amistad import CirculoAmistad
+from conftest import mutar
+
+CAMINOS = [False, pytest.param(True, marks=pytest.mark.skipif(find_spec("numpy") is None, reason="sin NumPy"))]
+
+def _umbrales_al_azar(azar):
+	porcentajes = sorted(azar.sample(range(6, 100), azar.randint(0, 6)), reverse=True) + [azar.choice([0, 5])]
+	return [(f"Categoria {i}", porcentaje) for i, porcentaje in enumerate(porcentajes)]
+
+def _categoria(umbrales, num_criterios, total):
+	"""La primera categoría, de mayor a menor, cuyo porcentaje del total máximo alcanza 'total'."""
+	for nombre, porcentaje in umbrales:
+		if total * 100 >= porcentaje * 10 * num_criterios:
+			return nombre
+	return umbrales[-1][0]
+
+def test_la_tabla_coincide_con_recorrer_los_umbrales(azar):
+	for _ in range(40):
+		umbrales = _umbrales_al_azar(azar)
+		num_criterios = azar.randint(1, 12)
+		clasificador = Clasificador(umbrales, num_criterios)
+		for total in range(255 * num_criterios + 1):
+			categoria = _categoria(umbrales, num_criterios, total)
+			assert clasificador.categoria(total) == categoria, (umbrales, num_criterios, total)
+			minimo, maximo = clasificador.rango(categoria)
+			assert minimo <= total and (maximo is None or total <= maximo)
+	assert Clasificador(UMBRALES_CATEGORIAS, 10).rango("Inexistente") == (1, 0)
+
+@pytest.mark.parametrize("umbrales", [
+	[],
+	[("Uno", 50), ("Uno", 10)],
+	[("Con, coma", 50)],
+	[("Sin orden", 10), ("Otro", 50)],
+	[("Fuera", 150)],
+	[("Emoji ☺", 50)],
+])
+def test_umbrales_invalidos(umbrales):
+	with pytest.raises(ValueError):
+		Clasificador(umbrales)
+
+def test_cargar_categorias(carpeta):
+	archivo = str(carpeta / "categorias.txt")
+	# Si no existe, se crea con los umbrales de siempre.
+	assert cargar_categorias(archivo) == (UMBRALES_CATEGORIAS, False)
+	assert cargar_categorias(archivo) == ([(nombre, float(porcentaje)) for nombre, porcentaje in UMBRALES_CATEGORIAS], False)
+	with open(archivo, "w", encoding="utf-8") as destino:
+		destino.write("# comentario\n\nMejor, amigo,75.5\nResto,0\n")
+	# La coma separa el porcentaje: un nombre con coma no es válido y se usan los de siempre.
+	assert cargar_categorias(archivo) == (UMBRALES_CATEGORIAS, True)
+	with open(archivo, "w", encoding="utf-8") as destino:
+		destino.write("Muy cerca,70\n\nLejos,0\n")
+	assert cargar_categorias(archivo) == ([("Muy cerca", 70.0), ("Lejos", 0.0)], False)
+	with open(archivo, "w", encoding="utf-8") as destino:
+		destino.write("Sin porcentaje\n")
+	assert cargar_categorias(archivo) == (UMBRALES_CATEGORIAS, True)
+
+@pytest.mark.parametrize("usar_numpy", CAMINOS)
+def test_reclasificar_coincide_con_clasificar_cada_amigo(carpeta, azar, usar_numpy):
+	archivo = str(carpeta / "amigos.txt")
+	circulo = CirculoAmistad(archivo, diario=True)
+	mutar(circulo, azar, 150)
+	umbrales = UMBRALES_CATEGORIAS
+	for _ in range(8):
+		nuevos = azar.choice([None, _umbrales_al_azar(azar)])
+		antes = {amigo.id: amigo.categoria for amigo in circulo.amigos}
+		cambiados = circulo.reclasificar(nuevos, usar_numpy=usar_numpy)
+		umbrales = nuevos or UMBRALES_CATEGORIAS
+		categorias = {amigo.id: _categoria(umbrales, len(circulo.criterios), amigo.puntuacion_total())
+					  for amigo in circulo.amigos}
+		assert {amigo.id: amigo.categoria for amigo in circulo.amigos} == categorias
+		assert cambiados == sum(antes[id_amigo] != categoria for id_amigo, categoria in categorias.items())
+		assert +circulo.conteo_categorias == Counter(categorias.values())
+		# Las altas y reevaluaciones siguientes usan los nuevos umbrales.
+		mutar(circulo, azar, 10)
+		assert all(amigo.categoria == _categoria(umbrales, len(circulo.criterios), amigo.puntuacion_total())
+				   for amigo in circulo.amigos)
+	circulo.flush()
+	guardado = CirculoAmistad(archivo, diario=True, umbrales=umbrales)
+	assert {amigo.id: amigo.categoria for amigo in guardado.amigos} == {amigo.id: amigo.categoria for amigo in circulo.amigos}
+	with pytest.raises(ValueError):
+		with circulo.transaccion():
+			circulo.reclasificar()
+	circulo.cerrar()
@@ -0,0 +1,42 @@
+﻿# test_cli.py
+# --circulo en la línea de comandos: solo agregar e importar crean un círculo que no existe.
+
+import os
+import pytest
+import cli
+from amigo import CRITERIOS_POR_DEFECTO
+
+PUNTUACIONES = ["5"] * len(CRITERIOS_POR_DEFECTO)
+
+@pytest.mark.parametrize("comando", [
+	["listar"],
+	["filtrar", "--genero", "F"],
+	["estadisticas"],
+	["eliminar", "0"],
+	["reevaluar", "0"] + PUNTUACIONES,
+	["exportar", "copia.csv"],
+	["historial", "0"],
+	["migrar"],
+])
+def test_un_circulo_mal_escrito_no_se_crea(carpeta, capsys, comando):
+	assert cli.main(["--circulo", "Amigos", "agregar", "Ana"] + PUNTUACIONES) == 0
+	capsys.readouterr()
+	assert cli.main(["--circulo", "amigso"] + comando) == 2
+	error = capsys.readouterr().err
+	assert "no existe el círculo 'amigso'" in error
+	assert "'principal'" in error and "'Amigos'" in error
+	assert not any(nombre.startswith("amigso") for nombre in os.listdir(carpeta / "circulos"))
+	assert not os.path.exists("copia.csv")
+
+def test_agregar_e_importar_crean_el_circulo(carpeta, capsys):
+	assert cli.main(["--circulo", "Trabajo", "agregar", "Ana", "--genero", "F"] + PUNTUACIONES) == 0
+	with open("otros.txt", "w", encoding="latin-1") as destino:
+		destino.write("Bruno," + ",".join(PUNTUACIONES) + ",M,Conocido\n")
+	assert cli.main(["--circulo", "Club", "importar", "otros.txt"]) == 0
+	capsys.readouterr()
+	for circulo, nombre in (("Trabajo", "Ana"), ("Club", "Bruno")):
+		assert cli.main(["--circulo", circulo, "listar"]) == 0
+		assert nombre in capsys.readouterr().out
+	assert cli.main(["circulos"]) == 0
+	salida = capsys.readouterr().out
+	assert "Trabajo" in salida and "Club" in salida
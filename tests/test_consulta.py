@@ -0,0 +1,83 @@
+﻿# test_consulta.py
+# Consulta (consulta.py) comparada con un filtrado y un ordenamiento por fuerza bruta.
+
+from circulo_amistad import CirculoAmistad
+from conftest import NOMBRES, mutar, puntuaciones_al_azar
+from indice_nombres import normalizar_nombre
+
+def _clave(circulo, orden):
+	"""Clave de cada orden, según la documentación de Consulta y ORDENES."""
+	posiciones = circulo.clasificador.posiciones
+	claves = {
+		"total": lambda a: (-a.puntuacion_total(), a.id),
+		"nombre": lambda a: (normalizar_nombre(a.nombre), a.id),
+		"categoria": lambda a: (posiciones.get(a.categoria, len(posiciones)), -a.puntuacion_total(), a.id),
+		"genero": lambda a: (a.genero, -a.puntuacion_total(), a.id),
+		"id": lambda a: a.id,
+	}
+	return claves[orden]
+
+def _consulta_al_azar(circulo, azar):
+	"""Devuelve (consulta, función que filtra y ordena la lista de amigos por fuerza bruta)."""
+	consulta = circulo.consulta()
+	condiciones = []
+	if azar.random() < 0.4:
+		genero = azar.choice("MF")
+		consulta = consulta.genero(genero)
+		condiciones.append(lambda a, genero=genero: a.genero == genero)
+	if azar.random() < 0.3:
+		categoria = azar.choice(list(circulo.clasificador.posiciones))
+		consulta = consulta.categoria(categoria)
+		condiciones.append(lambda a, categoria=categoria: a.categoria == categoria)
+	if azar.random() < 0.4:
+		minimo = azar.choice([None, azar.randint(0, 80)])
+		maximo = azar.choice([None, (minimo or 0) + azar.randint(-5, 40)])
+		consulta = consulta.total(minimo, maximo)
+		condiciones.append(lambda a, minimo=minimo, maximo=maximo: (minimo is None or a.puntuacion_total() >= minimo)
+						   and (maximo is None or a.puntuacion_total() <= maximo))
+	if azar.random() < 0.3:
+		criterio = azar.choice(circulo.criterios)
+		minimo = azar.randint(0, 10)
+		consulta = consulta.puntuacion(criterio, minimo)
+		condiciones.append(lambda a, criterio=criterio, minimo=minimo: a.puntuaciones[criterio] >= minimo)
+	if azar.random() < 0.3:
+		prefijo = azar.choice(NOMBRES)[:azar.randint(1, 3)]
+		consulta = consulta.prefijo(prefijo)
+		condiciones.append(lambda a, prefijo=normalizar_nombre(prefijo): normalizar_nombre(a.nombre).startswith(prefijo))
+	if azar.random() < 0.2:
+		consulta = consulta.donde(lambda a: a.id % 3 != 0)
+		condiciones.append(lambda a: a.id % 3 != 0)
+	orden = azar.choice(["total", "total", "nombre", "categoria", "genero", "id"])
+	invertido = azar.random() < 0.25
+	consulta = consulta.ordenar(orden, invertido)
+	desde = azar.choice([0, 0, azar.randint(0, 300)])
+	limite = azar.choice([None, azar.randint(0, 50)])
+	consulta = consulta.desde(desde).limite(limite)
+
+	def fuerza_bruta(amigos):
+		elegidos = [a for a in amigos if all(condicion(a) for condicion in condiciones)]
+		elegidos.sort(key=_clave(circulo, orden), reverse=invertido)
+		return elegidos, elegidos[desde:None if limite is None else desde + limite]
+	return consulta, fuerza_bruta
+
+def test_consulta_coincide_con_la_fuerza_bruta(carpeta, azar):
+	circulo = CirculoAmistad(str(carpeta / "amigos.txt"), diario=True)
+	circulo.agregar_amigos([(f"{azar.choice(NOMBRES)} {i}", puntuaciones_al_azar(azar), azar.choice("MF"))
+							for i in range(600)])
+	for vuelta in range(300):
+		if vuelta % 25 == 0:
+			# Los índices se mantienen con cada cambio: se consulta también después de modificar.
+			mutar(circulo, azar, 40)
+		consulta, fuerza_bruta = _consulta_al_azar(circulo, azar)
+		todos, pagina = fuerza_bruta(circulo.amigos)
+		assert [a.id for a in consulta.ejecutar()] == [a.id for a in pagina], consulta.explicar()
+		assert consulta.contar() == len(todos), consulta.explicar()
+	circulo.cerrar()
+
+def test_una_pagina_del_ranking_sin_filtros_sale_del_indice(carpeta, azar):
+	circulo = CirculoAmistad(str(carpeta / "amigos.txt"))
+	circulo.agregar_amigos([(f"Amigo {i}", puntuaciones_al_azar(azar)) for i in range(500)])
+	consulta = circulo.consulta().desde(450).limite(30)
+	assert "porción directa del índice" in consulta.explicar()
+	assert consulta.ejecutar() == circulo.ranking()[450:480]
+	assert "porción directa" not in circulo.consulta().genero("F").desde(10).explicar()
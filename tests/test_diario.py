@@ -0,0 +1,69 @@
+﻿# test_diario.py
+# Reproducción y compactación del diario de cambios (diario.py y AlmacenTexto).
+
+import os
+from circulo_amistad import CirculoAmistad
+from conftest import estado, mutar, puntuaciones_al_azar
+
+def _pendientes(archivo):
+	"""Registros de altas, cambios y bajas del diario (los de marca e ids no son cambios)."""
+	if not os.path.exists(archivo + ".diario"):
+		return []
+	with open(archivo + ".diario", encoding="latin-1") as diario:
+		return [linea for linea in diario if linea[:1] in ("A", "U", "D")]
+
+def _abandonar(circulo):
+	"""Cierra el diario sin compactarlo, como un cierre inesperado del programa."""
+	circulo.almacen.diario.cerrar()
+
+def test_el_diario_se_reproduce_tras_un_cierre_inesperado(carpeta, azar):
+	archivo = str(carpeta / "amigos.txt")
+	circulo = CirculoAmistad(archivo, diario=True)
+	mutar(circulo, azar, 30)
+	circulo.guardar_amigos()
+	for ronda in range(5):
+		mutar(circulo, azar, 20)
+		esperado = estado(circulo)
+		_abandonar(circulo)
+		assert _pendientes(archivo)
+		circulo = CirculoAmistad(archivo, diario=True)
+		assert estado(circulo) == esperado, ronda
+	circulo.cerrar()
+
+def test_sin_modo_diario_el_diario_pendiente_se_vuelca_al_archivo(carpeta, azar):
+	archivo = str(carpeta / "amigos.txt")
+	circulo = CirculoAmistad(archivo, diario=True)
+	mutar(circulo, azar, 40)
+	esperado = estado(circulo)
+	_abandonar(circulo)
+	circulo = CirculoAmistad(archivo)
+	assert estado(circulo) == esperado
+	assert _pendientes(archivo) == []
+	assert estado(CirculoAmistad(archivo)) == esperado
+
+def test_la_compactacion_vacia_el_diario_sin_perder_cambios(carpeta, azar):
+	archivo = str(carpeta / "amigos.txt")
+	circulo = CirculoAmistad(archivo, diario=True, umbral_compactacion=7)
+	for _ in range(10):
+		mutar(circulo, azar, azar.randint(1, 9))
+		# Nunca quedan en el diario más registros que el umbral.
+		assert circulo.almacen._registros < 7
+		esperado = estado(circulo)
+		_abandonar(circulo)
+		circulo = CirculoAmistad(archivo, diario=True, umbral_compactacion=7)
+		assert estado(circulo) == esperado
+	circulo.cerrar()
+	assert _pendientes(archivo) == []
+	assert estado(CirculoAmistad(archivo)) == esperado
+
+def test_los_ids_de_los_amigos_eliminados_no_se_reutilizan(carpeta, azar):
+	archivo = str(carpeta / "amigos.txt")
+	for diario in (False, True):
+		circulo = CirculoAmistad(archivo, diario=diario)
+		ids = [circulo.agregar_amigo(f"Amigo {i}", puntuaciones_al_azar(azar)) for i in range(5)]
+		circulo.eliminar_amigo(ids[-1])
+		circulo.cerrar()
+		circulo = CirculoAmistad(archivo, diario=diario)
+		assert circulo.agregar_amigo("Nuevo", puntuaciones_al_azar(azar)) > ids[-1]
+		circulo.cerrar()
+		os.remove(archivo)
@@ -0,0 +1,110 @@
+﻿# test_esquema.py
+# Archivos anteriores a la línea de esquema: no se reinterpretan con otros criterios ni pierden líneas.
+
+import pytest
+import cli
+from amigo import CRITERIOS_POR_DEFECTO
+from circulo_amistad import CirculoAmistad
+from conftest import contenido, estado, mutar
+
+CRITERIOS_NUEVOS = CRITERIOS_POR_DEFECTO + ["Lealtad"]
+
+def _sin_esquema(carpeta, azar, cantidad=25):
+	"""Escribe amigos.txt con los criterios de ejemplo y sin línea de esquema; devuelve su estado."""
+	archivo = str(carpeta / "amigos.txt")
+	circulo = CirculoAmistad(archivo, CRITERIOS_POR_DEFECTO)
+	mutar(circulo, azar, cantidad)
+	circulo.cerrar()
+	with open(archivo, encoding="latin-1") as origen:
+		lineas = origen.readlines()
+	assert lineas[0].startswith("#esquema")
+	with open(archivo, "w", encoding="latin-1") as destino:
+		destino.writelines(lineas[1:])
+	return archivo, [amigo for _, amigo in sorted(estado(CirculoAmistad(archivo, CRITERIOS_POR_DEFECTO)).items())]
+
+def _criterios(carpeta, criterios):
+	with open(carpeta / "criterios.txt", "w", encoding="utf-8") as archivo:
+		archivo.write("\n".join(criterios) + "\n")
+
+def _leer(archivo):
+	with open(archivo, "rb") as origen:
+		return origen.read()
+
+def test_un_archivo_sin_esquema_no_se_abre_con_otros_criterios(carpeta, azar):
+	archivo, _ = _sin_esquema(carpeta, azar)
+	antes = _leer(archivo)
+	with pytest.raises(ValueError, match="migrar"):
+		CirculoAmistad(archivo, CRITERIOS_NUEVOS)
+	with pytest.raises(ValueError, match="migrar"):
+		CirculoAmistad(archivo, CRITERIOS_NUEVOS, diario=True, procesos=2)
+	assert _leer(archivo) == antes
+
+def test_la_linea_de_comandos_no_reescribe_un_archivo_sin_esquema(carpeta, azar, capsys):
+	archivo, _ = _sin_esquema(carpeta, azar)
+	antes = _leer(archivo)
+	_criterios(carpeta, CRITERIOS_NUEVOS)
+	assert cli.main(["agregar", "Zed"] + ["5"] * len(CRITERIOS_NUEVOS)) == 2
+	assert "migrar" in capsys.readouterr().err
+	assert _leer(archivo) == antes
+
+def test_migrar_un_archivo_sin_esquema_conserva_las_puntuaciones(carpeta, azar):
+	archivo, amigos = _sin_esquema(carpeta, azar)
+	with open(archivo, "a", encoding="latin-1") as destino:
+		destino.write("linea rota\n")
+	_criterios(carpeta, CRITERIOS_NUEVOS)
+	# La línea inválida se conserva y se informa con el código 2.
+	assert cli.main(["migrar", "--defecto", "5"]) == 2
+	circulo = CirculoAmistad(archivo, CRITERIOS_NUEVOS)
+	assert [amigo for _, amigo in sorted(estado(circulo).items())] == [
+		(nombre, genero, puntuaciones + (5,)) for nombre, genero, puntuaciones in amigos]
+	assert len(circulo.errores_carga) == 1
+	with open(archivo, encoding="latin-1") as origen:
+		assert origen.read().splitlines()[-1] == "linea rota"
+
+def test_migrar_desde_los_criterios_con_que_se_escribio(carpeta, azar):
+	archivo, amigos = _sin_esquema(carpeta, azar)
+	anteriores = carpeta / "anteriores.txt"
+	with open(anteriores, "w", encoding="utf-8") as destino:
+		destino.write("\n".join(CRITERIOS_POR_DEFECTO) + "\n")
+	_criterios(carpeta, CRITERIOS_NUEVOS[::-1])
+	assert cli.main(["migrar", "--desde", str(anteriores)]) == 0
+	circulo = CirculoAmistad(archivo, CRITERIOS_NUEVOS[::-1])
+	assert [amigo for _, amigo in sorted(estado(circulo).items())] == [
+		(nombre, genero, (0,) + puntuaciones[::-1]) for nombre, genero, puntuaciones in amigos]
+
+def test_las_lineas_invalidas_sobreviven_al_guardado(carpeta, azar):
+	archivo = str(carpeta / "amigos.txt")
+	circulo = CirculoAmistad(archivo)
+	mutar(circulo, azar, 10)
+	circulo.cerrar()
+	with open(archivo, "a", encoding="latin-1") as destino:
+		destino.write("sin puntuaciones\nOtro,1,2,3\n")
+	circulo = CirculoAmistad(archivo)
+	assert len(circulo.errores_carga) == 2
+	mutar(circulo, azar, 10)
+	circulo.guardar_amigos()
+	with open(archivo, encoding="latin-1") as origen:
+		assert origen.read().splitlines()[-2:] == ["sin puntuaciones", "Otro,1,2,3"]
+	assert estado(CirculoAmistad(archivo)) == estado(circulo)
+	assert cli.main(["listar"]) == 2
+
+def test_la_migracion_aparta_las_lineas_que_parecerian_un_amigo(carpeta, azar, capsys):
+	archivo = str(carpeta / "amigos.txt")
+	circulo = CirculoAmistad(archivo)
+	mutar(circulo, azar, 10)
+	circulo.cerrar()
+	antes = contenido(CirculoAmistad(archivo))
+	# Con un criterio más, la primera se leería como un amigo con puntuaciones que no son suyas.
+	sobrante = "Sobrante," + ",".join(["3"] * len(CRITERIOS_NUEVOS)) + ",M,Conocido"
+	with open(archivo, "a", encoding="latin-1") as destino:
+		destino.write(sobrante + "\nlinea rota\n")
+	capsys.readouterr()
+	# Al abrir con un criterio agregado, el archivo se migra solo.
+	circulo = CirculoAmistad(archivo, CRITERIOS_NUEVOS)
+	salida = capsys.readouterr().out
+	assert "1 líneas" in salida and ".rechazadas" in salida
+	# Editar el archivo a mano deja de lado el diario: se comparan los amigos sin sus ids.
+	assert contenido(circulo) == sorted((nombre, genero, puntuaciones + (0,)) for nombre, genero, puntuaciones in antes)
+	assert [error.contenido for error in circulo.errores_carga] == ["linea rota"]
+	with open(archivo + ".rechazadas", encoding="latin-1") as rechazadas:
+		assert rechazadas.read() == sobrante + "\n"
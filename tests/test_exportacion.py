@@ -0,0 +1,106 @@
+﻿# test_exportacion.py
+# Exportación (exportacion.py): cada formato, leído de vuelta, tiene los amigos en el orden recibido.
+
+import csv
+import json
+from html.parser import HTMLParser
+import pytest
+import cli
+from circulo_amistad import CirculoAmistad
+from exportacion import exportar, filas, formato_de
+from flujo_amigos import iter_amigos
+from conftest import mutar
+
+class _Celdas(HTMLParser):
+	"""Junta el texto de las celdas de cada fila de la tabla."""
+	def __init__(self):
+		super().__init__()
+		self.filas = []
+		self.en_celda = False
+
+	def handle_starttag(self, etiqueta, atributos):
+		if etiqueta == "tr":
+			self.filas.append([])
+		elif etiqueta in ("td", "th"):
+			self.filas[-1].append("")
+			self.en_celda = True
+
+	def handle_endtag(self, etiqueta):
+		if etiqueta in ("td", "th"):
+			self.en_celda = False
+
+	def handle_data(self, texto):
+		if self.en_celda:
+			self.filas[-1][-1] += texto
+
+def _leer(destino):
+	"""Las filas exportadas como listas de texto, sin el encabezado."""
+	formato = formato_de(destino)
+	if formato == "csv":
+		with open(destino, encoding="utf-8-sig", newline="") as origen:
+			return list(csv.reader(origen))[1:]
+	with open(destino, encoding="utf-8") as origen:
+		texto = origen.read()
+	if formato == "jsonl":
+		objetos = [json.loads(linea) for linea in texto.splitlines()]
+		return [[str(objeto["id"]), objeto["nombre"], objeto["genero"], objeto["categoria"], str(objeto["total"])]
+				+ [str(valor) for valor in objeto["puntuaciones"].values()] for objeto in objetos]
+	celdas = _Celdas()
+	celdas.feed(texto)
+	return [[id_amigo, nombre, "F" if genero == "Mujer" else "M"] + resto for id_amigo, nombre, genero, *resto in celdas.filas[1:]]
+
+def _esperadas(amigos):
+	return [[str(amigo.id), amigo.nombre, amigo.genero, amigo.categoria, str(amigo.puntuacion_total())]
+			+ [str(valor) for valor in amigo.puntuaciones.values()] for amigo in amigos]
+
+def _circulo(carpeta, azar):
+	circulo = CirculoAmistad(str(carpeta / "amigos.txt"))
+	mutar(circulo, azar, 120)
+	# Caracteres que cada formato debe escapar.
+	circulo.agregar_amigo('Con "comillas" <b>&amp;</b> ñ', dict.fromkeys(circulo.criterios, 7), "F")
+	return circulo
+
+@pytest.mark.parametrize("extension", [".csv", ".jsonl", ".html"])
+def test_cada_formato_conserva_los_amigos_y_su_orden(carpeta, azar, extension):
+	circulo = _circulo(carpeta, azar)
+	destino = str(carpeta / f"informe{extension}")
+	avisos = []
+	ranking = circulo.ranking()
+	# Con lotes chicos, el progreso se informa varias veces.
+	assert exportar(ranking, circulo.criterios, destino, progreso=lambda *aviso: avisos.append(aviso),
+					total=len(ranking), tamano_lote=25) == len(ranking)
+	assert _leer(destino) == _esperadas(ranking)
+	assert avisos == [(min(escritos, len(ranking)), len(ranking)) for escritos in range(25, len(ranking) + 25, 25)]
+	# Las filas copiadas antes, o el archivo leído sin cargar el círculo, dan lo mismo.
+	assert exportar(filas(ranking), circulo.criterios, destino) == len(ranking)
+	assert _leer(destino) == _esperadas(ranking)
+	circulo.cerrar()
+	exportar(iter_amigos(str(carpeta / "amigos.txt"), circulo.criterios), circulo.criterios, destino)
+	assert [fila[1:] for fila in _leer(destino)] == [fila[1:] for fila in _esperadas(circulo.amigos)]
+
+def test_cancelar_o_fallar_no_toca_el_destino(carpeta, azar):
+	circulo = _circulo(carpeta, azar)
+	destino = carpeta / "informe.csv"
+	destino.write_text("anterior")
+
+	def fallar():
+		yield from circulo.amigos[:10]
+		raise OSError("disco lleno")
+	with pytest.raises(OSError):
+		exportar(fallar(), circulo.criterios, str(destino), tamano_lote=3)
+	consultas = []
+	assert exportar(circulo.amigos, circulo.criterios, str(destino), tamano_lote=2,
+					cancelar=lambda: consultas.append(1) or len(consultas) > 2) is None
+	assert destino.read_text() == "anterior"
+	assert not (carpeta / "informe.csv.tmp").exists()
+	with pytest.raises(ValueError):
+		formato_de("informe.pdf")
+
+def test_la_linea_de_comandos_exporta_la_consulta(carpeta, azar):
+	circulo = _circulo(carpeta, azar)
+	circulo.cerrar()
+	assert cli.main(["exportar", "mujeres.jsonl", "--genero", "F", "--orden", "nombre", "--limite", "7"]) == 0
+	esperados = circulo.consulta().genero("F").ordenar("nombre").limite(7).ejecutar()
+	assert _leer(str(carpeta / "mujeres.jsonl")) == _esperadas(esperados)
+	with pytest.raises(SystemExit):
+		cli.main(["exportar", "copia.txt", "--genero", "X"])
@@ -0,0 +1,79 @@
+﻿# test_formato_binario.py
+# Formato binario (formato_binario.py): la conversión desde y hacia el texto no pierde nada.
+
+import pytest
+from amigo import CRITERIOS_POR_DEFECTO
+from circulo_amistad import CirculoAmistad
+from formato_binario import (ArchivoBinario, binario_a_texto, cadenas_a_bytes, escribir_binario, leer_cadenas,
+							 texto_a_binario)
+from tabla_puntuaciones import TablaPuntuaciones
+from conftest import mutar
+
+def _lineas(archivo):
+	"""Las líneas de amigos del archivo, sin la línea de esquema."""
+	with open(archivo, encoding="latin-1") as origen:
+		return [linea for linea in origen.read().splitlines() if not linea.startswith("#esquema")]
+
+def _texto(carpeta, azar, cantidad=80):
+	archivo = str(carpeta / "amigos.txt")
+	circulo = CirculoAmistad(archivo)
+	mutar(circulo, azar, cantidad)
+	circulo.cerrar()
+	# Nombres repetidos y una categoría que no es de las conocidas.
+	with open(archivo, "a", encoding="latin-1") as destino:
+		destino.write("Doble," + ",".join(["1"] * len(CRITERIOS_POR_DEFECTO)) + ",M,Vecino\n")
+		destino.write("Doble," + ",".join(["9"] * len(CRITERIOS_POR_DEFECTO)) + ",F,Vecino\n")
+	return archivo
+
+def test_las_cadenas_se_leen_como_se_escribieron():
+	cadenas = ["", "Confianza", "Ñandú", "x" * 300]
+	for formato in ("<H", "<I"):
+		datos = b"relleno" + cadenas_a_bytes(cadenas, formato) + b"resto"
+		assert leer_cadenas(datos, len(b"relleno"), len(cadenas), formato) == (cadenas, len(datos) - len(b"resto"))
+
+def test_texto_binario_texto_reproduce_las_lineas(carpeta, azar):
+	archivo = _texto(carpeta, azar)
+	with open(archivo, "a", encoding="latin-1") as destino:
+		destino.write("linea rota\nFuera,300" + ",1" * (len(CRITERIOS_POR_DEFECTO) - 1) + ",M,Conocido\n")
+	errores = []
+	binario = str(carpeta / "amigos.bin")
+	lineas = _lineas(archivo)[:-2]
+	assert texto_a_binario(archivo, binario, CRITERIOS_POR_DEFECTO, errores) == len(lineas)
+	assert [numero for numero, _ in errores] == [len(lineas) + 2, len(lineas) + 3]
+	assert binario_a_texto(binario, str(carpeta / "copia.txt")) == len(lineas)
+	assert _lineas(carpeta / "copia.txt") == lineas
+
+def test_la_carga_por_columnas_coincide_con_la_lectura_de_registros(carpeta, azar):
+	archivo = _texto(carpeta, azar)
+	binario = str(carpeta / "amigos.bin")
+	texto_a_binario(archivo, binario, CRITERIOS_POR_DEFECTO)
+	circulo = CirculoAmistad(archivo)
+	with ArchivoBinario(binario) as origen:
+		amigos = origen.cargar_en_tabla(TablaPuntuaciones(CRITERIOS_POR_DEFECTO))
+		registros = list(origen)
+	assert [(a.nombre, a.genero, list(a.puntuaciones.values())) for a in amigos] == \
+		[(nombre, genero, puntuaciones) for nombre, puntuaciones, genero, _ in registros] == \
+		[(a.nombre, a.genero, list(a.puntuaciones.values())) for a in circulo.amigos]
+
+def test_las_modificaciones_en_su_lugar_se_conservan(carpeta, azar):
+	binario = str(carpeta / "amigos.bin")
+	esperados = [(f"Amigo {i}", [azar.randint(0, 10) for _ in CRITERIOS_POR_DEFECTO], azar.choice("MF"), "Conocido")
+				 for i in range(5)]
+	escribir_binario(binario, CRITERIOS_POR_DEFECTO, esperados)
+	with ArchivoBinario(binario, escritura=True) as destino:
+		for _ in range(60):
+			if azar.random() < 0.5:
+				# Superar la capacidad reescribe el archivo con más lugar.
+				esperados.append((f"Nuevo {len(esperados)}", [azar.randint(0, 10) for _ in CRITERIOS_POR_DEFECTO], "F", "Primario"))
+				assert destino.agregar(*esperados[-1]) == len(esperados) - 1
+			else:
+				indice = azar.randrange(len(esperados))
+				nombre, puntuaciones, genero, categoria = esperados[indice]
+				puntuaciones = [azar.randint(0, 10) for _ in CRITERIOS_POR_DEFECTO]
+				nombre = azar.choice([nombre, f"Renombrado ñ {indice}"])
+				esperados[indice] = (nombre, puntuaciones, genero, "Secundario")
+				destino.actualizar(indice, puntuaciones=puntuaciones, categoria="Secundario", nombre=nombre)
+		with pytest.raises(ValueError):
+			destino.agregar("Otro", [1] * len(CRITERIOS_POR_DEFECTO), "M", "Inexistente")
+	with ArchivoBinario(binario) as origen:
+		assert list(origen) == esperados
@@ -0,0 +1,192 @@
+﻿# test_historial.py
+# Historial de reevaluaciones (historial.py) comparado con una lista de eventos en memoria.
+
+import heapq
+import os
+import time
+import pytest
+from amigo import CRITERIOS_POR_DEFECTO
+from categorias import clasificador_por_defecto
+from historial import Evaluacion, Historial
+
+INICIO = 1_700_000_000
+
+class Modelo:
+	"""Los mismos eventos que se anotan, guardados tal cual: (fecha, tipo, id, valores anteriores, valores)."""
+	def __init__(self):
+		self.eventos = []
+		self.actuales = {}
+		self.conocidos = set()
+
+	def anotar(self, historial, altas, cambios, bajas, fecha):
+		historial.anotar(altas, cambios, bajas, fecha)
+		for id_amigo, valores in altas:
+			self.eventos.append((fecha, "alta", id_amigo, None, list(valores)))
+			self.actuales[id_amigo] = list(valores)
+		for id_amigo, anteriores, valores in cambios:
+			if anteriores == valores:
+				continue
+			if id_amigo not in self.conocidos:
+				self.eventos.append((fecha, "alta", id_amigo, None, list(anteriores)))
+			self.eventos.append((fecha, "cambio", id_amigo, list(anteriores), list(valores)))
+			self.actuales[id_amigo] = list(valores)
+		for id_amigo in bajas:
+			self.eventos.append((fecha, "baja", id_amigo, None, None))
+			del self.actuales[id_amigo]
+		self.conocidos.update(self.actuales)
+
+	def trayectoria(self, id_amigo):
+		return [Evaluacion(fecha, None, None) if tipo == "baja" else
+				Evaluacion(fecha, dict(zip(CRITERIOS_POR_DEFECTO, valores)), sum(valores))
+				for fecha, tipo, otro, _, valores in self.eventos if otro == id_amigo]
+
+	def _periodo(self, desde, hasta):
+		return [evento for evento in self.eventos
+				if (desde is None or evento[0] >= desde) and (hasta is None or evento[0] <= hasta)]
+
+	def mayores_caidas(self, desde, hasta, k, ids):
+		totales = {}
+		for _, tipo, id_amigo, anteriores, valores in self._periodo(desde, hasta):
+			if tipo == "alta":
+				totales[id_amigo] = [sum(valores), sum(valores)]
+			elif tipo == "cambio":
+				totales.setdefault(id_amigo, [sum(anteriores), None])[1] = sum(valores)
+			else:
+				totales.pop(id_amigo, None)
+		caidas = [(final - inicial, id_amigo, inicial, final) for id_amigo, (inicial, final) in totales.items()
+				  if final < inicial and (ids is None or id_amigo in ids)]
+		return [(id_amigo, inicial, final) for _, id_amigo, inicial, final in heapq.nsmallest(k, caidas)]
+
+	def transiciones(self, desde, hasta):
+		categorias = clasificador_por_defecto(len(CRITERIOS_POR_DEFECTO)).por_total
+		return [(fecha, id_amigo, categorias[sum(anteriores)], categorias[sum(valores)])
+				for fecha, tipo, id_amigo, anteriores, valores in self._periodo(desde, hasta)
+				if tipo == "cambio" and categorias[sum(anteriores)] != categorias[sum(valores)]]
+
+def _valores(azar):
+	return [azar.randint(0, 10) for _ in CRITERIOS_POR_DEFECTO]
+
+def _lote(modelo, azar, siguiente_id):
+	"""Un lote al azar de altas, cambios (algunos sin cambios o de amigos anteriores al historial) y bajas."""
+	altas = []
+	for _ in range(azar.randint(0, 6)):
+		altas.append((siguiente_id, _valores(azar)))
+		siguiente_id += 1
+	vivos = list(modelo.actuales)
+	cambios = []
+	for id_amigo in azar.sample(vivos, min(len(vivos), azar.randint(0, 8))):
+		nuevos = list(modelo.actuales[id_amigo])
+		for _ in range(azar.randint(0, 3)):
+			nuevos[azar.randrange(len(nuevos))] = azar.randint(0, 10)
+		cambios.append((id_amigo, modelo.actuales[id_amigo], nuevos))
+	if azar.random() < 0.2:
+		# Un amigo que ya existía antes de llevar historial.
+		cambios.append((siguiente_id, _valores(azar), _valores(azar)))
+		siguiente_id += 1
+	elegidos = {id_amigo for id_amigo, _, _ in cambios}
+	bajas = [id_amigo for id_amigo in azar.sample(vivos, min(len(vivos), azar.randint(0, 2))) if id_amigo not in elegidos]
+	return altas, cambios, bajas, siguiente_id
+
+def _comparar(historial, modelo, azar):
+	for id_amigo in azar.sample(sorted(modelo.conocidos), min(len(modelo.conocidos), 30)) + [10 ** 9]:
+		assert historial.trayectoria(id_amigo) == modelo.trayectoria(id_amigo), id_amigo
+	fechas = [evento[0] for evento in modelo.eventos] or [INICIO]
+	for _ in range(10):
+		desde = azar.choice([None, azar.randint(fechas[0] - 10, fechas[-1] + 10)])
+		hasta = azar.choice([None, azar.randint(desde or fechas[0], fechas[-1] + 10)])
+		k = azar.randint(1, 20)
+		vivos = azar.choice([None, set(modelo.actuales)])
+		assert historial.mayores_caidas(desde, hasta, k, vivos) == modelo.mayores_caidas(desde, hasta, k, vivos)
+		assert historial.transiciones(desde, hasta) == modelo.transiciones(desde, hasta)
+
+def test_el_historial_coincide_con_los_eventos_anotados(carpeta, azar):
+	archivo = str(carpeta / "amigos.txt.historial")
+	modelo = Modelo()
+	historial = Historial(archivo, CRITERIOS_POR_DEFECTO)
+	fecha = INICIO
+	siguiente_id = 0
+	for ronda in range(30):
+		for _ in range(azar.randint(1, 40)):
+			# Saltos cortos y largos, para que se escriban marcas por tiempo y por cantidad.
+			fecha += azar.choice([0, 0, 1, 300, 20_000])
+			altas, cambios, bajas, siguiente_id = _lote(modelo, azar, siguiente_id)
+			modelo.anotar(historial, altas, cambios, bajas, fecha)
+		_comparar(historial, modelo, azar)
+		sorteo = azar.random()
+		if sorteo < 0.3:
+			# Se reabre con el índice...
+			historial.cerrar()
+			historial = Historial(archivo, CRITERIOS_POR_DEFECTO)
+		elif sorteo < 0.5:
+			# ... o sin él, recorriendo el archivo.
+			historial.cerrar()
+			os.remove(archivo + ".idx")
+			historial = Historial(archivo, CRITERIOS_POR_DEFECTO)
+	assert len(historial) == len(modelo.eventos)
+	historial.cerrar()
+
+def test_los_registros_de_otro_programa_se_incorporan(carpeta, azar):
+	archivo = str(carpeta / "amigos.txt.historial")
+	modelo = Modelo()
+	propio = Historial(archivo, CRITERIOS_POR_DEFECTO)
+	ajeno = Historial(archivo, CRITERIOS_POR_DEFECTO)
+	siguiente_id = 0
+	for paso in range(60):
+		historial = azar.choice([propio, ajeno])
+		altas, cambios, bajas, siguiente_id = _lote(modelo, azar, siguiente_id)
+		modelo.anotar(historial, altas, cambios, bajas, INICIO + paso * 100)
+	# Un cierre del otro programa guarda su índice, que no debe ocultar lo anotado después.
+	ajeno.cerrar()
+	altas, cambios, bajas, siguiente_id = _lote(modelo, azar, siguiente_id)
+	modelo.anotar(propio, altas, cambios, bajas, INICIO + 10_000)
+	for historial in (propio, Historial(archivo, CRITERIOS_POR_DEFECTO)):
+		_comparar(historial, modelo, azar)
+	propio.cerrar()
+
+def test_un_registro_incompleto_se_recorta(carpeta, azar):
+	archivo = str(carpeta / "amigos.txt.historial")
+	modelo = Modelo()
+	historial = Historial(archivo, CRITERIOS_POR_DEFECTO)
+	modelo.anotar(historial, [(1, _valores(azar)), (2, _valores(azar))], [], [], INICIO)
+	historial.cerrar()
+	with open(archivo, "ab") as destino:
+		# Comienzo de un alta que se interrumpió.
+		destino.write(bytes([3 << 2, 5]))
+	historial = Historial(archivo, CRITERIOS_POR_DEFECTO)
+	modelo.anotar(historial, [], [(1, modelo.actuales[1], [10] * len(CRITERIOS_POR_DEFECTO))], [], INICIO + 5)
+	_comparar(Historial(archivo, CRITERIOS_POR_DEFECTO), modelo, azar)
+	historial.cerrar()
+
+def test_el_historial_diferido_escribe_en_segundo_plano(carpeta, azar):
+	archivo = str(carpeta / "amigos.txt.historial")
+	modelo = Modelo()
+	historial = Historial(archivo, CRITERIOS_POR_DEFECTO, diferido=True)
+	siguiente_id = 0
+	for paso in range(50):
+		altas, cambios, bajas, siguiente_id = _lote(modelo, azar, siguiente_id)
+		modelo.anotar(historial, altas, cambios, bajas, INICIO + paso)
+	# Las consultas esperan a que se escriba lo encolado.
+	_comparar(historial, modelo, azar)
+	modelo.anotar(historial, [(siguiente_id, _valores(azar))], [], [], INICIO + 100)
+	historial.cerrar()
+	assert historial.escritor is None
+	_comparar(Historial(archivo, CRITERIOS_POR_DEFECTO), modelo, azar)
+
+@pytest.mark.skipif(os.name != "posix", reason="el bloqueo se toma con fcntl")
+def test_anotar_en_diferido_no_espera_el_bloqueo_de_otro_programa(carpeta, azar):
+	import fcntl
+	archivo = str(carpeta / "amigos.txt.historial")
+	modelo = Modelo()
+	historial = Historial(archivo, CRITERIOS_POR_DEFECTO, diferido=True)
+	with open(archivo + ".bloqueo", "a+b") as bloqueo:
+		fcntl.flock(bloqueo.fileno(), fcntl.LOCK_EX)
+		inicio = time.perf_counter()
+		modelo.anotar(historial, [(1, _valores(azar))], [], [], INICIO)
+		assert time.perf_counter() - inicio < 0.1
+		time.sleep(0.3)
+		# El hilo de escritura sigue esperando el bloqueo: nada se escribió.
+		assert not os.path.exists(archivo)
+		fcntl.flock(bloqueo.fileno(), fcntl.LOCK_UN)
+	historial.flush()
+	_comparar(historial, modelo, azar)
+	historial.cerrar()
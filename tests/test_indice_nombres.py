@@ -0,0 +1,59 @@
+﻿# test_indice_nombres.py
+# IndiceNombres (indice_nombres.py) frente a recorrer todos los amigos y comparar nombres.
+
+from types import SimpleNamespace
+import pytest
+import indice_nombres
+from indice_nombres import IndiceNombres, normalizar_nombre
+from conftest import NOMBRES
+
+def _nombre(azar):
+	return azar.choice(["", " ", "  "]) + f"{azar.choice(NOMBRES)}{azar.choice(['', ' ', '  '])}{azar.randint(0, 30)}"
+
+def _prefijos(azar, por_id):
+	nombres = [amigo.nombre for amigo in por_id.values()] or ["ana"]
+	elegido = normalizar_nombre(azar.choice(nombres))
+	return ["", "zzz", "a", "á", "JOSE", " jose  l", elegido[:azar.randint(0, len(elegido))], elegido]
+
+def _comparar(indice, por_id, azar):
+	for nombre in {amigo.nombre for amigo in por_id.values()} | {"Nadie", "ángel 3", "ANGEL  3"}:
+		esperados = [amigo for amigo in por_id.values() if normalizar_nombre(amigo.nombre) == normalizar_nombre(nombre)]
+		assert indice.buscar(nombre) == sorted(esperados, key=lambda amigo: amigo.id)
+	for prefijo in _prefijos(azar, por_id):
+		clave = normalizar_nombre(prefijo)
+		esperados = sorted(((normalizar_nombre(amigo.nombre), amigo.id) for amigo in por_id.values()
+							if normalizar_nombre(amigo.nombre).startswith(clave)))
+		assert indice.contar_prefijo(prefijo) == len(esperados), prefijo
+		assert [amigo.id for amigo in indice.recorrer_prefijo(prefijo, por_id)] == [id_amigo for _, id_amigo in esperados]
+		limite = azar.randint(0, 5)
+		assert [amigo.id for amigo in indice.buscar_prefijo(prefijo, por_id, limite)] == [id_amigo for _, id_amigo in esperados[:limite]]
+	assert sorted(indice.claves()) == sorted({normalizar_nombre(amigo.nombre) for amigo in por_id.values()})
+
+def test_normalizar_nombre():
+	assert normalizar_nombre("  José   PÉREZ ") == normalizar_nombre("jose perez") == "jose perez"
+	assert normalizar_nombre("Ñandú") == "nandu"
+
+@pytest.mark.parametrize("tamano_bloque", [2, 1000])
+def test_el_indice_coincide_con_una_busqueda_lineal(azar, monkeypatch, tamano_bloque):
+	# Con bloques chicos, los bloques se parten y se vacían a menudo.
+	monkeypatch.setattr(indice_nombres, "_TAMANO_BLOQUE", tamano_bloque)
+	indice = IndiceNombres()
+	por_id = {}
+	siguiente_id = 0
+	for ronda in range(25):
+		for _ in range(azar.randint(1, 15)):
+			sorteo = azar.random()
+			if sorteo < 0.5 or not por_id:
+				amigo = SimpleNamespace(id=siguiente_id, nombre=_nombre(azar))
+				siguiente_id += 1
+				por_id[amigo.id] = amigo
+				indice.agregar(amigo)
+			elif sorteo < 0.8:
+				# Un renombre: se quita con el nombre anterior y se vuelve a agregar.
+				amigo = por_id[azar.choice(list(por_id))]
+				indice.quitar(amigo)
+				amigo.nombre = _nombre(azar)
+				indice.agregar(amigo)
+			else:
+				indice.quitar(por_id.pop(azar.choice(list(por_id))))
+		_comparar(indice, por_id, azar)
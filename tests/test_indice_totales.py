@@ -0,0 +1,77 @@
+﻿# test_indice_totales.py
+# IndiceTotales (indice_totales.py) frente a ordenar la lista completa de amigos.
+
+import pytest
+from indice_totales import IndiceTotales
+
+class Falso:
+	"""Lo único que el índice usa de un amigo: su id y su puntuación total."""
+	def __init__(self, id_amigo, total):
+		self.id = id_amigo
+		self.nombre = f"Amigo {id_amigo}"
+		self.total = total
+
+	def puntuacion_total(self):
+		return self.total
+
+def _ordenados(amigos, minimo=None, maximo=None):
+	return sorted((amigo for amigo in amigos
+				   if (minimo is None or amigo.total >= minimo) and (maximo is None or amigo.total <= maximo)),
+				  key=lambda amigo: (-amigo.total, amigo.id))
+
+def _comparar(indice, amigos, azar):
+	assert len(indice) == len(amigos)
+	assert list(indice) == _ordenados(amigos)
+	assert [(total, list(cubeta)) for total, cubeta in indice.cubetas()] == \
+		[(total, [amigo for amigo in _ordenados(amigos) if amigo.total == total])
+		 for total in sorted({amigo.total for amigo in amigos}, reverse=True)]
+	for _ in range(10):
+		minimo = azar.choice([None, azar.randint(-5, 105)])
+		maximo = azar.choice([None, azar.randint(-5, 105)])
+		esperados = _ordenados(amigos, minimo, maximo)
+		assert indice.contar_entre(minimo, maximo) == len(esperados)
+		assert list(indice.entre(minimo, maximo)) == esperados
+		inicio = azar.randint(0, len(esperados) + 2)
+		fin = azar.choice([None, azar.randint(0, len(esperados) + 5)])
+		assert indice.rango(inicio, fin, minimo, maximo) == esperados[inicio:fin]
+		k = azar.randint(0, 12)
+		assert indice.top(k) == _ordenados(amigos)[:k]
+		total = azar.randint(-5, 105)
+		cercanas = list(indice.cubetas_cercanas(total))
+		diferencias = [diferencia for diferencia, _ in cercanas]
+		assert diferencias == sorted(diferencias)
+		assert sorted(amigo.id for _, cubeta in cercanas for amigo in cubeta) == sorted(amigo.id for amigo in amigos)
+		assert all(abs(amigo.total - total) == diferencia for diferencia, cubeta in cercanas for amigo in cubeta)
+
+def test_el_indice_coincide_con_un_ordenamiento_completo(azar):
+	amigos = [Falso(i, azar.randint(0, 100)) for i in range(0, 40, 2)]
+	# Se agregan desordenados: los ids no llegan siempre en orden creciente.
+	indice = IndiceTotales(azar.sample(amigos, len(amigos)))
+	siguiente_id = 41
+	for ronda in range(40):
+		for _ in range(azar.randint(1, 20)):
+			sorteo = azar.random()
+			if sorteo < 0.4 or not amigos:
+				amigo = Falso(siguiente_id, azar.randint(0, 100))
+				siguiente_id += 1
+				amigos.append(amigo)
+				indice.agregar(amigo)
+			elif sorteo < 0.8:
+				# Una reevaluación: se quita con el total anterior y se vuelve a agregar.
+				amigo = azar.choice(amigos)
+				indice.quitar(amigo)
+				amigo.total = azar.choice([amigo.total, azar.randint(0, 100)])
+				indice.agregar(amigo)
+			else:
+				amigo = amigos.pop(azar.randrange(len(amigos)))
+				indice.quitar(amigo)
+		_comparar(indice, amigos, azar)
+
+def test_quitar_un_amigo_ausente_es_un_error():
+	amigos = [Falso(1, 50), Falso(3, 50)]
+	indice = IndiceTotales(amigos)
+	# Otro id con el mismo total, otro objeto con el mismo id y un total sin cubeta.
+	for ausente in (Falso(2, 50), Falso(1, 50), Falso(4, 7)):
+		with pytest.raises(KeyError):
+			indice.quitar(ausente)
+	assert list(indice) == amigos
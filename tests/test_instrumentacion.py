@@ -0,0 +1,49 @@
+﻿# test_instrumentacion.py
+# perfilar(): un solo bloque perfilado a la vez, aunque se perfile desde varios hilos.
+
+import threading
+import instrumentacion
+
+def test_solo_quien_perfila_suelta_el_perfil():
+	dentro = threading.Event()
+	seguir = threading.Event()
+
+	def perfilar_largo():
+		with instrumentacion.perfilar("largo"):
+			dentro.set()
+			seguir.wait()
+
+	hilo = threading.Thread(target=perfilar_largo)
+	hilo.start()
+	dentro.wait()
+	# Mientras otro hilo perfila, este bloque se ejecuta sin perfilar y al terminar no
+	# debe dar por terminado el perfil del otro.
+	with instrumentacion.perfilar("corto", memoria=True):
+		assert instrumentacion._perfilando.locked()
+	assert instrumentacion._perfilando.locked()
+	assert "corto" not in instrumentacion._perfiles
+	seguir.set()
+	hilo.join()
+	assert not instrumentacion._perfilando.locked()
+	assert "largo" in instrumentacion._perfiles
+
+def test_perfilar_desde_varios_hilos_a_la_vez():
+	errores = []
+
+	def trabajar(numero):
+		try:
+			for _ in range(30):
+				with instrumentacion.perfilar(f"hilo {numero}", memoria=numero % 2 == 0):
+					sum(range(5000))
+					with instrumentacion.perfilar("anidado"):
+						pass
+		except Exception as e:
+			errores.append(e)
+
+	hilos = [threading.Thread(target=trabajar, args=(numero,)) for numero in range(6)]
+	for hilo in hilos:
+		hilo.start()
+	for hilo in hilos:
+		hilo.join()
+	assert errores == []
+	assert not instrumentacion._perfilando.locked()
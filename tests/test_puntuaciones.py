@@ -0,0 +1,46 @@
+﻿# test_puntuaciones.py
+# Las puntuaciones de un amigo solo cambian por el círculo, que mantiene sus índices.
+
+import pytest
+from amigo import CRITERIOS_POR_DEFECTO
+from circulo_amistad import CirculoAmistad
+from conftest import puntuaciones_al_azar
+
+def test_la_vista_de_puntuaciones_es_de_solo_lectura(carpeta, azar):
+	circulo = CirculoAmistad(str(carpeta / "amigos.txt"))
+	id_amigo = circulo.agregar_amigo("Ana", puntuaciones_al_azar(azar))
+	amigo = circulo.obtener(id_amigo)
+	with pytest.raises(TypeError):
+		amigo.puntuaciones[CRITERIOS_POR_DEFECTO[0]] = 10
+	with pytest.raises(AttributeError):
+		amigo.puntuaciones = {criterio: 10 for criterio in CRITERIOS_POR_DEFECTO}
+	# reevaluar_amigo() mantiene la categoría, el ranking y los contadores.
+	circulo.reevaluar_amigo(id_amigo, {criterio: 10 for criterio in CRITERIOS_POR_DEFECTO})
+	assert amigo.puntuacion_total() == 10 * len(CRITERIOS_POR_DEFECTO)
+	assert circulo.ranking() == [amigo]
+	assert circulo.conteo_categorias[amigo.categoria] == 1
+
+def test_escribir_puntuaciones_fuera_de_rango_no_cambia_nada(azar):
+	from amigo import Amigo
+	amigo = Amigo("Ana", puntuaciones_al_azar(azar))
+	antes = dict(amigo.puntuaciones)
+	with pytest.raises(ValueError):
+		amigo._escribir_puntuaciones({criterio: 300 for criterio in CRITERIOS_POR_DEFECTO})
+	assert dict(amigo.puntuaciones) == antes
+
+def test_una_linea_externa_fuera_de_rango_no_se_incorpora(carpeta, azar):
+	archivo = str(carpeta / "amigos.txt")
+	circulo = CirculoAmistad(archivo, vigilar=True)
+	for i in range(3):
+		circulo.agregar_amigo(f"Amigo {i}", puntuaciones_al_azar(azar))
+	with open(archivo, encoding="latin-1") as origen:
+		lineas = origen.read().splitlines()
+	campos = lineas[1].split(",")
+	campos[1] = "300"
+	lineas[1] = ",".join(campos)
+	with open(archivo, "w", encoding="latin-1") as destino:
+		destino.write("\n".join(lineas) + "\n")
+	cambios = circulo.recargar_cambios()
+	# Como al cargar: la línea no describe un amigo válido.
+	assert [a.id for a in cambios.bajas] == [0]
+	assert len(circulo.amigos) == 2
@@ -0,0 +1,73 @@
+﻿# test_similitud.py
+# similares() (similitud.py) frente a calcular la métrica con todos los amigos y ordenar.
+
+from math import sqrt
+import pytest
+import similitud
+from circulo_amistad import CirculoAmistad
+from conftest import mutar, puntuaciones_al_azar
+
+CAMINOS = [False, pytest.param(True, marks=pytest.mark.skipif(similitud.np is None, reason="sin NumPy"))]
+
+def _esperados(circulo, amigo, k, metrica, excluidos=()):
+	"""Los k más parecidos ordenando todo el círculo; los empates, por fila de la tabla."""
+	consulta = list(amigo.puntuaciones.values())
+	norma_consulta = sqrt(sum(valor * valor for valor in consulta))
+	puntajes = []
+	for otro in circulo.amigos:
+		if otro is amigo or otro in excluidos:
+			continue
+		valores = list(otro.puntuaciones.values())
+		if metrica == "euclidea":
+			valor = sqrt(sum((a - b) * (a - b) for a, b in zip(valores, consulta)))
+			clave = valor
+		else:
+			norma = sqrt(sum(valor * valor for valor in valores))
+			producto = sum(a * b for a, b in zip(valores, consulta))
+			valor = producto / (norma * norma_consulta) if norma and norma_consulta else 0.0
+			clave = -valor
+		puntajes.append((clave, otro._fila, otro, valor))
+	return [(otro, valor) for _, _, otro, valor in sorted(puntajes, key=lambda puntaje: puntaje[:2])[:k]]
+
+def _comparar(obtenidos, esperados, metrica, usar_numpy):
+	assert [valor for _, valor in obtenidos] == pytest.approx([valor for _, valor in esperados])
+	# Con NumPy, el coseno se redondea distinto y un empate puede resolverse por otro amigo.
+	if metrica == "euclidea" or not usar_numpy:
+		assert [otro.id for otro, _ in obtenidos] == [otro.id for otro, _ in esperados]
+
+@pytest.mark.parametrize("usar_numpy", CAMINOS)
+@pytest.mark.parametrize("metrica", similitud.METRICAS)
+def test_similares_coincide_con_un_ordenamiento_completo(carpeta, azar, metrica, usar_numpy):
+	circulo = CirculoAmistad(str(carpeta / "amigos.txt"))
+	# Un amigo sin puntuaciones: no tiene dirección para el coseno.
+	circulo.agregar_amigo("Cero", dict.fromkeys(circulo.criterios, 0))
+	for ronda in range(8):
+		mutar(circulo, azar, 40)
+		for amigo in azar.sample(circulo.amigos, min(10, len(circulo.amigos))):
+			k = azar.choice([1, 3, 10, len(circulo.amigos) + 5])
+			_comparar(similitud.similares(circulo, amigo, k, metrica, usar_numpy),
+					  _esperados(circulo, amigo, k, metrica), metrica, usar_numpy)
+
+@pytest.mark.parametrize("usar_numpy", CAMINOS)
+def test_los_eliminados_en_una_transaccion_no_aparecen(carpeta, azar, usar_numpy):
+	circulo = CirculoAmistad(str(carpeta / "amigos.txt"))
+	for i in range(40):
+		circulo.agregar_amigo(f"Amigo {i}", puntuaciones_al_azar(azar))
+	mutar(circulo, azar, 20)
+	amigo = circulo.amigos[0]
+	with pytest.raises(RuntimeError):
+		with circulo.transaccion():
+			eliminados = [circulo.por_id[id_amigo] for id_amigo in azar.sample(list(circulo.por_id)[1:], 10)]
+			for eliminado in eliminados:
+				circulo.eliminar_amigo(eliminado.id)
+			for metrica in similitud.METRICAS:
+				_comparar(similitud.similares(circulo, amigo, 20, metrica, usar_numpy),
+						  _esperados(circulo, amigo, 20, metrica, eliminados), metrica, usar_numpy)
+			raise RuntimeError("se cancela")
+
+def test_metrica_desconocida_y_k_nulo(carpeta, azar):
+	circulo = CirculoAmistad(str(carpeta / "amigos.txt"))
+	id_amigo = circulo.agregar_amigo("Ana", puntuaciones_al_azar(azar))
+	with pytest.raises(ValueError):
+		circulo.similares(id_amigo, metrica="manhattan")
+	assert circulo.similares(id_amigo, k=0) == []
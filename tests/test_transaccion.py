@@ -0,0 +1,63 @@
+﻿# test_transaccion.py
+# Transacciones de CirculoAmistad: al fallar, el círculo, sus índices y el archivo quedan como antes.
+
+from collections import Counter
+import pytest
+from circulo_amistad import CirculoAmistad
+from conftest import estado, mutar, puntuaciones_al_azar
+
+def _coherente(circulo):
+	"""Los índices del círculo describen exactamente a sus amigos."""
+	amigos = circulo.amigos
+	assert [a.id for a in circulo.ranking()] == [a.id for a in sorted(amigos, key=lambda a: (-a.puntuacion_total(), a.id))]
+	assert len(circulo.indice) == len(amigos)
+	assert +circulo.conteo_categorias == Counter(a.categoria for a in amigos)
+	assert +circulo.conteo_generos == Counter(a.genero for a in amigos)
+	for amigo in amigos:
+		assert amigo in circulo.buscar_por_nombre(amigo.nombre)
+
+@pytest.mark.parametrize("diario", [False, True])
+def test_una_excepcion_deshace_la_transaccion(carpeta, azar, diario):
+	archivo = str(carpeta / "amigos.txt")
+	circulo = CirculoAmistad(archivo, diario=diario)
+	mutar(circulo, azar, 60)
+	for _ in range(10):
+		antes = estado(circulo)
+		with pytest.raises(RuntimeError):
+			with circulo.transaccion():
+				mutar(circulo, azar, azar.randint(1, 15))
+				raise RuntimeError("se cancela")
+		assert estado(circulo) == antes
+		_coherente(circulo)
+	circulo.flush()
+	assert estado(CirculoAmistad(archivo, diario=diario)) == antes
+	circulo.cerrar()
+
+def test_un_guardado_fallido_deshace_la_transaccion(carpeta, azar, monkeypatch):
+	archivo = str(carpeta / "amigos.txt")
+	circulo = CirculoAmistad(archivo, diario=True)
+	mutar(circulo, azar, 30)
+	antes = estado(circulo)
+
+	def fallar(*argumentos):
+		raise OSError("disco lleno")
+	monkeypatch.setattr(circulo.almacen, "aplicar_lote", fallar)
+	with pytest.raises(OSError):
+		with circulo.transaccion():
+			circulo.agregar_amigo("Nuevo", puntuaciones_al_azar(azar))
+			circulo.eliminar_amigo(next(iter(circulo.por_id)))
+			mutar(circulo, azar, 10)
+	assert estado(circulo) == antes
+	_coherente(circulo)
+	monkeypatch.undo()
+	assert estado(CirculoAmistad(archivo, diario=True)) == antes
+
+def test_una_transaccion_confirmada_se_guarda_completa(carpeta, azar):
+	archivo = str(carpeta / "amigos.txt")
+	circulo = CirculoAmistad(archivo, diario=True)
+	mutar(circulo, azar, 30)
+	with circulo.transaccion():
+		mutar(circulo, azar, 25)
+	_coherente(circulo)
+	assert estado(CirculoAmistad(archivo, diario=True)) == estado(circulo)
+	circulo.cerrar()
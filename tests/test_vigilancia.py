@@ -0,0 +1,147 @@
+﻿# test_vigilancia.py
+# recargar_cambios(): los cambios que otro programa hace en el archivo se incorporan por diferencia.
+
+import threading
+import time
+import pytest
+import benchmark
+from amigo import CRITERIOS_POR_DEFECTO
+from circulo_amistad import CirculoAmistad
+from conftest import NOMBRES, contenido, estado, mutar, puntuaciones_al_azar
+
+def _editar(archivo, azar):
+	"""Edita el archivo a mano: borra, agrega y modifica líneas, y agrega alguna inválida."""
+	# La vigilancia compara fecha y tamaño: se espera para que la fecha cambie aunque el tamaño no.
+	time.sleep(0.01)
+	with open(archivo, encoding="latin-1") as origen:
+		lineas = origen.read().splitlines()
+	cabecera = lineas[:1] if lineas and lineas[0].startswith("#esquema") else []
+	lineas = lineas[len(cabecera):]
+	for _ in range(azar.randint(1, 4)):
+		sorteo = azar.random()
+		if sorteo < 0.3 and lineas:
+			del lineas[azar.randrange(len(lineas))]
+		elif sorteo < 0.6:
+			campos = [f"{azar.choice(NOMBRES)} E{azar.randint(0, 999)}"]
+			campos += [str(valor) for valor in puntuaciones_al_azar(azar).values()] + ["F", "X"]
+			lineas.insert(azar.randint(0, len(lineas)), ",".join(campos))
+		elif sorteo < 0.7:
+			lineas.insert(azar.randint(0, len(lineas)), "basura")
+		elif lineas:
+			posicion = azar.randrange(len(lineas))
+			campos = lineas[posicion].split(",")
+			campos[1:2] = [str(azar.randint(0, 10))] if len(campos) > 1 else []
+			lineas[posicion] = ",".join(campos)
+	lineas = cabecera + lineas
+	with open(archivo, "w", encoding="latin-1") as destino:
+		destino.write("\n".join(lineas) + ("\n" if lineas else ""))
+
+def _otro_programa(archivo, azar, cerrar):
+	"""Otro CirculoAmistad modifica el círculo; sin cerrar, sus cambios quedan en el diario."""
+	otro = CirculoAmistad(archivo, diario=True)
+	mutar(otro, azar, azar.randint(1, 5))
+	if cerrar:
+		otro.cerrar()
+	else:
+		otro.almacen.diario.cerrar()
+
+@pytest.mark.parametrize("diferido", [False, True])
+def test_recargar_cambios_coincide_con_una_carga_completa(carpeta, azar, diferido):
+	for ronda in range(15):
+		archivo = str(carpeta / f"amigos{ronda}.txt")
+		benchmark.generar_archivo(archivo, azar.randint(0, 60), CRITERIOS_POR_DEFECTO, semilla=ronda)
+		circulo = CirculoAmistad(archivo, diario=True, vigilar=True, diferido=diferido,
+								 umbral_compactacion=azar.choice([3, 1000]))
+		for paso in range(6):
+			modo = azar.choice(["otro_cierra", "otro_diario", "editar", "local"])
+			circulo.flush()
+			if modo == "local":
+				mutar(circulo, azar, azar.randint(1, 5))
+				circulo.flush()
+			elif modo == "editar":
+				_editar(archivo, azar)
+			else:
+				_otro_programa(archivo, azar, modo == "otro_cierra")
+			circulo.recargar_cambios()
+			circulo.flush()
+			assert not circulo.hay_cambios_externos(), (ronda, paso, modo)
+			assert contenido(circulo) == contenido(CirculoAmistad(archivo, diario=True)), (ronda, paso, modo)
+			assert [a.id for a in circulo.ranking()] == [a.id for a in sorted(circulo.amigos, key=lambda a: (-a.puntuacion_total(), a.id))]
+		mutar(circulo, azar, 3)
+		final = contenido(circulo)
+		circulo.cerrar()
+		assert contenido(CirculoAmistad(archivo, diario=True)) == final, ronda
+
+def test_los_oyentes_reciben_solo_la_diferencia(carpeta, azar):
+	archivo = str(carpeta / "amigos.txt")
+	circulo = CirculoAmistad(archivo, diario=True, vigilar=True)
+	ids = [circulo.agregar_amigo(f"Amigo {i}", puntuaciones_al_azar(azar)) for i in range(10)]
+	circulo.flush()
+	avisos = []
+	circulo.suscribir(avisos.append)
+	assert circulo.recargar_cambios() is None
+
+	otro = CirculoAmistad(archivo, diario=True)
+	alta = otro.agregar_amigo("Nuevo", puntuaciones_al_azar(azar), "F")
+	otro.reevaluar_amigo(ids[3], {criterio: 10 for criterio in otro.criterios}, "Cambiado")
+	otro.eliminar_amigo(ids[7])
+	otro.cerrar()
+
+	assert circulo.hay_cambios_externos()
+	cambios = circulo.recargar_cambios()
+	assert avisos == [cambios]
+	assert [a.id for a in cambios.altas] == [alta]
+	assert [(a.id, a.nombre, a.puntuacion_total()) for a in cambios.cambios] == [(ids[3], "Cambiado", 10 * len(circulo.criterios))]
+	assert [a.id for a in cambios.bajas] == [ids[7]]
+	assert estado(circulo) == estado(CirculoAmistad(archivo, diario=True))
+	assert circulo.buscar_por_nombre("Cambiado") == [circulo.por_id[ids[3]]]
+	assert circulo.recargar_cambios() is None
+	circulo.cerrar()
+
+def test_lo_modificado_despues_de_leer_conserva_la_version_local(carpeta, azar):
+	archivo = str(carpeta / "amigos.txt")
+	circulo = CirculoAmistad(archivo, diario=True, vigilar=True, diferido=True)
+	ids = [circulo.agregar_amigo(f"Amigo {i}", puntuaciones_al_azar(azar)) for i in range(10)]
+	circulo.flush()
+	otro = CirculoAmistad(archivo, diario=True)
+	otro.reevaluar_amigo(ids[2], puntuaciones_al_azar(azar), "Externo")
+	otro.reevaluar_amigo(ids[4], puntuaciones_al_azar(azar), "Externo")
+	otro.eliminar_amigo(ids[6])
+	otro.cerrar()
+	# La lectura corre en otro hilo; mientras, este modifica dos de esos amigos.
+	externos = circulo.leer_cambios_externos()
+	circulo.reevaluar_amigo(ids[2], puntuaciones_al_azar(azar), "Local")
+	circulo.reevaluar_amigo(ids[6], puntuaciones_al_azar(azar), "Local")
+	local = estado(circulo)
+	cambios = circulo.recargar_cambios(externos)
+	assert [a.id for a in cambios.cambios] == [ids[4]]
+	assert cambios.bajas == []
+	assert estado(circulo)[ids[2]] == local[ids[2]]
+	assert estado(circulo)[ids[6]] == local[ids[6]]
+	# Esos amigos se vuelven a comparar: el disco tiene la versión local, escrita después.
+	assert circulo.hay_cambios_externos()
+	circulo.recargar_cambios()
+	circulo.flush()
+	assert not circulo.hay_cambios_externos()
+	assert estado(circulo) == estado(CirculoAmistad(archivo, diario=True))
+	circulo.cerrar()
+
+def test_leer_en_otro_hilo_mientras_se_modifica_el_circulo(carpeta, azar):
+	archivo = str(carpeta / "amigos.txt")
+	circulo = CirculoAmistad(archivo, diario=True, vigilar=True, diferido=True)
+	mutar(circulo, azar, 40)
+	circulo.flush()
+	for ronda in range(20):
+		_otro_programa(archivo, azar, azar.random() < 0.5)
+		leidos = []
+		lector = threading.Thread(target=lambda: leidos.append(circulo.leer_cambios_externos()))
+		lector.start()
+		mutar(circulo, azar, azar.randint(1, 6))
+		lector.join()
+		if leidos[0] is not None:
+			circulo.recargar_cambios(leidos[0])
+		while circulo.hay_cambios_externos():
+			circulo.recargar_cambios()
+		circulo.flush()
+		assert estado(circulo) == estado(CirculoAmistad(archivo, diario=True)), ronda
+	circulo.cerrar()
@@ -0,0 +1,43 @@
+﻿# transaccion.py
+
+class Transaccion:
+	"""
+	Cambios de una transacción de CirculoAmistad (ver CirculoAmistad.transaccion()).
+	Los cambios se aplican en memoria al momento, para que las consultas dentro de la
+	transacción los vean, pero se persisten todos juntos al confirmarla. Se guarda:
+	 - el efecto neto por amigo ('altas', 'cambios' y 'bajas', diccionarios {id: amigo}):
+	   un amigo agregado y luego editado es solo un alta, y uno agregado y luego eliminado
+	   no deja rastro;
+	 - un registro para deshacer, en orden, con el estado previo de cada amigo modificado;
+	 - 'previos': el estado de cada amigo modificado antes de la transacción (para el historial).
+	"""
+	def __init__(self):
+		self.altas = {}
+		self.cambios = {}
+		self.bajas = {}
+		# Amigos eliminados durante la transacción; se desvinculan de la tabla al confirmarla.
+		self.eliminados = []
+		self.deshacer = []
+		self.previos = {}
+
+	def anotar_alta(self, amigo):
+		self.altas[amigo.id] = amigo
+		self.deshacer.append(("A", amigo, None))
+
+	def anotar_cambio(self, amigo, previo):
+		"""'previo' es (nombre, género, puntuaciones) del amigo antes del cambio."""
+		if amigo.id not in self.altas:
+			self.cambios[amigo.id] = amigo
+			self.previos.setdefault(amigo.id, previo)
+		self.deshacer.append(("U", amigo, previo))
+
+	def anotar_baja(self, amigo):
+		if self.altas.pop(amigo.id, None) is None:
+			self.cambios.pop(amigo.id, None)
+			self.bajas[amigo.id] = amigo
+		self.eliminados.append(amigo)
+		self.deshacer.append(("D", amigo, None))
+
+	def __len__(self):
+		"""Cantidad de amigos afectados."""
+		return len(self.altas) + len(self.cambios) + len(self.bajas)
@@ -0,0 +1,39 @@
+﻿# vigilancia.py
+# Vigilancia del archivo de amigos para incorporar los cambios que hagan otros programas
+# (la línea de comandos, un editor de texto o un servicio de sincronización) sin reiniciar.
+# Solo se consulta la fecha y el tamaño de los archivos cada cierto tiempo: no hace falta
+# ningún servicio del sistema operativo.
+
+import threading
+
+class Vigilante:
+	"""
+	Hilo que cada 'intervalo' segundos llama a comprobar() (por ejemplo,
+	CirculoAmistad.hay_cambios_externos) y, si devuelve True, a al_cambiar().
+	al_cambiar() se ejecuta en el hilo del vigilante: en la interfaz gráfica lee ahí los
+	cambios (CirculoAmistad.leer_cambios_externos) y pasa el resultado al hilo principal
+	(wx.CallAfter), que es el que llama a recargar_cambios().
+	"""
+	def __init__(self, comprobar, al_cambiar, intervalo=1.0):
+		self.comprobar = comprobar
+		self.al_cambiar = al_cambiar
+		self.intervalo = intervalo
+		self._detenido = threading.Event()
+		self._hilo = threading.Thread(target=self._vigilar, name="Vigilante", daemon=True)
+		self._hilo.start()
+
+	def _vigilar(self):
+		while not self._detenido.wait(self.intervalo):
+			try:
+				cambio = self.comprobar()
+			except OSError as e:
+				print(f"Error al vigilar el archivo de amigos: {e}")
+				continue
+			if cambio and not self._detenido.is_set():
+				self.al_cambiar()
+
+	def detener(self):
+		"""Termina el hilo; no espera más de lo que tarde la comprobación en curso."""
+		self._detenido.set()
+		if self._hilo is not threading.current_thread():
+			self._hilo.join()